@@ -0,0 +1,137 @@
+import logging
+import threading
+import time
+
+#--- Cached account snapshot for the dashboard
+# A background thread keeps balances, positions and open orders current, so web requests only ever
+# read memory. Viewers never trigger exchange calls, no matter how many there are.
+# With a user-data stream (bot.start_user_stream) the snapshot is copied from the stream's store
+# whenever an event changes it: no REST calls at all, the stream's own resync is the only REST
+# refresh (balance + position + all-symbol open orders cost about 50 weight per refresh). While the
+# stream is reconnecting the last data is served and ages into `stale`. Without a stream, REST is
+# polled every max_age / 2.
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_AGE = 10.0 # seconds a snapshot may be old before it is reported as stale
+STREAM_POLL = 1.0 # seconds between checks of the stream store (it is copied as soon as it changes)
+
+
+class AccountSnapshot:
+    def __init__(self, bot, max_age=DEFAULT_MAX_AGE):
+        """
+        :param bot: BasicBot whose user-data stream store is served, or (through its rate limiter)
+                    used for REST refreshes when it has no stream
+        :param max_age: Staleness bound in seconds; REST refreshes run every max_age / 2
+        """
+        self.bot = bot
+        self.max_age = max_age
+        self.interval = max_age / 2
+        self.balance = None
+        self.positions = None
+        self.open_orders = None
+        self.updated_at = None # time.time() of the last successful refresh
+        self.error = None
+        self.version = 0 # bumped on every refresh, used by push subscribers
+        self._condition = threading.Condition()
+        self._stopping = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name='account-snapshot', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopping.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def _stream_store(self):
+        stream = getattr(self.bot, 'user_stream', None)
+        return stream.store if stream else None
+
+    def _copy_from(self, store, version):
+        """Copies the stream store into the snapshot if it changed since `version`. :return: The store version copied"""
+        with self._condition:
+            if not store.live and self.updated_at is None:
+                return version # Not resynced yet: nothing to serve
+            if store.live:
+                self.updated_at = time.time() # Live stream: the data is current even if nothing changed
+            if store.version == version:
+                return version
+        current = store.snapshot()
+        with self._condition:
+            self.balance = current['balance']
+            self.positions = current['positions']
+            self.open_orders = current['open_orders']
+            self.error = None if current['live'] else 'User data stream reconnecting'
+            self.version += 1
+            self._condition.notify_all()
+        return current['version']
+
+    def refresh(self):
+        """Fetches a fresh snapshot over REST (blocking). Errors are recorded, keeping the previous data."""
+        try:
+            balance = self.bot._call('futures_account_balance')
+            positions = self.bot._call('futures_position_information')
+            open_orders = self.bot.fetch_open_orders()
+        except Exception as e:
+            logger.error(f"Account snapshot refresh failed: {e}")
+            with self._condition:
+                self.error = str(e)
+                self.version += 1
+                self._condition.notify_all()
+            return
+
+        with self._condition:
+            self.balance = [asset for asset in balance if float(asset.get('balance', 0)) > 0]
+            self.positions = [p for p in positions if float(p.get('positionAmt', 0)) != 0]
+            self.open_orders = open_orders
+            self.updated_at = time.time()
+            self.error = None
+            self.version += 1
+            self._condition.notify_all()
+
+    def request_refresh(self):
+        """Wakes the refresher early (e.g. right after an order was placed or cancelled)."""
+        self._wake.set()
+
+    def _run(self):
+        store_version = None
+        while not self._stopping.is_set():
+            store = self._stream_store()
+            if store is not None:
+                store_version = self._copy_from(store, store_version)
+                store.wait_for_change(store_version, STREAM_POLL)
+                continue
+            self.refresh()
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def get(self):
+        """:return: Snapshot dict (balance/positions/open_orders are None until the first refresh)"""
+        with self._condition:
+            age = time.time() - self.updated_at if self.updated_at else None
+            return {
+                'balance': self.balance,
+                'positions': self.positions,
+                'open_orders': self.open_orders,
+                'updated_at': self.updated_at,
+                'age': age,
+                'stale': age is None or age > self.max_age,
+                'error': self.error,
+                'version': self.version,
+            }
+
+    def wait_for_update(self, version, timeout):
+        """
+        Blocks until the snapshot is newer than `version` or `timeout` elapses.
+        :return: The current snapshot dict
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self.version != version, timeout=timeout)
+        return self.get()
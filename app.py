@@ -1,61 +1,203 @@
 # app.py
 import os
-from flask import Flask, render_template, request, redirect, url_for, flash, get_flashed_messages
-from trading_bot import BasicBot # Import your BasicBot class
-
-app = Flask(__name__)
-# Configure a secret key for Flask sessions (needed for flashing messages)
-# It's best practice to set this environment variable securely
-app.config['SECRET_KEY'] = os.environ.get('FLASK_SECRET_KEY', 'a_default_secret_key_if_env_not_set')
-
-# Initialize the bot instance (outside of routes, so it's persistent)
-# It's best practice to get API keys from environment variables in production
-api_key = os.environ.get('BINANCE_TEST_API_KEY')
-api_secret = os.environ.get('BINANCE_TEST_API_SECRET')
-
-# Basic check for API keys at startup
-if not api_key or not api_secret:
-    print("WARNING: BINANCE_TEST_API_KEY or BINANCE_TEST_API_SECRET not found in environment variables.")
-    print("Please set them for secure operation.")
-    # In a real app, you might render a configuration page or handle this more gracefully
-    # For this example, we'll proceed but bot operations will likely fail without keys
-    bot = None # Initialize bot as None if keys are missing
-    print("Bot initialization skipped due to missing API keys.")
-else:
+import json
+import logging
+import threading
+import time
+from flask import (Flask, Blueprint, render_template, request, redirect, url_for, flash, get_flashed_messages,
+                   jsonify, Response, current_app)
+from exchange_info import OrderValidationError
+from logging_setup import configure_logging
+from bot_server import SharedBot, connect_shared_bot
+
+logger = logging.getLogger(__name__)
+
+# How old (in seconds) the cached balance/positions/orders may get before they are flagged stale
+DASHBOARD_MAX_AGE = float(os.environ.get('DASHBOARD_MAX_AGE', 10))
+# How long an idle /api/stream connection waits before sending a keep-alive snapshot
+STREAM_HEARTBEAT = 15
+# An /api/stream connection holds a worker thread for as long as it is open, so it needs a threaded
+# or async server (the Flask dev server, gunicorn --threads N or -k gevent; not plain sync workers).
+# It is closed after this many seconds and the browser's EventSource reconnects on its own, so
+# abandoned connections cannot pin threads forever.
+STREAM_MAX_DURATION = 300
+
+dashboard = Blueprint('dashboard', __name__)
+_bot_lock = threading.Lock()
+
+
+def create_app(config=None):
+    """
+    Application factory. Does no network I/O: the bot is created on first use.
+    Set BOT_SERVER_ADDRESS (and BOT_SERVER_AUTHKEY) to share one bot_server.py process between all
+    web workers, e.g. `gunicorn -w 4 'app:wsgi_app()'`; otherwise each process runs its own bot.
+    """
+    app = Flask(__name__)
+    # Configure a secret key for Flask sessions (needed for flashing messages)
+    # It's best practice to set this environment variable securely
+    app.config['SECRET_KEY'] = os.environ.get('FLASK_SECRET_KEY', 'a_default_secret_key_if_env_not_set')
+    # It's best practice to get API keys from environment variables in production
+    app.config['BINANCE_TEST_API_KEY'] = os.environ.get('BINANCE_TEST_API_KEY')
+    app.config['BINANCE_TEST_API_SECRET'] = os.environ.get('BINANCE_TEST_API_SECRET')
+    app.config['BINANCE_FUTURES_BASE_URL'] = os.environ.get('BINANCE_FUTURES_BASE_URL')
+    app.config['BINANCE_FUTURES_WS_URL'] = os.environ.get('BINANCE_FUTURES_WS_URL')
+    app.config['BOT_SERVER_ADDRESS'] = os.environ.get('BOT_SERVER_ADDRESS')
+    app.config['BOT_SERVER_AUTHKEY'] = os.environ.get('BOT_SERVER_AUTHKEY', '')
+    if config:
+        app.config.update(config)
+
+    if not app.config['BOT_SERVER_ADDRESS'] and not (app.config['BINANCE_TEST_API_KEY'] and app.config['BINANCE_TEST_API_SECRET']):
+        logger.warning("BINANCE_TEST_API_KEY or BINANCE_TEST_API_SECRET not found in environment variables; "
+                       "bot operations are disabled.")
+
+    app.register_blueprint(dashboard)
+    return app
+
+
+def _create_bot(config):
+    if config['BOT_SERVER_ADDRESS']:
+        return connect_shared_bot(config['BOT_SERVER_ADDRESS'], config['BOT_SERVER_AUTHKEY'])
+    if not config['BINANCE_TEST_API_KEY'] or not config['BINANCE_TEST_API_SECRET']:
+        return None
+    # In-process bot: connects to the exchange on a background thread
+    return SharedBot(config['BINANCE_TEST_API_KEY'], config['BINANCE_TEST_API_SECRET'], testnet=True,
+                     base_url=config['BINANCE_FUTURES_BASE_URL'], max_age=DASHBOARD_MAX_AGE, ws_url=config['BINANCE_FUTURES_WS_URL'])
+
+
+def get_bot():
+    """
+    :return: The app's SharedBot (or a proxy to the shared bot process), or None if API keys are
+             missing or the bot server is unreachable
+    """
+    extensions = current_app.extensions
+    if extensions.get('trading_bot') is None:
+        with _bot_lock:
+            if extensions.get('trading_bot') is None:
+                try:
+                    extensions['trading_bot'] = _create_bot(current_app.config)
+                except Exception as e:
+                    # Not cached: the next request retries (e.g. bot_server.py started after the workers)
+                    logger.error(f"Could not connect to shared bot server: {e}")
+                    return None
+    return extensions['trading_bot']
+
+
+def _get_ready_bot():
+    """Returns the bot if it can take orders, otherwise flashes why not and returns None."""
+    bot = get_bot()
+    if not bot:
+        flash("Bot not initialized. API keys may be missing or invalid.", 'error')
+        return None
+    status = bot.status()
+    if not status['ready']:
+        flash(f"Bot initialization failed: {status['error']}" if status['error'] else
+              "Bot is still connecting to the exchange. Please try again in a moment.", 'error')
+        return None
+    return bot
+
+
+@dashboard.route('/healthz')
+def healthz():
+    """Liveness: the web worker is up (never touches the exchange)."""
+    return jsonify({'status': 'ok'})
+
+@dashboard.route('/readyz')
+def readyz():
+    """Readiness: the bot is connected and can take orders."""
+    bot = get_bot()
+    if not bot:
+        return jsonify({'ready': False, 'error': 'Bot not configured or bot server unreachable.'}), 503
     try:
-        bot = BasicBot(api_key=api_key, api_secret=api_secret, testnet=True)
-        print("Bot initialized successfully.")
+        status = bot.status()
+        if status['ready'] and not bot.check_connectivity(): # Cached: only pings an idle bot
+            status = {'ready': False, 'error': 'Exchange unreachable.'}
     except Exception as e:
-        print(f"Error initializing bot: {e}")
-        bot = None # Set bot to None if initialization fails
-        print("Bot initialization failed.")
+        return jsonify({'ready': False, 'error': str(e)}), 503
+    return jsonify(status), (200 if status['ready'] else 503)
 
+@dashboard.route('/metrics')
+def metrics():
+    """Prometheus scrape endpoint: per-endpoint exchange latency, error counters and in-flight calls."""
+    bot = get_bot()
+    body = bot.render_metrics() if bot else ''
+    return Response(body, mimetype='text/plain; version=0.0.4')
 
-@app.route('/')
+
+@dashboard.route('/')
 def index():
     """Renders the main dashboard page and displays flashed messages."""
     account_balance = None
-    if bot: # Only attempt API calls if bot was initialized successfully
-        try:
-            # Fetch balance to display on the dashboard
-            balance_info = bot.client.futures_account_balance()
-            # Filter for assets with positive balance
-            account_balance = [asset for asset in balance_info if float(asset.get('balance', 0)) > 0]
-        except Exception as e:
-            print(f"Error fetching balance: {e}")
-            flash(f"Error fetching account balance: {e}", 'error') # Flash error message
+    bot = get_bot()
+    if bot and bot.status()['ready']: # Served from the background snapshot: page load never waits on the exchange
+        current = bot.get_snapshot()
+        account_balance = current['balance'] # None until the first refresh completes
+        if current['error']:
+            flash(f"Error refreshing account data: {current['error']}", 'error') # Flash error message
 
     # get_flashed_messages() retrieves and clears the messages from the session
     messages = get_flashed_messages(with_categories=True)
 
     return render_template('index.html', account_balance=account_balance, messages=messages)
 
-@app.route('/place_order', methods=['POST'])
+def _snapshot_or_error():
+    bot = get_bot()
+    if not bot:
+        return None, (jsonify({'error': 'Bot not initialized. API keys may be missing or invalid.'}), 503)
+    status = bot.status()
+    if not status['ready']:
+        return None, (jsonify({'error': status['error'] or 'Bot is still connecting to the exchange.'}), 503)
+    return bot.get_snapshot(), None
+
+@dashboard.route('/api/balance')
+def api_balance():
+    """Cached account balance (assets with a positive balance) and positions as JSON."""
+    current, error = _snapshot_or_error()
+    if error:
+        return error
+    return jsonify({key: current[key] for key in ('balance', 'positions', 'updated_at', 'age', 'stale', 'error')})
+
+@dashboard.route('/api/orders')
+def api_orders():
+    """Cached open orders as JSON."""
+    current, error = _snapshot_or_error()
+    if error:
+        return error
+    return jsonify({key: current[key] for key in ('open_orders', 'updated_at', 'age', 'stale', 'error')})
+
+@dashboard.route('/api/messages')
+def api_messages():
+    """Pops flashed messages as JSON (used by the page after submitting a form in the background)."""
+    return jsonify([{'category': category, 'message': message}
+                    for category, message in get_flashed_messages(with_categories=True)])
+
+@dashboard.route('/api/stream')
+def api_stream():
+    """Server-sent events: pushes the snapshot to the page every time it is refreshed (for at most STREAM_MAX_DURATION)."""
+    current, error = _snapshot_or_error()
+    if error:
+        return error
+    bot = get_bot()
+
+    def events():
+        version = None
+        deadline = time.monotonic() + STREAM_MAX_DURATION
+        yield "retry: 1000\n\n" # Reconnect quickly when the connection is closed below
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            current = bot.wait_for_snapshot(version, timeout=min(STREAM_HEARTBEAT, remaining))
+            version = current['version']
+            yield f"data: {json.dumps(current)}\n\n"
+
+    return Response(events(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
+@dashboard.route('/place_order', methods=['POST'])
 def place_order():
     """Handles order placement requests from the form."""
+    bot = _get_ready_bot()
     if not bot:
-        flash("Bot not initialized. API keys may be missing or invalid.", 'error')
-        return redirect(url_for('index'))
+        return redirect(url_for('dashboard.index'))
 
     order_type = request.form.get('order_type')
     symbol = request.form.get('symbol').upper()
@@ -66,7 +208,7 @@ def place_order():
         quantity = float(quantity_str)
         if quantity <= 0:
              flash("Quantity must be greater than zero.", 'error')
-             return redirect(url_for('index'))
+             return redirect(url_for('dashboard.index'))
 
         order_details = None
         message = None
@@ -86,13 +228,10 @@ def place_order():
                 price = float(price_str)
                 if price <= 0:
                     flash("Limit price must be greater than zero.", 'error')
-                    return redirect(url_for('index'))
+                    return redirect(url_for('dashboard.index'))
 
-                # Add notional value check
-                notional_value = quantity * price
-                if notional_value < 100: # Assuming minimum notional is 100 USDT
-                    flash(f"Order notional value ({notional_value:.2f} USDT) is too small. Must be at least 100 USDT.", 'error')
-                    return redirect(url_for('index'))
+                # Check LOT_SIZE / PRICE_FILTER / MIN_NOTIONAL against the cached exchange info (no network call)
+                bot.validate_order({'symbol': symbol, 'side': side, 'type': 'LIMIT', 'quantity': quantity, 'price': price})
 
                 order_details = bot.place_limit_order(symbol, side, quantity, price)
                 if order_details:
@@ -102,7 +241,7 @@ def place_order():
                     category = 'error'
             except ValueError:
                 flash("Invalid number input for limit price.", 'error')
-                return redirect(url_for('index'))
+                return redirect(url_for('dashboard.index'))
 
 
         elif order_type == 'stop_limit':
@@ -114,13 +253,11 @@ def place_order():
 
                 if stop_price <= 0 or limit_price <= 0:
                     flash("Stop price and Limit price must be greater than zero.", 'error')
-                    return redirect(url_for('index'))
+                    return redirect(url_for('dashboard.index'))
 
-                 # Add notional value check for stop-limit (using limit price)
-                notional_value = quantity * limit_price
-                if notional_value < 100: # Assuming minimum notional is 100 USDT
-                    flash(f"Order notional value ({notional_value:.2f} USDT) is too small. Must be at least 100 USDT.", 'error')
-                    return redirect(url_for('index'))
+                # Check the symbol's exchange filters locally (notional uses the limit price)
+                bot.validate_order({'symbol': symbol, 'side': side, 'type': 'STOP', 'quantity': quantity,
+                                   'price': limit_price, 'stopPrice': stop_price})
 
                 order_details = bot.place_stop_limit_order(symbol, side, quantity, limit_price, stop_price) # Pass both prices
                 if order_details:
@@ -130,7 +267,7 @@ def place_order():
                     category = 'error'
             except ValueError:
                 flash("Invalid number input for stop price or limit price.", 'error')
-                return redirect(url_for('index'))
+                return redirect(url_for('dashboard.index'))
 
         else:
             message = "Invalid order type selected."
@@ -139,29 +276,79 @@ def place_order():
         if message:
             flash(message, category)
 
+    except OrderValidationError as e:
+        flash(str(e), 'error')
     except ValueError:
         flash("Invalid number input for quantity.", 'error')
     except Exception as e:
         flash(f"An unexpected error occurred while placing the order: {e}", 'error')
         print(f"Error placing order: {e}") # Still log to terminal for detailed debugging
 
+    bot.request_refresh() # Show the new order state on the dashboard without waiting a full interval
 
-    return redirect(url_for('index')) # Always redirect after POST
 
+    return redirect(url_for('dashboard.index')) # Always redirect after POST
+
+
+@dashboard.route('/place_ladder', methods=['POST'])
+def place_ladder():
+    """Places a ladder of limit orders in one go (sent as batch orders, 5 per request)."""
+    bot = _get_ready_bot()
+    if not bot:
+        return redirect(url_for('dashboard.index'))
+
+    symbol = request.form.get('ladder_symbol', '').upper()
+    side = request.form.get('ladder_side', '').upper()
+
+    try:
+        quantity = float(request.form.get('ladder_quantity'))
+        start_price = float(request.form.get('ladder_start_price'))
+        price_step = float(request.form.get('ladder_price_step'))
+        count = int(request.form.get('ladder_count'))
+    except (TypeError, ValueError):
+        flash("Invalid number input for ladder quantity, prices or order count.", 'error')
+        return redirect(url_for('dashboard.index'))
+
+    if quantity <= 0 or start_price <= 0 or price_step < 0 or not 1 <= count <= 50:
+        flash("Ladder needs a positive quantity and start price, a non-negative step and 1-50 orders.", 'error')
+        return redirect(url_for('dashboard.index'))
+
+    # BUY ladders step down from the start price, SELL ladders step up
+    direction = -1 if side == 'BUY' else 1
+    orders = [{'type': 'LIMIT', 'symbol': symbol, 'side': side, 'quantity': quantity,
+               'price': start_price + direction * price_step * i} for i in range(count)]
 
-@app.route('/check_status', methods=['POST'])
+    try:
+        results = bot.place_batch_orders(orders)
+        placed = [r['response']['orderId'] for r in results if r['response']]
+        if placed:
+            flash(f"Placed {len(placed)} of {len(results)} ladder orders. Order IDs: {', '.join(map(str, placed))}", 'success')
+        for r in results:
+            if r['error']:
+                price = r['request']['price'] if r['request'] else '?'
+                flash(f"Ladder order at {price} failed: {r['error']}", 'error')
+    except Exception as e:
+        flash(f"An unexpected error occurred while placing the ladder: {e}", 'error')
+        print(f"Error placing ladder: {e}") # Still log to terminal for detailed debugging
+
+    bot.request_refresh() # Show the new order state on the dashboard without waiting a full interval
+
+    return redirect(url_for('dashboard.index')) # Always redirect after POST
+
+
+@dashboard.route('/check_status', methods=['POST'])
 def check_status():
     """Handles checking order status."""
+    bot = _get_ready_bot()
     if not bot:
-        flash("Bot not initialized. API keys may be missing or invalid.", 'error')
-        return redirect(url_for('index'))
+        return redirect(url_for('dashboard.index'))
 
     symbol = request.form.get('status_symbol').upper()
     order_id = request.form.get('order_id')
 
     if not symbol or not order_id:
         flash("Symbol and Order ID are required to check status.", 'error')
-        return redirect(url_for('index'))
+        return redirect(url_for('dashboard.index'))
 
     try:
         status_result = bot.get_order_status(symbol, order_id)
@@ -178,21 +365,21 @@ def check_status():
         print(f"Error fetching status: {e}") # Still log to terminal
 
 
-    return redirect(url_for('index')) # Redirect back after POST
+    return redirect(url_for('dashboard.index')) # Redirect back after POST
 
-@app.route('/cancel_order', methods=['POST'])
+@dashboard.route('/cancel_order', methods=['POST'])
 def cancel_order():
     """Handles canceling an order."""
+    bot = _get_ready_bot()
     if not bot:
-        flash("Bot not initialized. API keys may be missing or invalid.", 'error')
-        return redirect(url_for('index'))
+        return redirect(url_for('dashboard.index'))
 
     symbol = request.form.get('cancel_symbol').upper()
     order_id = request.form.get('cancel_order_id')
 
     if not symbol or not order_id:
         flash("Symbol and Order ID are required to cancel order.", 'error')
-        return redirect(url_for('index'))
+        return redirect(url_for('dashboard.index'))
 
     try:
         cancel_response = bot.cancel_order(symbol, order_id)
@@ -207,13 +394,24 @@ def cancel_order():
         flash(f"An error occurred while cancelling Order ID {order_id}: {e}", 'error')
         print(f"Error cancelling order: {e}") # Still log to terminal
 
+    bot.request_refresh() # Show the new order state on the dashboard without waiting a full interval
+
+
+    return redirect(url_for('dashboard.index')) # Redirect back after POST
+
 
-    return redirect(url_for('index')) # Redirect back after POST
+def wsgi_app():
+    """
+    WSGI entry point (gunicorn 'app:wsgi_app()'): the serving process owns the logging setup.
+    Importing this module has no side effects, so tests and benchmarks can use create_app() directly.
+    """
+    configure_logging()
+    return create_app()
 
 
 if __name__ == '__main__':
     # Use a development server for testing
     # In production, use a production-ready WSGI server like Gunicorn or uWSGI
     # debug=True allows for automatic code reloading and detailed error pages
-    app.run(debug=True)
+    wsgi_app().run(debug=True)
 
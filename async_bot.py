@@ -0,0 +1,267 @@
+import asyncio
+import logging
+import os
+import time
+
+import aiohttp
+from binance import AsyncClient
+from binance.exceptions import BinanceAPIException, BinanceOrderException
+
+from exchange_info import OrderValidationError, SymbolFilterIndex
+from order_journal import assign_client_order_id, client_order_id, is_unknown_outcome, new_client_order_id
+from risk import RiskRejected
+from trading_bot import BasicBot, TESTNET_BASE_URL, apply_base_url, build_order_params
+
+#--- Async order engine
+# Same order/status/cancel surface as BasicBot, but every call is a coroutine running on one
+# pooled keep-alive aiohttp session, so a basket of orders costs ~1 RTT instead of N.
+# Orders are gated like BasicBot's: rounded and validated against the symbol filters, given a
+# client order ID, and checked by the risk engine (if one is passed) before they are sent.
+# Not covered: the order journal, the retry policy and the rate-limit scheduler, which are
+# BasicBot's; use BasicBot for orders that must be journaled and retried.
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_IN_FLIGHT = 10
+
+
+class AsyncBot:
+    def __init__(self, api_key, api_secret, testnet=True, base_url=None, max_in_flight=DEFAULT_MAX_IN_FLIGHT, filters=None, risk=None):
+        """
+        :param base_url: Optional futures REST root (e.g. a local mock_exchange.py server)
+        :param max_in_flight: Maximum number of requests submit_many / cancel_many keep open at once
+        :param filters: SymbolFilterIndex to validate orders with (default: downloaded by start())
+        :param risk: Optional RiskEngine every order is checked against (e.g. shared with a BasicBot)
+        """
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.testnet = testnet
+        self.base_url = base_url
+        self.max_in_flight = max_in_flight
+        self.filters = filters
+        self.risk = risk
+        self.client = None
+        self._semaphore = None # Created by start(), inside the loop that runs the bot
+        self._exchange_info = None
+
+    async def start(self):
+        """Opens the pooled HTTP session and checks connectivity."""
+        try:
+            # One connector for the bot's lifetime: TCP/TLS handshakes are paid once per connection
+            connector = aiohttp.TCPConnector(limit=self.max_in_flight, keepalive_timeout=60)
+            self.client = AsyncClient(self.api_key, self.api_secret, testnet=self.testnet,
+                                      session_params={'connector': connector})
+            if self.base_url:
+                apply_base_url(self.client, self.base_url)
+            elif self.testnet:
+                self.client.FUTURES_URL = TESTNET_BASE_URL
+
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+            await self.client.futures_ping()
+            if self.filters is None:
+                self.filters = SymbolFilterIndex(lambda: self._exchange_info, cache_path=None)
+                await self.refresh_filters()
+            logger.info("Async Binance Futures connection successful.")
+        except BinanceAPIException as e:
+            logger.error("Binance API Exception on async connection: %s", e)
+            await self.close()
+            raise
+        except Exception as e:
+            logger.error("An unexpected error occurred during async initialization: %s", e)
+            await self.close()
+            raise
+        return self
+
+    async def refresh_filters(self):
+        """Re-downloads exchange info into the symbol filters (they cannot fetch it themselves without blocking the loop)."""
+        try:
+            self._exchange_info = await self.client.futures_exchange_info()
+        except Exception as e:
+            logger.warning("Could not download exchange info: %s", e)
+            return
+        self.filters.refresh()
+
+    async def close(self):
+        if self.client:
+            await self.client.close_connection()
+            self.client = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def _request(self, description, method, params):
+        """Runs one REST call under the in-flight limit. Errors are raised."""
+        logger.info("Request: %s with params: %s", description, params)
+        async with self._semaphore:
+            response = await method(**params)
+        logger.info("Response: %s", response)
+        return response
+
+    @staticmethod
+    def _log_failure(description, error):
+        if isinstance(error, BinanceAPIException):
+            logger.error("Error: Binance API Exception in %s: %s", description, error)
+        elif isinstance(error, BinanceOrderException):
+            logger.error("Error: Binance Order Exception in %s: %s", description, error)
+        else:
+            logger.error("Error: Unexpected error in %s: %s", description, error)
+
+    async def _call(self, description, method, params):
+        """
+        Runs one REST call under the in-flight limit with BasicBot's logging/error conventions.
+        :return: Response dict or None if error
+        """
+        try:
+            return await self._request(description, method, params)
+        except Exception as e:
+            self._log_failure(description, e)
+            return None
+
+    async def _prepare_order(self, params):
+        """
+        Validates and rounds order params against the symbol filters, assigns the client order ID
+        and runs the risk check (reserving the order's exposure).
+        :return: Rejection message, or None if the order may be sent
+        """
+        if self.filters.is_stale():
+            await self.refresh_filters()
+        try:
+            self.filters.apply(params)
+        except OrderValidationError as e:
+            logger.error("Order rejected locally (not sent): %s", e)
+            return f"Rejected locally: {e}"
+        assign_client_order_id(params, new_client_order_id())
+        if self.risk is not None:
+            try:
+                self.risk.check(params)
+            except RiskRejected as e:
+                logger.error("Order rejected by risk check (not sent): %s", e)
+                return f"Rejected by risk check: {e}"
+        return None
+
+    async def _place(self, params):
+        """
+        Gates and sends one order.
+        :return: (order response, None) or (None, why the order was not placed)
+        """
+        rejection = await self._prepare_order(params)
+        if rejection:
+            return None, rejection
+        description = f"futures_create_order ({params['type']})"
+        try:
+            response = await self._request(description, self.client.futures_create_order, params)
+        except Exception as e:
+            self._log_failure(description, e)
+            if self.risk is not None and not is_unknown_outcome(e):
+                self.risk.release(client_order_id(params))
+            return None, str(e)
+        self._order_update(response)
+        return response, None
+
+    def _order_update(self, order):
+        if self.risk is not None and order:
+            self.risk.on_order(order)
+
+    async def place_market_order(self, symbol, side, quantity):
+        params = build_order_params({'type': 'MARKET', 'symbol': symbol, 'side': side, 'quantity': quantity})
+        return (await self._place(params))[0]
+
+    async def place_limit_order(self, symbol, side, quantity, price):
+        params = build_order_params({'type': 'LIMIT', 'symbol': symbol, 'side': side, 'quantity': quantity, 'price': price})
+        return (await self._place(params))[0]
+
+    async def place_stop_limit_order(self, symbol, side, quantity, price, stop_price):
+        params = build_order_params({'type': 'STOP', 'symbol': symbol, 'side': side, 'quantity': quantity, 'price': price,
+                                     'stop_price': stop_price})
+        return (await self._place(params))[0]
+
+    async def get_order_status(self, symbol, order_id):
+        params = {'symbol': symbol.upper(), 'orderId': order_id}
+        response = await self._call('futures_get_order', self.client.futures_get_order, params)
+        self._order_update(response)
+        return response
+
+    async def cancel_order(self, symbol, order_id):
+        params = {'symbol': symbol.upper(), 'orderId': order_id}
+        response = await self._call('futures_cancel_order', self.client.futures_cancel_order, params)
+        self._order_update(response)
+        return response
+
+    async def _submit_one(self, order):
+        result = {'request': None, 'response': None, 'error': None}
+        try:
+            result['request'] = build_order_params(order)
+            result['response'], result['error'] = await self._place(result['request'])
+        except Exception as e:
+            # A malformed order spec (or anything else) fails only this order
+            logger.error("Basket order %s not placed: %s", order, e)
+            result['error'] = f"Rejected locally: {e}"
+        return result
+
+    async def submit_many(self, orders):
+        """
+        Submits a basket of orders concurrently (at most max_in_flight at a time). Each order is
+        gated like the single-order methods, and one order failing does not affect the others.
+        :param orders: List of dicts with 'type' (MARKET/LIMIT/STOP), 'symbol', 'side', 'quantity'
+                       and, where relevant, 'price' / 'stop_price'
+        :return: One dict per input order, in input order:
+                 {'request': params, 'response': order response or None, 'error': message or None}
+        """
+        return await asyncio.gather(*(self._submit_one(order) for order in orders))
+
+    async def cancel_many(self, orders):
+        """
+        Cancels several orders concurrently.
+        :param orders: List of (symbol, order_id) tuples
+        :return: List of cancellation responses (None for failures), in input order
+        """
+        return await asyncio.gather(*(self.cancel_order(symbol, order_id) for symbol, order_id in orders))
+
+
+#--- Basket latency benchmark: sequential BasicBot vs concurrent AsyncBot
+
+def _benchmark_basket(base_url, basket_size, max_in_flight):
+    basket = [{'type': 'LIMIT', 'symbol': 'BTCUSDT', 'side': 'BUY', 'quantity': 0.01, 'price': 20000 + i}
+              for i in range(basket_size)]
+
+    bot = BasicBot('bench', 'bench', base_url=base_url)
+    start = time.perf_counter()
+    for order in basket:
+        bot.place_limit_order(order['symbol'], order['side'], order['quantity'], order['price'])
+    sequential = time.perf_counter() - start
+
+    async def run_async():
+        async with AsyncBot('bench', 'bench', base_url=base_url, max_in_flight=max_in_flight) as async_bot:
+            start = time.perf_counter()
+            results = await async_bot.submit_many(basket)
+            failed = [r['error'] for r in results if r['error']]
+            if failed:
+                print(f"  {len(failed)} basket orders failed, e.g. {failed[0]}")
+            return time.perf_counter() - start
+
+    concurrent = asyncio.run(run_async())
+    return sequential, concurrent
+
+
+if __name__ == "__main__":
+    from mock_exchange import MockFuturesServer
+
+    basket_size = int(os.environ.get('BENCH_BASKET_SIZE', 50))
+    max_in_flight = int(os.environ.get('BENCH_MAX_IN_FLIGHT', DEFAULT_MAX_IN_FLIGHT))
+    latency = float(os.environ.get('BENCH_LATENCY', 0.05))
+
+    # Keep the per-order log lines out of the way of the results
+    logging.getLogger().setLevel(logging.WARNING)
+
+    server = MockFuturesServer(latency=latency).start()
+    try:
+        sequential, concurrent = _benchmark_basket(server.base_url, basket_size, max_in_flight)
+    finally:
+        server.stop()
+
+    print(f"Basket of {basket_size} LIMIT orders, {latency * 1000:.0f} ms simulated RTT, max_in_flight={max_in_flight}")
+    print(f"  BasicBot (sequential): {sequential * 1000:8.1f} ms")
+    print(f"  AsyncBot (concurrent): {concurrent * 1000:8.1f} ms  ({sequential / concurrent:.1f}x faster)")
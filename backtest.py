@@ -0,0 +1,393 @@
+import heapq
+import json
+import logging
+import sys
+import time
+
+import numpy as np
+from binance.exceptions import BinanceAPIException
+
+from exchange_info import SymbolFilterIndex
+from trading_bot import BasicBot
+
+#--- Backtesting BasicBot strategies over historical klines
+# SimulatedExchange implements the futures_* methods BasicBot calls, so an unmodified BasicBot
+# (validation, logging, metrics and all) can be pointed at it with BasicBot(..., client=exchange).
+# Bars are held as NumPy columns. When an order is placed its fill bar is found immediately with a
+# vectorized search over the following bars, so the engine only runs Python code on the bars where
+# the strategy acts -- everything in between costs nothing per bar.
+#
+# Fill model (no intrabar path is known, so it is conservative where it has to guess):
+#   * MARKET      - next bar's open, moved against us by `slippage_bps` plus, with `impact` set, a
+#                   square-root market impact of impact * sqrt(quantity / bar volume)
+#   * LIMIT       - first later bar trading through the price; fills at the price, or at the open
+#                   if the bar gapped past it
+#   * STOP (stop-limit, as placed by place_stop_limit_order) - triggers on the first later bar
+#                   touching stopPrice; fills on that bar at max(stop, open) (BUY) if the limit
+#                   allows it, otherwise rests as a LIMIT from the next bar
+
+logger = logging.getLogger(__name__)
+
+KLINE_COLUMNS = ('open_time', 'open', 'high', 'low', 'close', 'volume')
+SEARCH_CHUNK = 256 # first window of the fill search; doubles up to MAX_SEARCH_CHUNK
+MAX_SEARCH_CHUNK = 1 << 16
+
+
+def load_klines(path):
+    """
+    Loads klines from a Binance kline CSV (data.binance.vision layout: open_time, open, high, low,
+    close, volume, ...; a header row is optional).
+    :return: Dict of NumPy arrays keyed by KLINE_COLUMNS
+    """
+    with open(path) as f:
+        first = f.readline()
+    skip = 0 if first.split(',')[0].strip().lstrip('-').isdigit() else 1
+    data = np.loadtxt(path, delimiter=',', skiprows=skip, usecols=range(len(KLINE_COLUMNS)), ndmin=2)
+    klines = {name: np.ascontiguousarray(data[:, i]) for i, name in enumerate(KLINE_COLUMNS)}
+    klines['open_time'] = klines['open_time'].astype(np.int64)
+    return klines
+
+
+def synthetic_klines(bars, start_price=30000.0, volatility=0.001, seed=7):
+    """Random-walk 1-minute klines for benchmarks and demos."""
+    rng = np.random.default_rng(seed)
+    close = start_price * np.exp(np.cumsum(rng.normal(0.0, volatility, bars)))
+    open_ = np.concatenate(([start_price], close[:-1]))
+    wick = np.abs(rng.normal(0.0, volatility / 2, (2, bars))) * close
+    return {
+        'open_time': 1_600_000_000_000 + np.arange(bars, dtype=np.int64) * 60_000,
+        'open': open_,
+        'high': np.maximum(open_, close) + wick[0],
+        'low': np.minimum(open_, close) - wick[1],
+        'close': close,
+        'volume': rng.uniform(1.0, 100.0, bars),
+    }
+
+
+def first_crossing(values, start, threshold, above):
+    """
+    :return: Index of the first bar >= start with values >= threshold (above=True) or
+             <= threshold (above=False), or None if there is none
+    """
+    index, chunk, end = start, SEARCH_CHUNK, len(values)
+    while index < end:
+        window = values[index:index + chunk]
+        hits = window >= threshold if above else window <= threshold
+        position = int(hits.argmax())
+        if hits[position]:
+            return index + position
+        index += chunk
+        chunk = min(chunk * 2, MAX_SEARCH_CHUNK)
+    return None
+
+
+def _api_error(code, message, status_code=400):
+    class _Response:
+        text = json.dumps({'code': code, 'msg': message})
+    return BinanceAPIException(_Response(), status_code, _Response.text)
+
+
+class SimulatedExchange:
+    """python-binance Client stand-in for one symbol, driven by a bar clock (see set_time)."""
+
+    def __init__(self, klines, symbol='BTCUSDT', balance=10000.0, fee_rate=0.0004, slippage_bps=1.0,
+                 tick_size='0.10', step_size='0.001', min_notional='100', impact=0.0):
+        """
+        :param klines: Dict of NumPy arrays (see load_klines)
+        :param fee_rate: Fee per fill as a fraction of notional
+        :param slippage_bps: Adverse price move applied to MARKET fills, in basis points
+        :param impact: Square-root impact coefficient for MARKET fills (0 disables; needs a volume column)
+        """
+        self.klines = klines
+        self.open, self.high, self.low, self.close = klines['open'], klines['high'], klines['low'], klines['close']
+        self.open_time = klines['open_time']
+        self.symbol = symbol
+        self.initial_balance = balance
+        self.fee_rate = fee_rate
+        self.slippage = slippage_bps / 10000.0
+        self.impact = impact
+        self.volume = klines.get('volume')
+        self.tick_size, self.step_size, self.min_notional = tick_size, step_size, min_notional
+
+        self.now = 0
+        self.orders = {}
+        self.position = 0.0
+        self.cash = balance
+        self.fills = [] # (bar index, signed quantity, price, reference price, fee)
+        self._pending = [] # heap of (fill bar, orderId)
+        self._next_order_id = 1
+        self.response = None # Client.response counterpart: no HTTP, so no rate-limit headers
+        # Callables receiving each order as it fills (futures_get_order shape), like user-data events
+        self.listeners = []
+
+    #--- Clock
+
+    def set_time(self, index):
+        """Moves the clock to bar `index`, applying every fill that happened up to and including it."""
+        self.now = index
+        while self._pending and self._pending[0][0] <= index:
+            _, order_id = heapq.heappop(self._pending)
+            order = self.orders[order_id]
+            if order['status'] == 'NEW':
+                self._fill(order)
+
+    def _fill(self, order):
+        quantity = order['_quantity'] if order['side'] == 'BUY' else -order['_quantity']
+        price = order['_fill_price']
+        fee = abs(quantity) * price * self.fee_rate
+        self.position += quantity
+        self.cash -= quantity * price + fee
+        self.fills.append((order['_fill_index'], quantity, price, order['_reference'], fee))
+        order.update({'status': 'FILLED', 'executedQty': order['origQty'], 'avgPrice': f"{price:.8f}",
+                      'updateTime': int(self.open_time[order['_fill_index']])})
+        for listener in self.listeners:
+            listener(self._public(order))
+
+    #--- Fill simulation
+
+    def _schedule(self, order, side, order_type, price, stop_price):
+        start = self.now + 1
+        fill_index = fill_price = None
+        if order_type == 'MARKET':
+            if start < len(self.open):
+                fill_index = start
+                move = self.slippage
+                if self.impact:
+                    move += self.impact * np.sqrt(order['_quantity'] / max(self.volume[start], 1e-12))
+                move = move if side == 'BUY' else -move
+                fill_price = self.open[start] * (1 + move)
+            reference = self.close[self.now]
+        elif order_type == 'LIMIT':
+            fill_index, fill_price = self._limit_fill(side, price, start)
+            reference = price
+        else: # STOP
+            reference = stop_price
+            trigger = first_crossing(self.high if side == 'BUY' else self.low, start, stop_price, above=side == 'BUY')
+            if trigger is not None:
+                if side == 'BUY':
+                    trigger_price = max(stop_price, self.open[trigger])
+                    marketable = trigger_price <= price
+                else:
+                    trigger_price = min(stop_price, self.open[trigger])
+                    marketable = trigger_price >= price
+                if marketable:
+                    fill_index, fill_price = trigger, trigger_price
+                else:
+                    fill_index, fill_price = self._limit_fill(side, price, trigger + 1)
+
+        order['_reference'] = reference
+        order['_fill_index'] = fill_index
+        order['_fill_price'] = fill_price
+        if fill_index is not None:
+            heapq.heappush(self._pending, (fill_index, order['orderId']))
+
+    def _limit_fill(self, side, price, start):
+        if side == 'BUY':
+            index = first_crossing(self.low, start, price, above=False)
+            return (index, min(price, self.open[index])) if index is not None else (None, None)
+        index = first_crossing(self.high, start, price, above=True)
+        return (index, max(price, self.open[index])) if index is not None else (None, None)
+
+    #--- Client surface used by BasicBot
+
+    def futures_ping(self):
+        return {}
+
+    def futures_exchange_info(self):
+        return {'timezone': 'UTC', 'serverTime': int(self.open_time[self.now]), 'symbols': [{
+            'symbol': self.symbol, 'filters': [
+                {'filterType': 'PRICE_FILTER', 'minPrice': self.tick_size, 'maxPrice': '10000000', 'tickSize': self.tick_size},
+                {'filterType': 'LOT_SIZE', 'minQty': self.step_size, 'maxQty': '100000', 'stepSize': self.step_size},
+                {'filterType': 'MIN_NOTIONAL', 'notional': self.min_notional},
+            ]}]}
+
+    def futures_account_balance(self, **params):
+        equity = self.cash + self.position * self.close[self.now]
+        return [{'asset': 'USDT', 'balance': f"{equity:.8f}", 'availableBalance': f"{self.cash:.8f}"}]
+
+    def futures_create_order(self, **params):
+        symbol = params.get('symbol')
+        if symbol != self.symbol:
+            raise _api_error(-1121, 'Invalid symbol.')
+        order_type = params.get('type')
+        if order_type not in ('MARKET', 'LIMIT', 'STOP'):
+            raise _api_error(-1116, 'Invalid orderType.')
+        side = params['side']
+        price = float(params['price']) if params.get('price') is not None else None
+        stop_price = float(params['stopPrice']) if params.get('stopPrice') is not None else None
+        if order_type != 'MARKET' and price is None:
+            raise _api_error(-1102, "Mandatory parameter 'price' was not sent, was empty/null, or malformed.")
+        if order_type == 'STOP' and stop_price is None:
+            raise _api_error(-1102, "Mandatory parameter 'stopPrice' was not sent, was empty/null, or malformed.")
+
+        order_id = self._next_order_id
+        self._next_order_id += 1
+        order = {
+            'orderId': order_id, 'symbol': symbol, 'status': 'NEW',
+            'clientOrderId': params.get('newClientOrderId') or params.get('clientAlgoId') or f"backtest-{order_id}",
+            'price': params.get('price', '0'), 'avgPrice': '0', 'origQty': str(params['quantity']), 'executedQty': '0',
+            'type': order_type, 'side': side, 'stopPrice': params.get('stopPrice', '0'),
+            'timeInForce': params.get('timeInForce', 'GTC'), 'updateTime': int(self.open_time[self.now]),
+            '_quantity': float(params['quantity']),
+        }
+        self.orders[order_id] = order
+        self._schedule(order, side, order_type, price, stop_price)
+        return self._public(order)
+
+    def futures_get_order(self, symbol, orderId=None, algoId=None, **params):
+        client_id = params.get('origClientOrderId') or params.get('clientAlgoId')
+        orderId = orderId or algoId # Conditional orders share the order ID sequence here
+        if orderId is None and client_id:
+            orderId = next((o['orderId'] for o in self.orders.values() if o['clientOrderId'] == client_id), 0)
+        return self._public(self._order(symbol, orderId))
+
+    def futures_cancel_order(self, symbol, orderId=None, algoId=None, **params):
+        order = self._order(symbol, orderId or algoId)
+        if order['status'] != 'NEW':
+            raise _api_error(-2011, 'Unknown order sent.')
+        order.update({'status': 'CANCELED', 'updateTime': int(self.open_time[self.now])})
+        return self._public(order)
+
+    def _order(self, symbol, order_id):
+        order = self.orders.get(int(order_id))
+        if order is None or order['symbol'] != symbol:
+            raise _api_error(-2013, 'Order does not exist.')
+        return order
+
+    @staticmethod
+    def _public(order):
+        return {key: value for key, value in order.items() if not key.startswith('_')}
+
+    #--- Results
+
+    def report(self):
+        """
+        Marks the fills to market bar by bar (vectorized).
+        :return: Dict with PnL, fees, fill count, slippage and drawdown
+        """
+        bars = len(self.close)
+        fills = np.array(self.fills, dtype=float).reshape(-1, 5)
+        index = fills[:, 0].astype(np.int64)
+        quantity, price, reference, fee = fills[:, 1], fills[:, 2], fills[:, 3], fills[:, 4]
+
+        position_change = np.zeros(bars)
+        cash_change = np.zeros(bars)
+        np.add.at(position_change, index, quantity)
+        np.add.at(cash_change, index, -quantity * price - fee)
+        equity = self.initial_balance + np.cumsum(cash_change) + np.cumsum(position_change) * self.close
+        drawdown = equity - np.maximum.accumulate(equity)
+
+        # Positive = paid more than the reference on buys / received less on sells
+        slippage_bps = np.sign(quantity) * (price - reference) / reference * 10000.0 if len(fills) else np.zeros(0)
+        return {
+            'bars': bars,
+            'orders': len(self.orders),
+            'fills': len(fills),
+            'cancels': sum(1 for order in self.orders.values() if order['status'] == 'CANCELED'),
+            'pnl': float(equity[-1] - self.initial_balance) if bars else 0.0,
+            'fees': float(fee.sum()),
+            'final_position': self.position,
+            'max_drawdown': float(-drawdown.min()) if bars else 0.0,
+            'avg_slippage_bps': float(slippage_bps.mean()) if len(fills) else 0.0,
+            'max_slippage_bps': float(slippage_bps.max()) if len(fills) else 0.0,
+            'equity': equity,
+        }
+
+
+class _Unthrottled:
+    """Scheduler stand-in: simulated calls need no rate limiting."""
+
+    def acquire(self, endpoint, priority=None, params=None):
+        return 0.0
+
+    def update_from_response(self, response):
+        pass
+
+
+#--- Strategies
+# A strategy exposes signals(klines) -> sorted bar indices where it wants to act (computed
+# vectorized up front), and on_signal(bot, index, klines), which trades through the BasicBot API.
+
+class SmaCrossStrategy:
+    """Long-only moving-average crossover: enter when fast crosses above slow, exit when it crosses below."""
+
+    def __init__(self, symbol='BTCUSDT', fast=20, slow=100, quantity=0.01, entry='limit', offset=0.001):
+        """
+        :param entry: 'market', 'limit' (offset below the close) or 'stop' (stop-limit offset above it)
+        :param offset: Entry price offset as a fraction of the close
+        """
+        self.symbol = symbol
+        self.fast = fast
+        self.slow = slow
+        self.quantity = quantity
+        self.entry = entry
+        self.offset = offset
+        self.entry_order_id = None
+        self._direction = None
+
+    def signals(self, klines):
+        close = klines['close']
+        totals = np.concatenate(([0.0], np.cumsum(close)))
+        fast = (totals[self.slow:] - totals[self.slow - self.fast:-self.fast]) / self.fast
+        slow = (totals[self.slow:] - totals[:-self.slow]) / self.slow
+        above = fast > slow # one value per bar from index slow - 1
+        crosses = np.flatnonzero(above[1:] != above[:-1]) + 1
+        self._direction = np.zeros(len(close), dtype=np.int8)
+        self._direction[crosses + self.slow - 1] = np.where(above[crosses], 1, -1)
+        return crosses + self.slow - 1
+
+    def on_signal(self, bot, index, klines):
+        close = float(klines['close'][index])
+        if self._direction[index] > 0:
+            if self.entry_order_id is None:
+                if self.entry == 'market':
+                    order = bot.place_market_order(self.symbol, 'BUY', self.quantity)
+                elif self.entry == 'stop':
+                    stop = close * (1 + self.offset)
+                    order = bot.place_stop_limit_order(self.symbol, 'BUY', self.quantity, stop * (1 + self.offset), stop)
+                else:
+                    order = bot.place_limit_order(self.symbol, 'BUY', self.quantity, close * (1 - self.offset))
+                self.entry_order_id = order.get('orderId') if order else None
+            return
+
+        if self.entry_order_id is not None:
+            status = bot.get_order_status(self.symbol, self.entry_order_id)
+            if status and status['status'] == 'FILLED':
+                bot.place_market_order(self.symbol, 'SELL', self.quantity)
+            else:
+                bot.cancel_order(self.symbol, self.entry_order_id)
+            self.entry_order_id = None
+
+
+def run_backtest(klines, strategy, symbol='BTCUSDT', balance=10000.0, fee_rate=0.0004, slippage_bps=1.0):
+    """
+    Runs `strategy` through a BasicBot connected to a SimulatedExchange.
+    :return: SimulatedExchange.report() plus 'elapsed' seconds and 'bars_per_minute'
+    """
+    started = time.perf_counter()
+    exchange = SimulatedExchange(klines, symbol=symbol, balance=balance, fee_rate=fee_rate, slippage_bps=slippage_bps)
+    bot = BasicBot('backtest', 'backtest', client=exchange, scheduler=_Unthrottled())
+    # Filters come from the simulated exchange, never from (or into) the live exchange-info cache
+    bot.filters = SymbolFilterIndex(exchange.futures_exchange_info, cache_path=None)
+
+    for index in strategy.signals(klines):
+        exchange.set_time(int(index))
+        strategy.on_signal(bot, int(index), klines)
+    exchange.set_time(len(exchange.close) - 1)
+
+    report = exchange.report()
+    report['elapsed'] = time.perf_counter() - started
+    report['bars_per_minute'] = report['bars'] / report['elapsed'] * 60 if report['elapsed'] else 0.0
+    return report
+
+
+if __name__ == "__main__":
+    # Usage: python backtest.py [klines.csv|-] [market|limit|stop]   ('-' = synthetic 2M bars)
+    logging.getLogger('trading_bot').setLevel(logging.WARNING) # One log line per simulated call is noise here
+    klines = load_klines(sys.argv[1]) if len(sys.argv) > 1 and sys.argv[1] != '-' else synthetic_klines(2_000_000)
+    entry = sys.argv[2] if len(sys.argv) > 2 else 'limit'
+    result = run_backtest(klines, SmaCrossStrategy(entry=entry))
+    print(f"Backtested {result['bars']:,} bars in {result['elapsed']:.2f}s ({result['bars_per_minute']:,.0f} bars/min)")
+    print(f"  Orders: {result['orders']}, fills: {result['fills']}, cancels: {result['cancels']}")
+    print(f"  PnL: {result['pnl']:.2f} USDT (fees {result['fees']:.2f}), max drawdown: {result['max_drawdown']:.2f}")
+    print(f"  Slippage: avg {result['avg_slippage_bps']:.2f} bps, worst {result['max_slippage_bps']:.2f} bps")
@@ -0,0 +1,312 @@
+import argparse
+import csv
+import json
+import logging
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from requests.adapters import HTTPAdapter
+
+from logging_setup import configure_logging
+from trading_bot import build_bot, API_KEY_ENV, API_SECRET_ENV
+
+#--- Non-interactive trading_bot CLI
+# python trading_bot.py <command> ...
+#   place SYMBOL SIDE QUANTITY [--type LIMIT --price P] [--type STOP --price P --stop-price S]
+#   cancel SYMBOL ORDER_ID | status SYMBOL ORDER_ID | balance
+#   batch FILE [--concurrency N]   (FILE: .csv with a header row, or JSONL; '-' reads JSONL from stdin)
+# Every command prints one JSON object per operation on stdout:
+#   {"line": 3, "op": "place", "ok": true, "ms": 41.2, "response": {...}}
+#   {"line": 4, "op": "cancel", "ok": false, "ms": 38.0, "error": "Binance API Exception cancelling order: ..."}
+# and exits 1 if any operation failed. Batch files are streamed: instructions are read, executed on a
+# thread pool (admitted by the bot's rate limiter) and written back in input order as they complete,
+# so memory stays flat for any file size. Logs go to trading_bot.log (console logs with -v).
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONCURRENCY = 8
+# Results buffered per worker thread while waiting for an earlier (slower) line to finish
+WINDOW_PER_THREAD = 4
+
+OPERATIONS = ('place', 'cancel', 'status', 'balance')
+ORDER_TYPES = ('MARKET', 'LIMIT', 'STOP', 'STOP_LIMIT')
+
+
+#--- Instructions
+
+def read_instructions(path, fmt=None):
+    """
+    Streams instructions from a CSV (header row) or JSONL file.
+    Fields: op (place/cancel/status/balance, default place), symbol, side, type, quantity, price,
+    stop_price, order_id, client_order_id.
+    :param path: File path, or '-' for stdin
+    :param fmt: 'csv' or 'jsonl' (default: from the file extension)
+    :return: Iterator of (line number, instruction dict)
+    """
+    fmt = fmt or ('csv' if path.lower().endswith('.csv') else 'jsonl')
+    stream = sys.stdin if path == '-' else open(path, newline='')
+    try:
+        if fmt == 'csv':
+            reader = csv.DictReader(stream)
+            for row in reader:
+                yield reader.line_num, {key.strip(): value.strip() for key, value in row.items()
+                                        if key and value is not None and value.strip()}
+        else:
+            for number, line in enumerate(stream, 1):
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                try:
+                    yield number, json.loads(line)
+                except ValueError as e:
+                    yield number, {'invalid': f"Invalid JSON: {e}"}
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def execute(bot, instruction):
+    """
+    Runs one instruction on the bot.
+    :return: Exchange response (None if the bot reported an error)
+    :raises ValueError: if the instruction is malformed
+    """
+    if 'invalid' in instruction:
+        raise ValueError(instruction['invalid'])
+    op = str(instruction.get('op', 'place')).lower()
+    if op not in OPERATIONS:
+        raise ValueError(f"Unknown op: {op} (expected one of {', '.join(OPERATIONS)})")
+    if op == 'balance':
+        return bot.get_account_balance()
+    symbol = _field(instruction, 'symbol').upper()
+    if op == 'cancel':
+        return bot.cancel_order(symbol, _field(instruction, 'order_id'))
+    if op == 'status':
+        return bot.get_order_status(symbol, _field(instruction, 'order_id'))
+
+    order_type = str(instruction.get('type', 'MARKET')).upper()
+    if order_type not in ORDER_TYPES:
+        raise ValueError(f"Unsupported order type: {order_type}")
+    side = _field(instruction, 'side').upper()
+    if side not in ('BUY', 'SELL'):
+        raise ValueError(f"Invalid side: {side}")
+    quantity = float(_field(instruction, 'quantity'))
+    client_order_id = instruction.get('client_order_id') or None
+    if order_type == 'MARKET':
+        return bot.place_market_order(symbol, side, quantity, client_order_id=client_order_id)
+    price = float(_field(instruction, 'price'))
+    if order_type == 'LIMIT':
+        return bot.place_limit_order(symbol, side, quantity, price, client_order_id=client_order_id)
+    return bot.place_stop_limit_order(symbol, side, quantity, price, float(_field(instruction, 'stop_price')),
+                                      client_order_id=client_order_id)
+
+
+def _field(instruction, name):
+    value = instruction.get(name)
+    if value is None or value == '':
+        raise ValueError(f"Missing field: {name}")
+    return value
+
+
+def run_instruction(bot, number, instruction):
+    """:return: Result dict for the JSONL output"""
+    op = str(instruction.get('op', 'place')).lower()
+    result = {'line': number, 'op': op}
+    if instruction.get('client_order_id'):
+        result['client_order_id'] = instruction['client_order_id']
+    started = time.perf_counter()
+    bot.clear_error()
+    try:
+        response = execute(bot, instruction)
+        error = None if response is not None else (bot.last_error() or 'Failed (see trading_bot.log)')
+    except (ValueError, TypeError) as e:
+        response, error = None, str(e)
+    except Exception as e:
+        logger.error(f"Batch line {number} failed: {e}")
+        response, error = None, f"Unexpected error: {e}"
+    result['ok'] = error is None
+    result['ms'] = round((time.perf_counter() - started) * 1000, 2)
+    if error is None:
+        result['response'] = response
+    else:
+        result['error'] = error
+    return result
+
+
+#--- Streaming pipeline
+
+def size_connection_pool(bot, connections):
+    """
+    Lets `connections` threads keep their HTTP connections alive (requests pools 10 per host by default).
+    Only ever grows the pool, and the replacement adapter keeps the mounted one's retry and blocking
+    settings; an adapter that is not a plain HTTPAdapter is left alone.
+    """
+    session = getattr(bot.client, 'session', None)
+    if session is None:
+        return
+    for prefix in ('https://', 'http://'):
+        current = session.adapters.get(prefix)
+        if type(current) is not HTTPAdapter or current._pool_maxsize >= connections:
+            continue
+        session.mount(prefix, HTTPAdapter(pool_connections=max(connections, current._pool_connections), pool_maxsize=connections,
+                                          max_retries=current.max_retries, pool_block=current._pool_block))
+
+
+def run_batch(bot, instructions, out=None, concurrency=DEFAULT_CONCURRENCY):
+    """
+    Executes instructions with `concurrency` threads, writing each result as a JSON line in input order.
+    At most concurrency * WINDOW_PER_THREAD instructions are in flight, so input is read lazily.
+    :param instructions: Iterable of (line number, instruction), e.g. read_instructions(path)
+    :param out: Text stream for the results (default: stdout)
+    :return: Summary dict: operations, ok, failed, seconds, ops_per_second, p50_ms, p99_ms
+    """
+    out = out or sys.stdout
+    size_connection_pool(bot, concurrency)
+    window = deque()
+    latencies = []
+    failed = 0
+    started = time.perf_counter()
+
+    def emit(result):
+        nonlocal failed
+        out.write(json.dumps(result, default=str) + '\n')
+        out.flush() # Downstream processes see each result as soon as it is final
+        latencies.append(result['ms'])
+        failed += not result['ok']
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='batch') as pool:
+        for number, instruction in instructions:
+            window.append(pool.submit(run_instruction, bot, number, instruction))
+            while len(window) >= concurrency * WINDOW_PER_THREAD or (window and window[0].done()):
+                emit(window.popleft().result())
+        while window:
+            emit(window.popleft().result())
+
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    count = len(latencies)
+    return {
+        'operations': count,
+        'ok': count - failed,
+        'failed': failed,
+        'seconds': round(elapsed, 3),
+        'ops_per_second': round(count / elapsed, 1) if elapsed > 0 else 0.0,
+        'p50_ms': latencies[count // 2] if count else None,
+        'p99_ms': latencies[min(count - 1, int(count * 0.99))] if count else None,
+    }
+
+
+#--- Command line
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='trading_bot.py', description="Binance Futures Testnet bot (no arguments: interactive menu).")
+    parser.add_argument('--base-url', help="Futures endpoint to use instead of the Testnet (e.g. a local mock exchange)")
+    parser.add_argument('-v', '--verbose', action='store_true', help="Also log to the console (stderr)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    place = commands.add_parser('place', help="Place an order")
+    place.add_argument('symbol')
+    place.add_argument('side', type=str.upper, choices=('BUY', 'SELL'))
+    place.add_argument('quantity', type=float)
+    place.add_argument('--type', type=str.upper, choices=ORDER_TYPES, default='MARKET')
+    place.add_argument('--price', type=float, help="Limit price (LIMIT, STOP)")
+    place.add_argument('--stop-price', type=float, help="Trigger price (STOP)")
+    place.add_argument('--client-order-id')
+
+    for name, text in (('cancel', "Cancel an order"), ('status', "Show an order")):
+        command = commands.add_parser(name, help=text)
+        command.add_argument('symbol')
+        command.add_argument('order_id')
+
+    commands.add_parser('balance', help="Show the account balance")
+
+    batch = commands.add_parser('batch', help="Run a CSV/JSONL file of instructions, printing results as JSONL")
+    batch.add_argument('file', help="Instruction file ('-' for JSONL on stdin)")
+    batch.add_argument('--format', choices=('csv', 'jsonl'), help="Default: from the file extension")
+    batch.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY, help="Operations in flight (default %(default)s)")
+    return parser
+
+
+def main(argv):
+    """
+    Entry point for python trading_bot.py <command>.
+    :return: Exit code: 0 if every operation succeeded, 1 if any failed, 2 on setup errors
+    """
+    args = build_parser().parse_args(argv)
+    configure_logging(console=args.verbose) # stdout carries only results
+    api_key, api_secret = os.environ.get(API_KEY_ENV), os.environ.get(API_SECRET_ENV)
+    if not api_key or not api_secret:
+        print(f"API keys not found: set {API_KEY_ENV} and {API_SECRET_ENV}.", file=sys.stderr)
+        return 2
+    try:
+        bot = build_bot(api_key, api_secret, base_url=args.base_url)
+    except Exception as e:
+        print(f"Could not connect: {e}", file=sys.stderr)
+        return 2
+
+    if args.command == 'batch':
+        try:
+            instructions = read_instructions(args.file, args.format)
+            summary = run_batch(bot, instructions, concurrency=max(1, args.concurrency))
+        except OSError as e:
+            print(f"Could not read {args.file}: {e}", file=sys.stderr)
+            return 2
+        print(f"{summary['operations']} operations in {summary['seconds']:.2f}s ({summary['ops_per_second']:,.1f}/s): "
+              f"{summary['ok']} ok, {summary['failed']} failed, latency p50 {summary['p50_ms']} ms, p99 {summary['p99_ms']} ms",
+              file=sys.stderr)
+        return 1 if summary['failed'] else 0
+
+    instruction = {key: value for key, value in vars(args).items() if value is not None}
+    instruction['op'] = args.command
+    result = run_instruction(bot, 0, instruction)
+    del result['line']
+    print(json.dumps(result, default=str))
+    return 0 if result['ok'] else 1
+
+
+if __name__ == "__main__":
+    # Benchmark: streams generated instructions through run_batch against a local mock exchange
+    # python batch_cli.py [operations] [mock latency s]
+    import io
+    import multiprocessing
+    from bot_manager import _serve_mock, _free_port
+    from rate_limiter import WeightScheduler
+    from trading_bot import BasicBot
+
+    operations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.005
+    configure_logging(log_file=None, level=logging.WARNING) # Per-order INFO logging would dominate the numbers
+
+    port = _free_port()
+    mock = multiprocessing.Process(target=_serve_mock, args=(port, latency), daemon=True)
+    mock.start()
+    time.sleep(0.5)
+
+    def instructions(count):
+        # Resting limit orders interleaved with balance queries
+        for n in range(count):
+            kind = n % 4
+            if kind == 3:
+                yield n + 1, {'op': 'balance'}
+            else:
+                yield n + 1, {'op': 'place', 'symbol': 'BTCUSDT', 'side': 'BUY' if n % 2 else 'SELL', 'type': 'LIMIT',
+                              'quantity': 0.01, 'price': 20000 + n % 100}
+
+    # Rate limits lifted: this measures the pipeline and client cost, not the exchange's order-rate caps
+    bot = BasicBot('key', 'secret', base_url=f'http://127.0.0.1:{port}',
+                   scheduler=WeightScheduler(weight_limit=10 ** 9, order_limit=10 ** 9, order_limit_10s=10 ** 9))
+    print(f"{operations} operations (3/4 limit orders, 1/4 balance), mock latency {latency * 1000:.0f} ms")
+    baseline = None
+    for concurrency in (1, 4, 8, 16, 32):
+        out = io.StringIO()
+        summary = run_batch(bot, instructions(operations), out=out, concurrency=concurrency)
+        lines = out.getvalue().splitlines()
+        in_order = [json.loads(line)['line'] for line in lines] == list(range(1, operations + 1))
+        baseline = baseline or summary['ops_per_second']
+        print(f"  concurrency {concurrency:2d}: {summary['ops_per_second']:7,.0f} ops/s ({summary['ops_per_second'] / baseline:.1f}x), "
+              f"p50 {summary['p50_ms']} ms, p99 {summary['p99_ms']} ms, {summary['failed']} failed, "
+              f"output {'in' if in_order else 'OUT OF'} input order")
+    mock.terminate()
@@ -0,0 +1,338 @@
+import argparse
+import io
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bot_manager import _free_port
+from logging_setup import configure_logging
+
+#--- Benchmark suite
+# Drives BasicBot (including its cold start), the Flask routes in app.py and the CLI paths against the local mock exchange
+# (mock_exchange.py, run in its own process with a fixed latency and seed) and writes a JSON report
+# of ops/s and p50/p99 latency per operation, so runs can be compared across commits:
+#   python benchmarks.py --output before.json
+#   git checkout <other commit> && python benchmarks.py --output after.json --compare before.json
+
+logger = logging.getLogger(__name__)
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_LATENCY = 0.005 # Mock round trip; well below real exchange RTTs so client-side cost stays visible
+DEFAULT_SEED = 42
+DEFAULT_ITERATIONS = 200
+WARMUP = 10 # Untimed calls per benchmark (connection setup, exchange info cache, lazy imports)
+REGRESSION_THRESHOLD = 0.10 # --compare flags ops/s drops / p50 increases beyond this fraction
+
+RESTING_PRICE = 20000 # Far below the mock's ~30000 BTCUSDT reference price, so limit BUYs rest
+QUANTITY = 0.01
+
+
+def _run_mock(port, ws_port, options):
+    from mock_exchange import serve
+    logging.getLogger().setLevel(logging.WARNING)
+    serve(port=port, ws_port=ws_port, **options)
+
+
+class MockProcess:
+    """The mock exchange (REST + WebSocket) in a child process, so its CPU time is not charged to the client."""
+
+    def __init__(self, latency=DEFAULT_LATENCY, seed=DEFAULT_SEED, **options):
+        self.port, self.ws_port = _free_port(), _free_port()
+        self.options = dict(options, latency=latency, seed=seed)
+        self._process = multiprocessing.Process(target=_run_mock, args=(self.port, self.ws_port, self.options), daemon=True)
+
+    @property
+    def base_url(self):
+        return f'http://127.0.0.1:{self.port}'
+
+    @property
+    def ws_url(self):
+        return f'ws://127.0.0.1:{self.ws_port}'
+
+    def __enter__(self):
+        self._process.start()
+        time.sleep(0.5)
+        return self
+
+    def __exit__(self, *exc):
+        self._process.terminate()
+        self._process.join()
+
+
+def summarize(latencies, failed, seconds):
+    """:return: Result dict: operations, failed, seconds, ops_per_second, p50_ms, p99_ms, mean_ms"""
+    latencies = sorted(latencies)
+    count = len(latencies)
+    ms = lambda seconds: round(seconds * 1000, 3)
+    return {
+        'operations': count,
+        'failed': failed,
+        'seconds': round(seconds, 3),
+        'ops_per_second': round(count / seconds, 1) if seconds > 0 else 0.0,
+        'p50_ms': ms(latencies[count // 2]) if count else None,
+        'p99_ms': ms(latencies[min(count - 1, int(count * 0.99))]) if count else None,
+        'mean_ms': ms(sum(latencies) / count) if count else None,
+    }
+
+
+def measure(operation, iterations, threads=1, warmup=WARMUP):
+    """
+    Times `iterations` calls of operation(n).
+    :param operation: Callable taking the call number; a falsy return value counts as a failure
+    :param threads: Calls in flight at once (1: sequential)
+    """
+    for n in range(warmup):
+        operation(-1 - n)
+
+    def timed(n):
+        started = time.perf_counter()
+        ok = bool(operation(n))
+        return time.perf_counter() - started, ok
+
+    started = time.perf_counter()
+    if threads == 1:
+        results = [timed(n) for n in range(iterations)]
+    else:
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            results = list(pool.map(timed, range(iterations)))
+    elapsed = time.perf_counter() - started
+    return summarize([latency for latency, _ in results], sum(not ok for _, ok in results), elapsed)
+
+
+#--- Benchmarks
+# Each returns {name: result}; names are stable so reports from different commits line up.
+
+def bench_bot(mock, iterations):
+    """BasicBot's order paths over REST."""
+    from batch_cli import size_connection_pool
+    from rate_limiter import WeightScheduler
+    from trading_bot import BasicBot
+
+    # Rate limits lifted: this measures the client, not the exchange's order-rate caps
+    bot = BasicBot('bench', 'bench', base_url=mock.base_url,
+                   scheduler=WeightScheduler(weight_limit=10 ** 9, order_limit=10 ** 9, order_limit_10s=10 ** 9))
+    size_connection_pool(bot, 16)
+    placed = []
+
+    def limit(n):
+        order = bot.place_limit_order('BTCUSDT', 'BUY', QUANTITY, RESTING_PRICE)
+        if order and n >= 0:
+            placed.append(order['orderId'])
+        return order
+
+    results = {'bot.place_limit': measure(limit, iterations)}
+    # Alternating sides keep the mock position flat
+    results['bot.place_market'] = measure(lambda n: bot.place_market_order('BTCUSDT', 'BUY' if n % 2 else 'SELL', QUANTITY), iterations)
+    results['bot.order_status'] = measure(lambda n: bot.get_order_status('BTCUSDT', placed[n % len(placed)]), iterations)
+    cancels = list(placed)
+    results['bot.cancel'] = measure(lambda n: bot.cancel_order('BTCUSDT', cancels[n]), len(cancels), warmup=0)
+    basket = [{'type': 'LIMIT', 'symbol': 'BTCUSDT', 'side': 'BUY', 'quantity': QUANTITY, 'price': RESTING_PRICE + i}
+              for i in range(5)]
+    results['bot.place_batch_5'] = measure(lambda n: all(r['response'] for r in bot.place_batch_orders(basket)), iterations // 5)
+    results['bot.place_limit_16_threads'] = measure(limit, iterations, threads=16)
+    bot.cancel_all_open_orders('BTCUSDT')
+    return results
+
+
+def bench_flask(mock, iterations):
+    """The web UI's routes through Flask's test client, with an in-process SharedBot and user-data stream."""
+    from app import create_app
+    configure_logging(log_file=None, level=logging.ERROR) # Keep the per-request log lines out of the measurement
+
+    app = create_app({'TESTING': True, 'BINANCE_TEST_API_KEY': 'bench', 'BINANCE_TEST_API_SECRET': 'bench',
+                      'BINANCE_FUTURES_BASE_URL': mock.base_url, 'BINANCE_FUTURES_WS_URL': mock.ws_url,
+                      'BOT_SERVER_ADDRESS': None})
+    client = app.test_client()
+    client.get('/readyz') # Creates the bot, which connects in the background
+    shared_bot = app.extensions['trading_bot']
+    if not shared_bot.wait_until_ready(30):
+        raise RuntimeError(f"Web UI bot did not become ready: {shared_bot.status()}")
+    while not shared_bot.bot.user_stream.store.live:
+        time.sleep(0.01)
+
+    def place(n):
+        return client.post('/place_order', data={'order_type': 'limit', 'symbol': 'BTCUSDT', 'side': 'BUY',
+                                                 'quantity': QUANTITY, 'price': RESTING_PRICE}).status_code == 302
+
+    results = {'flask.place_order': measure(place, iterations)}
+    order_ids = [order['orderId'] for order in shared_bot.bot.client.futures_get_open_orders(symbol='BTCUSDT')]
+    time.sleep(0.2) # Let the user-data stream deliver the last NEW events
+    results['flask.check_status'] = measure(lambda n: client.post('/check_status', data={
+        'status_symbol': 'BTCUSDT', 'order_id': order_ids[n % len(order_ids)]}).status_code == 302, iterations)
+    results['flask.api_balance'] = measure(lambda n: client.get('/api/balance').status_code == 200, iterations)
+    results['flask.index'] = measure(lambda n: client.get('/').status_code == 200, iterations)
+    cancels = order_ids[:iterations]
+    results['flask.cancel_order'] = measure(lambda n: client.post('/cancel_order', data={
+        'cancel_symbol': 'BTCUSDT', 'cancel_order_id': cancels[n]}).status_code == 302, len(cancels), warmup=0)
+    shared_bot.snapshot.stop()
+    shared_bot.bot.stop_user_stream()
+    return results
+
+
+def bench_cli(mock, iterations, concurrency=8):
+    """Script mode: batch throughput in-process, and one-shot `trading_bot.py place` including interpreter start."""
+    from batch_cli import run_batch
+    from rate_limiter import WeightScheduler
+    from trading_bot import API_KEY_ENV, API_SECRET_ENV, BasicBot
+
+    bot = BasicBot('bench', 'bench', base_url=mock.base_url,
+                   scheduler=WeightScheduler(weight_limit=10 ** 9, order_limit=10 ** 9, order_limit_10s=10 ** 9))
+    instructions = [(n + 1, {'op': 'place', 'symbol': 'BTCUSDT', 'side': 'BUY', 'type': 'LIMIT', 'quantity': QUANTITY,
+                             'price': RESTING_PRICE}) for n in range(iterations)]
+    summary = run_batch(bot, instructions, out=io.StringIO(), concurrency=concurrency)
+    results = {f'cli.batch_{concurrency}_concurrent': {
+        'operations': summary['operations'], 'failed': summary['failed'], 'seconds': summary['seconds'],
+        'ops_per_second': summary['ops_per_second'], 'p50_ms': summary['p50_ms'], 'p99_ms': summary['p99_ms'],
+        'mean_ms': None}}
+    bot.cancel_all_open_orders('BTCUSDT')
+
+    env = dict(os.environ, **{API_KEY_ENV: 'bench', API_SECRET_ENV: 'bench'})
+    command = [sys.executable, os.path.join(REPO_DIR, 'trading_bot.py'), '--base-url', mock.base_url,
+               'place', 'BTCUSDT', 'BUY', str(QUANTITY), '--type', 'MARKET']
+    run = lambda n: subprocess.run(command, env=env, capture_output=True).returncode == 0
+    results['cli.place_subprocess'] = measure(run, max(5, iterations // 20), warmup=1)
+    return results
+
+
+def bench_startup(mock, iterations):
+    """Cold start: importing trading_bot in a fresh interpreter, and constructor to first order, eager vs lazy."""
+    from rate_limiter import WeightScheduler
+    from trading_bot import BasicBot
+
+    env = dict(os.environ, PYTHONPATH=REPO_DIR)
+    # Run from the temporary working directory: an import that configures file logging shows up as a stray log
+    run = lambda n: subprocess.run([sys.executable, '-c', 'import trading_bot'], env=env, capture_output=True).returncode == 0
+    results = {'startup.import': measure(run, max(5, iterations // 20), warmup=1)}
+
+    def first_order(lazy):
+        def operation(n):
+            bot = BasicBot('bench', 'bench', base_url=mock.base_url, lazy=lazy,
+                           scheduler=WeightScheduler(weight_limit=10 ** 9, order_limit=10 ** 9, order_limit_10s=10 ** 9))
+            return bot.place_market_order('BTCUSDT', 'BUY' if n % 2 else 'SELL', QUANTITY)
+        return operation
+
+    results['startup.construct_eager'] = measure(lambda n: BasicBot('bench', 'bench', base_url=mock.base_url), iterations // 10)
+    results['startup.construct_lazy'] = measure(lambda n: BasicBot('bench', 'bench', base_url=mock.base_url, lazy=True), iterations // 10)
+    results['startup.first_order_eager'] = measure(first_order(False), iterations // 10)
+    results['startup.first_order_lazy'] = measure(first_order(True), iterations // 10)
+    return results
+
+
+def bench_faults(iterations, error_rate=0.05):
+    """Order placement against a mock that fails `error_rate` of requests and enforces Binance's rate limits."""
+    from mock_exchange import DEFAULT_RATE_LIMITS
+    from retry import RetryPolicy
+    from trading_bot import BasicBot
+
+    with MockProcess(error_rate=error_rate, rate_limits=DEFAULT_RATE_LIMITS) as mock:
+        bot = BasicBot('bench', 'bench', base_url=mock.base_url, retry_policy=RetryPolicy(base_delay=0.01, max_delay=0.1))
+        result = measure(lambda n: bot.place_limit_order('BTCUSDT', 'BUY', QUANTITY, RESTING_PRICE), iterations)
+        result['retries'] = bot.retry_policy.stats()['retries']
+    return {f'bot.place_limit_{error_rate:.0%}_errors': result}
+
+
+def run_suite(iterations=DEFAULT_ITERATIONS, latency=DEFAULT_LATENCY, seed=DEFAULT_SEED, only=None):
+    """
+    Runs the benchmarks.
+    :param only: Optional list of groups ('bot', 'flask', 'cli', 'startup', 'faults')
+    :return: Report dict (environment, configuration and per-benchmark results)
+    """
+    results = {}
+    groups = only or ('bot', 'flask', 'cli', 'startup', 'faults')
+    with MockProcess(latency=latency, seed=seed) as mock:
+        for group, bench in (('bot', bench_bot), ('flask', bench_flask), ('cli', bench_cli), ('startup', bench_startup)):
+            if group in groups:
+                print(f"Running {group} benchmarks...", file=sys.stderr)
+                results.update(bench(mock, iterations))
+    if 'faults' in groups:
+        print("Running faults benchmarks...", file=sys.stderr)
+        results.update(bench_faults(iterations))
+    return {'commit': _git('rev-parse', '--short', 'HEAD'), 'dirty': bool(_git('status', '--porcelain', '--untracked-files=no')),
+            'created': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()), 'python': platform.python_version(),
+            'platform': platform.platform(), 'cpus': os.cpu_count(),
+            'config': {'iterations': iterations, 'latency': latency, 'seed': seed, 'warmup': WARMUP}, 'results': results}
+
+
+def _git(*args):
+    try:
+        return subprocess.run(['git', *args], cwd=REPO_DIR, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None
+
+
+#--- Reports
+
+def format_report(report):
+    rows = [f"commit {report['commit']}{' (dirty)' if report['dirty'] else ''}, {report['cpus']} CPU(s), "
+            f"Python {report['python']}, mock latency {report['config']['latency'] * 1000:g} ms, seed {report['config']['seed']}",
+            f"{'benchmark':32s} {'ops':>6} {'failed':>6} {'ops/s':>9} {'p50 ms':>9} {'p99 ms':>9}"]
+    for name, result in report['results'].items():
+        rows.append(f"{name:32s} {result['operations']:6d} {result['failed']:6d} {result['ops_per_second']:9,.1f} "
+                    f"{result['p50_ms']:9.2f} {result['p99_ms']:9.2f}")
+    return '\n'.join(rows)
+
+
+def compare(report, baseline, threshold=REGRESSION_THRESHOLD):
+    """
+    Prints per-benchmark changes versus a baseline report. Regressions are judged on ops/s and p50,
+    which are stable run to run; p99 over a few hundred calls is shown but too noisy to gate on.
+    :return: Names of benchmarks whose ops/s dropped or p50 rose by more than `threshold`
+    """
+    if baseline['config'] != report['config']:
+        print(f"Warning: configurations differ ({baseline['config']} vs {report['config']}); deltas are not comparable.")
+    print(f"\nversus {baseline['commit']} ({baseline['created']}):")
+    print(f"{'benchmark':32s} {'ops/s':>9} {'change':>8} {'p50 ms':>9} {'change':>8} {'p99 ms':>9} {'change':>8}")
+    change = lambda new, old: new / old - 1 if old else 0.0
+    regressions = []
+    for name, result in report['results'].items():
+        before = baseline['results'].get(name)
+        if not before:
+            print(f"{name:32s} {result['ops_per_second']:9,.1f} {'new':>8}")
+            continue
+        throughput = change(result['ops_per_second'], before['ops_per_second'])
+        p50 = change(result['p50_ms'], before['p50_ms'])
+        regressed = throughput < -threshold or p50 > threshold
+        if regressed:
+            regressions.append(name)
+        print(f"{name:32s} {result['ops_per_second']:9,.1f} {throughput:+8.1%} {result['p50_ms']:9.2f} {p50:+8.1%} "
+              f"{result['p99_ms']:9.2f} {change(result['p99_ms'], before['p99_ms']):+8.1%}{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks BasicBot, the web UI and the CLI against the local mock exchange.")
+    parser.add_argument('--iterations', type=int, default=DEFAULT_ITERATIONS, help="Timed calls per benchmark (default %(default)s)")
+    parser.add_argument('--latency', type=float, default=DEFAULT_LATENCY, help="Mock round trip in seconds (default %(default)s)")
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--only', nargs='+', choices=('bot', 'flask', 'cli', 'startup', 'faults'), help="Run only these groups")
+    parser.add_argument('--output', help="Write the JSON report here")
+    parser.add_argument('--compare', help="Baseline JSON report; exits with 1 if any benchmark regressed")
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD, help="Regression threshold (default %(default)s)")
+    args = parser.parse_args()
+
+    configure_logging(log_file=None, level=logging.ERROR) # Per-order logging would dominate the numbers
+    output = os.path.abspath(args.output) if args.output else None
+    baseline_path = os.path.abspath(args.compare) if args.compare else None
+    # Journals, exchange-info caches and log files the bots create stay out of the working tree
+    os.chdir(tempfile.mkdtemp(prefix='bench-'))
+    os.environ['BOT_JOURNAL_PATH'] = os.path.join(os.getcwd(), 'order_journal.db')
+
+    report = run_suite(args.iterations, args.latency, args.seed, args.only)
+    print(format_report(report))
+    if output:
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {output}")
+    if baseline_path:
+        with open(baseline_path) as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+            sys.exit(1)
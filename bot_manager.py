@@ -0,0 +1,407 @@
+import concurrent.futures
+import itertools
+import logging
+import logging.handlers
+import multiprocessing
+import os
+import queue
+import socket
+import sys
+import threading
+import time
+import zlib
+
+from trading_bot import BasicBot
+from rate_limiter import SharedFixedWindow, WeightScheduler
+from order_journal import OrderJournal
+
+#--- Multi-account / multi-symbol bot manager
+# One BasicBot is one key pair in one process. BotManager owns several accounts (sub-accounts, each
+# with its own keys) and spreads their (account, symbol) shards over worker processes:
+#   * every shard lives in exactly one worker, so all orders for an account's symbol are routed to
+#     the same process and BasicBot
+#   * each worker builds one BasicBot per account it serves. Request weight is limited per IP, so
+#     every bot in every worker spends one shared weight budget (a SharedFixedWindow); order limits
+#     are per account and split between the workers holding the account
+#   * strategies run in the worker that owns their shard, next to the bot they trade through
+#   * balances and positions are fetched per account and aggregated in the manager
+#   * every request has a timeout, and a worker that dies fails its pending requests at once
+# Orders cost client-side CPU (signing, HTTP, logging, journaling) while the GIL is held, so one
+# process tops out long before the exchange does; separate processes scale with cores.
+#
+# Accounts are configured as {name: {'api_key': ..., 'api_secret': ..., 'symbols': [...],
+# 'testnet': True, 'base_url': None, 'rate_limits': {'order_limit': 1200, 'order_limit_10s': 300}}}.
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_THREADS = 4 # Concurrent commands per worker (overlaps network round trips)
+STARTUP_TIMEOUT = 60
+REQUEST_TIMEOUT = 60 # Seconds to wait for a worker's answer (above the bots' own retry budget)
+LIVENESS_INTERVAL = 1.0 # Seconds between worker liveness checks
+
+# Request weight per minute for the IP, shared by all workers (see rate_limiter.py)
+DEFAULT_WEIGHT_LIMIT = 2400
+# Per-account order limits, split between the workers serving the account
+DEFAULT_RATE_LIMITS = {'order_limit': 1200, 'order_limit_10s': 300}
+
+
+class WorkerError(Exception):
+    """Raised in the manager for an exception that escaped a bot method inside a worker."""
+
+
+def assign_shards(accounts, workers):
+    """
+    Spreads every (account, symbol) pair over the workers, round-robin in sorted order so every
+    worker gets the same number of shards (+-1).
+    :return: {(account, symbol): worker index}
+    """
+    pairs = sorted((name, symbol.upper()) for name, account in accounts.items() for symbol in account.get('symbols', []))
+    return {pair: index % workers for index, pair in enumerate(pairs)}
+
+
+#--- Worker process
+
+def _forward_logs(log_queue, level):
+    """Sends this process's log records to the manager, which writes them through its own handlers."""
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(level)
+
+
+def _build_bot(name, account, workers_sharing, weight_window, journal_dir, index):
+    # Order limits are per account: each worker gets its share. Weight is per IP: one budget for all bots
+    limits = dict(DEFAULT_RATE_LIMITS, **account.get('rate_limits', {}))
+    scheduler = WeightScheduler(weight_window=weight_window,
+                                **{limit: value // workers_sharing for limit, value in limits.items() if limit in DEFAULT_RATE_LIMITS})
+    # One journal file per account and worker: a journal numbers its client order IDs, so it has one owner
+    journal = OrderJournal(os.path.join(journal_dir, f"{name}-w{index}.db")) if journal_dir else None
+    bot = BasicBot(account['api_key'], account['api_secret'], testnet=account.get('testnet', True),
+                   base_url=account.get('base_url'), scheduler=scheduler, journal=journal)
+    if journal:
+        bot.reconcile_journal()
+    return bot
+
+
+def _run_strategy(bot, symbol, strategy, interval, stopping):
+    """Calls strategy(bot, symbol) every `interval` seconds until the worker stops."""
+    while not stopping.is_set():
+        try:
+            strategy(bot, symbol)
+        except Exception as e:
+            logger.error(f"Strategy {strategy!r} on {symbol} failed: {e}")
+        stopping.wait(interval)
+
+
+def _worker_main(index, accounts, sharing, weight_window, strategies, journal_dir, threads, commands, results, log_queue, log_level):
+    _forward_logs(log_queue, log_level)
+    try:
+        bots = {name: _build_bot(name, account, sharing[name], weight_window, journal_dir, index) for name, account in accounts.items()}
+    except Exception as e:
+        results.put((None, False, f"Worker {index} failed to start: {e}"))
+        return
+    results.put((None, True, index))
+
+    stopping = threading.Event()
+    for name, symbol, strategy, interval in strategies:
+        threading.Thread(target=_run_strategy, args=(bots[name], symbol, strategy, interval, stopping),
+                         name=f"strategy-{name}-{symbol}", daemon=True).start()
+
+    def execute(request_id, name, method, args, kwargs):
+        try:
+            results.put((request_id, True, getattr(bots[name], method)(*args, **kwargs)))
+        except Exception as e:
+            # Exceptions are sent back as text: Binance exceptions hold a response and do not pickle
+            results.put((request_id, False, f"{type(e).__name__}: {e}"))
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as pool:
+        for command in iter(commands.get, None):
+            pool.submit(execute, *command)
+    stopping.set()
+    for bot in bots.values():
+        if bot.journal:
+            bot.journal.close()
+
+
+#--- Manager
+
+class BotManager:
+    def __init__(self, accounts, workers=None, strategies=None, journal_dir=None, threads=DEFAULT_THREADS,
+                 weight_limit=DEFAULT_WEIGHT_LIMIT, timeout=REQUEST_TIMEOUT):
+        """
+        :param accounts: {name: {'api_key', 'api_secret', 'symbols', 'testnet', 'base_url', 'rate_limits'}}
+        :param workers: Worker processes (default: one per CPU, at most one per shard)
+        :param strategies: [(account, symbol, strategy, interval_seconds)]; strategy(bot, symbol) is
+                           called periodically in the worker owning the shard (must be picklable)
+        :param journal_dir: Directory for per-account, per-worker order journals (None: no journal)
+        :param threads: Commands each worker runs concurrently
+        :param weight_limit: Request weight per minute for the whole IP, shared by every bot in every worker
+        :param timeout: Seconds the blocking helpers wait for a worker's answer
+        """
+        self.accounts = accounts
+        shard_count = sum(len(account.get('symbols', [])) for account in accounts.values())
+        self.workers = max(1, min(workers or os.cpu_count() or 1, shard_count or 1))
+        self.shards = assign_shards(accounts, self.workers)
+        self.strategies = strategies or []
+        self.journal_dir = journal_dir
+        self.threads = threads
+        self.weight_limit = weight_limit
+        self.timeout = timeout
+        self._processes = []
+        self._dead = set() # indexes of workers that exited
+        self._commands = []
+        self._results = None
+        self._log_listener = None
+        self._pending = {} # request id -> (worker, Future)
+        self._pending_lock = threading.Lock()
+        self._request_ids = itertools.count(1)
+        self._dispatcher = None
+
+    def worker_for(self, account, symbol):
+        """:return: Index of the worker owning the shard (unlisted symbols are hashed onto one of the account's workers)"""
+        if account not in self.accounts:
+            raise KeyError(f"Unknown account: {account}")
+        worker = self.shards.get((account, symbol.upper()))
+        if worker is None:
+            workers = self._workers_of(account)
+            worker = workers[zlib.crc32(f"{account}/{symbol.upper()}".encode()) % len(workers)]
+        return worker
+
+    def _workers_of(self, account):
+        """:return: Sorted worker indexes holding at least one shard of the account"""
+        return sorted({worker for (name, _), worker in self.shards.items() if name == account}) or \
+               [zlib.crc32(account.encode()) % self.workers]
+
+    def start(self):
+        """Starts the workers and waits until every worker has connected its bots."""
+        context = multiprocessing.get_context()
+        self._results = context.Queue()
+        log_queue = context.Queue()
+        root = logging.getLogger()
+        self._log_listener = logging.handlers.QueueListener(log_queue, *root.handlers, respect_handler_level=True)
+        self._log_listener.start()
+
+        sharing = {name: len(self._workers_of(name)) for name in self.accounts}
+        weight_window = SharedFixedWindow(self.weight_limit, 60, context=context)
+        for index in range(self.workers):
+            accounts = {name: account for name, account in self.accounts.items() if index in self._workers_of(name)}
+            strategies = [s for s in self.strategies if self.worker_for(s[0], s[1]) == index]
+            commands = context.Queue()
+            process = context.Process(target=_worker_main, name=f"bot-worker-{index}", daemon=True,
+                                      args=(index, accounts, sharing, weight_window, strategies, self.journal_dir, self.threads,
+                                            commands, self._results, log_queue, root.level))
+            process.start()
+            self._processes.append(process)
+            self._commands.append(commands)
+
+        for _ in range(self.workers):
+            _, ok, value = self._results.get(timeout=STARTUP_TIMEOUT)
+            if not ok:
+                self.stop()
+                raise WorkerError(value)
+        self._dispatcher = threading.Thread(target=self._dispatch_results, name='bot-manager-results', daemon=True)
+        self._dispatcher.start()
+        logger.info(f"Bot manager started: {len(self.accounts)} accounts, {len(self.shards)} shards, {self.workers} workers")
+        return self
+
+    def stop(self):
+        for commands in self._commands:
+            commands.put(None)
+        for process in self._processes:
+            process.join(timeout=10)
+            if process.is_alive():
+                process.terminate()
+        if self._results is not None:
+            self._results.put(None) # Ends the dispatcher
+        if self._dispatcher:
+            self._dispatcher.join(timeout=5)
+        if self._log_listener:
+            self._log_listener.stop()
+        self._processes, self._commands = [], []
+
+    def _dispatch_results(self):
+        checked = time.monotonic()
+        while True:
+            try:
+                message = self._results.get(timeout=LIVENESS_INTERVAL)
+            except queue.Empty:
+                message = ()
+            if message is None:
+                return
+            if time.monotonic() - checked >= LIVENESS_INTERVAL:
+                self._check_workers()
+                checked = time.monotonic()
+            if not message:
+                continue
+            request_id, ok, value = message
+            with self._pending_lock:
+                worker, future = self._pending.pop(request_id, (None, None))
+            if future is None:
+                continue
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(WorkerError(value))
+
+    def _check_workers(self):
+        """Fails the pending requests of workers that have exited (crashed or killed) instead of leaving them waiting."""
+        for index, process in enumerate(self._processes):
+            if index in self._dead or process.is_alive():
+                continue
+            self._dead.add(index)
+            logger.error(f"Bot worker {index} exited with code {process.exitcode}; failing its pending requests")
+            with self._pending_lock:
+                failed = [request_id for request_id, (worker, _) in self._pending.items() if worker == index]
+                futures = [self._pending.pop(request_id)[1] for request_id in failed]
+            for future in futures:
+                future.set_exception(WorkerError(f"Worker {index} exited with code {process.exitcode}"))
+
+    #--- Routing
+
+    def submit(self, account, symbol, method, *args, **kwargs):
+        """
+        Runs bot.<method>(*args, **kwargs) on the account's bot in the worker owning `symbol`.
+        :return: concurrent.futures.Future with the method's return value
+        """
+        return self._submit(self.worker_for(account, symbol), account, method, args, kwargs)
+
+    def _submit(self, worker, account, method, args, kwargs):
+        request_id = next(self._request_ids)
+        future = concurrent.futures.Future()
+        if worker in self._dead:
+            future.set_exception(WorkerError(f"Worker {worker} is not running"))
+            return future
+        with self._pending_lock:
+            self._pending[request_id] = (worker, future)
+        self._commands[worker].put((request_id, account, method, args, kwargs))
+        return future
+
+    def _result(self, future):
+        """
+        Waits for a request's answer.
+        :raises concurrent.futures.TimeoutError: if the worker has not answered within self.timeout
+        :raises WorkerError: if the bot method raised or its worker died
+        """
+        return future.result(timeout=self.timeout)
+
+    def place_market_order(self, account, symbol, side, quantity):
+        return self._result(self.submit(account, symbol, 'place_market_order', symbol, side, quantity))
+
+    def place_limit_order(self, account, symbol, side, quantity, price):
+        return self._result(self.submit(account, symbol, 'place_limit_order', symbol, side, quantity, price))
+
+    def place_stop_limit_order(self, account, symbol, side, quantity, price, stop_price):
+        return self._result(self.submit(account, symbol, 'place_stop_limit_order', symbol, side, quantity, price, stop_price))
+
+    def get_order_status(self, account, symbol, order_id):
+        return self._result(self.submit(account, symbol, 'get_order_status', symbol, order_id))
+
+    def cancel_order(self, account, symbol, order_id):
+        return self._result(self.submit(account, symbol, 'cancel_order', symbol, order_id))
+
+    def cancel_all_open_orders(self, account, symbol):
+        return self._result(self.submit(account, symbol, 'cancel_all_open_orders', symbol))
+
+    def place_batch_orders(self, account, orders):
+        """
+        Splits the orders by symbol, sends each group to its shard's worker in parallel.
+        :return: Per-order results in input order (see BasicBot.place_batch_orders)
+        """
+        groups = {}
+        for position, order in enumerate(orders):
+            groups.setdefault(order['symbol'].upper(), []).append(position)
+        futures = {symbol: self.submit(account, symbol, 'place_batch_orders', [orders[p] for p in positions])
+                   for symbol, positions in groups.items()}
+        results = [None] * len(orders)
+        for symbol, positions in groups.items():
+            for position, result in zip(positions, self._result(futures[symbol]) or [None] * len(positions)):
+                results[position] = result
+        return results
+
+    #--- Aggregation
+
+    def _per_account(self, method, *args):
+        """Runs a read-only method once per account (on its first worker) in parallel."""
+        futures = {name: self._submit(self._workers_of(name)[0], name, method, args, {}) for name in self.accounts}
+        return {name: self._result(future) for name, future in futures.items()}
+
+    def balances(self):
+        """
+        :return: {'accounts': {account: [per-asset balance] or None}, 'total': {asset: summed balance}}
+        """
+        per_account = self._per_account('get_account_balance')
+        total = {}
+        for balance in per_account.values():
+            for asset in balance or []:
+                total[asset['asset']] = total.get(asset['asset'], 0.0) + float(asset['balance'])
+        return {'accounts': per_account, 'total': total}
+
+    def positions(self):
+        """
+        :return: {'accounts': {account: [non-zero positions]}, 'net': {symbol: summed positionAmt}}
+        """
+        per_account = {name: [p for p in positions if float(p.get('positionAmt', 0)) != 0]
+                       for name, positions in self._per_account('_call', 'futures_position_information').items()}
+        net = {}
+        for positions in per_account.values():
+            for position in positions:
+                net[position['symbol']] = net.get(position['symbol'], 0.0) + float(position['positionAmt'])
+        return {'accounts': per_account, 'net': net}
+
+
+#--- Scaling benchmark: orders/sec versus worker count against the local mock exchange
+# python bot_manager.py [orders per run] [mock latency seconds]
+
+def _serve_mock(port, latency):
+    from mock_exchange import MockFuturesServer
+    logging.getLogger().setLevel(logging.WARNING)
+    MockFuturesServer(port=port, latency=latency).serve_forever()
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+if __name__ == "__main__":
+    from logging_setup import configure_logging
+
+    orders = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.005
+    configure_logging(log_file=None, level=logging.WARNING) # Per-order INFO logging would dominate the numbers
+
+    port = _free_port()
+    mock = multiprocessing.Process(target=_serve_mock, args=(port, latency), daemon=True)
+    mock.start()
+    time.sleep(0.5)
+    base_url = f'http://127.0.0.1:{port}'
+    prices = {'BTCUSDT': (20000, 0.01), 'ETHUSDT': (1500, 0.1)}
+    # Limits lifted: this measures the manager and client CPU cost, not the exchange's order-rate caps
+    unlimited = {name: 10 ** 9 for name in DEFAULT_RATE_LIMITS}
+    accounts = {f'sub{n}': {'api_key': f'key{n}', 'api_secret': 'secret', 'base_url': base_url, 'symbols': list(prices),
+                            'rate_limits': unlimited} for n in range(1, 5)}
+    shards = [(name, symbol) for name in accounts for symbol in prices]
+
+    print(f"{os.cpu_count()} CPU(s), {len(accounts)} accounts x {len(prices)} symbols, mock latency {latency * 1000:.0f} ms")
+    baseline = None
+    for workers in [w for w in (1, 2, 4, 8) if w <= len(shards)]:
+        manager = BotManager(accounts, workers=workers, threads=4, weight_limit=10 ** 9).start()
+        try:
+            started = time.perf_counter()
+            futures = []
+            for n in range(orders):
+                name, symbol = shards[n % len(shards)]
+                price, quantity = prices[symbol]
+                futures.append(manager.submit(name, symbol, 'place_limit_order', symbol, 'BUY', quantity, price))
+            placed = sum(manager._result(future) is not None for future in futures)
+            elapsed = time.perf_counter() - started
+            total = manager.balances()['total']
+        finally:
+            manager.stop()
+        rate = placed / elapsed
+        baseline = baseline or rate
+        print(f"  {workers} worker(s): {placed}/{orders} orders in {elapsed:5.2f}s = {rate:7,.0f} orders/s "
+              f"({rate / baseline:.2f}x), aggregated USDT balance {total.get('USDT', 0):,.0f}")
+    mock.terminate()
@@ -0,0 +1,190 @@
+import logging
+import os
+import threading
+from multiprocessing.managers import BaseManager
+
+from logging_setup import configure_logging
+from trading_bot import BasicBot, CONNECTIVITY_TTL
+from account_snapshot import AccountSnapshot, DEFAULT_MAX_AGE
+from order_journal import OrderJournal, DEFAULT_JOURNAL_PATH
+from risk import RiskEngine, load_limits
+
+#--- Shared bot process
+# Under a multi-worker WSGI server every worker importing app.py would otherwise build its own
+# client, redo the startup calls and keep its own caches/streams. Instead, one `python bot_server.py`
+# process owns the BasicBot (plus its user-data stream and account snapshot) and web workers call it
+# over a local multiprocessing-manager socket.
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ADDRESS = '127.0.0.1:50055'
+
+
+class BotNotReadyError(Exception):
+    """Raised when the shared bot is still connecting or failed to initialize."""
+
+
+class SharedBot:
+    """
+    Facade over one BasicBot and its AccountSnapshot. Only exposes plain methods so it can be
+    served through a multiprocessing manager proxy. The exchange connection is made on a
+    background thread, so constructing this never blocks on network I/O.
+    """
+
+    def __init__(self, api_key, api_secret, testnet=True, base_url=None, max_age=DEFAULT_MAX_AGE, ws_url=None):
+        """:param ws_url: Optional WebSocket root for the user-data stream (e.g. a local mock_exchange.py server)"""
+        self.bot = None
+        self.snapshot = None
+        self.error = None
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._initialize, args=(api_key, api_secret, testnet, base_url, max_age, ws_url),
+                                        name='bot-init', daemon=True)
+        self._thread.start()
+
+    def _initialize(self, api_key, api_secret, testnet, base_url, max_age, ws_url):
+        try:
+            journal = OrderJournal(os.environ.get('BOT_JOURNAL_PATH', DEFAULT_JOURNAL_PATH))
+            # Pre-trade risk limits (JSON file, see risk.load_limits); seeded again on every stream resync
+            risk_path = os.environ.get('BOT_RISK_LIMITS')
+            risk = RiskEngine(*load_limits(risk_path)) if risk_path else None
+            bot = BasicBot(api_key=api_key, api_secret=api_secret, testnet=testnet, base_url=base_url, journal=journal, risk=risk)
+            # Resolve orders left in flight by a previous crash before taking new ones
+            bot.reconcile_journal()
+            if risk:
+                bot.sync_risk()
+            # Order status checks are answered from the user-data stream instead of a REST call per click
+            bot.start_user_stream(ws_url)
+            # Dashboard data is refreshed in the background; requests only read this cache
+            self.snapshot = AccountSnapshot(bot, max_age=max_age).start()
+            self.bot = bot
+            self._ready.set()
+            logger.info("Shared bot initialized successfully.")
+        except Exception as e:
+            self.error = str(e)
+            logger.error(f"Shared bot initialization failed: {e}")
+
+    def _require_bot(self):
+        if not self._ready.is_set():
+            raise BotNotReadyError(f"Bot initialization failed: {self.error}" if self.error else "Bot is still connecting to the exchange.")
+        return self.bot
+
+    def status(self):
+        """:return: {'ready': bool, 'error': str or None}"""
+        return {'ready': self._ready.is_set(), 'error': self.error}
+
+    def wait_until_ready(self, timeout=None):
+        return self._ready.wait(timeout)
+
+    def check_connectivity(self, max_age=CONNECTIVITY_TTL):
+        """:return: True if the exchange answered within max_age seconds (pinging it only if not)"""
+        return self._require_bot().check_connectivity(max_age)
+
+    #--- Orders (same signatures and return values as BasicBot)
+
+    def place_market_order(self, symbol, side, quantity):
+        return self._require_bot().place_market_order(symbol, side, quantity)
+
+    def place_limit_order(self, symbol, side, quantity, price):
+        return self._require_bot().place_limit_order(symbol, side, quantity, price)
+
+    def place_stop_limit_order(self, symbol, side, quantity, price, stop_price):
+        return self._require_bot().place_stop_limit_order(symbol, side, quantity, price, stop_price)
+
+    def place_batch_orders(self, orders):
+        return self._require_bot().place_batch_orders(orders)
+
+    def get_order_status(self, symbol, order_id):
+        return self._require_bot().get_order_status(symbol, order_id)
+
+    def cancel_order(self, symbol, order_id):
+        return self._require_bot().cancel_order(symbol, order_id)
+
+    def cancel_batch_orders(self, symbol, order_ids):
+        return self._require_bot().cancel_batch_orders(symbol, order_ids)
+
+    def cancel_all_open_orders(self, symbol):
+        return self._require_bot().cancel_all_open_orders(symbol)
+
+    def validate_order(self, params):
+        """
+        Checks/rounds futures_create_order params against the cached symbol filters and, when
+        enabled, the risk limits (dry run: nothing is reserved).
+        :raises OrderValidationError: if the exchange or the risk engine would reject the order
+        """
+        bot = self._require_bot()
+        bot.filters.apply(params)
+        if bot.risk:
+            bot.risk.evaluate(params, reference_price=bot.mid_price(params['symbol']))
+        return params
+
+    def render_metrics(self):
+        """:return: The bot's latency/error metrics in Prometheus text format ('' until connected)"""
+        if not self.bot:
+            return ''
+        return self.bot.metrics.render_prometheus() + self.bot.retry_policy.render_prometheus()
+
+    #--- Account snapshot
+
+    def get_snapshot(self):
+        self._require_bot()
+        return self.snapshot.get()
+
+    def wait_for_snapshot(self, version, timeout):
+        self._require_bot()
+        return self.snapshot.wait_for_update(version, timeout)
+
+    def request_refresh(self):
+        self._require_bot()
+        self.snapshot.request_refresh()
+
+
+class BotServerManager(BaseManager):
+    """Server side: owns the SharedBot."""
+
+
+class BotClientManager(BaseManager):
+    """Client side (web workers). Kept separate so its registry never shadows the server's."""
+
+
+BotClientManager.register('get_bot')
+
+
+def parse_address(address):
+    """'host:port' -> (host, port); anything else is treated as a Unix socket path."""
+    host, sep, port = address.rpartition(':')
+    if sep and port.isdigit():
+        return host, int(port)
+    return address
+
+
+def connect_shared_bot(address, authkey):
+    """
+    Connects to a running bot_server.py.
+    :return: SharedBot proxy
+    """
+    manager = BotClientManager(address=parse_address(address), authkey=authkey.encode())
+    manager.connect()
+    return manager.get_bot()
+
+
+def serve(address, authkey, api_key, api_secret, testnet=True, base_url=None, ws_url=None):
+    """Runs the shared bot and serves it to web workers until interrupted."""
+    shared_bot = SharedBot(api_key, api_secret, testnet=testnet, base_url=base_url,
+                           max_age=float(os.environ.get('DASHBOARD_MAX_AGE', DEFAULT_MAX_AGE)), ws_url=ws_url)
+    BotServerManager.register('get_bot', callable=lambda: shared_bot)
+    manager = BotServerManager(address=parse_address(address), authkey=authkey.encode())
+    server = manager.get_server()
+    logger.info(f"Shared bot server listening on {address}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    configure_logging()
+    api_key = os.environ.get('BINANCE_TEST_API_KEY')
+    api_secret = os.environ.get('BINANCE_TEST_API_SECRET')
+    authkey = os.environ.get('BOT_SERVER_AUTHKEY')
+    if not api_key or not api_secret or not authkey:
+        print("BINANCE_TEST_API_KEY, BINANCE_TEST_API_SECRET and BOT_SERVER_AUTHKEY must be set. Exiting.")
+    else:
+        serve(os.environ.get('BOT_SERVER_ADDRESS', DEFAULT_ADDRESS), authkey, api_key, api_secret,
+              base_url=os.environ.get('BINANCE_FUTURES_BASE_URL'), ws_url=os.environ.get('BINANCE_FUTURES_WS_URL'))
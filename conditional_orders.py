@@ -0,0 +1,733 @@
+import asyncio
+import json
+import logging
+import queue
+import secrets
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import os
+
+import numpy as np
+import websockets
+from binance.exceptions import BinanceAPIException
+
+from metrics import Histogram
+from order_journal import normalize_order
+
+#--- Client-side conditional orders: OCO, bracket and trailing stop
+# Binance futures has no OCO/bracket order types, so they are managed here as groups of legs:
+#   * exchange legs  - MARKET, LIMIT and STOP_LIMIT (place_stop_limit_order): sent when the leg
+#                      becomes active and left resting on the exchange
+#   * local legs     - STOP_MARKET, TAKE_PROFIT_MARKET and TRAILING_STOP: held here and checked on
+#                      every price tick; when triggered they are sent as a MARKET order
+# Legs of a group that share the same parent are one-cancels-other siblings: the first fill of one
+# (even a partial one) or its trigger cancels the rest. A leg with a parent only becomes active once
+# the parent is done filling, sized to the quantity the parent actually executed, so
+#   OCO      = two legs without a parent
+#   bracket  = entry, plus take-profit and stop-loss legs whose parent is the entry
+#   trailing = one TRAILING_STOP leg
+# Decisions (trigger checks, sibling cancels, child activation) are made under one lock in memory;
+# the resulting exchange calls run afterwards, on a sender thread by default, so the price-tick
+# path never waits on the network. Every state change is written to SQLite before the exchange
+# call it leads to, and each leg's client order ID is fixed up front, so after a restart
+# reconcile() can look every in-flight leg up on the exchange and carry on.
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = 'conditional_orders.db'
+
+EXCHANGE_TYPES = ('MARKET', 'LIMIT', 'STOP_LIMIT')
+LOCAL_TYPES = ('STOP_MARKET', 'TAKE_PROFIT_MARKET', 'TRAILING_STOP')
+
+# Leg states
+WAITING = 'WAITING' # parent not filled yet
+ARMED = 'ARMED' # local leg watching prices
+SENDING = 'SENDING' # decided; the order is being sent
+WORKING = 'WORKING' # resting on the exchange
+CANCELING = 'CANCELING' # a sibling filled; the exchange cancel is in flight
+FILLED = 'FILLED'
+CANCELED = 'CANCELED'
+FAILED = 'FAILED'
+TERMINAL_STATES = (FILLED, CANCELED, FAILED)
+
+# Trailing-stop high/low water marks move on most ticks; they are persisted at most this often
+TRAIL_SAVE_INTERVAL = 1.0
+
+DECISION_BUCKETS = (0.000005, 0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.01)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS groups (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    updated REAL NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS groups_status ON groups (status);
+"""
+
+
+def _leg(name, spec, parent=None, side=None, quantity=None):
+    leg_type = spec.get('type', 'MARKET').upper()
+    if leg_type not in EXCHANGE_TYPES + LOCAL_TYPES:
+        raise ValueError(f"Unsupported leg type: {leg_type}")
+    leg = {
+        'name': name,
+        'type': leg_type,
+        'side': (spec.get('side') or side).upper(),
+        'quantity': spec.get('quantity') or quantity,
+        'price': spec.get('price'),
+        'stop_price': spec.get('stop_price'),
+        'callback_rate': spec.get('callback_rate'), # TRAILING_STOP: retracement as a fraction (0.01 = 1%)
+        'activation_price': spec.get('activation_price'), # TRAILING_STOP: start trailing once reached
+        'parent': parent,
+        'state': WAITING,
+        'client_order_id': None,
+        'order_id': None,
+        'extreme': None, # TRAILING_STOP: best price seen since activation
+        'executed': 0.0, # executedQty reported by the exchange
+        'fill_price': None,
+        'error': None,
+    }
+    if leg_type in ('LIMIT', 'STOP_LIMIT') and leg['price'] is None:
+        raise ValueError(f"{name}: {leg_type} legs need a price")
+    if leg_type in ('STOP_LIMIT', 'STOP_MARKET', 'TAKE_PROFIT_MARKET') and leg['stop_price'] is None:
+        raise ValueError(f"{name}: {leg_type} legs need a stop_price")
+    if leg_type == 'TRAILING_STOP' and not leg['callback_rate']:
+        raise ValueError(f"{name}: TRAILING_STOP legs need a callback_rate")
+    return leg
+
+
+def _opposite(side):
+    return 'SELL' if side.upper() == 'BUY' else 'BUY'
+
+
+class ConditionalOrderEngine:
+    def __init__(self, bot, path=DEFAULT_PATH, send_async=True):
+        """
+        :param bot: BasicBot the legs are placed through; the engine registers as one of its order listeners
+        :param path: SQLite file holding the groups (None keeps them in memory only)
+        :param send_async: Run exchange calls on a sender thread (False: in the calling thread, e.g. replays)
+        """
+        self.bot = bot
+        self.send_async = send_async
+        self.groups = {} # id -> active group
+        self.prices = {} # symbol -> last price
+        self.decision_latency = Histogram(DECISION_BUCKETS)
+        self.fired = 0
+        self._armed = {} # symbol -> {(group id, leg name): (group, leg)}
+        self._by_client_id = {} # client order ID -> (group, leg)
+        self._unsaved = {} # group id -> (status, JSON) waiting for _flush()
+        self._lock = threading.RLock()
+        self._db_lock = threading.Lock()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('PRAGMA synchronous=NORMAL')
+            self._db.executescript(SCHEMA)
+            self._load()
+        self._queue = None
+        if send_async:
+            self._queue = queue.Queue()
+            self._sender = threading.Thread(target=self._send_loop, name='conditional-orders', daemon=True)
+            self._sender.start()
+        bot.order_listeners.append(self.on_order_update)
+
+    def stop(self):
+        if self._queue:
+            self._queue.put(None)
+            self._sender.join(timeout=10)
+        if self.on_order_update in self.bot.order_listeners:
+            self.bot.order_listeners.remove(self.on_order_update)
+        if self._db:
+            self._db.close()
+
+    #--- Persistence
+
+    def _load(self):
+        for (data,) in self._db.execute("SELECT data FROM groups WHERE status = 'ACTIVE'"):
+            group = json.loads(data)
+            self.groups[group['id']] = group
+            for leg in group['legs'].values():
+                if leg['client_order_id'] and leg['state'] not in TERMINAL_STATES:
+                    self._by_client_id[leg['client_order_id']] = (group, leg)
+                if leg['state'] == ARMED:
+                    self._arm(group, leg)
+        if self.groups:
+            logger.info(f"Loaded {len(self.groups)} active conditional order groups; call reconcile() before trading.")
+
+    def _save(self, group):
+        """Queues the group's current state for _flush() (call with the lock held)."""
+        if self._db:
+            legs = {name: {key: value for key, value in leg.items() if not key.startswith('_')} for name, leg in group['legs'].items()}
+            self._unsaved[group['id']] = (group['status'], json.dumps(dict(group, legs=legs)))
+
+    def _flush(self):
+        """Writes queued group states; runs before the exchange calls they lead to."""
+        if not self._unsaved:
+            return
+        with self._lock:
+            pending, self._unsaved = self._unsaved, {}
+        with self._db_lock:
+            now = time.time()
+            self._db.executemany('INSERT OR REPLACE INTO groups (id, status, updated, data) VALUES (?, ?, ?, ?)',
+                                 [(group_id, status, now, data) for group_id, (status, data) in pending.items()])
+
+    #--- Task execution (exchange calls happen outside the lock)
+
+    def _run(self, tasks):
+        self._flush()
+        for task in tasks:
+            if self._queue:
+                self._queue.put(task)
+            else:
+                task()
+
+    def _send_loop(self):
+        for task in iter(self._queue.get, None):
+            try:
+                task()
+            except Exception as e:
+                logger.error(f"Conditional order task failed: {e}")
+
+    #--- Creating groups
+
+    def _create(self, kind, symbol, legs):
+        group_id = secrets.token_hex(4)
+        group = {'id': group_id, 'kind': kind, 'symbol': symbol.upper(), 'status': 'ACTIVE', 'created': time.time(),
+                 'legs': {leg['name']: leg for leg in legs}}
+        for leg in legs:
+            # Fixed before anything is sent, so a restart can always find the order on the exchange
+            leg['client_order_id'] = f"co-{group_id}-{leg['name']}"
+        with self._lock:
+            self.groups[group_id] = group
+            tasks = []
+            for leg in legs:
+                if leg['parent'] is None:
+                    tasks += self._activate(group, leg)
+            self._save(group)
+        self._run(tasks)
+        logger.info(f"Conditional {kind} {group_id} on {group['symbol']}: {', '.join(leg['name'] + ' ' + leg['type'] for leg in legs)}")
+        return group_id
+
+    def place_oco(self, symbol, first, second):
+        """
+        One-cancels-other pair, e.g. a take-profit LIMIT and a stop-loss STOP_MARKET.
+        :param first: Leg spec {'type', 'side', 'quantity', 'price', 'stop_price', ...}
+        :return: Group ID
+        """
+        return self._create('oco', symbol, [_leg('a', first), _leg('b', second)])
+
+    def place_bracket(self, symbol, entry, take_profit, stop_loss):
+        """
+        Entry order whose fill activates a take-profit / stop-loss OCO pair.
+        Exit legs default to the opposite side and the entry quantity. They become active once the
+        entry is done (filled, or cancelled/expired after a partial fill), scaled to the executed quantity.
+        :param entry: Leg spec (MARKET, LIMIT or STOP_LIMIT; or a local type to enter on a trigger)
+        :param take_profit: Leg spec, e.g. {'type': 'LIMIT', 'price': 31000}
+        :param stop_loss: Leg spec, e.g. {'type': 'STOP_MARKET', 'stop_price': 29000}
+        :return: Group ID
+        """
+        entry_leg = _leg('entry', entry)
+        exit_side = _opposite(entry_leg['side'])
+        return self._create('bracket', symbol, [
+            entry_leg,
+            _leg('tp', take_profit, parent='entry', side=exit_side, quantity=entry_leg['quantity']),
+            _leg('sl', stop_loss, parent='entry', side=exit_side, quantity=entry_leg['quantity']),
+        ])
+
+    def place_trailing_stop(self, symbol, side, quantity, callback_rate, activation_price=None):
+        """
+        Trailing stop: a SELL trails the highest price since activation and fires a MARKET order
+        once the price falls `callback_rate` below it (a BUY mirrors this from the lowest price).
+        :return: Group ID
+        """
+        return self._create('trailing', symbol, [_leg('trail', {'type': 'TRAILING_STOP', 'side': side, 'quantity': quantity,
+                                                                 'callback_rate': callback_rate,
+                                                                 'activation_price': activation_price})])
+
+    def cancel(self, group_id):
+        """Cancels every leg of a group that has not filled."""
+        with self._lock:
+            group = self.groups.get(group_id)
+            if group is None:
+                return False
+            tasks = []
+            for leg in group['legs'].values():
+                tasks += self._cancel_leg(group, leg)
+            self._finish_if_done(group)
+            self._save(group)
+        self._run(tasks)
+        return True
+
+    #--- State machine (all called with the lock held; they return exchange tasks to run afterwards)
+
+    def _activate(self, group, leg):
+        if leg['type'] in LOCAL_TYPES:
+            leg['state'] = ARMED
+            self._arm(group, leg)
+            price = self.prices.get(group['symbol'])
+            if price is not None and self._triggered(leg, price):
+                return self._fire(group, leg)
+            return []
+        leg['state'] = SENDING
+        self._by_client_id[leg['client_order_id']] = (group, leg)
+        return [lambda: self._send(group, leg)]
+
+    def _arm(self, group, leg):
+        self._armed.setdefault(group['symbol'], {})[(group['id'], leg['name'])] = (group, leg)
+
+    def _disarm(self, group, leg):
+        self._armed.get(group['symbol'], {}).pop((group['id'], leg['name']), None)
+
+    def _siblings(self, group, leg):
+        return [other for other in group['legs'].values() if other is not leg and other['parent'] == leg['parent']]
+
+    def _cancel_leg(self, group, leg):
+        state = leg['state']
+        if state in (WAITING, ARMED):
+            self._disarm(group, leg)
+            leg['state'] = CANCELED
+        elif state in (SENDING, WORKING):
+            leg['state'] = CANCELING
+            if state == WORKING: # A leg still SENDING is cancelled as soon as its order is acknowledged
+                return [lambda: self._cancel_on_exchange(group, leg)]
+        return []
+
+    def _fire(self, group, leg):
+        """A local leg triggered: cancel its siblings, then send it as a MARKET order."""
+        self._disarm(group, leg)
+        leg['state'] = SENDING
+        self._by_client_id[leg['client_order_id']] = (group, leg)
+        self.fired += 1
+        working = [sibling for sibling in self._siblings(group, leg) if sibling['state'] in (SENDING, WORKING)]
+        for sibling in self._siblings(group, leg):
+            self._cancel_leg(group, sibling)
+        return [lambda: self._send_after_cancels(group, leg, working)]
+
+    def _apply(self, group, leg, order):
+        # Exchange STOP_LIMIT legs go through the algo endpoint: algoId / algoStatus / quantity
+        order = normalize_order(order)
+        status = order.get('status')
+        if leg['state'] in TERMINAL_STATES or status is None:
+            return []
+        tasks = []
+        if order.get('orderId') is not None:
+            leg['order_id'] = order['orderId']
+        executed = float(order.get('executedQty') or 0)
+        if status == 'FILLED' and not executed:
+            executed = float(order.get('origQty') or leg['quantity'])
+        first_fill = executed > 0 and not leg.get('executed')
+        if executed > leg.get('executed', 0.0): # Updates may arrive out of order
+            leg['executed'] = executed
+            leg['fill_price'] = float(order.get('avgPrice') or 0) or float(order.get('price') or 0) or None
+        if first_fill:
+            # One-cancels-other on the first fill, partial or not: otherwise both legs could fill
+            for sibling in self._siblings(group, leg):
+                if sibling.get('executed'):
+                    logger.error(f"Conditional {group['id']}: legs {sibling['name']} and {leg['name']} both filled.")
+                tasks += self._cancel_leg(group, sibling)
+        if status == 'FILLED':
+            leg['state'] = FILLED
+            self._by_client_id.pop(leg['client_order_id'], None)
+            tasks += self._activate_children(group, leg)
+        elif status in ('CANCELED', 'EXPIRED', 'EXPIRED_IN_MATCH', 'REJECTED'):
+            leg['state'] = CANCELED if status != 'REJECTED' else FAILED
+            self._by_client_id.pop(leg['client_order_id'], None)
+            if leg.get('executed'):
+                # Partially filled, then cancelled or expired: the filled part still needs its exits
+                tasks += self._activate_children(group, leg)
+            else:
+                for child in group['legs'].values():
+                    if child['parent'] == leg['name']:
+                        tasks += self._cancel_leg(group, child)
+        elif leg['state'] == SENDING:
+            leg['state'] = WORKING
+        elif leg['state'] == CANCELING and status in ('NEW', 'PARTIALLY_FILLED'):
+            tasks.append(lambda: self._cancel_on_exchange(group, leg))
+        self._finish_if_done(group)
+        self._save(group)
+        return tasks
+
+    def _activate_children(self, group, leg):
+        """Activates the legs waiting on `leg`, scaled to the quantity it executed."""
+        tasks = []
+        for child in group['legs'].values():
+            if child['parent'] == leg['name'] and child['state'] == WAITING:
+                child['quantity'] = round(float(child['quantity']) * leg['executed'] / float(leg['quantity']), 12)
+                tasks += self._activate(group, child)
+        return tasks
+
+    def _finish_if_done(self, group):
+        if group['status'] == 'ACTIVE' and all(leg['state'] in TERMINAL_STATES for leg in group['legs'].values()):
+            group['status'] = 'DONE'
+            self.groups.pop(group['id'], None)
+            logger.info(f"Conditional {group['kind']} {group['id']} done: "
+                        f"{', '.join(leg['name'] + '=' + leg['state'] for leg in group['legs'].values())}")
+
+    @staticmethod
+    def _triggered(leg, price):
+        side, leg_type = leg['side'], leg['type']
+        if leg_type == 'STOP_MARKET':
+            return price <= leg['stop_price'] if side == 'SELL' else price >= leg['stop_price']
+        if leg_type == 'TAKE_PROFIT_MARKET':
+            return price >= leg['stop_price'] if side == 'SELL' else price <= leg['stop_price']
+        # TRAILING_STOP
+        extreme = leg['extreme']
+        if extreme is None:
+            activation = leg['activation_price']
+            if activation is not None and (price < activation if side == 'SELL' else price > activation):
+                return False
+            leg['extreme'] = price
+            return False
+        if side == 'SELL':
+            if price > extreme:
+                leg['extreme'] = price
+                return False
+            return price <= extreme * (1 - leg['callback_rate'])
+        if price < extreme:
+            leg['extreme'] = price
+            return False
+        return price >= extreme * (1 + leg['callback_rate'])
+
+    #--- Exchange calls (outside the lock)
+
+    def _send(self, group, leg, market=False):
+        symbol, cid = group['symbol'], leg['client_order_id']
+        leg_type = 'MARKET' if market else leg['type']
+        if leg_type == 'MARKET':
+            order = self.bot.place_market_order(symbol, leg['side'], leg['quantity'], client_order_id=cid)
+        elif leg_type == 'LIMIT':
+            order = self.bot.place_limit_order(symbol, leg['side'], leg['quantity'], leg['price'], client_order_id=cid)
+        else:
+            order = self.bot.place_stop_limit_order(symbol, leg['side'], leg['quantity'], leg['price'], leg['stop_price'],
+                                                    client_order_id=cid)
+        with self._lock:
+            if order is None:
+                leg['state'] = FAILED
+                leg['error'] = 'Order placement failed (see the bot log)'
+                logger.error(f"Conditional {group['id']}: {leg['name']} could not be placed.")
+                tasks = []
+                for child in group['legs'].values():
+                    if child['parent'] == leg['name']:
+                        tasks += self._cancel_leg(group, child)
+                self._finish_if_done(group)
+                self._save(group)
+            else:
+                tasks = self._apply(group, leg, order)
+        self._run(tasks)
+
+    def _send_after_cancels(self, group, leg, working_siblings):
+        for sibling in working_siblings:
+            self._cancel_on_exchange(group, sibling)
+            if sibling['state'] == FILLED: # Filled before the cancel arrived; _apply already cancelled `leg`
+                return
+        with self._lock:
+            if leg['state'] != SENDING:
+                return
+        self._send(group, leg, market=True)
+
+    def _cancel_on_exchange(self, group, leg):
+        response = None
+        if leg['order_id'] is not None:
+            conditional = leg['type'] == 'STOP_LIMIT' # Placed on the algo endpoint
+            response = self.bot.cancel_order(group['symbol'], leg['order_id'], conditional=conditional)
+            if response is None: # Usually "Unknown order": it filled or was cancelled meanwhile
+                response = self.bot.get_order_status(group['symbol'], leg['order_id'], conditional=conditional)
+        if response:
+            self.on_order_update(response)
+
+    #--- Inputs
+
+    def on_price(self, symbol, price):
+        """Price tick (last trade or mark price): checks every armed local leg on the symbol."""
+        started = time.perf_counter()
+        tasks = []
+        with self._lock:
+            self.prices[symbol] = price
+            armed = self._armed.get(symbol)
+            if not armed:
+                return
+            now = time.monotonic()
+            for group, leg in list(armed.values()):
+                extreme = leg['extreme']
+                if self._triggered(leg, price):
+                    tasks += self._fire(group, leg)
+                    self._save(group)
+                elif leg['extreme'] != extreme and now - leg.get('_saved', 0.0) >= TRAIL_SAVE_INTERVAL:
+                    leg['_saved'] = now
+                    self._save(group)
+            self.decision_latency.observe(time.perf_counter() - started)
+        self._run(tasks)
+
+    def on_order_update(self, order):
+        """
+        Order response or user-data update (futures_get_order or algo order shape); orders of other
+        clients are ignored.
+        """
+        entry = self._by_client_id.get(order.get('clientOrderId') or order.get('clientAlgoId'))
+        if entry is None:
+            return
+        with self._lock:
+            tasks = self._apply(entry[0], entry[1], order)
+        self._run(tasks)
+
+    def reconcile(self):
+        """
+        After a restart: looks every in-flight leg up on the exchange by its client order ID.
+        Legs that never reached the exchange are sent again.
+        :return: {'checked': n, 'resent': n, 'missing': n}
+        """
+        summary = {'checked': 0, 'resent': 0, 'missing': 0}
+        with self._lock:
+            pending = [(group, leg) for group in self.groups.values() for leg in group['legs'].values()
+                       if leg['state'] in (SENDING, WORKING, CANCELING)]
+        for group, leg in pending:
+            summary['checked'] += 1
+            cid = leg['client_order_id']
+            lookup = {'clientAlgoId': cid} if leg['type'] == 'STOP_LIMIT' else {'origClientOrderId': cid}
+            try:
+                order = self.bot._call('futures_get_order', symbol=group['symbol'], **lookup)
+            except BinanceAPIException as e:
+                if e.code != -2013: # Order does not exist
+                    logger.error(f"Conditional {group['id']}: lookup of {cid} failed: {e}")
+                    continue
+                with self._lock:
+                    if leg['state'] == SENDING:
+                        summary['resent'] += 1
+                        tasks = [lambda group=group, leg=leg: self._send(group, leg, market=leg['type'] in LOCAL_TYPES)]
+                    else:
+                        summary['missing'] += 1
+                        tasks = self._apply(group, leg, {'status': 'CANCELED'})
+                self._run(tasks)
+                continue
+            except Exception as e:
+                logger.error(f"Conditional {group['id']}: lookup of {cid} failed: {e}")
+                continue
+            self.on_order_update(order)
+        logger.info(f"Conditional orders reconciled: {summary}")
+        return summary
+
+    def stats(self):
+        with self._lock:
+            return {
+                'active_groups': len(self.groups),
+                'armed_legs': sum(len(legs) for legs in self._armed.values()),
+                'fired': self.fired,
+                'decision_p50_us': (self.decision_latency.quantile(0.5) or 0) * 1e6,
+                'decision_p99_us': (self.decision_latency.quantile(0.99) or 0) * 1e6,
+            }
+
+
+#--- Live price feed
+
+class TradePriceFeed:
+    """Calls on_price(symbol, price) for every aggregate trade of `symbols` (one combined WebSocket)."""
+
+    def __init__(self, symbols, on_price, ws_url):
+        self.symbols = [symbol.upper() for symbol in symbols]
+        self.on_price = on_price
+        self.ws_url = ws_url.rstrip('/')
+        self._loop = None
+        self._thread = None
+        self._task = None
+        self._stopping = False
+
+    def start(self):
+        self._stopping = False
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_until_complete, args=(self._run(),),
+                                        name='trade-price-feed', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopping = True
+        if self._loop and self._task:
+            self._loop.call_soon_threadsafe(self._task.cancel)
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    async def _run(self):
+        self._task = asyncio.current_task()
+        streams = '/'.join(f"{symbol.lower()}@aggTrade" for symbol in self.symbols)
+        try:
+            while not self._stopping:
+                try:
+                    async with websockets.connect(f"{self.ws_url}/stream?streams={streams}") as ws:
+                        logger.info(f"Trade price feed connected for {', '.join(self.symbols)}")
+                        async for message in ws:
+                            trade = json.loads(message)['data']
+                            self.on_price(trade['s'], float(trade['p']))
+                except Exception as e:
+                    logger.error(f"Trade price feed error: {e}")
+                await asyncio.sleep(1.0)
+        except asyncio.CancelledError:
+            pass
+
+
+#--- Tick replay
+# Tick files are CSV lines `time_ms,symbol,price` (a header line is skipped). Ticks become one-price
+# bars of backtest.SimulatedExchange, which fills the engine's exchange legs as the replay advances.
+
+def load_ticks(path):
+    """:return: (times, symbol, prices) with times/prices as NumPy arrays (one symbol per file)"""
+    times, prices, symbol = [], [], None
+    with open(path) as f:
+        for line in f:
+            fields = line.strip().split(',')
+            if len(fields) < 3 or not fields[0].isdigit():
+                continue
+            times.append(int(fields[0]))
+            symbol = fields[1].upper()
+            prices.append(float(fields[2]))
+    return np.array(times, dtype=np.int64), symbol, np.array(prices)
+
+
+def replay_bot(times, prices, symbol='BTCUSDT'):
+    """:return: (SimulatedExchange over the ticks, BasicBot trading on it)"""
+    from backtest import SimulatedExchange, _Unthrottled
+    from exchange_info import SymbolFilterIndex
+    from trading_bot import BasicBot
+
+    klines = {'open_time': times, 'open': prices, 'high': prices, 'low': prices, 'close': prices,
+              'volume': np.ones(len(prices))}
+    exchange = SimulatedExchange(klines, symbol=symbol, slippage_bps=0.0)
+    bot = BasicBot('replay', 'replay', client=exchange, scheduler=_Unthrottled())
+    bot.filters = SymbolFilterIndex(exchange.futures_exchange_info, cache_path=None)
+    return exchange, bot
+
+
+def replay(engine, exchange, symbol, prices, start=0, end=None):
+    """Feeds ticks [start, end) to the exchange clock and the engine."""
+    for index in range(start, len(prices) if end is None else end):
+        exchange.set_time(index)
+        engine.on_price(symbol, float(prices[index]))
+
+
+def _path(points, step=1.0):
+    """Piecewise-linear price path through `points`, `step` apart: a readable tick file stand-in."""
+    prices = [points[0]]
+    for target in points[1:]:
+        while abs(target - prices[-1]) > 1e-9:
+            prices.append(prices[-1] + max(-step, min(step, target - prices[-1])))
+    prices = np.round(np.array(prices), 1)
+    return np.arange(len(prices), dtype=np.int64) * 100 + 1_700_000_000_000, prices
+
+
+if __name__ == "__main__":
+    # Scenarios replayed through SimulatedExchange: python conditional_orders.py [ticks.csv]
+    for name in ('trading_bot', 'exchange_info', __name__): # One log line per simulated call is noise here
+        logging.getLogger(name).setLevel(logging.WARNING)
+    results = []
+
+    def check(name, passed, detail):
+        results.append(passed)
+        print(f"[{'PASS' if passed else 'FAIL'}] {name}: {detail}")
+
+    def scenario(points):
+        times, prices = _path(points, step=5.0)
+        exchange, bot = replay_bot(times, prices)
+        engine = ConditionalOrderEngine(bot, path=None, send_async=False)
+        exchange.listeners.append(engine.on_order_update)
+        engine.on_price('BTCUSDT', float(prices[0]))
+        return exchange, bot, engine, prices
+
+    def legs(engine, group_id):
+        return {name: leg['state'] for name, leg in engine_group(engine, group_id)['legs'].items()}
+
+    finished = {}
+    def engine_group(engine, group_id):
+        return engine.groups.get(group_id) or finished[group_id]
+
+    def track(engine, group_id):
+        finished[group_id] = engine.groups[group_id]
+        return group_id
+
+    # Bracket: entry LIMIT fills on the dip, the rally hits the take-profit, the stop is cancelled
+    exchange, bot, engine, prices = scenario([30000, 29900, 30300])
+    group = track(engine, engine.place_bracket('BTCUSDT', {'type': 'LIMIT', 'side': 'BUY', 'quantity': 0.01, 'price': 29950},
+                                               {'type': 'LIMIT', 'price': 30200}, {'type': 'STOP_MARKET', 'stop_price': 29800}))
+    replay(engine, exchange, 'BTCUSDT', prices, start=1)
+    states = legs(engine, group)
+    check("Bracket take-profit", states == {'entry': FILLED, 'tp': FILLED, 'sl': CANCELED} and exchange.position == 0,
+          f"{states}, final position {exchange.position}")
+
+    # Bracket: the drop hits the local stop-loss, which cancels the resting take-profit on the exchange
+    exchange, bot, engine, prices = scenario([30000, 29940, 30100, 29700])
+    group = track(engine, engine.place_bracket('BTCUSDT', {'type': 'LIMIT', 'side': 'BUY', 'quantity': 0.01, 'price': 29950},
+                                               {'type': 'LIMIT', 'price': 30200}, {'type': 'STOP_MARKET', 'stop_price': 29800}))
+    replay(engine, exchange, 'BTCUSDT', prices, start=1)
+    states = legs(engine, group)
+    tp_order = exchange.orders[engine_group(engine, group)['legs']['tp']['order_id']]
+    check("Bracket stop-loss", states == {'entry': FILLED, 'tp': CANCELED, 'sl': FILLED} and tp_order['status'] == 'CANCELED'
+          and exchange.position == 0, f"{states}, take-profit order {tp_order['status']} on the exchange")
+
+    # OCO of two exchange legs: the STOP_LIMIT triggers and fills, the LIMIT is cancelled
+    exchange, bot, engine, prices = scenario([30000, 29700])
+    exchange.position = 0.02
+    group = track(engine, engine.place_oco('BTCUSDT', {'type': 'LIMIT', 'side': 'SELL', 'quantity': 0.02, 'price': 30300},
+                                           {'type': 'STOP_LIMIT', 'side': 'SELL', 'quantity': 0.02, 'price': 29750, 'stop_price': 29800}))
+    replay(engine, exchange, 'BTCUSDT', prices, start=1)
+    states = legs(engine, group)
+    check("OCO on exchange legs", states == {'a': CANCELED, 'b': FILLED} and exchange.position == 0, str(states))
+
+    # Trailing stop: trails the rally to 30500, fires 1% below it
+    exchange, bot, engine, prices = scenario([30000, 30500, 30100, 29000])
+    exchange.position = 0.01
+    group = track(engine, engine.place_trailing_stop('BTCUSDT', 'SELL', 0.01, callback_rate=0.01))
+    replay(engine, exchange, 'BTCUSDT', prices, start=1)
+    trail = engine_group(engine, group)['legs']['trail']
+    check("Trailing stop", trail['state'] == FILLED and trail['extreme'] == 30500 and 30180 <= trail['fill_price'] <= 30200,
+          f"high {trail['extreme']}, filled at {trail['fill_price']}")
+
+    # Restart: the process dies after the entry filled; a new engine on the same file carries on
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'conditional_orders.db')
+        times, prices = _path([30000, 29900, 30300], step=5.0)
+        exchange, bot = replay_bot(times, prices)
+        engine = ConditionalOrderEngine(bot, path=path, send_async=False)
+        exchange.listeners.append(engine.on_order_update)
+        group = engine.place_bracket('BTCUSDT', {'type': 'LIMIT', 'side': 'BUY', 'quantity': 0.01, 'price': 29950},
+                                     {'type': 'LIMIT', 'price': 30200}, {'type': 'STOP_MARKET', 'stop_price': 29800})
+        replay(engine, exchange, 'BTCUSDT', prices, start=1, end=40)
+        before = {name: leg['state'] for name, leg in engine.groups[group]['legs'].items()}
+        engine.stop() # "crash": nothing but the SQLite file survives
+        exchange.listeners.clear()
+        bot.order_listeners.clear()
+
+        engine = ConditionalOrderEngine(bot, path=path, send_async=False)
+        exchange.listeners.append(engine.on_order_update)
+        summary = engine.reconcile()
+        replay(engine, exchange, 'BTCUSDT', prices, start=40)
+        row = engine._db.execute('SELECT status, data FROM groups WHERE id = ?', (group,)).fetchone()
+        after = {name: leg['state'] for name, leg in json.loads(row[1])['legs'].items()}
+        engine.stop()
+        check("Survives a restart", row[0] == 'DONE' and after == {'entry': FILLED, 'tp': FILLED, 'sl': CANCELED},
+              f"before {before}, reconciled {summary}, after {after}")
+
+    # Decision latency: 1000 armed trailing stops, 20k ticks (or the ticks of the given file)
+    if len(sys.argv) > 1:
+        times, symbol, prices = load_ticks(sys.argv[1])
+    else:
+        rng = np.random.default_rng(3)
+        symbol, prices = 'BTCUSDT', np.round(30000 + np.cumsum(rng.normal(0, 2, 20000)), 1)
+        times = np.arange(len(prices), dtype=np.int64) * 100
+    exchange, bot = replay_bot(times, prices, symbol=symbol)
+    engine = ConditionalOrderEngine(bot, path=None, send_async=True)
+    engine.on_price(symbol, float(prices[0]))
+    for n in range(1000):
+        engine.place_trailing_stop(symbol, 'SELL' if n % 2 else 'BUY', 0.01, callback_rate=0.005 + n * 0.00005)
+    started = time.perf_counter()
+    for price in prices:
+        engine.on_price(symbol, float(price))
+    elapsed = time.perf_counter() - started
+    stats = engine.stats()
+    engine.stop()
+    print(f"{len(prices):,} ticks x {1000} trailing stops in {elapsed:.2f}s: {elapsed / len(prices) * 1e6:.0f} us per tick "
+          f"({elapsed / len(prices) / 1000 * 1e9:.0f} ns per leg check), {stats['fired']} fired")
+    print(f"Decision latency per tick: p50 {stats['decision_p50_us']:.0f} us, p99 {stats['decision_p99_us']:.0f} us")
+    print(f"{sum(results)}/{len(results)} scenarios passed")
@@ -0,0 +1,205 @@
+import json
+import logging
+import os
+import time
+from decimal import Decimal, ROUND_DOWN, ROUND_HALF_UP
+
+#--- Exchange-info cache and local order pre-validation
+# futures_exchange_info is downloaded once, indexed per symbol, persisted to disk and refreshed
+# after a TTL. Orders are checked/rounded against LOT_SIZE, PRICE_FILTER and MIN_NOTIONAL locally,
+# so an order the exchange would reject never costs a network round trip. A failed refresh is not
+# retried for RETRY_INTERVAL seconds: meanwhile orders use the stale index instead of each paying
+# for another attempt (and its retry backoff) while the endpoint is down.
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = 'exchange_info_cache.json'
+DEFAULT_TTL = 3600 # seconds
+RETRY_INTERVAL = 60 # seconds between refresh attempts after a failure
+
+
+class OrderValidationError(Exception):
+    """Raised when an order breaks a symbol filter and must not be sent."""
+
+
+def _to_decimal(value):
+    # str() first so floats like 0.1 become Decimal('0.1') rather than their binary expansion
+    return Decimal(str(value))
+
+
+def _round_to_step(value, step, rounding):
+    if step <= 0:
+        return value
+    return (value / step).quantize(Decimal(1), rounding=rounding) * step
+
+
+def _format_decimal(value):
+    # Plain (non-scientific) notation without trailing zeros, as the exchange expects
+    text = format(value, 'f')
+    return text.rstrip('0').rstrip('.') if '.' in text else text
+
+
+class SymbolFilters:
+    """The subset of a symbol's exchange filters the bot validates against."""
+
+    def __init__(self, symbol_info):
+        filters = {f['filterType']: f for f in symbol_info.get('filters', [])}
+        price_filter = filters.get('PRICE_FILTER', {})
+        lot_size = filters.get('LOT_SIZE', {})
+        market_lot_size = filters.get('MARKET_LOT_SIZE', lot_size)
+        min_notional = filters.get('MIN_NOTIONAL', {})
+
+        self.symbol = symbol_info['symbol']
+        self.tick_size = _to_decimal(price_filter.get('tickSize', 0))
+        self.min_price = _to_decimal(price_filter.get('minPrice', 0))
+        self.max_price = _to_decimal(price_filter.get('maxPrice', 0))
+        self.step_size = _to_decimal(lot_size.get('stepSize', 0))
+        self.min_qty = _to_decimal(lot_size.get('minQty', 0))
+        self.max_qty = _to_decimal(lot_size.get('maxQty', 0))
+        self.market_step_size = _to_decimal(market_lot_size.get('stepSize', 0))
+        self.market_min_qty = _to_decimal(market_lot_size.get('minQty', 0))
+        self.market_max_qty = _to_decimal(market_lot_size.get('maxQty', 0))
+        # Futures exchange info calls the field 'notional'; spot uses 'minNotional'
+        self.min_notional = _to_decimal(min_notional.get('notional', min_notional.get('minNotional', 0)))
+
+    def round_quantity(self, quantity, market=False):
+        # Always round quantity down so we never trade more than was asked for
+        step = self.market_step_size if market else self.step_size
+        return _round_to_step(_to_decimal(quantity), step, ROUND_DOWN)
+
+    def round_price(self, price):
+        return _round_to_step(_to_decimal(price), self.tick_size, ROUND_HALF_UP)
+
+    def check_quantity(self, quantity, market=False):
+        min_qty = self.market_min_qty if market else self.min_qty
+        max_qty = self.market_max_qty if market else self.max_qty
+        if quantity <= 0 or quantity < min_qty:
+            raise OrderValidationError(f"Quantity {_format_decimal(quantity)} is below the minimum of {_format_decimal(min_qty)} for {self.symbol}.")
+        if max_qty and quantity > max_qty:
+            raise OrderValidationError(f"Quantity {_format_decimal(quantity)} is above the maximum of {_format_decimal(max_qty)} for {self.symbol}.")
+
+    def check_price(self, price, label='Price'):
+        if price <= 0 or price < self.min_price:
+            raise OrderValidationError(f"{label} {_format_decimal(price)} is below the minimum of {_format_decimal(self.min_price)} for {self.symbol}.")
+        if self.max_price and price > self.max_price:
+            raise OrderValidationError(f"{label} {_format_decimal(price)} is above the maximum of {_format_decimal(self.max_price)} for {self.symbol}.")
+
+    def check_notional(self, quantity, price):
+        notional = quantity * price
+        if notional < self.min_notional:
+            raise OrderValidationError(f"Order notional value ({notional:.2f}) is too small. Must be at least {_format_decimal(self.min_notional)} for {self.symbol}.")
+
+
+class SymbolFilterIndex:
+    def __init__(self, fetch_exchange_info, cache_path=DEFAULT_CACHE_PATH, ttl=DEFAULT_TTL, retry_interval=RETRY_INTERVAL):
+        """
+        :param fetch_exchange_info: Callable returning the futures_exchange_info response
+        :param cache_path: JSON file the index is persisted to (None disables persistence)
+        :param ttl: Seconds before the index is re-downloaded
+        :param retry_interval: Seconds before a stale index is re-downloaded again after a failed attempt
+        """
+        self._fetch_exchange_info = fetch_exchange_info
+        self.cache_path = cache_path
+        self.ttl = ttl
+        self.retry_interval = retry_interval
+        self.symbols = {}
+        self.fetched_at = 0.0
+        self.failed_at = None # time.monotonic() of the last failed refresh
+        self._raw_symbols = []
+
+    def _build(self, raw_symbols, fetched_at):
+        self._raw_symbols = raw_symbols
+        self.symbols = {info['symbol']: SymbolFilters(info) for info in raw_symbols}
+        self.fetched_at = fetched_at
+
+    def _load_from_disk(self):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return False
+        try:
+            with open(self.cache_path) as f:
+                cached = json.load(f)
+            self._build(cached['symbols'], cached['fetched_at'])
+            logger.info(f"Loaded exchange info for {len(self.symbols)} symbols from {self.cache_path}")
+            return True
+        except Exception as e:
+            logger.warning(f"Could not read exchange info cache {self.cache_path}: {e}")
+            return False
+
+    def _save_to_disk(self):
+        if not self.cache_path:
+            return
+        try:
+            tmp_path = f"{self.cache_path}.{os.getpid()}.tmp" # Per process: several bot workers may save at once
+            with open(tmp_path, 'w') as f:
+                json.dump({'fetched_at': self.fetched_at, 'symbols': self._raw_symbols}, f)
+            os.replace(tmp_path, self.cache_path) # Atomic: a crash never leaves a half-written cache
+        except Exception as e:
+            logger.warning(f"Could not write exchange info cache {self.cache_path}: {e}")
+
+    def is_stale(self):
+        return time.time() - self.fetched_at > self.ttl
+
+    def refresh(self):
+        """Re-downloads exchange info. On failure the previous (stale) index is kept."""
+        try:
+            info = self._fetch_exchange_info()
+            raw_symbols = [{'symbol': s['symbol'], 'filters': s.get('filters', [])} for s in info['symbols']]
+            self._build(raw_symbols, time.time())
+            self.failed_at = None
+            self._save_to_disk()
+            logger.info(f"Exchange info refreshed: {len(self.symbols)} symbols")
+        except Exception as e:
+            self.failed_at = time.monotonic()
+            logger.warning(f"Could not refresh exchange info, keeping cached filters for {self.retry_interval}s: {e}")
+
+    def _ensure_loaded(self):
+        if not self.symbols:
+            self._load_from_disk()
+        if self.is_stale() and (self.failed_at is None or time.monotonic() - self.failed_at >= self.retry_interval):
+            self.refresh()
+
+    def get(self, symbol):
+        """
+        :return: SymbolFilters for symbol, or None if no exchange info could be loaded at all
+        :raises OrderValidationError: if exchange info is loaded but does not list the symbol
+        """
+        self._ensure_loaded()
+        if not self.symbols:
+            return None
+        filters = self.symbols.get(symbol.upper())
+        if filters is None:
+            raise OrderValidationError(f"Unknown symbol: {symbol.upper()}")
+        return filters
+
+    def apply(self, params, reference_price=None):
+        """
+        Validates order params against the symbol's filters and rounds quantity/price/stopPrice to
+        step/tick size in place.
+        :param params: futures_create_order params dict
+        :param reference_price: Price used for the MIN_NOTIONAL check of MARKET orders (optional)
+        :raises OrderValidationError: if the order would be rejected by the exchange
+        """
+        filters = self.get(params['symbol'])
+        if filters is None:
+            logger.warning("No exchange info available; sending order without local validation.")
+            return params
+
+        market = params.get('type') == 'MARKET'
+        quantity = filters.round_quantity(params['quantity'], market=market)
+        filters.check_quantity(quantity, market=market)
+        params['quantity'] = _format_decimal(quantity)
+
+        price = None
+        if params.get('price') is not None:
+            price = filters.round_price(params['price'])
+            filters.check_price(price)
+            params['price'] = _format_decimal(price)
+        if params.get('stopPrice') is not None:
+            stop_price = filters.round_price(params['stopPrice'])
+            filters.check_price(stop_price, label='Stop price')
+            params['stopPrice'] = _format_decimal(stop_price)
+
+        notional_price = price if price is not None else reference_price
+        if notional_price is not None:
+            filters.check_notional(quantity, _to_decimal(notional_price))
+        return params
@@ -0,0 +1,523 @@
+import logging
+import secrets
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+#--- Execution algorithms: TWAP, VWAP and iceberg parent orders
+# A parent order is worked as a series of child orders instead of one large place_market_order:
+#   * TWAP    - `slices` MARKET children evenly spaced over `duration`
+#   * VWAP    - MARKET children sized by a volume profile (see volume_profile) over `duration`
+#   * ICEBERG - one LIMIT child of `display_quantity` at a time; the next is posted when it fills
+# Each TWAP/VWAP slice sends what is still owed for its share of the schedule, so a rejected or
+# unfilled slice is caught up by the following ones and the last slice sends the rest.
+# Scheduling runs on a hashed timer wheel: one pending timer per parent, O(1) to schedule and cancel,
+# so thousands of concurrent parents cost little more than the child orders themselves. The wheel
+# is driven by a thread in live mode, or by advance(now) from a simulation clock.
+# Child fills come from the bot's order listeners (responses, status polls, user-data events). Every
+# parent records its arrival price (the mid when it was submitted), and report() gives the
+# slippage of the average fill against it.
+
+logger = logging.getLogger(__name__)
+
+TWAP = 'TWAP'
+VWAP = 'VWAP'
+ICEBERG = 'ICEBERG'
+
+WORKING = 'WORKING'
+DONE = 'DONE'
+CANCELED = 'CANCELED'
+FAILED = 'FAILED'
+
+CHILD_TERMINAL = ('FILLED', 'CANCELED', 'EXPIRED', 'EXPIRED_IN_MATCH', 'REJECTED')
+
+DEFAULT_TICK = 0.05 # timer wheel resolution, seconds
+DEFAULT_SLOTS = 4096 # one revolution = slots * tick (~3.4 minutes); longer timers wait extra revolutions
+DEFAULT_POLL_INTERVAL = 2.0 # status poll for children still open, seconds (None: rely on order listeners)
+
+
+#--- Timer wheel
+
+class Timer:
+    __slots__ = ('due', 'callback', 'args', 'cancelled')
+
+    def __init__(self, due, callback, args):
+        self.due = due
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class TimerWheel:
+    """
+    Hashed timing wheel: timers are bucketed by due tick modulo `slots`; each tick only looks at
+    its own bucket. Cancellation is lazy (the timer is skipped when its bucket comes round).
+    """
+
+    def __init__(self, tick=DEFAULT_TICK, slots=DEFAULT_SLOTS, clock=time.time):
+        """
+        :param tick: Resolution in seconds
+        :param clock: Time source for schedule() and the live thread (a simulation passes its own)
+        """
+        self.tick = tick
+        self.clock = clock
+        self._slots = [[] for _ in range(slots)]
+        self._current = int(clock() / tick) # last tick processed
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopping = threading.Event()
+        self.pending = 0
+
+    def schedule(self, delay, callback, *args):
+        """
+        Runs callback(*args) once `delay` seconds have passed (at the next tick at the earliest).
+        :return: Timer (call .cancel() to drop it)
+        """
+        with self._lock:
+            due = max(int((self.clock() + delay) / self.tick), self._current + 1)
+            timer = Timer(due, callback, args)
+            self._slots[due % len(self._slots)].append(timer)
+            self.pending += 1
+        return timer
+
+    def advance(self, now=None):
+        """
+        Processes every tick up to `now` and runs the timers that came due, in due order.
+        :return: Number of callbacks run
+        """
+        target = int((self.clock() if now is None else now) / self.tick)
+        slots = self._slots
+        fired = []
+        with self._lock:
+            if target <= self._current:
+                return 0
+            if target - self._current >= len(slots):
+                # Jumped a whole revolution or more (e.g. a simulation skipping ahead): sweep every bucket once
+                buckets = range(len(slots))
+            else:
+                buckets = [tick % len(slots) for tick in range(self._current + 1, target + 1)]
+            for index in buckets:
+                bucket = slots[index]
+                if not bucket:
+                    continue
+                keep = []
+                for timer in bucket:
+                    if timer.cancelled:
+                        self.pending -= 1
+                    elif timer.due <= target:
+                        fired.append(timer)
+                    else:
+                        keep.append(timer)
+                slots[index] = keep
+            self._current = target
+            self.pending -= len(fired)
+        if len(fired) > 1:
+            fired.sort(key=lambda timer: timer.due)
+        for timer in fired:
+            try:
+                timer.callback(*timer.args)
+            except Exception as e:
+                logger.error(f"Timer callback failed: {e}")
+        return len(fired)
+
+    def start(self):
+        """Advances the wheel from a background thread every tick."""
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name='timer-wheel', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopping.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def _run(self):
+        while not self._stopping.wait(self.tick):
+            self.advance()
+
+
+#--- Volume profile
+
+def volume_profile(klines, start_time, duration, slices, period=86_400_000):
+    """
+    Average share of volume traded in each slice of a window, by time of day, from historical klines.
+    :param klines: Dict of NumPy arrays with 'open_time' (ms) and 'volume'
+    :param start_time: Window start (ms); only its time of day (modulo `period`) matters
+    :param duration: Window length in seconds
+    :return: NumPy array of `slices` weights summing to 1 (uniform if there is no history for the window)
+    """
+    slice_ms = duration * 1000.0 / slices
+    offset = (klines['open_time'] - start_time) % period
+    inside = offset < duration * 1000
+    buckets = (offset[inside] // slice_ms).astype(np.int64)
+    volume = np.bincount(buckets, weights=klines['volume'][inside], minlength=slices)[:slices]
+    counts = np.bincount(buckets, minlength=slices)[:slices]
+    mean = np.divide(volume, counts, out=np.zeros(slices), where=counts > 0)
+    total = mean.sum()
+    return mean / total if total > 0 else np.full(slices, 1.0 / slices)
+
+
+#--- Scheduler
+
+class ExecutionScheduler:
+    def __init__(self, bot, wheel=None, price_source=None, threads=4, poll_interval=DEFAULT_POLL_INTERVAL):
+        """
+        :param bot: BasicBot children are placed through; the scheduler registers as one of its order listeners
+        :param wheel: TimerWheel (default: a new one; call start() to drive it from a thread)
+        :param price_source: Callable symbol -> current price for arrival prices (default: bot.mid_price)
+        :param threads: Threads placing children (0: place them in the timer thread, e.g. in simulations)
+        :param poll_interval: Seconds between status polls of open children (None: listeners only)
+        """
+        self.bot = bot
+        self.wheel = wheel or TimerWheel()
+        self.price_source = price_source or bot.mid_price
+        self.poll_interval = poll_interval
+        self.parents = {}
+        self._children = {} # client order ID -> child
+        self._lock = threading.RLock()
+        self._pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='execution') if threads else None
+        bot.order_listeners.append(self.on_order_update)
+
+    def start(self):
+        self.wheel.start()
+        return self
+
+    def stop(self):
+        self.wheel.stop()
+        if self._pool:
+            self._pool.shutdown(wait=True)
+        if self.on_order_update in self.bot.order_listeners:
+            self.bot.order_listeners.remove(self.on_order_update)
+
+    #--- Submitting parents
+
+    def _submit(self, algo, symbol, side, quantity, **settings):
+        symbol, side = symbol.upper(), side.upper()
+        if side not in ('BUY', 'SELL'):
+            raise ValueError(f"Invalid side: {side}")
+        if quantity <= 0:
+            raise ValueError("Quantity must be positive")
+        parent = dict(settings, id=secrets.token_hex(4), algo=algo, symbol=symbol, side=side, quantity=float(quantity),
+                      status=WORKING, started=self.wheel.clock(), finished=None, arrival_price=self.price_source(symbol),
+                      children=[], filled=0.0, notional=0.0, slice=0, timer=None, error=None)
+        with self._lock:
+            self.parents[parent['id']] = parent
+            self._next_slice(parent)
+        logger.info(f"{algo} {parent['id']}: {side} {quantity} {symbol}, arrival price {parent['arrival_price']}")
+        return parent['id']
+
+    def submit_twap(self, symbol, side, quantity, duration, slices):
+        """
+        Works `quantity` as `slices` MARKET children, one every duration / slices seconds (the first immediately).
+        :return: Parent ID
+        """
+        return self._submit(TWAP, symbol, side, quantity, duration=duration, slices=int(slices),
+                            weights=[1.0 / slices] * int(slices))
+
+    def submit_vwap(self, symbol, side, quantity, duration, profile):
+        """
+        Works `quantity` as MARKET children sized by `profile`, one per profile entry over `duration` seconds.
+        :param profile: Relative volume per slice, e.g. volume_profile(history, start_time, duration, slices)
+        :return: Parent ID
+        """
+        weights = np.asarray(profile, dtype=float)
+        if len(weights) == 0 or weights.sum() <= 0:
+            raise ValueError("Volume profile must have positive weights")
+        return self._submit(VWAP, symbol, side, quantity, duration=duration, slices=len(weights),
+                            weights=(weights / weights.sum()).tolist())
+
+    def submit_iceberg(self, symbol, side, quantity, price, display_quantity, variance=0.0):
+        """
+        Shows at most `display_quantity` at a time as a LIMIT order at `price`; posts the next slice when one fills.
+        :param variance: Random +/- fraction applied to each slice so the display size is less recognisable
+        :return: Parent ID
+        """
+        if display_quantity <= 0:
+            raise ValueError("Display quantity must be positive")
+        return self._submit(ICEBERG, symbol, side, quantity, price=price, display_quantity=float(display_quantity),
+                            variance=variance)
+
+    def cancel(self, parent_id):
+        """Stops a parent and cancels its open children. :return: False if the parent is not working"""
+        with self._lock:
+            parent = self.parents.get(parent_id)
+            if parent is None or parent['status'] != WORKING:
+                return False
+            self._finish(parent, CANCELED)
+            open_children = [child for child in parent['children'] if child['order_id'] and not child['done']]
+        for child in open_children:
+            self._dispatch(self.bot.cancel_order, parent['symbol'], child['order_id'])
+        return True
+
+    #--- Slicing (called with the lock held)
+
+    def _open_quantity(self, parent):
+        return sum(child['quantity'] - child['executed'] for child in parent['children'] if not child['done'])
+
+    def _remaining(self, parent):
+        return parent['quantity'] - parent['filled'] - self._open_quantity(parent)
+
+    def _next_slice(self, parent):
+        if parent['status'] != WORKING:
+            return
+        if parent['algo'] == ICEBERG:
+            if self._open_quantity(parent) <= 0:
+                quantity = parent['display_quantity']
+                if parent['variance']:
+                    quantity *= 1 + parent['variance'] * (2 * np.random.random() - 1)
+                self._send_child(parent, min(quantity, self._remaining(parent)))
+            return
+
+        index = parent['slice']
+        slices = parent['slices']
+        final = index == slices - 1
+        # This slice's share of what is still owed, so shortfalls from earlier slices are caught up
+        share = 1.0 if final else parent['weights'][index] / sum(parent['weights'][index:])
+        self._send_child(parent, self._remaining(parent) * share)
+        parent['slice'] += 1
+        if not final:
+            parent['timer'] = self.wheel.schedule(parent['duration'] / slices, self._on_timer, parent['id'])
+
+    def _on_timer(self, parent_id):
+        with self._lock:
+            parent = self.parents.get(parent_id)
+            if parent:
+                parent['timer'] = None
+                self._next_slice(parent)
+
+    def _send_child(self, parent, quantity):
+        filters = self.bot.filters.get(parent['symbol'])
+        market = parent['algo'] != ICEBERG
+        if filters is not None:
+            # round() first: float residue in the remaining quantity must not cost a whole step
+            quantity = float(filters.round_quantity(round(quantity, 9), market=market))
+        if quantity <= 0:
+            # Nothing left that the exchange would accept (or a slice below one step): skip it
+            self._check_done(parent)
+            return
+        child = {'client_order_id': f"ex-{parent['id']}-{len(parent['children']) + 1}", 'quantity': quantity,
+                 'order_id': None, 'executed': 0.0, 'avg_price': 0.0, 'done': False}
+        parent['children'].append(child)
+        self._children[child['client_order_id']] = (parent, child)
+        self._dispatch(self._place_child, parent, child)
+
+    def _dispatch(self, function, *args):
+        if self._pool:
+            self._pool.submit(function, *args)
+        else:
+            function(*args)
+
+    #--- Child orders (outside the lock)
+
+    def _place_child(self, parent, child):
+        symbol, side, cid = parent['symbol'], parent['side'], child['client_order_id']
+        if parent['algo'] == ICEBERG:
+            order = self.bot.place_limit_order(symbol, side, child['quantity'], parent['price'], client_order_id=cid)
+        else:
+            order = self.bot.place_market_order(symbol, side, child['quantity'], client_order_id=cid)
+        if order is None:
+            with self._lock:
+                child['done'] = True
+                parent['error'] = self.bot.last_error() or 'Child order failed'
+                logger.warning(f"{parent['algo']} {parent['id']}: child {cid} failed: {parent['error']}")
+                if parent['algo'] == ICEBERG:
+                    self._finish(parent, FAILED)
+                else:
+                    self._check_done(parent)
+            return
+        self.on_order_update(order)
+        if self.poll_interval and not child['done']:
+            self.wheel.schedule(self.poll_interval, self._poll, parent, child)
+
+    def _poll(self, parent, child):
+        if child['done'] or child['order_id'] is None:
+            return
+        # The status response reaches on_order_update through the bot's order listeners
+        self._dispatch(self.bot.get_order_status, parent['symbol'], child['order_id'])
+        self.wheel.schedule(self.poll_interval, self._poll, parent, child)
+
+    def on_order_update(self, order):
+        """Order response or update (futures_get_order shape); orders that are not children are ignored."""
+        entry = self._children.get(order.get('clientOrderId'))
+        if entry is None:
+            return
+        parent, child = entry
+        executed = float(order.get('executedQty') or 0)
+        if order.get('status') == 'FILLED':
+            executed = max(executed, float(order.get('origQty') or child['quantity']))
+        with self._lock:
+            if order.get('orderId') is not None:
+                child['order_id'] = order['orderId']
+            if executed > child['executed']:
+                # Updates carry cumulative quantity and average price: apply only the increment
+                avg_price = float(order.get('avgPrice') or 0) or float(order.get('price') or 0)
+                parent['notional'] += executed * avg_price - child['executed'] * child['avg_price']
+                parent['filled'] += executed - child['executed']
+                child['executed'], child['avg_price'] = executed, avg_price
+            if order.get('status') in CHILD_TERMINAL and not child['done']:
+                child['done'] = True
+                self._children.pop(child['client_order_id'], None)
+                if parent['algo'] == ICEBERG:
+                    if order['status'] == 'FILLED':
+                        self._next_slice(parent)
+                    self._check_done(parent, final=order['status'] != 'FILLED')
+                else:
+                    self._check_done(parent)
+
+    def _check_done(self, parent, final=False):
+        """Finishes the parent once nothing is open and it is filled, or no more children will follow."""
+        if parent['status'] != WORKING or self._open_quantity(parent) > 0:
+            return
+        filters = self.bot.filters.get(parent['symbol'])
+        step = float(filters.step_size) if filters is not None else 0.0
+        schedule_done = parent['algo'] != ICEBERG and parent['slice'] >= parent['slices']
+        if parent['quantity'] - parent['filled'] < max(step, 1e-12) or final or schedule_done:
+            self._finish(parent, DONE)
+
+    def _finish(self, parent, status):
+        parent['status'] = status
+        parent['finished'] = self.wheel.clock()
+        if parent['timer']:
+            parent['timer'].cancel()
+            parent['timer'] = None
+        report = self.report(parent['id'])
+        logger.info(f"{parent['algo']} {parent['id']} {status}: filled {report['filled']} of {report['quantity']} "
+                    f"at {report['avg_price']}, slippage {report['slippage_bps']} bps vs arrival")
+
+    #--- Reporting
+
+    def report(self, parent_id):
+        """
+        :return: Dict with status, filled quantity, average fill price, arrival price and
+                 arrival-price slippage in bps (positive = paid more than arrival for a BUY / got less for a SELL)
+        """
+        with self._lock:
+            parent = self.parents[parent_id]
+            avg_price = parent['notional'] / parent['filled'] if parent['filled'] else None
+            arrival = parent['arrival_price']
+            slippage = None
+            if avg_price and arrival:
+                sign = 1 if parent['side'] == 'BUY' else -1
+                slippage = round(sign * (avg_price - arrival) / arrival * 10000.0, 2)
+            return {
+                'id': parent_id, 'algo': parent['algo'], 'symbol': parent['symbol'], 'side': parent['side'],
+                'status': parent['status'], 'quantity': parent['quantity'], 'filled': round(parent['filled'], 8),
+                'avg_price': round(avg_price, 8) if avg_price else None, 'arrival_price': arrival,
+                'slippage_bps': slippage, 'children': len(parent['children']),
+                'seconds': round((parent['finished'] or self.wheel.clock()) - parent['started'], 3),
+                'error': parent['error'],
+            }
+
+    def stats(self):
+        with self._lock:
+            statuses = {}
+            for parent in self.parents.values():
+                statuses[parent['status']] = statuses.get(parent['status'], 0) + 1
+            return {'parents': statuses, 'open_children': len(self._children), 'timers': self.wheel.pending}
+
+
+#--- Simulation
+
+def simulate(klines, submit, impact=0.002, symbol='BTCUSDT', start=0, bars=None):
+    """
+    Runs parents against backtest.SimulatedExchange, advancing the wheel with the bar clock.
+    :param submit: Callable(scheduler, exchange) submitting parents; returns their IDs
+    :param impact: Square-root market impact coefficient of the simulated exchange
+    :return: (scheduler, exchange, parent IDs)
+    """
+    from backtest import SimulatedExchange, _Unthrottled
+    from exchange_info import SymbolFilterIndex
+    from trading_bot import BasicBot
+
+    exchange = SimulatedExchange(klines, symbol=symbol, balance=1e12, slippage_bps=0.0, impact=impact)
+    exchange.set_time(start)
+    bot = BasicBot('sim', 'sim', client=exchange, scheduler=_Unthrottled())
+    bot.filters = SymbolFilterIndex(exchange.futures_exchange_info, cache_path=None)
+    clock = lambda: exchange.open_time[exchange.now] / 1000.0
+    scheduler = ExecutionScheduler(bot, wheel=TimerWheel(tick=1.0, clock=clock),
+                                   price_source=lambda s: float(exchange.open[exchange.now]), threads=0, poll_interval=None)
+    exchange.listeners.append(scheduler.on_order_update)
+    parent_ids = submit(scheduler, exchange)
+    end = len(exchange.open) if bars is None else min(len(exchange.open), start + bars)
+    for index in range(start + 1, end):
+        exchange.set_time(index)
+        scheduler.wheel.advance(clock())
+        if all(scheduler.parents[p]['status'] != WORKING for p in parent_ids):
+            break
+    return scheduler, exchange, parent_ids
+
+
+if __name__ == "__main__":
+    # Simulated executions: python execution_algos.py [parents for the scale test]
+    from backtest import synthetic_klines
+
+    for name in ('trading_bot', 'exchange_info', __name__): # One log line per simulated call is noise here
+        logging.getLogger(name).setLevel(logging.WARNING)
+    parents = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    # Three days of 1m bars with a U-shaped intraday volume curve (busy at the start and end of the day)
+    days = 3
+    klines = synthetic_klines(days * 1440, volatility=0.0005, seed=11)
+    minute_of_day = (klines['open_time'] // 60_000) % 1440
+    klines['volume'] = klines['volume'] * (0.3 + 2.0 * np.cos(np.pi * minute_of_day / 1440) ** 2)
+    start = 2 * 1440 + 1380 # 23:00 on day 3: volume rises towards the end of the day
+    duration, slices, quantity = 3600, 30, 40.0
+    profile = volume_profile({'open_time': klines['open_time'][:start], 'volume': klines['volume'][:start]},
+                             int(klines['open_time'][start]), duration, slices)
+
+    print(f"Parent: BUY {quantity} BTCUSDT, sqrt impact 0.002, 1m bars (mean volume {klines['volume'].mean():.0f}/bar)")
+    algos = {
+        'Single market order': lambda s, e: [s.submit_twap('BTCUSDT', 'BUY', quantity, duration=60, slices=1)],
+        f'TWAP {slices} slices/1h': lambda s, e: [s.submit_twap('BTCUSDT', 'BUY', quantity, duration, slices)],
+        f'VWAP {slices} slices/1h': lambda s, e: [s.submit_vwap('BTCUSDT', 'BUY', quantity, duration, profile)],
+        'Iceberg 2 @ arrival+5bps': lambda s, e: [s.submit_iceberg('BTCUSDT', 'BUY', quantity, e.open[e.now] * 1.0005, 2.0)],
+    }
+    for name, submit in algos.items():
+        scheduler, exchange, (parent_id,) = simulate(klines, submit, start=start, bars=duration // 60 + 120)
+        report = scheduler.report(parent_id)
+        print(f"  {name:26s} {report['status']:8s} filled {report['filled']:6.3f} in {report['children']:3d} children, "
+              f"avg {report['avg_price']:.2f} vs arrival {report['arrival_price']:.2f}: {report['slippage_bps']:+7.2f} bps")
+
+    # Scale: thousands of concurrent TWAP/VWAP parents on one wheel
+    rng = np.random.default_rng(5)
+    def submit_many(scheduler, exchange):
+        ids = []
+        for n in range(parents):
+            side = 'BUY' if n % 2 else 'SELL'
+            size = float(np.round(rng.uniform(0.1, 2.0), 3))
+            length = int(rng.integers(10, 120)) * 60
+            count = int(rng.integers(5, 30))
+            if n % 3:
+                ids.append(scheduler.submit_twap('BTCUSDT', side, size, length, count))
+            else:
+                ids.append(scheduler.submit_vwap('BTCUSDT', side, size, length,
+                                                 volume_profile(klines, int(exchange.open_time[exchange.now]), length, count)))
+        return ids
+    started = time.perf_counter()
+    scheduler, exchange, ids = simulate(klines, submit_many, impact=0.0005, start=1440, bars=240)
+    elapsed = time.perf_counter() - started
+    reports = [scheduler.report(p) for p in ids]
+    children = sum(r['children'] for r in reports)
+    slippage = np.array([r['slippage_bps'] for r in reports if r['slippage_bps'] is not None])
+    print(f"{parents} concurrent parents: {children:,} children in {elapsed:.1f}s ({children / elapsed:,.0f} children/s "
+          f"through BasicBot), {scheduler.stats()['parents']}, arrival slippage mean {slippage.mean():+.2f} bps, "
+          f"p95 {np.percentile(slippage, 95):+.2f} bps")
+
+    wheel = TimerWheel(tick=0.001, clock=lambda: 0.0)
+    count = 200_000
+    delays = np.random.default_rng(1).uniform(0, 60, count)
+    started = time.perf_counter()
+    for delay in delays:
+        wheel.schedule(delay, int)
+    scheduled = time.perf_counter() - started
+    fired = sum(wheel.advance(t) for t in np.arange(0.1, 60.2, 0.1))
+    total = time.perf_counter() - started
+    print(f"Timer wheel: {count:,} timers scheduled in {scheduled * 1e3:.0f} ms ({scheduled / count * 1e9:.0f} ns each), "
+          f"{fired:,} fired, {total / count * 1e9:.0f} ns per timer end to end")
@@ -0,0 +1,206 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import tempfile
+import time
+
+#--- Logging configuration for the bot
+# Two modes:
+#   * 'sync'  - handlers run in the calling thread (the original behaviour)
+#   * 'queue' - the calling thread only enqueues the LogRecord; a QueueListener thread formats it
+#               and does the file/console I/O, keeping disk and terminal latency off the order path
+# Messages use %-style args so they are only rendered if (and where) a handler formats them.
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+DEFAULT_LOG_FILE = 'trading_bot.log'
+
+# Log a full response body for 1 in N records at each level; others keep only a short summary.
+# The defaults keep every body (the original behaviour); raise INFO to e.g. 100 under load.
+DEFAULT_BODY_SAMPLE_EVERY = {logging.DEBUG: 1, logging.INFO: 1, logging.WARNING: 1, logging.ERROR: 1}
+
+# Response fields kept when a body is not sampled
+SUMMARY_FIELDS = ('symbol', 'orderId', 'status', 'type', 'side', 'code', 'msg')
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message and any structured extras."""
+
+    EXTRA_FIELDS = ('event', 'endpoint', 'params', 'response', 'span')
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for field in self.EXTRA_FIELDS:
+            if hasattr(record, field):
+                entry[field] = getattr(record, field)
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class ResponseSamplingFilter(logging.Filter):
+    """
+    Replaces full response bodies with a summary on all but 1 in N records per level.
+    Applies to records logged with extra={'response': body} and the body as the first arg.
+    The decision is made once per record and marked on it, so when the filter is attached to
+    several handlers they all log the same records in full.
+    """
+
+    def __init__(self, sample_every=None):
+        super().__init__()
+        self.sample_every = dict(DEFAULT_BODY_SAMPLE_EVERY)
+        self.sample_every.update(sample_every or {})
+        self._counters = {}
+
+    def filter(self, record):
+        if not hasattr(record, 'response') or getattr(record, 'body_sampled', False):
+            return True
+        record.body_sampled = True
+        every = self.sample_every.get(record.levelno, 1)
+        count = self._counters.get(record.levelno, 0)
+        self._counters[record.levelno] = count + 1
+        if every <= 1 or count % every == 0:
+            return True
+
+        body = record.response
+        if isinstance(body, dict):
+            summary = {k: body[k] for k in SUMMARY_FIELDS if k in body}
+        elif isinstance(body, list):
+            summary = f"<{len(body)} items>"
+        else:
+            summary = body
+        record.response = summary
+        # logging unwraps a lone dict argument into record.args itself
+        rest = () if isinstance(record.args, dict) else tuple(record.args[1:])
+        record.args = (summary,) + rest
+        return True
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    # The stock QueueHandler.prepare() renders the message in the caller's thread; skipping it keeps
+    # formatting on the listener thread. Safe because logged params/responses are not mutated later.
+    def prepare(self, record):
+        return record
+
+
+def configure_logging(mode=None, log_file=DEFAULT_LOG_FILE, level=logging.INFO, json_format=False,
+                      max_bytes=10 * 1024 * 1024, backup_count=5, rotate_when=None, body_sample_every=None,
+                      console=True, console_stream=None):
+    """
+    Configures the root logger for the bot.
+    :param mode: 'sync' or 'queue' (defaults to the BOT_LOG_MODE environment variable, then 'sync')
+    :param log_file: Log file path (None disables file logging)
+    :param json_format: Emit structured JSON lines instead of the plain text format
+    :param max_bytes: Size-based rotation threshold (ignored when rotate_when is set)
+    :param backup_count: Number of rotated files to keep
+    :param rotate_when: Time-based rotation interval for TimedRotatingFileHandler (e.g. 'midnight')
+    :param body_sample_every: {level: N} overrides for ResponseSamplingFilter
+    :param console_stream: Stream for console output (defaults to sys.stderr)
+    :return: The QueueListener in 'queue' mode (already started), otherwise None
+    """
+    global _listener
+    mode = mode or os.environ.get('BOT_LOG_MODE', 'sync')
+    formatter = JsonFormatter() if json_format else logging.Formatter(LOG_FORMAT)
+
+    handlers = []
+    if log_file:
+        if rotate_when:
+            file_handler = logging.handlers.TimedRotatingFileHandler(log_file, when=rotate_when, backupCount=backup_count)
+        else:
+            file_handler = logging.handlers.RotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backup_count)
+        handlers.append(file_handler)
+    if console:
+        handlers.append(logging.StreamHandler(console_stream))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    shutdown_logging()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+    root.setLevel(level)
+
+    sampling = ResponseSamplingFilter(body_sample_every)
+    if mode == 'queue':
+        queue_handler = _DeferredQueueHandler(queue.SimpleQueue())
+        queue_handler.addFilter(sampling)
+        root.addHandler(queue_handler)
+        _listener = logging.handlers.QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        return _listener
+
+    for handler in handlers:
+        handler.addFilter(sampling)
+        root.addHandler(handler)
+    return None
+
+
+def shutdown_logging():
+    """Flushes and stops the queue listener (if any)."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+# Drain queued records on interpreter exit so the last log lines are not lost
+atexit.register(shutdown_logging)
+
+
+#--- Microbenchmark: caller-side cost of logging one request + response
+
+_SAMPLE_RESPONSE = {
+    'orderId': 4061234567, 'symbol': 'BTCUSDT', 'status': 'NEW', 'clientOrderId': 'x-Cb7ytekJ8b4f3471fd5e035f905de5',
+    'price': '20000', 'avgPrice': '0.00', 'origQty': '0.010', 'executedQty': '0', 'cumQty': '0', 'cumQuote': '0',
+    'timeInForce': 'GTC', 'type': 'LIMIT', 'reduceOnly': False, 'closePosition': False, 'side': 'BUY',
+    'positionSide': 'BOTH', 'stopPrice': '0', 'workingType': 'CONTRACT_PRICE', 'priceProtect': False,
+    'origType': 'LIMIT', 'updateTime': 1700000000000,
+}
+
+
+def _time_calls(log, calls):
+    params = {'symbol': 'BTCUSDT', 'side': 'BUY', 'type': 'LIMIT', 'quantity': 0.01, 'price': 20000, 'timeInForce': 'GTC'}
+    start = time.perf_counter()
+    for _ in range(calls):
+        log(params, _SAMPLE_RESPONSE)
+    return (time.perf_counter() - start) / calls
+
+
+if __name__ == "__main__":
+    calls = 20000
+    bench_logger = logging.getLogger('bench')
+
+    def original(params, response):
+        # What BasicBot did before: eager f-strings, handlers in the calling thread
+        bench_logger.info(f"Request: futures_create_order (LIMIT) with params: {params}")
+        bench_logger.info(f"Response: {response}")
+
+    def pipeline(params, response):
+        bench_logger.info("Request: %s with params: %s", 'futures_create_order (LIMIT)', params,
+                          extra={'event': 'request', 'params': params})
+        bench_logger.info("Response: %s", response, extra={'event': 'response', 'response': response})
+
+    with tempfile.TemporaryDirectory() as tmp, open(os.devnull, 'w') as devnull:
+        results = []
+        for label, mode, log, sample in (('original (sync, f-string)', 'sync', original, None),
+                                          ('queue pipeline', 'queue', pipeline, None),
+                                          ('queue pipeline, 1/100 INFO bodies', 'queue', pipeline, {logging.INFO: 100})):
+            # Console output goes to /dev/null so the terminal doesn't dominate the measurement
+            configure_logging(mode=mode, log_file=os.path.join(tmp, f'{mode}.log'), body_sample_every=sample,
+                              console_stream=devnull)
+            results.append((label, _time_calls(log, calls)))
+            shutdown_logging()
+        configure_logging(mode='sync', log_file=None, console=False)
+
+    for label, per_call in results:
+        print(f"{label:36s} {per_call * 1e6:8.1f} us per request+response log")
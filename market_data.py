@@ -0,0 +1,292 @@
+import logging
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+#--- Columnar on-disk market data store
+# Layout: <root>/<SYMBOL>/<dataset>/<column>.bin, one raw little-endian array per column.
+# Files are append-only and every dataset is sorted by its time column, so:
+#   * appends are plain writes at the end of each column file
+#   * reads memory-map the files and return zero-copy NumPy views
+#   * range queries are a binary search (np.searchsorted) on the mapped time column, touching
+#     only the pages they actually read
+# Datasets: 'klines_<interval>' (e.g. klines_1m) and 'aggTrades'. Each also has a unique key that only
+# ever increases (open_time for klines, agg_id for trades, where many trades share a millisecond):
+# appends resume after the stored key, so rows a download sees twice are skipped rather than stored again.
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ROOT = 'market_data'
+
+KLINE_SCHEMA = (
+    ('open_time', '<i8'), ('open', '<f8'), ('high', '<f8'), ('low', '<f8'), ('close', '<f8'),
+    ('volume', '<f8'), ('close_time', '<i8'), ('quote_volume', '<f8'), ('trades', '<i8'),
+    ('taker_buy_volume', '<f8'), ('taker_buy_quote_volume', '<f8'),
+)
+AGG_TRADE_SCHEMA = (
+    ('time', '<i8'), ('agg_id', '<i8'), ('price', '<f8'), ('quantity', '<f8'),
+    ('first_id', '<i8'), ('last_id', '<i8'), ('is_buyer_maker', '|u1'),
+)
+
+# Unique, strictly increasing key column per dataset kind (defaults to the time column)
+DATASET_KEYS = {'aggTrades': 'agg_id'}
+
+KLINE_LIMIT = 1500 # max rows per futures_klines request
+AGG_TRADE_LIMIT = 1000 # max rows per futures_aggregate_trades request
+
+
+def schema_for(dataset):
+    """:return: ((column, dtype), ...) for a dataset; the first column is the time index"""
+    if dataset.startswith('klines_'):
+        return KLINE_SCHEMA
+    if dataset == 'aggTrades':
+        return AGG_TRADE_SCHEMA
+    raise ValueError(f"Unknown dataset: {dataset}")
+
+
+def key_for(dataset):
+    """:return: The dataset's unique, strictly increasing key column"""
+    return DATASET_KEYS.get(dataset) or schema_for(dataset)[0][0]
+
+
+class ColumnStore:
+    def __init__(self, root=DEFAULT_ROOT):
+        self.root = root
+        self._maps = {} # path -> memmap over the first N rows, reused while N is unchanged
+
+    def _dir(self, symbol, dataset):
+        return os.path.join(self.root, symbol.upper(), dataset)
+
+    def _path(self, symbol, dataset, column):
+        return os.path.join(self._dir(symbol, dataset), f"{column}.bin")
+
+    def count(self, symbol, dataset):
+        """:return: Number of complete rows (a torn append leaves columns of different lengths)"""
+        counts = []
+        for column, dtype in schema_for(dataset):
+            path = self._path(symbol, dataset, column)
+            counts.append(os.path.getsize(path) // np.dtype(dtype).itemsize if os.path.exists(path) else 0)
+        return min(counts)
+
+    def _repair(self, symbol, dataset):
+        """Truncates every column to the shortest one, dropping a partially written last row."""
+        rows = self.count(symbol, dataset)
+        for column, dtype in schema_for(dataset):
+            path = self._path(symbol, dataset, column)
+            size = rows * np.dtype(dtype).itemsize
+            if os.path.exists(path) and os.path.getsize(path) != size:
+                logger.warning(f"Truncating {path} to {rows} rows after an incomplete append")
+                os.truncate(path, size)
+        return rows
+
+    def _last(self, symbol, dataset, column):
+        rows = self.count(symbol, dataset)
+        if not rows:
+            return None
+        dtype = dict(schema_for(dataset))[column]
+        return int(np.memmap(self._path(symbol, dataset, column), dtype=dtype, mode='r')[rows - 1])
+
+    def last_time(self, symbol, dataset):
+        """:return: Time index value of the last stored row, or None if the dataset is empty"""
+        return self._last(symbol, dataset, schema_for(dataset)[0][0])
+
+    def last_key(self, symbol, dataset):
+        """:return: Key (see key_for) of the last stored row, or None if the dataset is empty"""
+        return self._last(symbol, dataset, key_for(dataset))
+
+    def append(self, symbol, dataset, columns):
+        """
+        Appends rows to a dataset. Leading rows whose key is not after the stored tail's (already
+        stored, e.g. by an overlapping download) are skipped.
+        :param columns: {column: array}, all schema columns with equal lengths; keys must be strictly
+                        ascending and times ascending, starting no earlier than the last stored row
+        :return: Number of rows written
+        """
+        schema = schema_for(dataset)
+        time_column, key_column = schema[0][0], key_for(dataset)
+        times = np.asarray(columns[time_column])
+        keys = np.asarray(columns[key_column])
+        if not len(times):
+            return 0
+        for column, values in ((column, columns[column]) for column, _ in schema):
+            if len(values) != len(times):
+                raise ValueError(f"Column {column} has {len(values)} rows, expected {len(times)}")
+        if np.any(np.diff(times) < 0):
+            raise ValueError(f"{dataset} rows must be sorted by {time_column}")
+        if np.any(np.diff(keys) <= 0):
+            raise ValueError(f"{dataset} rows must have strictly ascending {key_column}")
+
+        os.makedirs(self._dir(symbol, dataset), exist_ok=True)
+        self._repair(symbol, dataset)
+        last_key = self.last_key(symbol, dataset)
+        skip = int(np.searchsorted(keys, last_key, side='right')) if last_key is not None else 0
+        if skip == len(times):
+            return 0
+        last = self.last_time(symbol, dataset)
+        if last is not None and times[skip] < last:
+            raise ValueError(f"{dataset} append starts at {times[skip]}, before the stored tail ({last})")
+
+        for column, dtype in schema:
+            values = np.ascontiguousarray(columns[column][skip:], dtype=dtype)
+            with open(self._path(symbol, dataset, column), 'ab') as f:
+                f.write(values.tobytes())
+        return len(times) - skip
+
+    def read(self, symbol, dataset, start=None, end=None, columns=None):
+        """
+        Range query over the time index (start inclusive, end exclusive, milliseconds).
+        :param columns: Column names to return (default: all)
+        :return: {column: read-only NumPy view into the memory-mapped file}
+        """
+        schema = dict(schema_for(dataset))
+        time_column = schema_for(dataset)[0][0]
+        columns = columns or list(schema)
+        rows = self.count(symbol, dataset)
+        if not rows:
+            return {column: np.empty(0, dtype=schema[column]) for column in columns}
+
+        def mapped(column):
+            path = self._path(symbol, dataset, column)
+            array = self._maps.get(path)
+            if array is None or len(array) != rows:
+                array = self._maps[path] = np.memmap(path, dtype=schema[column], mode='r', shape=(rows,))
+            return array
+
+        first, last = 0, rows
+        if start is not None or end is not None:
+            times = mapped(time_column)
+            if start is not None:
+                first = int(np.searchsorted(times, start, side='left'))
+            if end is not None:
+                last = int(np.searchsorted(times, end, side='left'))
+        return {column: mapped(column)[first:last] for column in columns}
+
+
+class MarketDataDownloader:
+    """Fills a ColumnStore from the REST API, fetching only what is missing after the stored tail."""
+
+    def __init__(self, bot, store):
+        """:param bot: BasicBot whose rate-limited _call is used for the requests"""
+        self.bot = bot
+        self.store = store
+
+    def update_klines(self, symbol, interval='1m', start_time=None):
+        """
+        Downloads closed candles from after the last stored one (or from start_time) up to now.
+        :param start_time: Milliseconds; only used when the dataset is empty
+        :return: Number of candles appended
+        """
+        symbol = symbol.upper()
+        dataset = f"klines_{interval}"
+        last = self.store.last_time(symbol, dataset)
+        if last is None and start_time is None:
+            raise ValueError(f"No stored {dataset} for {symbol}: pass start_time for the first download")
+        next_time = last + 1 if last is not None else start_time
+
+        written = 0
+        while True:
+            rows = self.bot._call('futures_klines', symbol=symbol, interval=interval, startTime=next_time, limit=KLINE_LIMIT)
+            now = int(time.time() * 1000)
+            rows = [row for row in rows if row[6] < now] # The still-open candle is fetched again next time
+            if not rows:
+                break
+            table = np.array([row[:len(KLINE_SCHEMA)] for row in rows], dtype=object)
+            written += self.store.append(symbol, dataset, {column: table[:, i].astype(float).astype(dtype)
+                                                           for i, (column, dtype) in enumerate(KLINE_SCHEMA)})
+            next_time = int(rows[-1][0]) + 1
+            if len(rows) < KLINE_LIMIT:
+                break
+        logger.info(f"Stored {written} new {interval} klines for {symbol}")
+        return written
+
+    def update_agg_trades(self, symbol, start_time=None):
+        """
+        Downloads aggregate trades after the last stored trade id (or from start_time) up to now.
+        :param start_time: Milliseconds; only used when the dataset is empty
+        :return: Number of trades appended
+        """
+        symbol = symbol.upper()
+        last_id = self.store.last_key(symbol, 'aggTrades')
+        if last_id is not None:
+            params = {'fromId': last_id + 1}
+        elif start_time is not None:
+            params = {'startTime': start_time}
+        else:
+            raise ValueError(f"No stored aggTrades for {symbol}: pass start_time for the first download")
+
+        written = 0
+        while True:
+            trades = self.bot._call('futures_aggregate_trades', symbol=symbol, limit=AGG_TRADE_LIMIT, **params)
+            if not trades:
+                break
+            written += self.store.append(symbol, 'aggTrades', {
+                'time': np.array([t['T'] for t in trades], dtype='<i8'),
+                'agg_id': np.array([t['a'] for t in trades], dtype='<i8'),
+                'price': np.array([t['p'] for t in trades], dtype=float),
+                'quantity': np.array([t['q'] for t in trades], dtype=float),
+                'first_id': np.array([t['f'] for t in trades], dtype='<i8'),
+                'last_id': np.array([t['l'] for t in trades], dtype='<i8'),
+                'is_buyer_maker': np.array([t['m'] for t in trades], dtype='|u1'),
+            })
+            params = {'fromId': trades[-1]['a'] + 1}
+            if len(trades) < AGG_TRADE_LIMIT:
+                break
+        logger.info(f"Stored {written} new aggregate trades for {symbol}")
+        return written
+
+
+#--- Downloader / range-scan benchmark
+# python market_data.py download BTCUSDT [interval] [days]  - incremental kline download into ./market_data
+# python market_data.py [rows]                             - range-scan benchmark on synthetic klines
+
+def _download(symbol, interval, days):
+    from trading_bot import BasicBot
+    api_key = os.environ.get('BINANCE_TEST_API_KEY')
+    api_secret = os.environ.get('BINANCE_TEST_API_SECRET')
+    if not api_key or not api_secret:
+        print("BINANCE_TEST_API_KEY and BINANCE_TEST_API_SECRET must be set. Exiting.")
+        return
+    bot = BasicBot(api_key, api_secret, testnet=True, base_url=os.environ.get('BINANCE_FUTURES_BASE_URL'))
+    store = ColumnStore()
+    start_time = int((time.time() - days * 86400) * 1000)
+    written = MarketDataDownloader(bot, store).update_klines(symbol, interval, start_time=start_time)
+    print(f"{written} new {interval} klines; {store.count(symbol, f'klines_{interval}')} stored for {symbol.upper()}")
+
+
+if __name__ == "__main__" and len(sys.argv) > 2 and sys.argv[1] == 'download':
+    _download(sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else '1m', float(sys.argv[4]) if len(sys.argv) > 4 else 30)
+
+elif __name__ == "__main__":
+    from backtest import synthetic_klines
+
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000
+    scans = 200
+    with tempfile.TemporaryDirectory() as root:
+        store = ColumnStore(root)
+        klines = synthetic_klines(rows)
+        klines.update({'close_time': klines['open_time'] + 59999, 'quote_volume': klines['volume'] * klines['close'],
+                       'trades': np.full(rows, 100), 'taker_buy_volume': klines['volume'] / 2,
+                       'taker_buy_quote_volume': klines['volume'] * klines['close'] / 2})
+        started = time.perf_counter()
+        for offset in range(0, rows, 1_000_000): # Appended in chunks, like incremental downloads
+            store.append('BTCUSDT', 'klines_1m', {column: values[offset:offset + 1_000_000] for column, values in klines.items()})
+        write_elapsed = time.perf_counter() - started
+        print(f"Appended {rows:,} klines in {write_elapsed:.2f}s ({rows / write_elapsed:,.0f} rows/s)")
+
+        times = klines['open_time']
+        rng = np.random.default_rng(1)
+        for window in [w for w in (1_000, 100_000) if w < rows // 2] + [rows // 2]:
+            starts = rng.integers(0, rows - window, scans)
+            scanned = 0
+            started = time.perf_counter()
+            for first in starts:
+                view = store.read('BTCUSDT', 'klines_1m', start=times[first], end=times[first + window], columns=['close', 'volume'])
+                float(np.dot(view['close'], view['volume'])) # VWAP numerator: touches every row of both columns
+                scanned += len(view['close'])
+            elapsed = time.perf_counter() - started
+            mb = scanned * 16 / 1e6
+            print(f"  {window:>10,}-row ranges: {scans / elapsed:9,.0f} queries/s, {scanned / elapsed:13,.0f} rows/s, "
+                  f"{mb / elapsed:8,.0f} MB/s")
@@ -0,0 +1,379 @@
+import itertools
+import logging
+import threading
+import time
+from bisect import bisect_left
+
+from binance.exceptions import BinanceAPIException, BinanceOrderException
+
+#--- Latency instrumentation for BasicBot REST calls
+# Every BasicBot._call is recorded per endpoint:
+#   * rtt            - HTTP round trip as measured by requests (send -> response headers)
+#   * serialization  - the rest of the call (signing, encoding, reading and decoding the body)
+#   * exchange_offset - exchange timestamp in the response (updateTime/transactTime) minus our send
+#                       time: one-way latency plus clock offset, useful to spot drift
+# plus error counters by exception type and in-flight gauges. render_prometheus() produces the
+# text exposition format served on /metrics; summary() / format_summary() are for the CLI.
+# Optional tracing: set `tracer` to a callable and every call (and every `with metrics.span(...)`)
+# is reported as a span dict with its parent span, e.g. tracer=log_span.
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SERIALIZATION_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05)
+OFFSET_BUCKETS = (-1.0, -0.5, -0.1, -0.05, -0.01, 0.0, 0.01, 0.05, 0.1, 0.5, 1.0)
+
+ERROR_TYPES = ((BinanceOrderException, 'BinanceOrderException'), (BinanceAPIException, 'BinanceAPIException'))
+
+# Response fields carrying the exchange's own timestamp (milliseconds)
+EXCHANGE_TIME_FIELDS = ('transactTime', 'updateTime', 'serverTime')
+
+
+def error_type(error):
+    for exception_type, name in ERROR_TYPES:
+        if isinstance(error, exception_type):
+            return name
+    return 'other'
+
+
+class Histogram:
+    """Fixed-bucket histogram (Prometheus semantics: `le` upper bounds plus +Inf). Not locked itself."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Estimates a quantile by linear interpolation inside its bucket (None if empty)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                if index == len(self.buckets):
+                    return self.buckets[-1] # Beyond the last bound: report the bound
+                lower = self.buckets[index - 1] if index else min(0.0, self.buckets[0])
+                upper = self.buckets[index]
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+
+class ResponseCapture:
+    """
+    Per-thread record of the HTTP responses a client receives. Client.response holds whatever
+    response any thread got last, so with threads sharing a bot it can belong to another call; a
+    requests response hook on the client's session runs in the thread that made the request.
+    Clients without a requests session (e.g. backtest.SimulatedExchange) fall back to .response,
+    ignored when it is the object that was there before the call.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self._local = threading.local()
+        session = getattr(client, 'session', None)
+        self.hooked = session is not None and hasattr(session, 'hooks')
+        if self.hooked:
+            session.hooks.setdefault('response', []).append(self._hook)
+
+    def _hook(self, response, *args, **kwargs):
+        self._local.response = response
+
+    def begin(self):
+        """Forgets this thread's last response; call before each client call."""
+        self._local.response = None
+        if not self.hooked:
+            self._local.previous = getattr(self.client, 'response', None)
+
+    def response(self):
+        """:return: The response to this thread's call since begin(), or None if it got none"""
+        if self.hooked:
+            return getattr(self._local, 'response', None)
+        response = getattr(self.client, 'response', None)
+        return None if response is getattr(self._local, 'previous', None) else response
+
+
+class _TrackedCall:
+    """Context manager returned by BotMetrics.track(); set .result inside the block, read .response after it."""
+    __slots__ = ('metrics', 'endpoint', 'capture', 'response', 'started', 'wall_started', 'result', 'span')
+
+    def __init__(self, metrics, endpoint, capture):
+        self.metrics = metrics
+        self.endpoint = endpoint
+        self.capture = capture
+        self.response = None
+        self.result = None
+        self.span = None
+
+    def __enter__(self):
+        self.capture.begin()
+        self.metrics._enter(self)
+        self.wall_started = time.time()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.started
+        # None if the call failed before a response arrived: no round trip to attribute
+        self.response = self.capture.response()
+        self.metrics._exit(self, duration, self.response, exc)
+        return False
+
+
+class BotMetrics:
+    def __init__(self, tracer=None):
+        """:param tracer: Optional callable receiving a span dict for every finished call/span"""
+        self.tracer = tracer
+        self.rtt = {}
+        self.serialization = {}
+        self.exchange_offset = {}
+        self.errors = {} # (endpoint, error_type) -> count
+        self.in_flight = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._span_ids = itertools.count(1)
+
+    def track(self, endpoint, client):
+        """
+        Times one client call:
+            with metrics.track('futures_create_order', client) as call:
+                call.result = client.futures_create_order(**params)
+        :param client: python-binance Client (its responses give the HTTP round trip)
+        """
+        capture = getattr(client, '_response_capture', None)
+        if capture is None:
+            with self._lock:
+                capture = getattr(client, '_response_capture', None)
+                if capture is None:
+                    capture = client._response_capture = ResponseCapture(client)
+        return _TrackedCall(self, endpoint, capture)
+
+    def _enter(self, call):
+        with self._lock:
+            self.in_flight[call.endpoint] = self.in_flight.get(call.endpoint, 0) + 1
+        if self.tracer is not None:
+            call.span = self._open_span(call.endpoint)
+
+    def _exit(self, call, duration, response, error):
+        rtt = serialization = offset = None
+        if response is not None:
+            rtt = response.elapsed.total_seconds()
+            serialization = max(duration - rtt, 0.0)
+        if isinstance(call.result, dict):
+            for field in EXCHANGE_TIME_FIELDS:
+                if field in call.result:
+                    offset = call.result[field] / 1000.0 - call.wall_started
+                    break
+
+        endpoint = call.endpoint
+        with self._lock:
+            self.in_flight[endpoint] -= 1
+            if rtt is not None:
+                self._histogram(self.rtt, endpoint, LATENCY_BUCKETS).observe(rtt)
+                self._histogram(self.serialization, endpoint, SERIALIZATION_BUCKETS).observe(serialization)
+            if offset is not None:
+                self._histogram(self.exchange_offset, endpoint, OFFSET_BUCKETS).observe(offset)
+            if error is not None:
+                key = (endpoint, error_type(error))
+                self.errors[key] = self.errors.get(key, 0) + 1
+
+        if call.span is not None:
+            call.span.update({'rtt': rtt, 'serialization': serialization, 'exchange_offset': offset,
+                              'error': error_type(error) if error is not None else None})
+            self._close_span(call.span)
+
+    @staticmethod
+    def _histogram(histograms, endpoint, buckets):
+        histogram = histograms.get(endpoint)
+        if histogram is None:
+            histogram = histograms[endpoint] = Histogram(buckets)
+        return histogram
+
+    #--- Tracing
+
+    def _open_span(self, name, **attributes):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        span = {'name': name, 'span_id': next(self._span_ids), 'parent_id': stack[-1]['span_id'] if stack else None,
+                'start': time.time(), '_started': time.perf_counter()}
+        span.update(attributes)
+        stack.append(span)
+        return span
+
+    def _close_span(self, span):
+        span['duration'] = time.perf_counter() - span.pop('_started')
+        stack = self._local.stack
+        if stack and stack[-1] is span:
+            stack.pop()
+        try:
+            self.tracer(span)
+        except Exception as e:
+            logger.error(f"Tracer failed for span {span['name']}: {e}")
+
+    def span(self, name, **attributes):
+        """
+        Groups the calls made inside the block under one parent span (no-op without a tracer):
+            with bot.metrics.span('rebalance', symbol='BTCUSDT'): ...
+        """
+        return _Span(self, name, attributes)
+
+    #--- Export
+
+    def render_prometheus(self):
+        """:return: Metrics in the Prometheus text exposition format (version 0.0.4)"""
+        with self._lock:
+            lines = []
+            self._render_histograms(lines, 'bot_request_rtt_seconds',
+                                    'HTTP round trip per exchange endpoint.', self.rtt)
+            self._render_histograms(lines, 'bot_request_serialization_seconds',
+                                    'Call time outside the HTTP round trip (signing, encoding, body read, decoding).',
+                                    self.serialization)
+            self._render_histograms(lines, 'bot_exchange_time_offset_seconds',
+                                    'Exchange timestamp in the response minus local send time.', self.exchange_offset)
+            lines.append('# HELP bot_request_errors_total Failed calls by endpoint and exception type.')
+            lines.append('# TYPE bot_request_errors_total counter')
+            for (endpoint, kind), count in sorted(self.errors.items()):
+                lines.append(f'bot_request_errors_total{{endpoint="{endpoint}",error_type="{kind}"}} {count}')
+            lines.append('# HELP bot_requests_in_flight Calls currently waiting on the exchange.')
+            lines.append('# TYPE bot_requests_in_flight gauge')
+            for endpoint, count in sorted(self.in_flight.items()):
+                lines.append(f'bot_requests_in_flight{{endpoint="{endpoint}"}} {count}')
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _render_histograms(lines, name, help_text, histograms):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} histogram')
+        for endpoint, histogram in sorted(histograms.items()):
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{{endpoint="{endpoint}",le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{endpoint="{endpoint}",le="+Inf"}} {histogram.count}')
+            lines.append(f'{name}_sum{{endpoint="{endpoint}"}} {histogram.sum}')
+            lines.append(f'{name}_count{{endpoint="{endpoint}"}} {histogram.count}')
+
+    def summary(self):
+        """:return: {endpoint: {'calls', 'avg_rtt', 'p50_rtt', 'p99_rtt', 'avg_serialization', 'avg_offset', 'errors', 'in_flight'}}"""
+        with self._lock:
+            endpoints = set(self.rtt) | set(self.in_flight) | {endpoint for endpoint, _ in self.errors}
+            result = {}
+            for endpoint in sorted(endpoints):
+                rtt = self.rtt.get(endpoint)
+                serialization = self.serialization.get(endpoint)
+                offset = self.exchange_offset.get(endpoint)
+                result[endpoint] = {
+                    'calls': rtt.count if rtt else 0,
+                    'avg_rtt': rtt.sum / rtt.count if rtt and rtt.count else None,
+                    'p50_rtt': rtt.quantile(0.5) if rtt else None,
+                    'p99_rtt': rtt.quantile(0.99) if rtt else None,
+                    'avg_serialization': serialization.sum / serialization.count if serialization and serialization.count else None,
+                    'avg_offset': offset.sum / offset.count if offset and offset.count else None,
+                    'errors': {kind: count for (name, kind), count in self.errors.items() if name == endpoint},
+                    'in_flight': self.in_flight.get(endpoint, 0),
+                }
+        return result
+
+    def format_summary(self):
+        """:return: Human-readable per-endpoint table for the CLI"""
+        def ms(value):
+            return f"{value * 1000:9.2f}" if value is not None else f"{'-':>9}"
+
+        rows = [f"{'endpoint':32s} {'calls':>6} {'avg ms':>9} {'p50 ms':>9} {'p99 ms':>9} {'ser ms':>9} {'offs ms':>9}  errors"]
+        for endpoint, stats in self.summary().items():
+            errors = ', '.join(f"{kind}={count}" for kind, count in stats['errors'].items()) or '-'
+            rows.append(f"{endpoint:32s} {stats['calls']:6d} {ms(stats['avg_rtt'])} {ms(stats['p50_rtt'])} "
+                        f"{ms(stats['p99_rtt'])} {ms(stats['avg_serialization'])} {ms(stats['avg_offset'])}  {errors}")
+        return '\n'.join(rows)
+
+
+class _Span:
+    __slots__ = ('metrics', 'name', 'attributes', 'span')
+
+    def __init__(self, metrics, name, attributes):
+        self.metrics = metrics
+        self.name = name
+        self.attributes = attributes
+        self.span = None
+
+    def __enter__(self):
+        if self.metrics.tracer is not None:
+            self.span = self.metrics._open_span(self.name, **self.attributes)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.span is not None:
+            self.span['error'] = error_type(exc) if exc is not None else None
+            self.metrics._close_span(self.span)
+        return False
+
+
+def log_span(span):
+    """Tracer that writes each span to the log (structured under extra['span'] for JSON logs)."""
+    logger.debug("Span %s (id %s, parent %s) took %.3f ms", span['name'], span['span_id'], span['parent_id'],
+                 span['duration'] * 1000, extra={'event': 'span', 'span': span})
+
+
+#--- Benchmark: overhead of tracking a call, against a real round trip to the mock exchange
+
+class _FakeResponse:
+    class elapsed:
+        @staticmethod
+        def total_seconds():
+            return 0.0001
+
+
+class _FakeClient:
+    def __init__(self):
+        self.response = None
+
+    def futures_create_order(self, **params):
+        self.response = _FakeResponse()
+        return {'orderId': 1, 'updateTime': int(time.time() * 1000)}
+
+
+def _per_call(function, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        function()
+    return (time.perf_counter() - start) / calls
+
+
+if __name__ == "__main__":
+    calls = 100000
+    client = _FakeClient()
+    plain = BotMetrics()
+    traced = BotMetrics(tracer=lambda span: None)
+
+    def bare():
+        client.futures_create_order(symbol='BTCUSDT')
+
+    def tracked(metrics):
+        with metrics.track('futures_create_order', client) as call:
+            call.result = client.futures_create_order(symbol='BTCUSDT')
+
+    baseline = _per_call(bare, calls)
+    overhead = _per_call(lambda: tracked(plain), calls) - baseline
+    traced_overhead = _per_call(lambda: tracked(traced), calls) - baseline
+    print(f"Tracking overhead: {overhead * 1e6:.2f} us per call ({traced_overhead * 1e6:.2f} us with tracing)")
+
+    from mock_exchange import MockFuturesServer
+    from trading_bot import BasicBot
+    server = MockFuturesServer().start()
+    try:
+        bot = BasicBot('key', 'secret', base_url=server.base_url)
+        round_trip = _per_call(lambda: bot._call('futures_ping'), 200)
+        print(f"Mock exchange round trip: {round_trip * 1e6:.0f} us -> tracking adds {overhead / round_trip:.3%}")
+        print()
+        print(bot.metrics.format_summary())
+    finally:
+        server.stop()
@@ -0,0 +1,975 @@
+import argparse
+import asyncio
+import bisect
+import json
+import logging
+import math
+import random
+import re
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+import websockets
+
+#--- Local mock of the Binance USD-M Futures API
+# Lets BasicBot / AsyncBot / the web UI be exercised (and benchmarked) without touching testnet.
+#   * REST: the endpoints the bot uses; signatures are not checked
+#   * Conditional types sent to /fapi/v1/algoOrder (as python-binance routes them) are answered in
+#     that endpoint's shape (algoId, clientAlgoId, quantity, algoStatus) and listed by openAlgoOrders,
+#     not openOrders, like the real API
+#   * Matching engine: a price-time priority book per symbol. Client orders trade against each other
+#     and against synthetic liquidity (LIQUIDITY_LEVELS per side around a slowly moving reference
+#     price, refilled after every match). Resting orders fill when the reference price moves through
+#     them and STOP / STOP_MARKET / TAKE_PROFIT(_MARKET) orders trigger on it. GTC, IOC, FOK and GTX
+#     (post-only) are supported; net positions and realized PnL feed balance / account / positionRisk.
+#   * WebSocket (MockStreamServer): user-data events on /ws/<listenKey>; aggTrade, bookTicker and
+#     depth@100ms diff streams on /stream?streams=... (or /ws/<symbol>@<stream>)
+#   * Latency: fixed delay plus seeded exponential jitter
+#   * Rate limits (opt-in): request weight per minute and order counts per 10s / minute, enforced
+#     with 429 and Retry-After; usage is always reported in the X-MBX-* headers
+#   * Faults: queued with inject_fault(), or drawn at a seeded random `error_rate`
+
+logger = logging.getLogger(__name__)
+
+# Faults for inject_fault(): close the connection without answering, before or after processing
+DISCONNECT = 'disconnect'
+DROP_RESPONSE = 'drop_response'
+# Binance's timestamp rule: reject if the request is from the future (+1s) or older than recvWindow
+DEFAULT_RECV_WINDOW = 5000
+
+# Strips the '/fapi/v1/', '/fapi/v2/' ... prefix so handlers work on the bare endpoint name
+FAPI_PATH_RE = re.compile(r'^/fapi/v\d+/')
+
+# Request weight charged per endpoint (everything else costs 1), reported via X-MBX-USED-WEIGHT-1M
+ENDPOINT_WEIGHTS = {'balance': 5, 'account': 5, 'positionRisk': 5, 'depth': 5, 'klines': 5, 'aggTrades': 20,
+                    'batchOrders': 5}
+ORDER_ENDPOINTS = ('order', 'algoOrder', 'batchOrders')
+
+# Binance's default limits, for MockFuturesExchange(rate_limits=DEFAULT_RATE_LIMITS)
+DEFAULT_RATE_LIMITS = {'weight_1m': 2400, 'orders_10s': 300, 'orders_1m': 1200}
+
+# Faults drawn at random when error_rate is set
+RANDOM_FAULTS = (
+    (503, {'code': -1001, 'msg': 'Internal error; unable to process your request. Please try again.'}),
+    (503, {'code': -1008, 'msg': 'Server is currently overloaded with other requests. Please try again in a few minutes.'}),
+    DISCONNECT,
+)
+
+# Symbols listed by exchangeInfo, with testnet-like filters; `scale` maps the reference price path
+# onto the symbol and `level_quantity` is the synthetic size quoted at each price level
+SYMBOL_FILTERS = {
+    'BTCUSDT': {'tickSize': '0.10', 'stepSize': '0.001', 'minQty': '0.001', 'notional': '100', 'scale': 1.0,
+                'level_quantity': 2.0},
+    'ETHUSDT': {'tickSize': '0.01', 'stepSize': '0.001', 'minQty': '0.001', 'notional': '20', 'scale': 0.1,
+                'level_quantity': 20.0},
+}
+
+LIQUIDITY_LEVELS = 10
+LEVEL_SPACING_BPS = 1.0 # Distance between synthetic levels; the spread is one level
+DEPTH_LEVELS = 20 # Levels per side in depth snapshots and diff streams
+UPDATE_ID_STEP = 10 # Each depth event covers this many update IDs (U..u), like the real stream
+WALLET_BALANCE = 10000.0
+
+OPEN_STATUSES = ('NEW', 'PARTIALLY_FILLED')
+STOP_TYPES = ('STOP', 'STOP_MARKET', 'TAKE_PROFIT', 'TAKE_PROFIT_MARKET')
+MARKET_TYPES = ('MARKET', 'STOP_MARKET', 'TAKE_PROFIT_MARKET')
+ORDER_TYPES = ('MARKET', 'LIMIT') + STOP_TYPES
+EPSILON = 1e-9
+
+
+def _exchange_info():
+    symbols = []
+    for symbol, f in SYMBOL_FILTERS.items():
+        symbols.append({'symbol': symbol, 'filters': [
+            {'filterType': 'PRICE_FILTER', 'minPrice': f['tickSize'], 'maxPrice': '1000000', 'tickSize': f['tickSize']},
+            {'filterType': 'LOT_SIZE', 'minQty': f['minQty'], 'maxQty': '1000', 'stepSize': f['stepSize']},
+            {'filterType': 'MARKET_LOT_SIZE', 'minQty': f['minQty'], 'maxQty': '120', 'stepSize': f['stepSize']},
+            {'filterType': 'MIN_NOTIONAL', 'notional': f['notional']},
+        ]})
+    return {'timezone': 'UTC', 'serverTime': int(time.time() * 1000), 'symbols': symbols}
+
+
+def _mock_price(seconds):
+    return 30000.0 + 100.0 * math.sin(seconds / 3600.0)
+
+
+def reference_price(symbol, seconds):
+    """The synthetic market's mid price of symbol at `seconds` (epoch)."""
+    return _mock_price(seconds) * SYMBOL_FILTERS[symbol]['scale']
+
+
+def _klines(params):
+    """Deterministic closed 1m candles from startTime (default: the last `limit` minutes) up to now."""
+    limit = min(int(params.get('limit', 500)), 1500)
+    now_minute = int(time.time() // 60)
+    start_minute = -(-int(params['startTime']) // 60000) if 'startTime' in params else now_minute - limit
+    rows = []
+    for minute in range(start_minute, min(start_minute + limit, now_minute)):
+        open_, close = _mock_price(minute * 60), _mock_price(minute * 60 + 60)
+        rows.append([minute * 60000, f"{open_:.1f}", f"{max(open_, close) + 5:.1f}", f"{min(open_, close) - 5:.1f}",
+                     f"{close:.1f}", '10.000', minute * 60000 + 59999, f"{10 * close:.2f}", 100, '5.000',
+                     f"{5 * close:.2f}", '0'])
+    return rows
+
+
+def _agg_trades(params):
+    """One deterministic aggregate trade per second; ids are epoch seconds."""
+    limit = min(int(params.get('limit', 500)), 1000)
+    now_second = int(time.time())
+    first = int(params['fromId']) if 'fromId' in params else -(-int(params.get('startTime', (now_second - limit) * 1000)) // 1000)
+    return [{'a': second, 'p': f"{_mock_price(second):.1f}", 'q': '0.010', 'f': second * 10, 'l': second * 10 + 1,
+             'T': second * 1000, 'm': second % 2 == 0}
+            for second in range(first, min(first + limit, now_second))]
+
+
+def _decimals(step):
+    step = step.rstrip('0')
+    return len(step.split('.')[1]) if '.' in step else 0
+
+
+def _error(code, msg, status=400):
+    return status, {'code': code, 'msg': msg}
+
+
+#--- Matching engine
+
+class _OrderBook:
+    """Resting client orders of one symbol in price-time priority, plus its untriggered stop orders."""
+
+    def __init__(self, symbol):
+        f = SYMBOL_FILTERS[symbol]
+        self.symbol = symbol
+        self.tick = float(f['tickSize'])
+        self.price_decimals = _decimals(f['tickSize'])
+        self.qty_decimals = _decimals(f['stepSize'])
+        self.level_quantity = f['level_quantity']
+        self.levels = {'BUY': {}, 'SELL': {}} # side -> price -> deque of orders (time priority)
+        self.prices = {'BUY': [], 'SELL': []} # side -> sorted prices (ascending)
+        self.stops = []
+        # Depth stream state: the levels as last published, and the last update ID
+        self.published = None
+        self.update_id = 1
+
+    def best(self, side):
+        prices = self.prices[side]
+        if not prices:
+            return None
+        return prices[-1] if side == 'BUY' else prices[0]
+
+    def add(self, order):
+        side, price = order['side'], order['_price']
+        queue = self.levels[side].get(price)
+        if queue is None:
+            queue = self.levels[side][price] = deque()
+            bisect.insort(self.prices[side], price)
+        queue.append(order)
+
+    def remove(self, order):
+        side, price = order['side'], order['_price']
+        queue = self.levels[side].get(price)
+        if queue is None or order not in queue:
+            return
+        queue.remove(order)
+        if not queue:
+            del self.levels[side][price]
+            prices = self.prices[side]
+            del prices[bisect.bisect_left(prices, price)]
+
+    def synthetic(self, side, mid):
+        """:return: Synthetic liquidity resting on `side`, best level first: [[price, quantity], ...]"""
+        step = mid * LEVEL_SPACING_BPS / 10000.0
+        if side == 'SELL':
+            return [[round(math.ceil((mid + step * (i + 0.5)) / self.tick) * self.tick, self.price_decimals), self.level_quantity]
+                    for i in range(LIQUIDITY_LEVELS)]
+        return [[round(math.floor((mid - step * (i + 0.5)) / self.tick) * self.tick, self.price_decimals), self.level_quantity]
+                for i in range(LIQUIDITY_LEVELS)]
+
+    def depth(self, mid, limit=DEPTH_LEVELS):
+        """:return: {'bids': {price: quantity}, 'asks': {price: quantity}} of client and synthetic liquidity"""
+        book = {}
+        for side, key in (('BUY', 'bids'), ('SELL', 'asks')):
+            levels = dict(self.synthetic(side, mid))
+            for price, queue in self.levels[side].items():
+                price = round(price, self.price_decimals)
+                levels[price] = levels.get(price, 0.0) + sum(o['_qty'] - o['_executed'] for o in queue)
+            best = sorted(levels, reverse=side == 'BUY')[:limit]
+            book[key] = {price: levels[price] for price in best}
+        return book
+
+    def format_price(self, price):
+        return f"{price:.{self.price_decimals}f}"
+
+    def format_qty(self, quantity):
+        return f"{quantity:.{self.qty_decimals}f}"
+
+
+class MockFuturesExchange:
+    """In-memory matching engine and account behind the mock REST and WebSocket servers."""
+
+    def __init__(self, latency=0.0, latency_jitter=0.0, rate_limits=None, error_rate=0.0, seed=None, price=None):
+        """
+        :param latency: Artificial per-request delay in seconds (simulates network RTT)
+        :param latency_jitter: Mean of an extra, exponentially distributed delay in seconds
+        :param rate_limits: Limits to enforce, e.g. DEFAULT_RATE_LIMITS (None: report usage only)
+        :param error_rate: Fraction of requests failing with one of RANDOM_FAULTS
+        :param seed: Seed for the jitter, random faults and synthetic trades (reproducible runs)
+        :param price: Callable (symbol, epoch seconds) -> reference price, default reference_price
+        """
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.rate_limits = rate_limits
+        self.error_rate = error_rate
+        self.price = price or reference_price
+        self._rng = random.Random(seed)
+        self.orders = {}
+        self.books = {symbol: _OrderBook(symbol) for symbol in SYMBOL_FILTERS}
+        self.positions = {} # symbol -> [net quantity, entry price]
+        self.realized_pnl = 0.0
+        self.trade_count = 0
+        self._client_ids = {} # clientOrderId -> latest order placed with it
+        self.request_count = 0
+        self.rejected_count = 0 # Requests answered 429
+        self.used_weight = 0
+        self.order_count_10s = 0
+        self.order_count_1m = 0
+        self._minute = self._ten_seconds = None
+        self._next_order_id = 1
+        self._next_trade_id = 1
+        self._lock = threading.RLock()
+        # Callbacks receiving user-data events (ORDER_TRADE_UPDATE, ACCOUNT_UPDATE), see MockStreamServer
+        self.listeners = []
+        # Callbacks receiving market data as (stream name, payload), e.g. ('btcusdt@aggTrade', {...})
+        self.market_listeners = []
+        # Fault injection: the exchange clock runs `clock_offset` seconds ahead of ours (signed
+        # requests outside recvWindow get -1021), and queued faults are served before real answers
+        self.clock_offset = 0.0
+        self._faults = [] # (endpoint or None for any, fault)
+
+    def inject_fault(self, fault, endpoint=None, count=1):
+        """
+        Makes the next `count` matching requests fail.
+        :param fault: (http_status, {'code': ..., 'msg': ...}), DISCONNECT, DROP_RESPONSE (the request
+                      takes effect but no answer is sent) or {'delay': seconds} (answers normally
+                      after the delay, e.g. to trigger client timeouts)
+        :param endpoint: Bare endpoint name (e.g. 'order'); None matches every request
+        """
+        with self._lock:
+            self._faults.extend([(endpoint, fault)] * count)
+
+    def _take_fault(self, endpoint):
+        with self._lock:
+            for index, (fault_endpoint, fault) in enumerate(self._faults):
+                if fault_endpoint in (None, endpoint):
+                    del self._faults[index]
+                    return fault
+            if self.error_rate and self._rng.random() < self.error_rate:
+                return self._rng.choice(RANDOM_FAULTS)
+        return None
+
+    def server_time(self):
+        return int((time.time() + self.clock_offset) * 1000)
+
+    #--- Rate limits
+
+    def _count_request(self, method, endpoint, params):
+        """
+        Charges a request to the weight and order-count windows (aligned to the wall clock, like Binance's).
+        :return: The 429 answer if a limit is exceeded, else None
+        """
+        now = time.time()
+        minute, ten_seconds = int(now // 60), int(now // 10)
+        if minute != self._minute:
+            self._minute, self.used_weight, self.order_count_1m = minute, 0, 0
+        if ten_seconds != self._ten_seconds:
+            self._ten_seconds, self.order_count_10s = ten_seconds, 0
+        self.used_weight += ENDPOINT_WEIGHTS.get(endpoint, 1)
+        if method == 'POST' and endpoint in ORDER_ENDPOINTS:
+            orders = len(json.loads(params.get('batchOrders', '[]'))) if endpoint == 'batchOrders' else 1
+            self.order_count_10s += orders
+            self.order_count_1m += orders
+
+        limits = self.rate_limits or {}
+        if self.used_weight > limits.get('weight_1m', math.inf):
+            return _error(-1003, f"Too many requests; current limit of IP is {limits['weight_1m']} requests per minute.", 429)
+        if self.order_count_1m > limits.get('orders_1m', math.inf):
+            return _error(-1015, f"Too many new orders; current limit is {limits['orders_1m']} orders per MINUTE.", 429)
+        if self.order_count_10s > limits.get('orders_10s', math.inf):
+            return _error(-1015, f"Too many new orders; current limit is {limits['orders_10s']} orders per TEN_SECONDS.", 429)
+        return None
+
+    def retry_after(self):
+        """:return: Seconds until the exhausted rate-limit window resets (the Retry-After header)"""
+        limits = self.rate_limits or {}
+        now = time.time()
+        if self.used_weight <= limits.get('weight_1m', math.inf) and self.order_count_1m <= limits.get('orders_1m', math.inf):
+            return max(1, math.ceil(10 - now % 10))
+        return max(1, math.ceil(60 - now % 60))
+
+    def rate_headers(self):
+        return {'X-MBX-USED-WEIGHT-1M': str(self.used_weight), 'X-MBX-ORDER-COUNT-10S': str(self.order_count_10s),
+                'X-MBX-ORDER-COUNT-1M': str(self.order_count_1m)}
+
+    #--- Requests
+
+    def handle(self, method, endpoint, params):
+        """
+        Dispatches one request.
+        :return: (http_status, response_body)
+        """
+        with self._lock:
+            self.request_count += 1
+            limited = self._count_request(method, endpoint, params)
+            delay = self.latency + (self._rng.expovariate(1.0 / self.latency_jitter) if self.latency_jitter else 0.0)
+
+        if delay:
+            time.sleep(delay)
+        if limited:
+            with self._lock:
+                self.rejected_count += 1
+            return limited
+
+        fault = self._take_fault(endpoint)
+        if fault == DISCONNECT:
+            return None, None
+        if isinstance(fault, dict):
+            time.sleep(fault['delay'])
+        elif fault == DROP_RESPONSE:
+            self._answer(method, endpoint, params)
+            return None, None
+        elif fault is not None:
+            return fault
+        return self._answer(method, endpoint, params)
+
+    def _answer(self, method, endpoint, params):
+        if 'timestamp' in params:
+            server_time = self.server_time()
+            timestamp = int(params['timestamp'])
+            if timestamp >= server_time + 1000 or server_time - timestamp > int(params.get('recvWindow', DEFAULT_RECV_WINDOW)):
+                return 400, {'code': -1021, 'msg': 'Timestamp for this request is outside of the recvWindow.'}
+
+        symbol = params.get('symbol')
+        if symbol in self.books:
+            with self._lock:
+                self._sweep(self.books[symbol])
+
+        if endpoint == 'ping':
+            return 200, {}
+        if endpoint == 'time':
+            return 200, {'serverTime': self.server_time()}
+        if endpoint == 'depth':
+            return self._depth_snapshot(params)
+        if endpoint in ('ticker/price', 'ticker/bookTicker', 'premiumIndex'):
+            return self._ticker(endpoint, symbol)
+        if endpoint == 'exchangeInfo':
+            return 200, _exchange_info()
+        if endpoint == 'klines':
+            return 200, _klines(params)
+        if endpoint == 'aggTrades':
+            return 200, _agg_trades(params)
+        if endpoint == 'balance' and method == 'GET':
+            return 200, [self._balance()]
+        if endpoint == 'account' and method == 'GET':
+            balance = self._balance()
+            return 200, {'assets': [{'asset': 'USDT', 'walletBalance': balance['balance'], 'availableBalance': balance['availableBalance']}],
+                         'positions': self._positions()}
+        if endpoint == 'positionRisk' and method == 'GET':
+            return 200, [p for p in self._positions() if symbol in (None, p['symbol'])]
+        if endpoint == 'listenKey':
+            return 200, {'listenKey': 'mock-listen-key'}
+        if endpoint in ('openOrders', 'openAlgoOrders') and method == 'GET':
+            algo = endpoint == 'openAlgoOrders'
+            with self._lock:
+                return 200, [self._public(o) for o in self.orders.values()
+                             if o['status'] in OPEN_STATUSES and symbol in (None, o['symbol']) and o['_algo'] == algo]
+        if endpoint in ('order', 'algoOrder'):
+            algo = endpoint == 'algoOrder'
+            if method == 'POST':
+                return self._create_order(params, algo=algo)
+            if method == 'GET':
+                return self._get_order(params)
+            if method == 'DELETE':
+                return self._cancel_order(params)
+        if endpoint == 'batchOrders':
+            if method == 'POST':
+                return 200, [self._create_order(order)[1] for order in json.loads(params['batchOrders'])]
+            if method == 'DELETE':
+                order_ids = json.loads(params.get('orderidlist') or params.get('orderIdList'))
+                return 200, [self._cancel_order({'orderId': order_id})[1] for order_id in order_ids]
+        if endpoint == 'allOpenOrders' and method == 'DELETE':
+            with self._lock:
+                for order in list(self.orders.values()):
+                    if order['symbol'] == symbol and order['status'] in OPEN_STATUSES:
+                        self._cancel_order({'orderId': order['orderId']})
+            return 200, {'code': 200, 'msg': 'The operation of cancel all open order is done.'}
+        return 404, {'code': -1000, 'msg': f'Unsupported endpoint: {method} {endpoint}'}
+
+    #--- Orders
+
+    def _find_order(self, params):
+        """Looks an order up by orderId / algoId or by client ID (origClientOrderId / clientAlgoId)."""
+        client_id = params.get('origClientOrderId') or params.get('clientAlgoId')
+        if client_id:
+            return self._client_ids.get(client_id)
+        return self.orders.get(int(params.get('orderId') or params.get('algoId') or 0))
+
+    @staticmethod
+    def _public(order):
+        """The order as the API returns it, without the engine's bookkeeping fields."""
+        if order['_algo']:
+            return MockFuturesExchange._algo_public(order)
+        return {key: value for key, value in order.items() if not key.startswith('_')}
+
+    @staticmethod
+    def _algo_public(order):
+        """A conditional order in the /fapi/v1/algoOrder shape."""
+        status = order['status']
+        if order['_triggered']:
+            algo_status = {'FILLED': 'FINISHED', 'CANCELED': 'CANCELED', 'EXPIRED': 'EXPIRED'}.get(status, 'TRIGGERED')
+        else:
+            algo_status = status
+        return {'algoId': order['orderId'], 'clientAlgoId': order['clientOrderId'], 'algoType': 'CONDITIONAL',
+                'orderType': order['type'], 'symbol': order['symbol'], 'side': order['side'], 'positionSide': 'BOTH',
+                'timeInForce': order['timeInForce'], 'quantity': order['origQty'], 'algoStatus': algo_status,
+                'triggerPrice': order['stopPrice'], 'price': order['price'], 'reduceOnly': order['reduceOnly'],
+                'actualOrderId': str(order['orderId']) if order['_triggered'] else '',
+                'actualPrice': order['avgPrice'] if order['_triggered'] else '', 'createTime': order['_created'],
+                'updateTime': order['updateTime'], 'triggerTime': order['_triggered'] or 0}
+
+    def _create_order(self, params, algo=False):
+        symbol, side, order_type = params.get('symbol'), params.get('side'), params.get('type')
+        if symbol not in self.books:
+            return _error(-1121, 'Invalid symbol.')
+        if side not in ('BUY', 'SELL'):
+            return _error(-1117, 'Invalid side.')
+        if order_type not in ORDER_TYPES:
+            return _error(-1116, 'Invalid orderType.')
+        try:
+            quantity = float(params.get('quantity') or 0)
+            price = float(params['price']) if float(params.get('price') or 0) else None
+            stop = params.get('stopPrice', params.get('triggerPrice'))
+            stop_price = float(stop) if float(stop or 0) else None
+        except ValueError:
+            return _error(-1102, 'A mandatory parameter was not sent, was empty/null, or malformed.')
+        if quantity <= 0:
+            return _error(-4003, 'Quantity less than or equal to zero.')
+        if order_type in ('LIMIT', 'STOP', 'TAKE_PROFIT') and price is None:
+            return _error(-1102, "Mandatory parameter 'price' was not sent, was empty/null, or malformed.")
+        if order_type in STOP_TYPES and stop_price is None:
+            return _error(-1102, "Mandatory parameter 'stopPrice' was not sent, was empty/null, or malformed.")
+
+        with self._lock:
+            book = self.books[symbol]
+            client_id = params.get('newClientOrderId', params.get('clientAlgoId', ''))
+            # Like Binance, a client ID is only unique among open orders: reusing a filled or
+            # canceled order's ID places a new order
+            if client_id and self._client_ids.get(client_id, {}).get('status') in OPEN_STATUSES:
+                return _error(-4116, 'ClientOrderId is duplicated.')
+            mid = self.price(symbol, time.time())
+            minimum = float(SYMBOL_FILTERS[symbol]['notional'])
+            if quantity * (price or mid) < minimum and params.get('reduceOnly') != 'true':
+                return _error(-4164, f"Order's notional must be no smaller than {minimum:g} (unless you choose reduce only).")
+            time_in_force = params.get('timeInForce', 'GTC')
+            if time_in_force == 'GTX' and order_type == 'LIMIT' and self._crosses(book, side, price, mid):
+                return _error(-5022, 'Due to the order could not be executed as maker, the Post Only order will be rejected.')
+
+            order_id = self._next_order_id
+            self._next_order_id += 1
+            order = {
+                'orderId': order_id,
+                'symbol': symbol,
+                'side': side,
+                'type': order_type,
+                'origQty': book.format_qty(quantity),
+                'price': book.format_price(price) if price else '0',
+                'stopPrice': book.format_price(stop_price) if stop_price else '0',
+                'clientOrderId': client_id or f"mock-{order_id}",
+                'status': 'NEW',
+                'timeInForce': time_in_force,
+                'executedQty': book.format_qty(0),
+                'avgPrice': '0',
+                'cumQuote': '0',
+                'reduceOnly': params.get('reduceOnly') == 'true',
+                'positionSide': 'BOTH',
+                'updateTime': int(time.time() * 1000),
+                '_qty': quantity, '_executed': 0.0, '_quote': 0.0, '_price': price, '_stop': stop_price,
+                '_algo': algo, '_triggered': None, '_created': int(time.time() * 1000),
+            }
+            self.orders[order_id] = order
+            self._client_ids[order['clientOrderId']] = order
+            self._publish(order, 'NEW')
+            if order_type in STOP_TYPES:
+                book.stops.append(order)
+                self._sweep(book) # Triggers at once if the stop is already through the market
+            else:
+                self._execute(book, order, price, mid)
+            return 200, self._public(order)
+
+    def _crosses(self, book, side, price, mid):
+        """:return: True if a limit order at price would take liquidity"""
+        opposite = 'SELL' if side == 'BUY' else 'BUY'
+        best = book.synthetic(opposite, mid)[0][0]
+        client = book.best(opposite)
+        if client is not None:
+            best = min(best, client) if side == 'BUY' else max(best, client)
+        return price >= best if side == 'BUY' else price <= best
+
+    def _liquidity(self, book, side, limit, mid):
+        """:return: Quantity resting on `side` at prices an order limited at `limit` may take"""
+        reachable = lambda price: limit is None or (price <= limit if side == 'SELL' else price >= limit)
+        total = sum(quantity for price, quantity in book.synthetic(side, mid) if reachable(price))
+        for price, queue in book.levels[side].items():
+            if reachable(price):
+                total += sum(o['_qty'] - o['_executed'] for o in queue)
+        return total
+
+    def _execute(self, book, order, limit, mid):
+        """Matches an incoming (or just triggered) order, then rests, expires or completes it."""
+        side = order['side']
+        opposite = 'SELL' if side == 'BUY' else 'BUY'
+        better = (lambda a, b: a <= b) if side == 'BUY' else (lambda a, b: a >= b)
+        remaining = order['_qty'] - order['_executed']
+        if order['timeInForce'] == 'FOK' and self._liquidity(book, opposite, limit, mid) + EPSILON < remaining:
+            return self._close(order, 'EXPIRED')
+
+        synthetic = book.synthetic(opposite, mid)
+        level = 0
+        while remaining > EPSILON:
+            client_price = book.best(opposite)
+            synthetic_price = synthetic[level][0] if level < len(synthetic) else None
+            if client_price is not None and (synthetic_price is None or better(client_price, synthetic_price)):
+                price = client_price
+                if limit is not None and not better(price, limit):
+                    break
+                maker = book.levels[opposite][price][0]
+                quantity = min(remaining, maker['_qty'] - maker['_executed'])
+                self._fill(maker, quantity, price)
+                if maker['status'] == 'FILLED':
+                    book.remove(maker)
+            elif synthetic_price is not None:
+                price = synthetic_price
+                if limit is not None and not better(price, limit):
+                    break
+                quantity = min(remaining, synthetic[level][1])
+                synthetic[level][1] -= quantity
+                if synthetic[level][1] <= EPSILON:
+                    level += 1
+            else:
+                break
+            self._fill(order, quantity, price)
+            self._trade(book, side, quantity, price)
+            remaining -= quantity
+
+        if remaining <= EPSILON:
+            return
+        if order['type'] in MARKET_TYPES or order['timeInForce'] in ('IOC', 'FOK'):
+            self._close(order, 'EXPIRED')
+        else:
+            book.add(order)
+
+    def _sweep(self, book):
+        """Fills resting orders the reference price moved through and triggers stop orders (lock held)."""
+        mid = self.price(book.symbol, time.time())
+        for side, opposite in (('BUY', 'SELL'), ('SELL', 'BUY')):
+            touch = book.synthetic(opposite, mid)[0][0]
+            while True:
+                best = book.best(side)
+                if best is None or (best < touch if side == 'BUY' else best > touch):
+                    break
+                # The market traded through the resting order: it fills in full at its own price
+                order = book.levels[side][best][0]
+                book.remove(order)
+                quantity = order['_qty'] - order['_executed']
+                self._fill(order, quantity, best)
+                self._trade(book, side, quantity, best)
+        for order in list(book.stops):
+            # BUY STOP and SELL TAKE_PROFIT trigger on a rise, the other two on a fall
+            rising = (order['side'] == 'BUY') == order['type'].startswith('STOP')
+            if (mid >= order['_stop']) if rising else (mid <= order['_stop']):
+                book.stops.remove(order)
+                order['_triggered'] = int(time.time() * 1000)
+                limit = None if order['type'] in MARKET_TYPES else order['_price']
+                self._execute(book, order, limit, mid)
+
+    def _fill(self, order, quantity, price):
+        order['_executed'] += quantity
+        order['_quote'] += quantity * price
+        book = self.books[order['symbol']]
+        order['executedQty'] = book.format_qty(order['_executed'])
+        order['cumQuote'] = f"{order['_quote']:.8f}"
+        order['avgPrice'] = f"{order['_quote'] / order['_executed']:.8f}"
+        order['status'] = 'FILLED' if order['_qty'] - order['_executed'] <= EPSILON else 'PARTIALLY_FILLED'
+        order['updateTime'] = int(time.time() * 1000)
+        self._apply_position(order['symbol'], quantity if order['side'] == 'BUY' else -quantity, price)
+        self._publish(order, 'TRADE', quantity, price)
+
+    def _close(self, order, status):
+        order['status'] = status
+        order['updateTime'] = int(time.time() * 1000)
+        self._publish(order, status)
+
+    def _apply_position(self, symbol, quantity, price):
+        position = self.positions.setdefault(symbol, [0.0, 0.0])
+        amount, entry = position
+        if amount == 0 or (amount > 0) == (quantity > 0):
+            position[:] = [amount + quantity, (amount * entry + quantity * price) / (amount + quantity)]
+        else:
+            closed = min(abs(quantity), abs(amount))
+            self.realized_pnl += closed * (price - entry) * (1 if amount > 0 else -1)
+            position[0] = amount + quantity
+            if abs(position[0]) <= EPSILON:
+                position[:] = [0.0, 0.0]
+            elif (position[0] > 0) != (amount > 0): # Flipped: the remainder opened at this price
+                position[1] = price
+        self._publish_account(symbol)
+
+    def _get_order(self, params):
+        with self._lock:
+            order = self._find_order(params)
+            if order is None:
+                return 400, {'code': -2013, 'msg': 'Order does not exist.'}
+            return 200, self._public(order)
+
+    def _cancel_order(self, params):
+        with self._lock:
+            order = self._find_order(params)
+            if order is None or order['status'] not in OPEN_STATUSES:
+                return 400, {'code': -2011, 'msg': 'Unknown order sent.'}
+            book = self.books[order['symbol']]
+            if order in book.stops:
+                book.stops.remove(order)
+            else:
+                book.remove(order)
+            self._close(order, 'CANCELED')
+            return 200, self._public(order)
+
+    #--- Account and market data
+
+    def _balance(self):
+        balance = f"{WALLET_BALANCE + self.realized_pnl:.8f}"
+        return {'asset': 'USDT', 'balance': balance, 'availableBalance': balance}
+
+    def _positions(self):
+        with self._lock:
+            positions = []
+            for symbol, (amount, entry) in self.positions.items():
+                mark = self.price(symbol, time.time())
+                positions.append({'symbol': symbol, 'positionAmt': self.books[symbol].format_qty(amount),
+                                  'entryPrice': f"{entry:.8f}", 'markPrice': f"{mark:.8f}",
+                                  'unRealizedProfit': f"{amount * (mark - entry):.8f}", 'notional': f"{amount * mark:.8f}",
+                                  'leverage': '20', 'marginType': 'cross', 'positionSide': 'BOTH'})
+            return positions
+
+    def _ticker(self, endpoint, symbol):
+        if symbol not in self.books:
+            return _error(-1121, 'Invalid symbol.')
+        book = self.books[symbol]
+        now = time.time()
+        mid = self.price(symbol, now)
+        if endpoint == 'ticker/price':
+            return 200, {'symbol': symbol, 'price': book.format_price(mid), 'time': int(now * 1000)}
+        if endpoint == 'premiumIndex':
+            return 200, {'symbol': symbol, 'markPrice': f"{mid:.8f}", 'indexPrice': f"{mid:.8f}", 'time': int(now * 1000)}
+        with self._lock:
+            depth = book.depth(mid, limit=1)
+        (bid, bid_quantity), = depth['bids'].items()
+        (ask, ask_quantity), = depth['asks'].items()
+        return 200, {'symbol': symbol, 'bidPrice': book.format_price(bid), 'bidQty': book.format_qty(bid_quantity),
+                     'askPrice': book.format_price(ask), 'askQty': book.format_qty(ask_quantity), 'time': int(now * 1000)}
+
+    def _depth_snapshot(self, params):
+        symbol = params.get('symbol', 'BTCUSDT')
+        if symbol not in self.books:
+            return _error(-1121, 'Invalid symbol.')
+        book = self.books[symbol]
+        limit = int(params.get('limit', DEPTH_LEVELS))
+        with self._lock:
+            if book.published is None:
+                book.published = book.depth(self.price(symbol, time.time()))
+            # The levels as last published; lastUpdateId falls inside the next event's U..u range,
+            # so a client syncing per Binance's rules applies exactly the diffs that follow
+            bids = sorted(book.published['bids'].items(), reverse=True)[:limit]
+            asks = sorted(book.published['asks'].items())[:limit]
+            now = int(time.time() * 1000)
+            return 200, {'lastUpdateId': book.update_id + 1, 'E': now, 'T': now,
+                         'bids': [[book.format_price(p), book.format_qty(q)] for p, q in bids],
+                         'asks': [[book.format_price(p), book.format_qty(q)] for p, q in asks]}
+
+    def market_tick(self):
+        """
+        Advances the synthetic market one step (MockStreamServer calls it every 100ms): sweeps each book,
+        publishes its depth diff and bookTicker, and prints one small synthetic trade at the mid.
+        """
+        now = int(time.time() * 1000)
+        with self._lock:
+            for symbol, book in self.books.items():
+                self._sweep(book)
+                mid = self.price(symbol, now / 1000.0)
+                depth = book.depth(mid)
+                previous = book.published or {'bids': {}, 'asks': {}}
+                changes = {}
+                for key in ('bids', 'asks'):
+                    changed = [[book.format_price(p), book.format_qty(q)] for p, q in depth[key].items() if previous[key].get(p) != q]
+                    removed = [[book.format_price(p), book.format_qty(0)] for p in previous[key] if p not in depth[key]]
+                    changes[key] = changed + removed
+                first_id, book.update_id = book.update_id, book.update_id + UPDATE_ID_STEP
+                book.published = depth
+                stream = symbol.lower()
+                self._publish_market(f"{stream}@depth@100ms", {
+                    'e': 'depthUpdate', 'E': now, 'T': now, 's': symbol, 'U': first_id + 1, 'u': book.update_id,
+                    'pu': first_id, 'b': changes['bids'], 'a': changes['asks']})
+                bid, bid_quantity = max(depth['bids'].items())
+                ask, ask_quantity = min(depth['asks'].items())
+                self._publish_market(f"{stream}@bookTicker", {
+                    'e': 'bookTicker', 'u': book.update_id, 'E': now, 'T': now, 's': symbol,
+                    'b': book.format_price(bid), 'B': book.format_qty(bid_quantity),
+                    'a': book.format_price(ask), 'A': book.format_qty(ask_quantity)})
+                self._trade(book, self._rng.choice(('BUY', 'SELL')), book.level_quantity / 100,
+                            round(mid / book.tick) * book.tick)
+
+    #--- Events
+
+    def _trade(self, book, taker_side, quantity, price):
+        self.trade_count += 1
+        trade_id = self._next_trade_id
+        self._next_trade_id += 1
+        now = int(time.time() * 1000)
+        self._publish_market(f"{book.symbol.lower()}@aggTrade", {
+            'e': 'aggTrade', 'E': now, 's': book.symbol, 'a': trade_id, 'p': book.format_price(price),
+            'q': book.format_qty(quantity), 'f': trade_id, 'l': trade_id, 'T': now, 'm': taker_side == 'SELL'})
+
+    def _publish(self, order, execution_type, last_quantity=0.0, last_price=0.0):
+        now = int(time.time() * 1000)
+        book = self.books[order['symbol']]
+        event = {'e': 'ORDER_TRADE_UPDATE', 'E': now, 'T': now, 'o': {
+            's': order['symbol'], 'c': order['clientOrderId'], 'S': order['side'], 'o': order['type'],
+            'f': order['timeInForce'], 'q': order['origQty'], 'p': order['price'], 'ap': order['avgPrice'],
+            'sp': order['stopPrice'], 'x': execution_type, 'X': order['status'], 'i': order['orderId'],
+            'l': book.format_qty(last_quantity), 'z': order['executedQty'], 'L': book.format_price(last_price),
+            'T': now, 'ps': 'BOTH',
+        }}
+        for listener in list(self.listeners):
+            listener(event)
+
+    def _publish_account(self, symbol):
+        if not self.listeners:
+            return
+        now = int(time.time() * 1000)
+        amount, entry = self.positions[symbol]
+        balance = self._balance()['balance']
+        event = {'e': 'ACCOUNT_UPDATE', 'E': now, 'T': now, 'a': {
+            'm': 'ORDER', 'B': [{'a': 'USDT', 'wb': balance, 'cw': balance, 'bc': '0'}],
+            'P': [{'s': symbol, 'pa': self.books[symbol].format_qty(amount), 'ep': f"{entry:.8f}",
+                   'cr': f"{self.realized_pnl:.8f}", 'up': '0', 'mt': 'cross', 'iw': '0', 'ps': 'BOTH'}],
+        }}
+        for listener in list(self.listeners):
+            listener(event)
+
+    def _publish_market(self, stream, data):
+        for listener in list(self.market_listeners):
+            listener(stream, data)
+
+
+#--- REST server
+
+class _MockRequestHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 so pooled clients can keep connections alive between requests
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are separate writes; without TCP_NODELAY delayed ACKs add ~40ms per call
+    disable_nagle_algorithm = True
+
+    def _dispatch(self, method):
+        url = urlsplit(self.path)
+        params = dict(parse_qsl(url.query))
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            params.update(parse_qsl(self.rfile.read(length).decode()))
+
+        endpoint = FAPI_PATH_RE.sub('', url.path)
+        exchange = self.server.exchange
+        status, body = exchange.handle(method, endpoint, params)
+        if status is None: # Injected DISCONNECT / DROP_RESPONSE
+            self.close_connection = True
+            return
+
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in exchange.rate_headers().items():
+            self.send_header(name, value)
+        if status in (418, 429):
+            self.send_header('Retry-After', str(exchange.retry_after()))
+        try:
+            self.end_headers()
+            self.wfile.write(payload)
+        except (BrokenPipeError, ConnectionResetError): # Client timed out during an injected delay
+            self.close_connection = True
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def do_PUT(self):
+        self._dispatch('PUT')
+
+    def do_DELETE(self):
+        self._dispatch('DELETE')
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+class MockFuturesServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, **options):
+        """:param options: Further MockFuturesExchange settings (latency_jitter, rate_limits, error_rate, seed, price)"""
+        super().__init__((host, port), _MockRequestHandler)
+        self.exchange = MockFuturesExchange(latency=latency, **options)
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        """Serves requests from a daemon thread and returns self."""
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+#--- WebSocket server
+
+class MockStreamServer:
+    """
+    WebSocket server for the mock exchange: user-data events on /ws/<listenKey>, market streams on
+    /stream?streams=btcusdt@aggTrade/btcusdt@depth@100ms/... (combined) or /ws/btcusdt@bookTicker (raw).
+    """
+
+    def __init__(self, exchange, host='127.0.0.1', port=0, interval=0.1):
+        """:param interval: Seconds between market ticks (depth diffs, bookTicker, synthetic trades)"""
+        self.exchange = exchange
+        self.host = host
+        self.port = port
+        self.interval = interval
+        self._loop = asyncio.new_event_loop()
+        self._server = None
+        self._thread = None
+        self._ticker = None
+        self._handlers = set()
+        self._subscribers = [] # (stream names, combined, queue)
+
+    @property
+    def ws_url(self):
+        return f'ws://{self.host}:{self.port}'
+
+    def _on_market(self, stream, data):
+        for streams, combined, queue in list(self._subscribers):
+            if stream in streams:
+                message = {'stream': stream, 'data': data} if combined else data
+                self._loop.call_soon_threadsafe(queue.put_nowait, message)
+
+    async def _handler(self, websocket):
+        url = urlsplit(websocket.request.path)
+        queue = asyncio.Queue()
+        if url.path.startswith('/stream'):
+            subscription = (set(dict(parse_qsl(url.query)).get('streams', '').split('/')), True, queue)
+        elif '@' in url.path:
+            subscription = ({url.path.rsplit('/', 1)[-1]}, False, queue)
+        else:
+            subscription = None # /ws/<listenKey>: user data
+        listener = lambda event: self._loop.call_soon_threadsafe(queue.put_nowait, event)
+        if subscription:
+            self._subscribers.append(subscription)
+        else:
+            self.exchange.listeners.append(listener)
+        self._handlers.add(asyncio.current_task())
+        try:
+            while True:
+                await websocket.send(json.dumps(await queue.get()))
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            self._handlers.discard(asyncio.current_task())
+            if subscription:
+                self._subscribers.remove(subscription)
+            else:
+                self.exchange.listeners.remove(listener)
+
+    async def _tick_forever(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            if self._subscribers:
+                await asyncio.to_thread(self.exchange.market_tick)
+
+    async def _serve(self):
+        return await websockets.serve(self._handler, self.host, self.port)
+
+    async def _shutdown(self):
+        self._ticker.cancel()
+        # Handlers wait on their event queues, so they are cancelled rather than left to notice the close
+        for handler in list(self._handlers):
+            handler.cancel()
+        self._server.close()
+        await self._server.wait_closed()
+
+    def start(self):
+        self.exchange.market_listeners.append(self._on_market)
+        self._server = self._loop.run_until_complete(self._serve())
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._ticker = self._loop.create_task(self._tick_forever())
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._on_market in self.exchange.market_listeners:
+            self.exchange.market_listeners.remove(self._on_market)
+        try:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result(timeout=5)
+        except Exception as e:
+            logger.warning(f"Mock stream server did not shut down cleanly: {e}")
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+
+
+def serve(host='127.0.0.1', port=8765, ws_port=8766, **options):
+    """Runs the REST and WebSocket servers until interrupted (also the benchmark suite's subprocess target)."""
+    server = MockFuturesServer(host=host, port=port, **options).start()
+    streams = MockStreamServer(server.exchange, host=host, port=ws_port).start()
+    logger.info(f"Mock futures exchange: REST {server.base_url}, WebSocket {streams.ws_url}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        streams.stop()
+        server.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local mock Binance USD-M futures exchange (REST + WebSocket).")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--ws-port', type=int, default=8766)
+    parser.add_argument('--latency', type=float, default=0.05, help="fixed delay per request, seconds")
+    parser.add_argument('--jitter', type=float, default=0.0, help="mean extra exponential delay per request, seconds")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of requests failing at random")
+    parser.add_argument('--rate-limits', action='store_true', help="enforce Binance's default rate limits")
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    serve(args.host, args.port, args.ws_port, latency=args.latency, latency_jitter=args.jitter, error_rate=args.error_rate,
+          rate_limits=DEFAULT_RATE_LIMITS if args.rate_limits else None, seed=args.seed)
@@ -0,0 +1,323 @@
+import asyncio
+import itertools
+import json
+import logging
+import random
+import sys
+import threading
+import time
+from heapq import heapify, heappop, heappush, nsmallest
+
+import websockets
+
+#--- Local L2 order books fed by diff-depth streams
+# Each book is built from a REST snapshot plus <symbol>@depth@100ms diff events, following
+# Binance's sync rules: buffer events, fetch the snapshot, drop events older than it, then
+# require every event's `pu` to equal the previous event's `u` -- any gap triggers a resync.
+
+logger = logging.getLogger(__name__)
+
+TESTNET_WS_URL = 'wss://fstream.binancefuture.com'
+MAINNET_WS_URL = 'wss://fstream.binance.com'
+SNAPSHOT_LIMIT = 1000
+RECONNECT_DELAY = 1.0
+MAX_SYNC_DELAY = 30.0 # backoff cap between failed snapshot attempts
+
+
+class PriceLevels:
+    """
+    One side of a book: a price -> quantity dict plus a heap of keys with the best level on top.
+    Updating a level is O(1) for a known price and O(log n) for a new one; removed levels are left
+    in the heap and skipped when they surface (the heap is rebuilt once they outnumber the live ones),
+    so the best price is amortized O(log n) to find. Bids are stored negated so the heap (a min-heap)
+    keeps the highest bid on top.
+    """
+
+    def __init__(self, is_ask):
+        self.sign = 1.0 if is_ask else -1.0
+        self.heap = [] # keys, possibly with removed or duplicate entries
+        self.quantities = {}
+
+    def update(self, price, quantity):
+        key = self.sign * price
+        if quantity == 0:
+            self.quantities.pop(key, None)
+            return
+        if key not in self.quantities:
+            heappush(self.heap, key)
+            if len(self.heap) > 2 * len(self.quantities) + 64:
+                self.heap = list(self.quantities)
+                self.heap.append(key)
+                heapify(self.heap)
+        self.quantities[key] = quantity
+
+    def clear(self):
+        self.heap.clear()
+        self.quantities.clear()
+
+    def best(self):
+        """:return: (price, quantity) of the best level, or None if the side is empty"""
+        heap, quantities = self.heap, self.quantities
+        while heap and heap[0] not in quantities:
+            heappop(heap)
+        if not heap:
+            return None
+        key = heap[0]
+        return self.sign * key, quantities[key]
+
+    def quantity_at(self, price):
+        return self.quantities.get(self.sign * price, 0.0)
+
+    def top(self, levels):
+        """:return: List of (price, quantity), best first"""
+        return [(self.sign * key, self.quantities[key]) for key in nsmallest(levels, self.quantities)]
+
+    def __len__(self):
+        return len(self.quantities)
+
+
+class OrderBook:
+    def __init__(self, symbol):
+        self.symbol = symbol.upper()
+        self.bids = PriceLevels(is_ask=False)
+        self.asks = PriceLevels(is_ask=True)
+        self.last_update_id = None
+        self.synced = False
+        self._first_event_applied = False
+        self._lock = threading.Lock()
+
+    def load_snapshot(self, snapshot):
+        """:param snapshot: futures_order_book response"""
+        with self._lock:
+            self.bids.clear()
+            self.asks.clear()
+            for price, quantity in snapshot['bids']:
+                self.bids.update(float(price), float(quantity))
+            for price, quantity in snapshot['asks']:
+                self.asks.update(float(price), float(quantity))
+            self.last_update_id = snapshot['lastUpdateId']
+            self._first_event_applied = False
+            self.synced = True
+
+    def apply_diff(self, event):
+        """
+        Applies one depthUpdate event.
+        :return: False if a sequence gap was detected (the book must be resynced), True otherwise
+        """
+        with self._lock:
+            if event['u'] < self.last_update_id:
+                return True # Already contained in the snapshot
+            if self._first_event_applied:
+                if event['pu'] != self.last_update_id:
+                    self.synced = False
+                    return False
+            elif event['U'] > self.last_update_id:
+                self.synced = False
+                return False
+
+            for price, quantity in event['b']:
+                self.bids.update(float(price), float(quantity))
+            for price, quantity in event['a']:
+                self.asks.update(float(price), float(quantity))
+            self.last_update_id = event['u']
+            self._first_event_applied = True
+            return True
+
+    def best_bid(self):
+        with self._lock:
+            return self.bids.best()
+
+    def best_ask(self):
+        with self._lock:
+            return self.asks.best()
+
+    def mid_price(self):
+        with self._lock:
+            bid, ask = self.bids.best(), self.asks.best()
+        if bid is None or ask is None:
+            return None
+        return (bid[0] + ask[0]) / 2
+
+    def depth_at(self, side, price):
+        """:param side: 'BID'/'BUY' or 'ASK'/'SELL'"""
+        levels = self.bids if side.upper() in ('BID', 'BUY') else self.asks
+        with self._lock:
+            return levels.quantity_at(float(price))
+
+    def top(self, levels=10):
+        with self._lock:
+            return {'bids': self.bids.top(levels), 'asks': self.asks.top(levels)}
+
+
+class DepthStream:
+    """Maintains OrderBooks for several symbols from one combined diff-depth WebSocket."""
+
+    def __init__(self, bot, symbols, ws_url=TESTNET_WS_URL, on_event=None):
+        """
+        :param bot: BasicBot used (through its rate limiter) for REST snapshots
+        :param on_event: Optional callback receiving every raw depth event (e.g. to record it)
+        """
+        self.bot = bot
+        self.ws_url = ws_url.rstrip('/')
+        self.books = {symbol.upper(): OrderBook(symbol) for symbol in symbols}
+        self.on_event = on_event
+        self._buffers = {symbol: [] for symbol in self.books}
+        self._sync_tasks = {} # symbol -> running _sync task
+        self._loop = None
+        self._thread = None
+        self._task = None
+        self._stopping = False
+
+    def start(self):
+        self._stopping = False
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_until_complete, args=(self._run(),),
+                                         name='depth-stream', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopping = True
+        if self._loop and self._task: # _run cancels the sync tasks on its way out
+            self._loop.call_soon_threadsafe(self._task.cancel)
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    async def _sync(self, symbol):
+        """
+        Fetches a snapshot and replays the events buffered while it was in flight. Failed snapshots and
+        replay gaps are retried with exponential backoff (the 1000-level snapshot costs 20 weight).
+        """
+        book = self.books[symbol]
+        delay = RECONNECT_DELAY
+        try:
+            for attempt in itertools.count():
+                if self._stopping:
+                    return
+                if attempt:
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, MAX_SYNC_DELAY)
+                try:
+                    snapshot = await asyncio.to_thread(self.bot._call, 'futures_order_book', symbol=symbol, limit=SNAPSHOT_LIMIT)
+                    book.load_snapshot(snapshot)
+                except Exception as e:
+                    logger.error(f"Could not sync {symbol} order book: {e}; retrying in {delay:.1f}s")
+                    book.synced = False
+                    continue
+                buffered, self._buffers[symbol] = self._buffers[symbol], []
+                for index, event in enumerate(buffered):
+                    if not book.apply_diff(event):
+                        # Keep the unreplayed events: the next snapshot drops whatever it already covers
+                        self._buffers[symbol] = buffered[index:] + self._buffers[symbol]
+                        logger.warning(f"{symbol} depth gap while replaying buffer; resyncing.")
+                        break
+                else:
+                    logger.info(f"{symbol} order book synced at update {book.last_update_id}")
+                    return
+        finally:
+            if self._sync_tasks.get(symbol) is asyncio.current_task():
+                del self._sync_tasks[symbol]
+
+    def _on_depth(self, event):
+        symbol = event['s']
+        book = self.books.get(symbol)
+        if book is None:
+            return
+        if self.on_event:
+            self.on_event(event)
+        if book.synced and book.apply_diff(event):
+            return
+        if symbol not in self._sync_tasks:
+            logger.info(f"{symbol} order book not synced; fetching snapshot.")
+            self._buffers[symbol] = []
+            self._sync_tasks[symbol] = asyncio.ensure_future(self._sync(symbol))
+        self._buffers[symbol].append(event)
+
+    async def _run(self):
+        self._task = asyncio.current_task()
+        streams = '/'.join(f"{symbol.lower()}@depth@100ms" for symbol in self.books)
+        try:
+            while not self._stopping:
+                try:
+                    async with websockets.connect(f"{self.ws_url}/stream?streams={streams}") as ws:
+                        logger.info(f"Depth stream connected for {', '.join(self.books)}")
+                        async for message in ws:
+                            self._on_depth(json.loads(message)['data'])
+                except Exception as e:
+                    logger.error(f"Depth stream error: {e}")
+                # Everything is stale after a disconnect: force a fresh snapshot per symbol. A sync still
+                # in flight would replay the old connection's buffer next to the new one's: cancel it
+                self._cancel_syncs()
+                for book in self.books.values():
+                    book.synced = False
+                await asyncio.sleep(RECONNECT_DELAY)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self._cancel_syncs()
+
+    def _cancel_syncs(self):
+        for task in self._sync_tasks.values():
+            task.cancel()
+        self._sync_tasks.clear()
+
+
+#--- Replay benchmark
+# Recording format (JSONL): first line is a futures_order_book snapshot, every following line a
+# raw depthUpdate event. Without a file a synthetic recording is generated.
+
+def _synthetic_recording(events=200000, levels=500, seed=7):
+    """Random updates on both sides of one moving mid; levels the mid moves through are removed."""
+    rng = random.Random(seed)
+    mid = 300000 # in 0.1 ticks
+    bids = set(range(mid - levels, mid))
+    asks = set(range(mid + 1, mid + levels + 1))
+    snapshot = {
+        'lastUpdateId': 2,
+        'bids': [[f"{tick / 10:.1f}", '1.0'] for tick in sorted(bids, reverse=True)],
+        'asks': [[f"{tick / 10:.1f}", '1.0'] for tick in sorted(asks)],
+    }
+    recording, update_id = [snapshot], 1
+    for _ in range(events):
+        mid += rng.choice((-1, 0, 1))
+        # The mid moves one tick at a time, so only the level it reached can cross: clear it
+        bid_updates = {mid: 0.0} if mid in bids else {}
+        ask_updates = {mid: 0.0} if mid in asks else {}
+        for _ in range(5):
+            bid_updates[mid - rng.randint(1, levels)] = rng.choice((0, rng.random() * 5))
+            ask_updates[mid + rng.randint(1, levels)] = rng.choice((0, rng.random() * 5))
+        for side, updates in ((bids, bid_updates), (asks, ask_updates)):
+            for tick, quantity in updates.items():
+                if float(f"{quantity:.3f}"):
+                    side.add(tick)
+                else:
+                    side.discard(tick)
+        recording.append({'e': 'depthUpdate', 's': 'BTCUSDT', 'U': update_id + 1, 'u': update_id + 3, 'pu': update_id,
+                          'b': [[f"{tick / 10:.1f}", f"{quantity:.3f}"] for tick, quantity in bid_updates.items()],
+                          'a': [[f"{tick / 10:.1f}", f"{quantity:.3f}"] for tick, quantity in ask_updates.items()]})
+        update_id += 3
+    return recording
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        with open(sys.argv[1]) as f:
+            recording = [json.loads(line) for line in f if line.strip()]
+    else:
+        recording = _synthetic_recording()
+
+    snapshot, events = recording[0], recording[1:]
+    book = OrderBook(events[0]['s'] if events else 'BTCUSDT')
+    book.load_snapshot(snapshot)
+
+    start = time.perf_counter()
+    gaps = 0
+    for event in events:
+        if not book.apply_diff(event):
+            gaps += 1
+    elapsed = time.perf_counter() - start
+
+    level_updates = sum(len(e['b']) + len(e['a']) for e in events)
+    print(f"Replayed {len(events)} depth events ({level_updates} level updates) in {elapsed:.3f}s")
+    print(f"  {len(events) / elapsed:,.0f} events/s, {level_updates / elapsed:,.0f} level updates/s, {gaps} gaps")
+    print(f"  Best bid {book.best_bid()}, best ask {book.best_ask()}, mid {book.mid_price()}")
@@ -0,0 +1,329 @@
+import json
+import logging
+import os
+import secrets
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+from binance.exceptions import BinanceAPIException
+
+#--- Durable order journal
+# Every order intent is written (and committed) to an append-only SQLite event log *before* it is
+# sent, under a deterministic client order ID: '<prefix><journal id>-<intent number>'. The ID alone
+# does not make a resend safe: Binance only rejects a reused ID while the first order is still open,
+# so a filled order would be filled again. An intent whose outcome is unknown is therefore looked up
+# by its client ID before it is sent again (needs_lookup(); BasicBot does this, and the retry policy
+# does it between attempts), and only resent if the exchange answers -2013 (order does not exist).
+# The exchange's answer is appended as another event. After a crash, reconcile() replays the log
+# and asks the exchange about every order whose outcome is not known yet.
+#
+# WAL mode with synchronous=NORMAL: a commit is an append to the WAL file (safe against process
+# crashes) and fsync happens in batches at checkpoints. Use synchronous='FULL' to also survive
+# power loss at the cost of one fsync per event.
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_JOURNAL_PATH = 'order_journal.db'
+DEFAULT_PREFIX = 'bb'
+
+# Conditional types go to the algo endpoint, which takes the client ID as clientAlgoId
+CONDITIONAL_TYPES = ('STOP', 'STOP_MARKET', 'TAKE_PROFIT', 'TAKE_PROFIT_MARKET', 'TRAILING_STOP_MARKET')
+
+# algoStatus of a conditional order -> the status of the regular order shape. TRIGGERED: the trigger
+# fired and the order it placed is working; FINISHED: that order is done
+ALGO_STATUSES = {'NEW': 'NEW', 'TRIGGERING': 'NEW', 'TRIGGERED': 'NEW', 'FINISHED': 'FILLED',
+                 'CANCELED': 'CANCELED', 'EXPIRED': 'EXPIRED', 'REJECTED': 'REJECTED'}
+
+# Statuses after which an order can no longer change
+TERMINAL_STATUSES = ('FILLED', 'CANCELED', 'EXPIRED', 'EXPIRED_IN_MATCH', 'REJECTED', 'NOT_SENT', 'MISSING')
+
+# Journal-only statuses: sent (or about to be) but no answer recorded
+STATUS_INTENT = 'INTENT'
+STATUS_UNKNOWN = 'UNKNOWN'
+STATUS_NOT_SENT = 'NOT_SENT' # reconciliation: the exchange never saw it, safe to submit again
+STATUS_MISSING = 'MISSING' # reconciliation: acknowledged once, no longer known to the exchange
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS events (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    time REAL NOT NULL,
+    client_order_id TEXT NOT NULL,
+    event TEXT NOT NULL,
+    symbol TEXT,
+    order_id INTEGER,
+    status TEXT,
+    data TEXT
+);
+CREATE INDEX IF NOT EXISTS events_client_order_id ON events (client_order_id);
+"""
+
+
+def client_order_id(params):
+    """:return: The client ID field set on futures_create_order params (None if there is none)"""
+    return params.get('newClientOrderId') or params.get('clientAlgoId')
+
+
+def assign_client_order_id(params, cid, batch=False):
+    """Sets `cid` on futures_create_order params in the field the endpoint expects."""
+    field = 'clientAlgoId' if params.get('type') in CONDITIONAL_TYPES and not batch else 'newClientOrderId'
+    params[field] = cid
+
+
+def normalize_order(order):
+    """
+    Maps a conditional order in the /fapi/v1/algoOrder shape (algoId, clientAlgoId, orderType,
+    quantity, triggerPrice, algoStatus) onto the regular order shape (orderId, clientOrderId, type,
+    origQty, stopPrice, status, executedQty). Regular orders are returned as they are.
+    """
+    if 'algoStatus' not in order:
+        return order
+    normalized = dict(order)
+    normalized.setdefault('orderId', order.get('algoId'))
+    normalized.setdefault('clientOrderId', order.get('clientAlgoId'))
+    normalized.setdefault('type', order.get('orderType'))
+    normalized.setdefault('origQty', order.get('quantity'))
+    normalized.setdefault('stopPrice', order.get('triggerPrice'))
+    normalized.setdefault('avgPrice', order.get('actualPrice'))
+    status = ALGO_STATUSES.get(order['algoStatus'], order['algoStatus'])
+    normalized['status'] = status
+    # The algo response has no fill quantity; a FINISHED order is taken as fully filled
+    normalized.setdefault('executedQty', order.get('quantity') if status == 'FILLED' else '0')
+    return normalized
+
+
+def new_client_order_id(prefix=DEFAULT_PREFIX):
+    """Random client order ID for orders placed without a journal (still fixed across retries)."""
+    return f"{prefix}-{uuid.uuid4().hex[:24]}"
+
+
+def is_unknown_outcome(error):
+    """True if the order may or may not have reached the exchange (timeouts, 5xx, connection errors)."""
+    if isinstance(error, BinanceAPIException):
+        # -1007: "Timeout waiting for response from backend server. Send status unknown"
+        return error.code == -1007 or (error.status_code or 0) >= 500
+    return True
+
+
+class OrderJournal:
+    def __init__(self, path=DEFAULT_JOURNAL_PATH, prefix=DEFAULT_PREFIX, synchronous='NORMAL'):
+        """
+        :param path: SQLite database file (owned by one bot process: it numbers the client order IDs)
+        :param prefix: Client order ID prefix (lets reconcile() recognise this bot's orders)
+        :param synchronous: SQLite synchronous level: 'NORMAL' (batched fsync) or 'FULL'
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute(f'PRAGMA synchronous={synchronous}')
+        self._db.executescript(SCHEMA)
+
+        row = self._db.execute("SELECT value FROM meta WHERE key = 'journal_id'").fetchone()
+        if row is None:
+            # Random per journal file: a fresh journal never reuses IDs an older one sent
+            journal_id = secrets.token_hex(4)
+            self._db.execute("INSERT INTO meta (key, value) VALUES ('journal_id', ?)", (journal_id,))
+        else:
+            journal_id = row[0]
+        self.id_prefix = f"{prefix}{journal_id}-"
+
+        self.orders = {} # client order ID -> latest known state
+        self._intents = 0
+        self._replay()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    #--- State
+
+    def _replay(self):
+        for _, when, cid, event, symbol, order_id, status, data in self._db.execute('SELECT * FROM events ORDER BY seq'):
+            self._apply(when, cid, event, symbol, order_id, status, data)
+        logger.info(f"Order journal {self.path}: {len(self.orders)} orders, {len(self.unresolved())} unresolved")
+
+    def _apply(self, when, cid, event, symbol, order_id, status, data):
+        if event == 'intent':
+            self._intents += 1
+            self.orders[cid] = {'client_order_id': cid, 'symbol': symbol, 'params': json.loads(data),
+                                'order_id': None, 'status': STATUS_INTENT, 'error': None, 'created': when, 'updated': when}
+            return
+        order = self.orders.get(cid)
+        if order is None:
+            return
+        if order_id is not None:
+            order['order_id'] = order_id
+        if status is not None:
+            order['status'] = status
+        if event in ('reject', 'unknown'):
+            order['error'] = data
+        order['updated'] = when
+
+    def _append(self, cid, event, symbol=None, order_id=None, status=None, data=None):
+        when = time.time()
+        self._db.execute('INSERT INTO events (time, client_order_id, event, symbol, order_id, status, data) '
+                         'VALUES (?, ?, ?, ?, ?, ?, ?)', (when, cid, event, symbol, order_id, status, data))
+        self._apply(when, cid, event, symbol, order_id, status, data)
+
+    def unresolved(self):
+        """:return: Orders whose final outcome is not known (no answer, or still open when last seen)"""
+        return [order for order in self.orders.values() if order['status'] not in TERMINAL_STATUSES]
+
+    #--- Recording
+
+    def record_intent(self, params, batch=False):
+        """
+        Assigns the next deterministic client order ID to `params` (in place) and durably records
+        the intent. A client ID already set by the caller is journaled as is. Call right before
+        sending. Resending an intent that is already journaled returns its ID unchanged; check
+        needs_lookup() first, the earlier send may have been filled.
+        :param batch: The order goes through the batch endpoint (always newClientOrderId)
+        :return: The client order ID
+        """
+        with self._lock:
+            existing = client_order_id(params)
+            if existing and existing in self.orders:
+                return existing # Retry of an intent already journaled
+            cid = existing or f"{self.id_prefix}{self._intents + 1}"
+            assign_client_order_id(params, cid, batch=batch)
+            self._append(cid, 'intent', symbol=params.get('symbol'), data=json.dumps(params, default=str))
+            return cid
+
+    def needs_lookup(self, cid):
+        """
+        :return: True if an earlier send of this client ID may have reached the exchange (outcome
+                 unknown, or acknowledged): look it up before sending it again
+        """
+        order = self.orders.get(cid)
+        return order is not None and order['status'] not in (STATUS_INTENT, STATUS_NOT_SENT, 'REJECTED')
+
+    def record_response(self, cid, response):
+        """Records an exchange order response (placement acknowledgement or later status)."""
+        if cid is None or cid not in self.orders:
+            return
+        response = normalize_order(response)
+        with self._lock:
+            self._append(cid, 'ack', order_id=response.get('orderId'), status=response.get('status'))
+
+    def record_error(self, cid, error, unknown=None):
+        """
+        Records a failed send: a definite rejection, or an unknown outcome to be reconciled.
+        :param error: Exception (or message)
+        :param unknown: Override the outcome classification (default: is_unknown_outcome(error))
+        """
+        if cid is None or cid not in self.orders:
+            return
+        if unknown is None:
+            unknown = is_unknown_outcome(error)
+        with self._lock:
+            if unknown:
+                self._append(cid, 'unknown', status=STATUS_UNKNOWN, data=str(error))
+            else:
+                self._append(cid, 'reject', status='REJECTED', data=str(error))
+
+    def record_status(self, order):
+        """Records any order response that carries one of our client order IDs (status checks, cancels)."""
+        cid = order.get('clientOrderId') or order.get('clientAlgoId')
+        if cid in self.orders:
+            self.record_response(cid, order)
+
+    #--- Crash recovery
+
+    def reconcile(self, bot):
+        """
+        Resolves every unresolved order against the exchange: open orders come from
+        BasicBot.fetch_open_orders (per symbol, regular and conditional), anything else is looked up
+        by client ID.
+        :param bot: BasicBot (its rate-limited _call is used)
+        :return: {'checked': n, 'open': n, 'resolved': n, 'not_sent': n, 'failed': n, 'orphans': [client IDs]}
+        """
+        pending = self.unresolved()
+        summary = {'checked': len(pending), 'open': 0, 'resolved': 0, 'not_sent': 0, 'failed': 0, 'orphans': []}
+        open_orders = {}
+        # Without pending orders, one all-symbol call still finds orphans
+        for symbol in sorted({order['symbol'] for order in pending}) or [None]:
+            try:
+                for order in bot.fetch_open_orders(symbol):
+                    open_orders[order.get('clientOrderId')] = order
+            except Exception as e:
+                logger.error(f"Reconciliation: could not fetch open orders for {symbol or 'all symbols'}: {e}")
+
+        for order in pending:
+            cid = order['client_order_id']
+            if cid in open_orders:
+                self._record_reconciled(cid, open_orders[cid])
+                summary['open'] += 1
+                continue
+            lookup = {'clientAlgoId': cid} if 'clientAlgoId' in order['params'] else {'origClientOrderId': cid}
+            try:
+                self._record_reconciled(cid, bot._call('futures_get_order', symbol=order['symbol'], **lookup))
+                summary['resolved'] += 1
+            except BinanceAPIException as e:
+                if e.code != -2013: # Order does not exist
+                    logger.error(f"Reconciliation: lookup of {cid} failed: {e}")
+                    summary['failed'] += 1
+                    continue
+                never_acknowledged = order['status'] in (STATUS_INTENT, STATUS_UNKNOWN)
+                with self._lock:
+                    self._append(cid, 'reconciled', status=STATUS_NOT_SENT if never_acknowledged else STATUS_MISSING)
+                summary['not_sent' if never_acknowledged else 'resolved'] += 1
+            except Exception as e:
+                logger.error(f"Reconciliation: lookup of {cid} failed: {e}")
+                summary['failed'] += 1
+
+        summary['orphans'] = [cid for cid in open_orders
+                              if cid and cid.startswith(self.id_prefix) and cid not in self.orders]
+        if summary['orphans']:
+            logger.warning(f"Reconciliation: open orders missing from the journal: {summary['orphans']}")
+        logger.info(f"Reconciliation finished: {summary}")
+        return summary
+
+    def _record_reconciled(self, cid, response):
+        response = normalize_order(response)
+        with self._lock:
+            self._append(cid, 'reconciled', order_id=response.get('orderId'), status=response.get('status'))
+
+
+#--- Benchmark: journal cost per order (intent + acknowledgement) against a mock-exchange round trip
+
+def _time_orders(journal, orders):
+    start = time.perf_counter()
+    for i in range(orders):
+        params = {'symbol': 'BTCUSDT', 'side': 'BUY', 'type': 'LIMIT', 'quantity': '0.010',
+                  'price': '20000.0', 'timeInForce': 'GTC'}
+        cid = journal.record_intent(params)
+        journal.record_response(cid, {'orderId': i, 'status': 'NEW', 'clientOrderId': cid})
+    return (time.perf_counter() - start) / orders
+
+
+if __name__ == "__main__":
+    orders = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    with tempfile.TemporaryDirectory() as tmp:
+        results = []
+        for synchronous in ('NORMAL', 'FULL'):
+            journal = OrderJournal(os.path.join(tmp, f'{synchronous}.db'), synchronous=synchronous)
+            results.append((synchronous, _time_orders(journal, orders)))
+            journal.close()
+
+        from mock_exchange import MockFuturesServer
+        from trading_bot import BasicBot
+        logging.getLogger('trading_bot').setLevel(logging.WARNING)
+        server = MockFuturesServer().start()
+        try:
+            bot = BasicBot('key', 'secret', base_url=server.base_url)
+            start = time.perf_counter()
+            for _ in range(200):
+                bot._call('futures_ping')
+            round_trip = (time.perf_counter() - start) / 200
+        finally:
+            server.stop()
+
+    print(f"Mock exchange round trip: {round_trip * 1e6:.0f} us (real exchange RTTs are typically 5-200 ms)")
+    for synchronous, per_order in results:
+        print(f"  synchronous={synchronous:6s} journal cost {per_order * 1e6:7.1f} us per order "
+              f"({per_order / round_trip:.1%} of the mock round trip)")
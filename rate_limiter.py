@@ -0,0 +1,410 @@
+import heapq
+import itertools
+import json
+import logging
+import multiprocessing
+import threading
+import time
+
+#--- Client-side rate limiting for the futures REST API
+# Binance USD-M futures enforces:
+#   * 2400 request weight per minute, per IP
+#   * 1200 orders per minute and 300 orders per 10 seconds, per account
+# Exceeding them returns 429, and repeated 429s escalate to 418 IP bans. Every BasicBot call
+# goes through a WeightScheduler, which queues calls until the budget allows them instead.
+#
+# The exchange counts in fixed windows aligned to the wall clock (each UTC minute / 10 seconds starts
+# from zero), so the scheduler budgets against the same windows. A token bucket refilling at
+# limit/interval would let a full bucket plus a minute of refill, about twice the limit, land in one
+# exchange minute. Calls wait in a priority queue with aging: cancels go first, but a queued call is
+# promoted one priority level for every `aging` calls that arrive after it, so a steady stream of
+# cancels can overtake a query only a bounded number of times. Aging counts arrivals rather than
+# seconds: the budget of a window is spent in bursts, and a call that waited a whole window
+# must not lose to one that arrived a moment ago.
+
+logger = logging.getLogger(__name__)
+
+# Request weight per python-binance client method (see the Binance futures API docs)
+ENDPOINT_WEIGHTS = {
+    'futures_ping': 1,
+    'futures_time': 1,
+    'futures_exchange_info': 1,
+    'futures_order_book': 10,
+    'futures_klines': 5,
+    'futures_aggregate_trades': 20,
+    'futures_create_order': 1,
+    'futures_place_batch_order': 5,
+    'futures_get_order': 1,
+    'futures_get_open_orders': 1,
+    'futures_cancel_order': 1,
+    'futures_cancel_orders': 1,
+    'futures_cancel_all_open_orders': 1,
+    'futures_account_balance': 5,
+    'futures_account': 5,
+    'futures_position_information': 5,
+    'futures_stream_get_listen_key': 1,
+    'futures_stream_keepalive': 1,
+}
+DEFAULT_WEIGHT = 1
+
+# Endpoints that cost much more when called without a symbol (i.e. for every symbol at once)
+ALL_SYMBOLS_WEIGHTS = {
+    'futures_get_open_orders': 40,
+}
+
+# Endpoints priced by their `limit` param: (largest limit, weight) steps; ENDPOINT_WEIGHTS is the
+# weight at the exchange's default limit
+LIMIT_WEIGHTS = {
+    'futures_order_book': ((50, 2), (100, 5), (500, 10), (1000, 20)),
+    'futures_klines': ((99, 1), (499, 2), (1000, 5), (1500, 10)),
+}
+
+# Calls that count against the order-rate limits: one order each, a batch counts every order in it
+ORDER_ENDPOINTS = ('futures_create_order', 'futures_place_batch_order')
+
+# Lower value = served first. Cancels go ahead of new orders, status/account queries last.
+PRIORITY_CANCEL = 0
+PRIORITY_ORDER = 1
+PRIORITY_QUERY = 2
+
+ENDPOINT_PRIORITIES = {
+    'futures_cancel_order': PRIORITY_CANCEL,
+    'futures_cancel_orders': PRIORITY_CANCEL,
+    'futures_cancel_all_open_orders': PRIORITY_CANCEL,
+    'futures_create_order': PRIORITY_ORDER,
+    'futures_place_batch_order': PRIORITY_ORDER,
+}
+
+# Later arrivals that promote a queued call by one priority level (None: strict priority)
+DEFAULT_AGING = 20
+
+
+def endpoint_weight(endpoint, params=None):
+    """:return: Request weight of calling `endpoint` with `params`"""
+    params = params or {}
+    if endpoint in ALL_SYMBOLS_WEIGHTS and not params.get('symbol'):
+        return ALL_SYMBOLS_WEIGHTS[endpoint]
+    steps = LIMIT_WEIGHTS.get(endpoint)
+    if steps and params.get('limit') is not None:
+        limit = int(params['limit'])
+        for largest, weight in steps:
+            if limit <= largest:
+                return weight
+        return steps[-1][1]
+    return ENDPOINT_WEIGHTS.get(endpoint, DEFAULT_WEIGHT)
+
+
+def endpoint_orders(endpoint, params=None):
+    """:return: Orders that calling `endpoint` with `params` counts against the order-rate limits"""
+    if endpoint not in ORDER_ENDPOINTS:
+        return 0
+    batch = (params or {}).get('batchOrders')
+    if batch is None:
+        return 1
+    if isinstance(batch, str): # Already JSON-encoded for the request
+        batch = json.loads(batch)
+    return len(batch)
+
+
+class FixedWindow:
+    def __init__(self, capacity, interval, clock=time.time):
+        """
+        :param capacity: Units allowed per window (the exchange limit)
+        :param interval: Window length in seconds; windows start at multiples of it on `clock`
+        :param clock: Wall clock the windows are aligned to (the exchange resets on UTC boundaries)
+        """
+        self.capacity = capacity
+        self.interval = interval
+        self.clock = clock
+        self.window = None
+        self.used = 0
+
+    def _roll(self):
+        now = self.clock()
+        window = int(now // self.interval)
+        if window != self.window:
+            self.window, self.used = window, 0
+        return now
+
+    @property
+    def tokens(self):
+        """Units left in the current window."""
+        self._roll()
+        return self.capacity - self.used
+
+    def wait_time(self, amount):
+        """Seconds until `amount` units fit in a window (0 if they already do)."""
+        now = self._roll()
+        if self.used + amount <= self.capacity:
+            return 0.0
+        return (self.window + 1) * self.interval - now
+
+    def take(self, amount):
+        self._roll()
+        self.used += amount
+
+    def reserve(self, amount):
+        """
+        Takes `amount` units if they fit in the current window.
+        :return: 0 if taken, else seconds until the next window
+        """
+        wait = self.wait_time(amount)
+        if not wait:
+            self.used += amount
+        return wait
+
+    def sync_used(self, used):
+        """
+        Resyncs with the exchange's own count for the current window. Only raises the local count: calls
+        admitted after the response was produced are not in the header yet.
+        """
+        self._roll()
+        self.used = max(self.used, used)
+
+
+class SharedFixedWindow(FixedWindow):
+    """
+    FixedWindow counted in shared memory, so several processes spend one budget (e.g. the per-IP
+    weight limit across worker processes). Pass it to the processes as a Process argument.
+    """
+
+    def __init__(self, capacity, interval, clock=time.time, context=None):
+        """:param context: multiprocessing context the worker processes are started from"""
+        self.capacity = capacity
+        self.interval = interval
+        self.clock = clock
+        self._shared = (context or multiprocessing).Array('q', [-1, 0]) # [window, used]
+
+    @property
+    def window(self):
+        return self._shared[0]
+
+    @window.setter
+    def window(self, value):
+        self._shared[0] = -1 if value is None else value
+
+    @property
+    def used(self):
+        return self._shared[1]
+
+    @used.setter
+    def used(self, value):
+        self._shared[1] = value
+
+    @property
+    def tokens(self):
+        with self._shared.get_lock():
+            return FixedWindow.tokens.fget(self)
+
+    def take(self, amount):
+        with self._shared.get_lock():
+            super().take(amount)
+
+    def reserve(self, amount):
+        with self._shared.get_lock():
+            return super().reserve(amount)
+
+    def sync_used(self, used):
+        with self._shared.get_lock():
+            super().sync_used(used)
+
+
+class WeightScheduler:
+    """
+    Blocking, priority-ordered admission control for REST calls.
+    Thread-safe: any number of threads may call acquire() concurrently.
+    """
+
+    def __init__(self, weight_limit=2400, order_limit=1200, order_limit_10s=300, interval=60, aging=DEFAULT_AGING, clock=time.time,
+                 weight_window=None):
+        """
+        :param weight_limit: Request weight allowed per `interval`
+        :param order_limit: Orders allowed per `interval`
+        :param order_limit_10s: Orders allowed per `interval / 6` (10 seconds by default)
+        :param interval: Window length in seconds (shrink it to speed up simulations)
+        :param aging: Later arrivals that promote a queued call by one priority level (None: strict priority)
+        :param clock: Wall clock the windows are aligned to
+        :param weight_window: Weight budget shared with other schedulers (e.g. a SharedFixedWindow for
+                              every bot on the IP); replaces weight_limit
+        """
+        self.weight_window = weight_window or FixedWindow(weight_limit, interval, clock)
+        self.order_window = FixedWindow(order_limit, interval, clock)
+        self.order_window_10s = FixedWindow(order_limit_10s, interval / 6, clock)
+        self.aging = aging
+
+        self._condition = threading.Condition()
+        self._queue = [] # heap of (aged priority, sequence)
+        self._sequence = itertools.count()
+        self._banned_until = 0.0
+
+        # Metrics
+        self.max_queue_depth = 0
+        self.total_calls = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _admit(self, weight, orders, now):
+        """
+        Takes the call's weight and orders if every limit allows them.
+        :return: 0 if admitted, else seconds to wait before trying again
+        """
+        wait = self._banned_until - now
+        if orders:
+            wait = max(wait,
+                       self.order_window.wait_time(orders),
+                       self.order_window_10s.wait_time(orders))
+        if wait > 0:
+            return wait
+        # Checked and taken in one step: the weight window may be shared with other processes
+        wait = self.weight_window.reserve(weight)
+        if wait > 0:
+            return wait
+        if orders:
+            self.order_window.take(orders)
+            self.order_window_10s.take(orders)
+        return 0.0
+
+    def acquire(self, endpoint, priority=None, params=None):
+        """
+        Blocks until `endpoint` may be called without exceeding any limit.
+        :param endpoint: python-binance client method name (e.g. 'futures_create_order')
+        :param priority: Optional override of the endpoint's default priority
+        :param params: The call's params (some endpoints are priced by 'symbol' or 'limit', batches by size)
+        :return: Seconds spent waiting
+        """
+        weight = endpoint_weight(endpoint, params)
+        orders = endpoint_orders(endpoint, params)
+        if priority is None:
+            priority = ENDPOINT_PRIORITIES.get(endpoint, PRIORITY_QUERY)
+
+        start = time.monotonic()
+        with self._condition:
+            # Aging: all queued calls gain priority at the same rate, so ranking by priority minus
+            # the arrivals seen since is the same as ranking by priority plus the arrival number
+            sequence = next(self._sequence)
+            rank = priority + sequence / self.aging if self.aging else priority
+            ticket = (rank, sequence)
+            heapq.heappush(self._queue, ticket)
+            self.max_queue_depth = max(self.max_queue_depth, len(self._queue))
+
+            while True:
+                now = time.monotonic()
+                if self._queue[0] == ticket:
+                    wait = self._admit(weight, orders, now)
+                    if wait <= 0:
+                        break
+                else:
+                    wait = None # Not our turn: sleep until the head of the queue moves
+                self._condition.wait(wait)
+
+            heapq.heappop(self._queue)
+
+            waited = now - start
+            self.total_calls += 1
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+            self._condition.notify_all()
+        return waited
+
+    def update_from_response(self, response):
+        """
+        Resyncs the windows from the exchange's rate-limit headers and honours Retry-After
+        on 429 (too many requests) / 418 (IP banned) responses.
+        :param response: requests.Response (or anything with .headers / .status_code), may be None
+        """
+        if response is None:
+            return
+        headers = response.headers
+        now = time.monotonic()
+        with self._condition:
+            used_weight = headers.get('X-MBX-USED-WEIGHT-1M') or headers.get('X-MBX-USED-WEIGHT-1m') or headers.get('X-MBX-USED-WEIGHT')
+            if used_weight is not None:
+                self.weight_window.sync_used(int(used_weight))
+            order_count = headers.get('X-MBX-ORDER-COUNT-1M') or headers.get('X-MBX-ORDER-COUNT-1m')
+            if order_count is not None:
+                self.order_window.sync_used(int(order_count))
+            order_count_10s = headers.get('X-MBX-ORDER-COUNT-10S') or headers.get('X-MBX-ORDER-COUNT-10s')
+            if order_count_10s is not None:
+                self.order_window_10s.sync_used(int(order_count_10s))
+
+            if getattr(response, 'status_code', None) in (418, 429):
+                retry_after = float(headers.get('Retry-After') or 1)
+                self._banned_until = max(self._banned_until, now + retry_after)
+                logger.warning(f"Rate limited by exchange (HTTP {response.status_code}); pausing requests for {retry_after}s")
+            self._condition.notify_all()
+
+    def stats(self):
+        """Snapshot of scheduler metrics."""
+        with self._condition:
+            return {
+                'queue_depth': len(self._queue),
+                'max_queue_depth': self.max_queue_depth,
+                'total_calls': self.total_calls,
+                'avg_wait': self.total_wait / self.total_calls if self.total_calls else 0.0,
+                'max_wait': self.max_wait,
+                'weight_available': self.weight_window.tokens,
+                'orders_available': self.order_window.tokens,
+            }
+
+
+#--- Simulated exchange: sustained load through the scheduler must stay at the limit without bans
+
+class _SimulatedExchange:
+    """Fixed-window weight accounting like the real exchange (windows aligned to the wall clock); counts would-be 429s."""
+
+    def __init__(self, weight_limit, interval):
+        self.weight_limit = weight_limit
+        self.interval = interval
+        self.window = None
+        self.used = 0
+        self.total_weight = 0
+        self.rejections = 0
+        self.windows = 0 # windows that saw a call
+        self.max_window_weight = 0
+        self._lock = threading.Lock()
+
+    def call(self, weight):
+        with self._lock:
+            window = int(time.time() // self.interval)
+            if window != self.window:
+                self.window, self.used = window, 0
+                self.windows += 1
+            if self.used + weight > self.weight_limit:
+                self.rejections += 1
+            else:
+                self.used += weight
+                self.total_weight += weight
+                self.max_window_weight = max(self.max_window_weight, self.used)
+
+
+if __name__ == "__main__":
+    weight_limit, interval, duration, workers = 200, 2.0, 10.0, 16
+    scheduler = WeightScheduler(weight_limit=weight_limit, order_limit=10**6, order_limit_10s=10**6, interval=interval)
+    exchange = _SimulatedExchange(weight_limit, interval)
+    endpoints = ['futures_create_order', 'futures_get_order', 'futures_cancel_order', 'futures_account_balance']
+    served = dict.fromkeys(endpoints, 0)
+    deadline = time.monotonic() + duration
+
+    def worker(index):
+        endpoint = endpoints[index % len(endpoints)]
+        while time.monotonic() < deadline:
+            scheduler.acquire(endpoint)
+            exchange.call(ENDPOINT_WEIGHTS[endpoint])
+            served[endpoint] += 1
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = scheduler.stats()
+    # Over the windows the run touched: dividing by the run time would count the partial first and
+    # last windows as if their budget were prorated
+    per_window = exchange.total_weight / exchange.windows
+    print(f"Weight per window: {per_window:.1f} over {exchange.windows} windows "
+          f"(limit {weight_limit}, {per_window / weight_limit:.0%} of limit)")
+    print(f"Exchange rejections (would-be 429s): {exchange.rejections}, busiest window: {exchange.max_window_weight}/{weight_limit}")
+    print(f"Calls served per endpoint: {served}")
+    print(f"Max queue depth: {stats['max_queue_depth']}, avg wait: {stats['avg_wait'] * 1000:.1f} ms, "
+          f"max wait: {stats['max_wait'] * 1000:.1f} ms")
@@ -0,0 +1,224 @@
+import logging
+import random
+import threading
+import time
+
+from binance.exceptions import BinanceAPIException, BinanceRequestException
+from requests.exceptions import ConnectionError as RequestsConnectionError, Timeout
+
+#--- Retry policy and circuit breaker for exchange calls
+# Every BasicBot REST call goes through RetryPolicy.call(), which classifies failures:
+#   * 'retryable'  - connection errors, timeouts, 5xx, 429 and Binance's transient codes:
+#                    retried with full-jitter exponential backoff
+#   * 'time_drift' - -1021 (timestamp outside recvWindow): the server clock offset is resynced
+#                    and the call retried at once
+#   * 'fatal'      - everything else (bad params, insufficient margin, ...): raised immediately.
+#                    This includes 418: the IP is banned, and every retry extends the ban.
+# Order placement is not idempotent: Binance only rejects a reused client order ID while the first
+# order is still open, so resending a MARKET order that already filled fills it again. Order calls
+# therefore pass a `resolve` hook: after a failure whose outcome is unknown, the order is looked up
+# by its client ID and only sent again if the exchange does not know it (-2013).
+#
+# The circuit breaker opens after `failure_threshold` consecutive retryable failures and then fails
+# calls immediately with CircuitOpenError for `reset_timeout` seconds, after which one probe call
+# is let through (half-open): success closes the circuit, failure reopens it.
+
+logger = logging.getLogger(__name__)
+
+# -1000 UNKNOWN, -1001 DISCONNECTED, -1003 TOO_MANY_REQUESTS, -1006 UNEXPECTED_RESP,
+# -1007 TIMEOUT, -1008 SERVER_BUSY
+RETRYABLE_CODES = (-1000, -1001, -1003, -1006, -1007, -1008)
+TIME_DRIFT_CODE = -1021
+
+RETRYABLE = 'retryable'
+TIME_DRIFT = 'time_drift'
+FATAL = 'fatal'
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the exchange while the circuit breaker is open."""
+
+
+def classify(error):
+    """:return: RETRYABLE, TIME_DRIFT or FATAL"""
+    if isinstance(error, BinanceAPIException):
+        if error.code == TIME_DRIFT_CODE:
+            return TIME_DRIFT
+        if error.status_code == 418: # IP ban: retrying only prolongs it
+            return FATAL
+        if error.code in RETRYABLE_CODES or (error.status_code or 0) >= 500 or error.status_code == 429:
+            return RETRYABLE
+        return FATAL
+    # BinanceRequestException: a non-JSON body, e.g. a gateway's HTML error page
+    if isinstance(error, (RequestsConnectionError, Timeout, BinanceRequestException)):
+        return RETRYABLE
+    return FATAL
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        """
+        :param failure_threshold: Consecutive retryable failures that open the circuit
+        :param reset_timeout: Seconds the circuit stays open before a probe call is allowed
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.opens = 0
+        self.short_circuited = 0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """:raises CircuitOpenError: while open (or while a half-open probe is already in flight)"""
+        with self._lock:
+            if self.state == OPEN:
+                remaining = self.opened_at + self.reset_timeout - time.monotonic()
+                if remaining > 0:
+                    self.short_circuited += 1
+                    raise CircuitOpenError(f"Exchange circuit open after {self.failures} consecutive failures; "
+                                           f"retrying in {remaining:.1f}s")
+                self.state = HALF_OPEN
+                logger.info("Circuit half-open: sending a probe request.")
+            if self.state == HALF_OPEN:
+                if self._probe_in_flight:
+                    self.short_circuited += 1
+                    raise CircuitOpenError("Exchange circuit half-open: probe request in flight")
+                self._probe_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            if self.state != CLOSED:
+                logger.info("Circuit closed: exchange is responding again.")
+            self.state = CLOSED
+            self.failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probe_in_flight = False
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.failure_threshold):
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self.opens += 1
+                logger.warning(f"Circuit opened after {self.failures} consecutive failures; "
+                               f"failing fast for {self.reset_timeout}s.")
+
+
+class RetryPolicy:
+    def __init__(self, max_attempts=4, base_delay=0.2, max_delay=5.0, breaker=None, sleep=time.sleep):
+        """
+        :param max_attempts: Attempts per call, including the first
+        :param base_delay: Backoff cap for the first retry; doubles per attempt up to max_delay
+        :param breaker: CircuitBreaker (a default one is created if omitted)
+        :param sleep: Sleep function (replaceable in simulations)
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = breaker or CircuitBreaker()
+        self.sleep = sleep
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.retries = {} # endpoint -> retries
+        self.retry_reasons = {} # error class name -> retries
+        self.gave_up = 0
+        self.time_syncs = 0
+
+    def backoff(self, attempt):
+        """Full jitter: uniform in [0, min(max_delay, base_delay * 2^attempt)]."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def call(self, function, endpoint=None, on_time_drift=None, resolve=None):
+        """
+        Runs function() with retries.
+        :param endpoint: Name used in the retry stats
+        :param on_time_drift: Called before retrying a -1021 error (should resync the clock offset)
+        :param resolve: For calls that must not take effect twice (order placement): called with the
+                        failed attempt's error before every resend. Returns the result if that attempt
+                        took effect after all, or None if it is safe to send again. If it raises, the
+                        failure counts as an attempt and the outcome is resolved again next time.
+        :raises CircuitOpenError: if the circuit breaker is open
+        """
+        with self._lock:
+            self.calls += 1
+        attempt = 0
+        failed = None # Error of the last attempt, still to be resolved before resending
+        while True:
+            self.breaker.before_call()
+            try:
+                result = resolve(failed) if failed is not None else None
+                failed = None
+                if result is None:
+                    result = function()
+            except Exception as e:
+                if resolve is not None and failed is None:
+                    failed = e
+                kind = classify(e)
+                if kind == RETRYABLE:
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success() # The exchange answered: it is up, the request was bad
+                if kind == FATAL:
+                    raise
+                attempt += 1
+                if attempt >= self.max_attempts:
+                    with self._lock:
+                        self.gave_up += 1
+                    logger.error(f"{endpoint}: giving up after {attempt} attempts: {e}")
+                    raise
+                with self._lock:
+                    self.retries[endpoint] = self.retries.get(endpoint, 0) + 1
+                    reason = f"{type(e).__name__}({e.code})" if isinstance(e, BinanceAPIException) else type(e).__name__
+                    self.retry_reasons[reason] = self.retry_reasons.get(reason, 0) + 1
+                if kind == TIME_DRIFT and on_time_drift:
+                    with self._lock:
+                        self.time_syncs += 1
+                    logger.warning(f"{endpoint}: request timestamp rejected (-1021); resyncing server time.")
+                    on_time_drift()
+                    continue
+                delay = self.backoff(attempt - 1)
+                logger.warning(f"{endpoint}: attempt {attempt} failed ({e}); retrying in {delay:.2f}s")
+                self.sleep(delay)
+                continue
+            self.breaker.record_success()
+            return result
+
+    def stats(self):
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'retries': sum(self.retries.values()),
+                'retries_by_endpoint': dict(self.retries),
+                'retries_by_reason': dict(self.retry_reasons),
+                'gave_up': self.gave_up,
+                'time_syncs': self.time_syncs,
+                'circuit_state': self.breaker.state,
+                'circuit_opens': self.breaker.opens,
+                'short_circuited': self.breaker.short_circuited,
+            }
+
+    def render_prometheus(self):
+        """:return: Retry counters in the Prometheus text exposition format"""
+        stats = self.stats()
+        lines = ['# HELP bot_request_retries_total Retried exchange calls by endpoint.',
+                 '# TYPE bot_request_retries_total counter']
+        lines += [f'bot_request_retries_total{{endpoint="{endpoint}"}} {count}'
+                  for endpoint, count in sorted(stats['retries_by_endpoint'].items())]
+        lines += ['# HELP bot_request_gave_up_total Calls that failed after the last retry.',
+                  '# TYPE bot_request_gave_up_total counter', f"bot_request_gave_up_total {stats['gave_up']}",
+                  '# HELP bot_time_syncs_total Server time resyncs after -1021 errors.',
+                  '# TYPE bot_time_syncs_total counter', f"bot_time_syncs_total {stats['time_syncs']}",
+                  '# HELP bot_circuit_open Whether the exchange circuit breaker is open (1) or not (0).',
+                  '# TYPE bot_circuit_open gauge', f"bot_circuit_open {int(stats['circuit_state'] != CLOSED)}",
+                  '# HELP bot_circuit_short_circuited_total Calls failed fast by the circuit breaker.',
+                  '# TYPE bot_circuit_short_circuited_total counter',
+                  f"bot_circuit_short_circuited_total {stats['short_circuited']}"]
+        return '\n'.join(lines) + '\n'
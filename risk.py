@@ -0,0 +1,451 @@
+import collections
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from exchange_info import OrderValidationError
+from order_journal import normalize_order
+from user_stream import _order_from_event
+
+#--- Local position and risk engine
+# Pre-trade checks run in memory on every order, before it is sent: no exchange round trip.
+# State is seeded from futures_account + futures_get_open_orders and kept current from order
+# responses and user-data events (ORDER_TRADE_UPDATE / ACCOUNT_UPDATE). Fills are tracked by
+# cumulative executed quantity per client order ID, so seeing the same fill in a REST response and
+# again in a stream event only counts the increase. Finished orders are forgotten from the open set
+# but their last executed quantity is kept (bounded, oldest first) so a late sighting of the same
+# fill, e.g. a get_order_status after the stream reported it, does not count it again. Conditional orders answered in the algo shape (clientAlgoId,
+# quantity, algoStatus) are normalized first, so their reservations are keyed and released the same way.
+#
+# Exposure is worst case: a symbol's position plus every open (or in-flight) order on the same
+# side filling. Limits (None disables a limit):
+#   max_order_notional     - notional of a single order
+#   max_position           - worst-case position size per symbol, in base asset
+#   max_position_notional  - worst-case position notional per symbol
+#   max_open_orders        - open orders per symbol
+#   max_total_open_orders  - open orders across the account
+#   max_leverage           - worst-case gross notional / equity across the account
+#   max_loss               - kill switch: once equity has fallen this far below its seeded value,
+#                            only orders that reduce a position are accepted
+#   leverage               - symbol leverage assumed when the account data does not report it
+# Rejections raise RiskRejected (an OrderValidationError, so callers already handle it) and are
+# appended to a JSON-lines audit log.
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_AUDIT_PATH = 'risk_audit.log'
+
+DEFAULT_LIMITS = {
+    'max_order_notional': None,
+    'max_position': None,
+    'max_position_notional': None,
+    'max_open_orders': None,
+    'max_total_open_orders': None,
+    'max_leverage': None,
+    'max_loss': None,
+    'leverage': 20,
+}
+# Limits that can be overridden per symbol
+SYMBOL_LIMITS = ('max_order_notional', 'max_position', 'max_position_notional', 'max_open_orders', 'leverage')
+
+OPEN_STATUSES = ('NEW', 'PARTIALLY_FILLED')
+# Finished orders whose executed quantity is remembered to ignore repeated sightings of their fills
+MAX_FINISHED_ORDERS = 10_000
+# An order may still be in flight between check() and the exchange's answer
+STATUS_PENDING = 'PENDING'
+
+
+class RiskRejected(OrderValidationError):
+    """Raised when an order breaks a risk limit and must not be sent."""
+
+    def __init__(self, rule, message):
+        super().__init__(message)
+        self.rule = rule
+
+
+def load_limits(path):
+    """
+    Reads risk limits from a JSON file: {"account": {...}, "symbols": {"BTCUSDT": {...}}}.
+    :return: (account limits, symbol limits)
+    """
+    with open(path) as f:
+        config = json.load(f)
+    return config.get('account', {}), config.get('symbols', {})
+
+
+class _SymbolState:
+    __slots__ = ('position', 'entry_price', 'open_buy', 'open_sell', 'open_orders', 'price', 'leverage')
+
+    def __init__(self):
+        self.position = 0.0 # signed, base asset
+        self.entry_price = 0.0
+        self.open_buy = 0.0 # unfilled quantity of open/pending BUY orders
+        self.open_sell = 0.0
+        self.open_orders = 0
+        self.price = None # last known price (fills, order prices, reference prices)
+        self.leverage = None
+
+
+class RiskEngine:
+    def __init__(self, limits=None, symbol_limits=None, audit_path=DEFAULT_AUDIT_PATH):
+        """
+        :param limits: Account-wide limits (see DEFAULT_LIMITS), also the default for every symbol
+        :param symbol_limits: {symbol: {limit: value}} per-symbol overrides
+        :param audit_path: JSON-lines file for rejected orders (None disables the file)
+        """
+        self.limits = dict(DEFAULT_LIMITS, **(limits or {}))
+        self.symbol_limits = {symbol.upper(): dict(overrides) for symbol, overrides in (symbol_limits or {}).items()}
+        for overrides in self.symbol_limits.values():
+            unknown = set(overrides) - set(SYMBOL_LIMITS)
+            if unknown:
+                raise ValueError(f"Limits that cannot be set per symbol: {', '.join(sorted(unknown))}")
+        self._limits_cache = {}
+        self.symbols = {} # symbol -> _SymbolState
+        self.orders = {} # client order ID -> {'symbol', 'side', 'quantity', 'executed', 'cost', 'status'}
+        self.finished = collections.OrderedDict() # client order ID -> (executed, cost) of finished orders
+        self.wallet_balance = 0.0
+        self.realized_pnl = 0.0
+        self.start_equity = None
+        self.killed = False
+        self.checks = 0
+        self.rejections = collections.Counter() # rule -> count
+        self.recent_rejections = collections.deque(maxlen=100)
+        self._audit = open(audit_path, 'a', buffering=1) if audit_path else None
+        self._lock = threading.Lock()
+
+    def close(self):
+        if self._audit:
+            self._audit.close()
+            self._audit = None
+
+    def _symbol_limits(self, symbol):
+        limits = self._limits_cache.get(symbol)
+        if limits is None:
+            limits = self._limits_cache[symbol] = dict(self.limits, **self.symbol_limits.get(symbol, {}))
+        return limits
+
+    def _state(self, symbol):
+        state = self.symbols.get(symbol)
+        if state is None:
+            state = self.symbols[symbol] = _SymbolState()
+        return state
+
+    #--- State updates
+
+    def seed(self, account, open_orders):
+        """
+        Replaces positions, balance and open orders with a REST snapshot.
+        :param account: futures_account response
+        :param open_orders: futures_get_open_orders response
+        """
+        with self._lock:
+            self.symbols = {}
+            self.orders = {}
+            self.wallet_balance = sum(float(a['walletBalance']) for a in account.get('assets', []) if a['asset'] in ('USDT', 'USDC', 'BUSD'))
+            for p in account.get('positions', []):
+                state = self._state(p['symbol'])
+                state.position = float(p.get('positionAmt', 0))
+                state.entry_price = float(p.get('entryPrice', 0))
+                if p.get('leverage'):
+                    state.leverage = float(p['leverage'])
+                if state.position and p.get('notional'):
+                    state.price = abs(float(p['notional']) / state.position)
+            for order in open_orders:
+                self._track(order)
+            if self.start_equity is None:
+                self.start_equity = self._equity()
+            self._update_kill_switch()
+        logger.info(f"Risk engine seeded: {sum(1 for s in self.symbols.values() if s.position)} positions, "
+                    f"{len(self.orders)} open orders, wallet {self.wallet_balance:.2f}")
+
+    def update_price(self, symbol, price):
+        """Feeds a mark/last price (used for MARKET order notionals and unrealized PnL)."""
+        with self._lock:
+            self._state(symbol.upper()).price = float(price)
+            self._update_kill_switch()
+
+    def on_order(self, order):
+        """Applies an order response or stream update (new, partially/fully filled, canceled...)."""
+        with self._lock:
+            self._track(order)
+            self._update_kill_switch()
+
+    def release(self, client_order_id):
+        """Drops an in-flight reservation whose order was rejected or never sent."""
+        with self._lock:
+            order = self.orders.pop(client_order_id, None)
+            if order:
+                self._remove_open(order)
+
+    def apply_event(self, event):
+        """Applies a user-data stream event."""
+        event_type = event.get('e')
+        if event_type == 'ORDER_TRADE_UPDATE':
+            self.on_order(_order_from_event(event['o'], event.get('E')))
+        elif event_type == 'ACCOUNT_UPDATE':
+            with self._lock:
+                account = event.get('a', {})
+                wallet = [float(b['wb']) for b in account.get('B', []) if b['a'] in ('USDT', 'USDC', 'BUSD')]
+                if wallet:
+                    self.wallet_balance = sum(wallet)
+                for p in account.get('P', []):
+                    state = self._state(p['s'])
+                    state.position = float(p['pa'])
+                    state.entry_price = float(p['ep'])
+                self._update_kill_switch()
+
+    def _track(self, order):
+        order = normalize_order(order)
+        cid = order.get('clientOrderId') or str(order.get('orderId'))
+        symbol = order['symbol']
+        state = self._state(symbol)
+        tracked = self.orders.get(cid)
+        if tracked is None:
+            finished = self.finished.get(cid)
+            tracked = {'symbol': symbol, 'side': order['side'], 'quantity': float(order.get('origQty') or 0),
+                       'executed': 0.0, 'cost': 0.0, 'status': None}
+            if finished is not None:
+                # Seen again after it finished (a late REST answer or status lookup): it stays finished,
+                # and only a fill beyond the one already counted applies
+                tracked['executed'], tracked['cost'] = finished
+                self._apply_new_fill(state, tracked, order)
+                self._finish(cid, tracked)
+                return
+            self.orders[cid] = tracked
+        if float(order.get('price') or 0):
+            state.price = float(order['price'])
+
+        self._apply_new_fill(state, tracked, order)
+        status = order.get('status')
+        was_open = tracked['status'] in OPEN_STATUSES or tracked['status'] == STATUS_PENDING
+        tracked['status'] = status
+        if status in OPEN_STATUSES:
+            if not was_open:
+                state.open_orders += 1
+            self._set_open_quantity(state, tracked)
+            return
+        if was_open:
+            self._remove_open(tracked)
+        del self.orders[cid]
+        self._finish(cid, tracked)
+
+    def _apply_new_fill(self, state, tracked, order):
+        # Fills: cumulative quantity only ever grows, so older or repeated updates add nothing
+        status = order.get('status')
+        executed = float(order.get('executedQty') or (order.get('origQty') if status == 'FILLED' else 0) or 0)
+        if executed > tracked['executed']:
+            average = float(order.get('avgPrice') or 0) or float(order.get('price') or 0) or state.price or 0.0
+            cost = average * executed
+            self._apply_fill(state, tracked['side'], executed - tracked['executed'], (cost - tracked['cost']) / (executed - tracked['executed']))
+            tracked['executed'], tracked['cost'] = executed, cost
+
+    def _finish(self, cid, tracked):
+        self.finished[cid] = (tracked['executed'], tracked['cost'])
+        self.finished.move_to_end(cid)
+        while len(self.finished) > MAX_FINISHED_ORDERS:
+            self.finished.popitem(last=False)
+
+    def _set_open_quantity(self, state, tracked):
+        remaining = tracked['quantity'] - tracked['executed']
+        previous = tracked.get('open', 0.0)
+        if tracked['side'] == 'BUY':
+            state.open_buy += remaining - previous
+        else:
+            state.open_sell += remaining - previous
+        tracked['open'] = remaining
+
+    def _remove_open(self, tracked):
+        state = self._state(tracked['symbol'])
+        if tracked['side'] == 'BUY':
+            state.open_buy -= tracked.get('open', 0.0)
+        else:
+            state.open_sell -= tracked.get('open', 0.0)
+        state.open_orders -= 1
+        tracked['open'] = 0.0
+
+    def _apply_fill(self, state, side, quantity, price):
+        signed = quantity if side == 'BUY' else -quantity
+        position = state.position
+        if position == 0 or (position > 0) == (signed > 0):
+            # Opening or adding: new average entry price
+            state.entry_price = (state.entry_price * abs(position) + price * quantity) / (abs(position) + quantity)
+        else:
+            closed = min(quantity, abs(position))
+            pnl = (price - state.entry_price) * closed * (1 if position > 0 else -1)
+            self.realized_pnl += pnl
+            self.wallet_balance += pnl
+            if quantity > abs(position): # Flipped: the remainder opens at the fill price
+                state.entry_price = price
+        state.position = position + signed
+        if state.position == 0:
+            state.entry_price = 0.0
+        state.price = price
+
+    #--- Equity and the kill switch
+
+    def _equity(self):
+        unrealized = sum((state.price - state.entry_price) * state.position
+                         for state in self.symbols.values() if state.position and state.price)
+        return self.wallet_balance + unrealized
+
+    def _update_kill_switch(self):
+        max_loss = self.limits['max_loss']
+        if max_loss is None or self.killed or self.start_equity is None:
+            return
+        loss = self.start_equity - self._equity()
+        if loss >= max_loss:
+            self.killed = True
+            logger.error(f"Risk kill switch engaged: loss {loss:.2f} reached the limit of {max_loss}. "
+                         f"Only position-reducing orders are accepted.")
+
+    def reset_kill_switch(self):
+        """Re-arms trading after a kill-switch stop, measuring further losses from the current equity."""
+        with self._lock:
+            self.killed = False
+            self.start_equity = self._equity()
+        logger.warning("Risk kill switch reset.")
+
+    #--- Pre-trade check
+
+    def check(self, params, reference_price=None):
+        """
+        Evaluates an order against the limits and, if it passes, reserves its exposure until the
+        exchange answers (on_order) or it is given up (release).
+        :param params: futures_create_order params (after filter rounding, with its client order ID)
+        :param reference_price: Price for MARKET orders (e.g. the local book's mid)
+        :raises RiskRejected: if the order breaks a limit (the rejection is audited)
+        """
+        with self._lock:
+            self.checks += 1
+            state, side, quantity, price = self._order_terms(params, reference_price)
+            try:
+                self._evaluate(state, self._symbol_limits(params['symbol']), side, quantity, price)
+            except RiskRejected as e:
+                self.rejections[e.rule] += 1
+                self._audit_rejection(params, price, e)
+                raise
+            cid = params.get('newClientOrderId') or params.get('clientAlgoId')
+            tracked = self.orders[cid] = {'symbol': params['symbol'], 'side': side, 'quantity': quantity, 'executed': 0.0,
+                                          'cost': 0.0, 'status': STATUS_PENDING}
+            state.open_orders += 1
+            self._set_open_quantity(state, tracked)
+
+    def evaluate(self, params, reference_price=None):
+        """
+        Dry run of check(): nothing is reserved or audited (e.g. to explain a rejection up front).
+        :raises RiskRejected: if the order breaks a limit
+        """
+        with self._lock:
+            state, side, quantity, price = self._order_terms(params, reference_price)
+            self._evaluate(state, self._symbol_limits(params['symbol']), side, quantity, price)
+
+    def _order_terms(self, params, reference_price):
+        state = self._state(params['symbol'])
+        price = float(params.get('price') or params.get('stopPrice') or 0) or reference_price or state.price
+        return state, params['side'], float(params['quantity']), price
+
+    def _evaluate(self, state, limits, side, quantity, price):
+        position = state.position
+        reduces = (position > 0 and side == 'SELL' and quantity <= position - state.open_sell) or \
+                  (position < 0 and side == 'BUY' and quantity <= -position - state.open_buy)
+        if self.killed and not reduces:
+            raise RiskRejected('kill_switch', "Kill switch engaged: only position-reducing orders are accepted.")
+
+        if limits['max_open_orders'] is not None and state.open_orders >= limits['max_open_orders']:
+            raise RiskRejected('max_open_orders', f"{state.open_orders} open orders already (limit {limits['max_open_orders']}).")
+        if self.limits['max_total_open_orders'] is not None and len(self.orders) >= self.limits['max_total_open_orders']:
+            raise RiskRejected('max_total_open_orders', f"{len(self.orders)} open orders on the account (limit {self.limits['max_total_open_orders']}).")
+        if reduces:
+            return
+
+        worst = position + state.open_buy + quantity if side == 'BUY' else position - state.open_sell - quantity
+        if limits['max_position'] is not None and abs(worst) > limits['max_position']:
+            raise RiskRejected('max_position', f"Worst-case position {worst:g} would exceed {limits['max_position']:g}.")
+
+        price_limits = (limits['max_order_notional'], limits['max_position_notional'], self.limits['max_leverage'])
+        if not price:
+            if any(limit is not None for limit in price_limits):
+                raise RiskRejected('no_price', "No price known to evaluate the notional limits.")
+            return
+        notional = quantity * price
+        if limits['max_order_notional'] is not None and notional > limits['max_order_notional']:
+            raise RiskRejected('max_order_notional', f"Order notional {notional:.2f} would exceed {limits['max_order_notional']:.2f}.")
+        if limits['max_position_notional'] is not None and abs(worst) * price > limits['max_position_notional']:
+            raise RiskRejected('max_position_notional', f"Worst-case position notional {abs(worst) * price:.2f} would exceed {limits['max_position_notional']:.2f}.")
+
+        # Margin: every symbol's worst-case exposure at its leverage must fit in the equity
+        equity = self._equity()
+        gross = notional
+        margin = notional / (state.leverage or limits['leverage'])
+        for symbol, other in self.symbols.items():
+            exposure = max(abs(other.position + other.open_buy), abs(other.position - other.open_sell)) * (other.price or 0.0)
+            gross += exposure
+            margin += exposure / (other.leverage or self._symbol_limits(symbol)['leverage'])
+        if margin > equity:
+            raise RiskRejected('margin', f"Required margin {margin:.2f} would exceed equity {equity:.2f}.")
+        if self.limits['max_leverage'] is not None and equity > 0 and gross / equity > self.limits['max_leverage']:
+            raise RiskRejected('max_leverage', f"Account leverage {gross / equity:.1f}x would exceed {self.limits['max_leverage']}x.")
+
+    def _audit_rejection(self, params, price, error):
+        entry = {'time': time.time(), 'rule': error.rule, 'reason': str(error), 'symbol': params['symbol'],
+                 'side': params['side'], 'type': params.get('type'), 'quantity': params['quantity'], 'price': price,
+                 'client_order_id': params.get('newClientOrderId') or params.get('clientAlgoId')}
+        self.recent_rejections.append(entry)
+        if self._audit:
+            self._audit.write(json.dumps(entry) + '\n')
+        logger.warning(f"Risk rejected {params['side']} {params['quantity']} {params['symbol']}: {error}")
+
+    def stats(self):
+        """:return: Check/rejection counters and the current exposure per symbol"""
+        with self._lock:
+            return {
+                'checks': self.checks,
+                'rejections': dict(self.rejections),
+                'killed': self.killed,
+                'equity': self._equity(),
+                'realized_pnl': self.realized_pnl,
+                'open_orders': len(self.orders),
+                'positions': {symbol: {'position': s.position, 'entry_price': s.entry_price, 'open_buy': s.open_buy,
+                                       'open_sell': s.open_sell, 'open_orders': s.open_orders}
+                              for symbol, s in self.symbols.items() if s.position or s.open_orders},
+            }
+
+
+#--- Benchmark: pre-trade checks per second
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    logging.getLogger().setLevel(logging.ERROR)
+    with tempfile.TemporaryDirectory() as directory:
+        audit_path = os.path.join(directory, 'risk_audit.log')
+        engine = RiskEngine({'max_order_notional': 50_000, 'max_position': 5, 'max_open_orders': 100,
+                             'max_leverage': 10, 'max_loss': 2_000}, {'ETHUSDT': {'max_position': 50}}, audit_path=audit_path)
+        account = {'assets': [{'asset': 'USDT', 'walletBalance': '100000'}],
+                   'positions': [{'symbol': 'BTCUSDT', 'positionAmt': '1.5', 'entryPrice': '30000', 'notional': '45000', 'leverage': '10'},
+                                 {'symbol': 'ETHUSDT', 'positionAmt': '-10', 'entryPrice': '2000', 'notional': '-20000', 'leverage': '10'}]}
+        engine.seed(account, [])
+
+        orders = [{'symbol': 'BTCUSDT', 'side': 'BUY', 'type': 'LIMIT', 'quantity': '0.010', 'price': '30000'},
+                  {'symbol': 'ETHUSDT', 'side': 'BUY', 'type': 'MARKET', 'quantity': '1.000'},
+                  {'symbol': 'BTCUSDT', 'side': 'BUY', 'type': 'LIMIT', 'quantity': '9.000', 'price': '30000'}] # rejected
+        started = time.perf_counter()
+        for n in range(iterations):
+            params = dict(orders[n % 3], newClientOrderId=f'bench-{n}')
+            try:
+                engine.check(params, reference_price=2000.0)
+                engine.release(params['newClientOrderId']) # Keep the state constant between checks
+            except RiskRejected:
+                pass
+        elapsed = time.perf_counter() - started
+        stats = engine.stats()
+        with open(audit_path) as f:
+            audited = sum(1 for _ in f)
+        print(f"{iterations:,} checks in {elapsed:.2f}s: {iterations / elapsed:,.0f} checks/s, "
+              f"{elapsed / iterations * 1e6:.2f} us/check (incl. reserve/release)")
+        print(f"Rejections: {stats['rejections']} ({audited:,} audit log lines)")
+        print(f"Sample audit entry: {engine.recent_rejections[-1]}")
+        engine.close()
@@ -0,0 +1,38 @@
+import logging
+import os
+import sys
+
+import pytest
+
+# The modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mock_exchange import MockFuturesServer
+from retry import CircuitBreaker, RetryPolicy
+from trading_bot import BasicBot
+
+
+@pytest.fixture(autouse=True)
+def _run_in_tmp_path(tmp_path, monkeypatch):
+    """The bot writes its exchange-info cache (and journals) to the working directory."""
+    monkeypatch.chdir(tmp_path)
+
+
+@pytest.fixture
+def server():
+    server = MockFuturesServer().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def new_bot(server):
+    """Factory for BasicBots on the mock exchange with fast retries."""
+    logging.getLogger('trading_bot').setLevel(logging.CRITICAL)
+
+    def new_bot(**options):
+        policy = RetryPolicy(base_delay=0.01, max_delay=0.05, breaker=CircuitBreaker(failure_threshold=5, reset_timeout=1.0))
+        bot = BasicBot('key', 'secret', base_url=server.base_url, retry_policy=policy, **options)
+        bot.client.REQUEST_TIMEOUT = 0.5
+        return bot
+    return new_bot
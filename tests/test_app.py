@@ -0,0 +1,20 @@
+import importlib
+import logging
+
+
+def test_importing_the_app_has_no_side_effects():
+    root = logging.getLogger()
+    handlers = list(root.handlers)
+    app_module = importlib.reload(importlib.import_module('app'))
+    assert root.handlers == handlers
+    assert not hasattr(app_module, 'app')
+
+
+def test_factory_serves_health_without_a_bot():
+    from app import create_app
+    app = create_app({'TESTING': True, 'BINANCE_TEST_API_KEY': None, 'BINANCE_TEST_API_SECRET': None,
+                      'BOT_SERVER_ADDRESS': None})
+    client = app.test_client()
+    assert client.get('/healthz').get_json() == {'status': 'ok'}
+    response = client.get('/readyz')
+    assert response.status_code == 503 and response.get_json()['ready'] is False
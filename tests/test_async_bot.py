@@ -0,0 +1,71 @@
+import asyncio
+
+from async_bot import AsyncBot
+from risk import RiskEngine
+
+ACCOUNT = {'assets': [{'asset': 'USDT', 'walletBalance': '100000'}], 'positions': []}
+
+
+def _run(bot, scenario):
+    async def main():
+        async with bot:
+            return await scenario(bot)
+    return asyncio.run(main())
+
+
+def _limit(price, quantity=0.01):
+    return {'type': 'LIMIT', 'symbol': 'BTCUSDT', 'side': 'BUY', 'quantity': quantity, 'price': price}
+
+
+def test_basket_results_are_per_order(server):
+    risk = RiskEngine({'max_order_notional': 1000}, audit_path=None)
+    risk.seed(ACCOUNT, [])
+    basket = [
+        _limit(20000),
+        _limit(20000, quantity=0.0001), # Below the minimum quantity
+        {'type': 'LIMIT', 'symbol': 'BTCUSDT', 'side': 'BUY', 'quantity': 0.01}, # No price
+        _limit(20000, quantity=1), # 20000 notional: over the risk limit
+        _limit(20001.04),
+    ]
+    results = _run(AsyncBot('key', 'secret', base_url=server.base_url, risk=risk), lambda bot: bot.submit_many(basket))
+
+    assert [result['error'] is None for result in results] == [True, False, False, False, True]
+    assert results[1]['error'].startswith('Rejected locally')
+    assert results[2]['error'].startswith('Rejected locally') and results[2]['request'] is None
+    assert results[3]['error'].startswith('Rejected by risk check')
+    assert results[4]['request']['price'] == '20001' # Rounded to the tick before sending
+    placed = {result['response']['clientOrderId'] for result in results if result['response']}
+    assert len(placed) == 2 and len(server.exchange.orders) == 2
+    assert risk.stats()['open_orders'] == 2 # Rejected orders hold no reservation
+
+
+def test_in_flight_requests_are_capped(server):
+    server.exchange.latency = 0.02
+    bot = AsyncBot('key', 'secret', base_url=server.base_url, max_in_flight=3)
+    in_flight, peak = 0, 0
+
+    async def scenario(bot):
+        nonlocal in_flight, peak
+        create_order = bot.client.futures_create_order
+
+        async def tracked(**params):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            try:
+                return await create_order(**params)
+            finally:
+                in_flight -= 1
+        bot.client.futures_create_order = tracked
+        return await bot.submit_many([_limit(20000 + n) for n in range(12)])
+
+    results = _run(bot, scenario)
+    assert all(result['response'] for result in results)
+    assert peak == 3
+
+
+def test_bot_built_outside_the_loop_runs_in_another_one(server):
+    bot = AsyncBot('key', 'secret', base_url=server.base_url, max_in_flight=2)
+    for _ in range(2): # A new event loop each time
+        results = _run(bot, lambda bot: bot.submit_many([_limit(20000), _limit(20001)]))
+        assert all(result['response'] for result in results)
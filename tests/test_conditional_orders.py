@@ -0,0 +1,148 @@
+import itertools
+
+import pytest
+
+from conditional_orders import (CANCELED, FILLED, WAITING, WORKING, ConditionalOrderEngine, _path, replay,
+                                replay_bot)
+
+
+class FakeBot:
+    """Answers every placement with a resting order; tests push the later updates themselves."""
+
+    def __init__(self):
+        self.order_listeners = []
+        self.placed = []
+        self.cancels = []
+        self._ids = itertools.count(100)
+
+    def _order(self, order_type, symbol, side, quantity, client_order_id, price=None):
+        order = {'orderId': next(self._ids), 'clientOrderId': client_order_id, 'symbol': symbol, 'side': side,
+                 'type': order_type, 'origQty': str(quantity), 'executedQty': '0', 'price': str(price or 0),
+                 'status': 'NEW'}
+        self.placed.append(order)
+        return order
+
+    def place_market_order(self, symbol, side, quantity, client_order_id=None):
+        return self._order('MARKET', symbol, side, quantity, client_order_id)
+
+    def place_limit_order(self, symbol, side, quantity, price, client_order_id=None):
+        return self._order('LIMIT', symbol, side, quantity, client_order_id, price)
+
+    def place_stop_limit_order(self, symbol, side, quantity, price, stop_price, client_order_id=None):
+        # Conditional orders are answered by the algo endpoint
+        algo_id = next(self._ids)
+        order = {'algoId': algo_id, 'clientAlgoId': client_order_id, 'symbol': symbol, 'side': side,
+                 'orderType': 'STOP', 'quantity': str(quantity), 'price': str(price), 'triggerPrice': str(stop_price),
+                 'algoStatus': 'NEW'}
+        self.placed.append(order)
+        return order
+
+    def cancel_order(self, symbol, order_id, conditional=False):
+        self.cancels.append((order_id, conditional))
+        if conditional:
+            return {'algoId': order_id, 'clientAlgoId': self._client_id(order_id), 'algoStatus': 'CANCELED'}
+        return {'orderId': order_id, 'clientOrderId': self._client_id(order_id), 'status': 'CANCELED',
+                'executedQty': '0'}
+
+    def get_order_status(self, symbol, order_id, conditional=False):
+        return None
+
+    def _client_id(self, order_id):
+        for order in self.placed:
+            if order_id in (order.get('orderId'), order.get('algoId')):
+                return order.get('clientOrderId') or order.get('clientAlgoId')
+
+
+@pytest.fixture
+def engine():
+    engine = ConditionalOrderEngine(FakeBot(), path=None, send_async=False)
+    yield engine
+    engine.stop()
+
+
+def _update(engine, leg, status, executed):
+    engine.on_order_update({'orderId': leg['order_id'], 'clientOrderId': leg['client_order_id'], 'status': status,
+                            'executedQty': str(executed), 'avgPrice': '29950'})
+
+
+def test_bracket_exits_cover_a_partially_filled_entry(engine):
+    group_id = engine.place_bracket('BTCUSDT', {'type': 'LIMIT', 'side': 'BUY', 'quantity': 0.01, 'price': 29950},
+                                    {'type': 'LIMIT', 'price': 30200}, {'type': 'STOP_MARKET', 'stop_price': 29800})
+    legs = engine.groups[group_id]['legs']
+    entry = legs['entry']
+    assert entry['state'] == WORKING
+
+    _update(engine, entry, 'PARTIALLY_FILLED', 0.004)
+    assert legs['tp']['state'] == WAITING and legs['sl']['state'] == WAITING
+
+    _update(engine, entry, 'CANCELED', 0.004)
+    assert entry['state'] == CANCELED and entry['executed'] == 0.004
+    assert legs['tp']['state'] == WORKING and legs['tp']['quantity'] == pytest.approx(0.004)
+    assert legs['sl']['quantity'] == pytest.approx(0.004)
+    take_profit = engine.bot.placed[-1]
+    assert take_profit['clientOrderId'] == legs['tp']['client_order_id'] and take_profit['side'] == 'SELL'
+
+
+def test_bracket_entry_cancelled_unfilled_cancels_the_exits(engine):
+    group_id = engine.place_bracket('BTCUSDT', {'type': 'LIMIT', 'side': 'BUY', 'quantity': 0.01, 'price': 29950},
+                                    {'type': 'LIMIT', 'price': 30200}, {'type': 'STOP_MARKET', 'stop_price': 29800})
+    group = engine.groups[group_id]
+    _update(engine, group['legs']['entry'], 'CANCELED', 0)
+    assert {leg['state'] for leg in group['legs'].values()} == {CANCELED}
+    assert group_id not in engine.groups and len(engine.bot.placed) == 1
+
+
+def test_oco_first_partial_fill_cancels_the_sibling(engine):
+    group_id = engine.place_oco('BTCUSDT', {'type': 'LIMIT', 'side': 'SELL', 'quantity': 0.02, 'price': 30300},
+                                {'type': 'LIMIT', 'side': 'BUY', 'quantity': 0.02, 'price': 29700})
+    legs = engine.groups[group_id]['legs']
+    _update(engine, legs['a'], 'PARTIALLY_FILLED', 0.005)
+    assert legs['b']['state'] == CANCELED
+    assert engine.bot.cancels == [(legs['b']['order_id'], False)]
+    assert legs['a']['state'] == WORKING
+
+    _update(engine, legs['a'], 'FILLED', 0.02)
+    assert legs['a']['state'] == FILLED and group_id not in engine.groups
+
+
+def test_stop_limit_leg_tracks_the_algo_order_shape(engine):
+    group_id = engine.place_oco('BTCUSDT', {'type': 'LIMIT', 'side': 'SELL', 'quantity': 0.02, 'price': 30300},
+                                {'type': 'STOP_LIMIT', 'side': 'SELL', 'quantity': 0.02, 'price': 29750,
+                                 'stop_price': 29800})
+    legs = engine.groups[group_id]['legs']
+    algo_order = engine.bot.placed[-1]
+    assert legs['b']['state'] == WORKING and legs['b']['order_id'] == algo_order['algoId']
+
+    engine.on_order_update(dict(algo_order, algoStatus='TRIGGERED'))
+    assert legs['b']['state'] == WORKING
+    engine.on_order_update(dict(algo_order, algoStatus='FINISHED', actualPrice='29760'))
+    assert legs['b']['state'] == FILLED and legs['b']['executed'] == 0.02
+    assert legs['a']['state'] == CANCELED and engine.bot.cancels == [(legs['a']['order_id'], False)]
+
+
+def test_filled_limit_leg_cancels_a_stop_limit_sibling_on_the_algo_endpoint(engine):
+    group_id = engine.place_oco('BTCUSDT', {'type': 'LIMIT', 'side': 'SELL', 'quantity': 0.02, 'price': 30300},
+                                {'type': 'STOP_LIMIT', 'side': 'SELL', 'quantity': 0.02, 'price': 29750,
+                                 'stop_price': 29800})
+    legs = engine.groups[group_id]['legs']
+    _update(engine, legs['a'], 'FILLED', 0.02)
+    assert engine.bot.cancels == [(legs['b']['order_id'], True)]
+    assert legs['b']['state'] == CANCELED and group_id not in engine.groups
+
+
+def test_bracket_stop_loss_replayed_on_the_simulated_exchange():
+    times, prices = _path([30000, 29940, 30100, 29700], step=5.0)
+    exchange, bot = replay_bot(times, prices)
+    engine = ConditionalOrderEngine(bot, path=None, send_async=False)
+    exchange.listeners.append(engine.on_order_update)
+    engine.on_price('BTCUSDT', float(prices[0]))
+    group_id = engine.place_bracket('BTCUSDT', {'type': 'LIMIT', 'side': 'BUY', 'quantity': 0.01, 'price': 29950},
+                                    {'type': 'LIMIT', 'price': 30200}, {'type': 'STOP_MARKET', 'stop_price': 29800})
+    group = engine.groups[group_id]
+    replay(engine, exchange, 'BTCUSDT', prices, start=1)
+    engine.stop()
+
+    states = {name: leg['state'] for name, leg in group['legs'].items()}
+    assert states == {'entry': FILLED, 'tp': CANCELED, 'sl': FILLED}
+    assert exchange.orders[group['legs']['tp']['order_id']]['status'] == 'CANCELED'
+    assert exchange.position == 0
@@ -0,0 +1,59 @@
+import time
+
+import pytest
+
+from exchange_info import OrderValidationError, SymbolFilterIndex
+
+EXCHANGE_INFO = {'symbols': [{'symbol': 'BTCUSDT', 'filters': [
+    {'filterType': 'PRICE_FILTER', 'tickSize': '0.10', 'minPrice': '100', 'maxPrice': '1000000'},
+    {'filterType': 'LOT_SIZE', 'stepSize': '0.001', 'minQty': '0.001', 'maxQty': '1000'},
+    {'filterType': 'MARKET_LOT_SIZE', 'stepSize': '0.001', 'minQty': '0.001', 'maxQty': '120'},
+    {'filterType': 'MIN_NOTIONAL', 'notional': '100'},
+]}]}
+
+
+class Fetcher:
+    def __init__(self, failing=False):
+        self.failing = failing
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.failing:
+            raise ConnectionError('exchangeInfo unavailable')
+        return EXCHANGE_INFO
+
+
+def test_orders_are_rounded_and_checked_locally():
+    index = SymbolFilterIndex(Fetcher(), cache_path=None)
+    params = index.apply({'symbol': 'btcusdt', 'type': 'LIMIT', 'quantity': 0.0129, 'price': 30000.06})
+    assert params['quantity'] == '0.012' and params['price'] == '30000.1'
+    with pytest.raises(OrderValidationError, match='notional'):
+        index.apply({'symbol': 'BTCUSDT', 'type': 'LIMIT', 'quantity': 0.001, 'price': 30000})
+    with pytest.raises(OrderValidationError, match='Unknown symbol'):
+        index.get('ETHBTC')
+
+
+def test_failed_refresh_is_not_retried_on_every_order():
+    fetch = Fetcher()
+    index = SymbolFilterIndex(fetch, cache_path=None, ttl=0, retry_interval=0.2)
+    assert index.get('BTCUSDT') is not None and fetch.calls == 1
+
+    fetch.failing = True
+    for _ in range(5):
+        assert index.get('BTCUSDT') is not None # The stale index keeps validating orders
+    assert fetch.calls == 2
+
+    time.sleep(0.25)
+    fetch.failing = False
+    index.get('BTCUSDT')
+    assert fetch.calls == 3 and index.failed_at is None
+
+
+def test_cache_survives_a_restart(tmp_path):
+    path = str(tmp_path / 'exchange_info.json')
+    SymbolFilterIndex(Fetcher(), cache_path=path).get('BTCUSDT')
+    fetch = Fetcher(failing=True)
+    index = SymbolFilterIndex(fetch, cache_path=path)
+    assert index.get('BTCUSDT').step_size == index.get('BTCUSDT').min_qty
+    assert fetch.calls == 0
@@ -0,0 +1,60 @@
+import io
+import logging
+
+import pytest
+
+from logging_setup import ResponseSamplingFilter, configure_logging, shutdown_logging
+
+BODY = {'orderId': 1, 'symbol': 'BTCUSDT', 'status': 'NEW', 'clientOrderId': 'full-body-marker'}
+
+
+@pytest.fixture
+def restore_logging():
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+    yield
+    shutdown_logging()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+    for handler in handlers:
+        root.addHandler(handler)
+    root.setLevel(level)
+
+
+def _log_responses(count):
+    log = logging.getLogger('test.sampling')
+    for _ in range(count):
+        log.info('Response: %s', BODY, extra={'response': BODY})
+
+
+@pytest.mark.parametrize('mode', ['sync', 'queue'])
+def test_handlers_agree_on_sampled_bodies(mode, tmp_path, restore_logging):
+    console = io.StringIO()
+    log_file = tmp_path / 'bot.log'
+    configure_logging(mode=mode, log_file=str(log_file), console_stream=console, body_sample_every={logging.INFO: 2})
+    _log_responses(6)
+    shutdown_logging()
+    for handler in logging.getLogger().handlers:
+        handler.flush()
+
+    file_lines = log_file.read_text().splitlines()
+    console_lines = console.getvalue().splitlines()
+    assert len(file_lines) == len(console_lines) == 6
+    full = [n for n, line in enumerate(file_lines) if 'full-body-marker' in line]
+    assert full == [n for n, line in enumerate(console_lines) if 'full-body-marker' in line]
+    assert len(full) == 3
+
+
+def test_filter_summarises_all_but_one_in_n():
+    sampling = ResponseSamplingFilter({logging.INFO: 3})
+    records = []
+    for n in range(6):
+        record = logging.LogRecord('test', logging.INFO, __file__, 0, "Response: %s", (BODY,), None)
+        record.response = BODY
+        assert sampling.filter(record)
+        assert sampling.filter(record) # A second handler reuses the decision
+        records.append(record)
+    full = [record.response is BODY for record in records]
+    assert full == [True, False, False, True, False, False]
+    assert records[1].getMessage() == "Response: {'symbol': 'BTCUSDT', 'orderId': 1, 'status': 'NEW'}"
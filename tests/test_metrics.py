@@ -0,0 +1,73 @@
+import threading
+
+import pytest
+
+from metrics import BotMetrics, _FakeClient
+
+ENDPOINT_PATHS = {'futures_ping': '/ping', 'futures_time': '/time'}
+
+
+class RecordingScheduler:
+    """Admits every call and records the responses the bot resyncs from."""
+
+    def __init__(self):
+        self.responses = []
+
+    def acquire(self, endpoint, params=None):
+        return 0.0
+
+    def update_from_response(self, response):
+        self.responses.append(response)
+
+
+def test_each_thread_sees_its_own_response(new_bot):
+    bot = new_bot(lazy=True)
+    metrics = bot.metrics
+    mismatches = []
+    barrier = threading.Barrier(4)
+
+    def worker(endpoint):
+        barrier.wait()
+        for _ in range(25):
+            with metrics.track(endpoint, bot.client) as call:
+                call.result = getattr(bot.client, endpoint)()
+            if not call.response.url.endswith(ENDPOINT_PATHS[endpoint]):
+                mismatches.append((endpoint, call.response.url))
+
+    threads = [threading.Thread(target=worker, args=(endpoint,)) for endpoint in ('futures_ping', 'futures_time') * 2]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert mismatches == []
+    assert metrics.rtt['futures_ping'].count == metrics.rtt['futures_time'].count == 50
+
+
+def test_failed_call_does_not_reuse_the_previous_response(new_bot):
+    scheduler = RecordingScheduler()
+    bot = new_bot(lazy=True, scheduler=scheduler)
+    bot._call_once('futures_ping', {})
+    assert scheduler.responses[-1].url.endswith('/ping')
+
+    def unreachable(**params):
+        raise ConnectionError('connection refused')
+    bot.client.futures_time = unreachable
+    with pytest.raises(ConnectionError):
+        bot._call_once('futures_time', {})
+    assert scheduler.responses[-1] is None
+    assert 'futures_time' not in bot.metrics.rtt
+    assert bot.metrics.errors == {('futures_time', 'other'): 1}
+
+
+def test_client_without_session_falls_back_to_its_response():
+    client = _FakeClient()
+    metrics = BotMetrics()
+    with metrics.track('futures_create_order', client) as call:
+        call.result = client.futures_create_order(symbol='BTCUSDT')
+    assert call.response is client.response
+
+    with pytest.raises(RuntimeError):
+        with metrics.track('futures_create_order', client) as call:
+            raise RuntimeError('failed before sending')
+    assert call.response is None
+    assert metrics.rtt['futures_create_order'].count == 1
@@ -0,0 +1,124 @@
+import asyncio
+import json
+import random
+import threading
+
+import order_book
+from order_book import DepthStream, OrderBook, PriceLevels, _synthetic_recording
+
+
+def _event(first, last, previous, bids=(), asks=()):
+    return {'e': 'depthUpdate', 's': 'BTCUSDT', 'U': first, 'u': last, 'pu': previous,
+            'b': [list(level) for level in bids], 'a': [list(level) for level in asks]}
+
+
+def test_price_levels_match_a_sorted_reference():
+    rng = random.Random(3)
+    bids, reference = PriceLevels(is_ask=False), {}
+    for _ in range(5000):
+        price = rng.randint(1, 300) / 10
+        quantity = rng.choice((0.0, rng.random()))
+        bids.update(price, quantity)
+        if quantity:
+            reference[price] = quantity
+        else:
+            reference.pop(price, None)
+        best = max(reference) if reference else None
+        assert bids.best() == ((best, reference[best]) if reference else None)
+    assert bids.top(5) == [(price, reference[price]) for price in sorted(reference, reverse=True)[:5]]
+    assert len(bids) == len(reference)
+    assert len(bids.heap) <= 2 * len(reference) + 65
+
+
+def test_diffs_follow_the_sync_rules():
+    book = OrderBook('BTCUSDT')
+    book.load_snapshot({'lastUpdateId': 10, 'bids': [['100.0', '1']], 'asks': [['101.0', '1']]})
+    assert book.apply_diff(_event(5, 9, 4, bids=[('100.0', '5')])) # Older than the snapshot: skipped
+    assert book.best_bid() == (100.0, 1.0)
+    assert book.apply_diff(_event(9, 12, 8, bids=[('100.5', '2')]))
+    assert book.apply_diff(_event(13, 14, 12, asks=[('101.0', '0')]))
+    assert book.best_bid() == (100.5, 2.0) and book.best_ask() is None
+    assert not book.apply_diff(_event(16, 17, 15)) # pu does not chain: gap
+    assert not book.synced
+
+
+def test_synthetic_recording_never_crosses():
+    recording = _synthetic_recording(events=5000, levels=50)
+    book = OrderBook('BTCUSDT')
+    book.load_snapshot(recording[0])
+    for event in recording[1:]:
+        assert book.apply_diff(event)
+        bid, ask = book.best_bid(), book.best_ask()
+        assert bid is None or ask is None or bid[0] < ask[0]
+
+
+class _Socket:
+    """One fake WebSocket connection: sends `messages`, then waits for `close_after` before dropping."""
+
+    def __init__(self, messages, close_after):
+        self.messages = messages
+        self.close_after = close_after
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    def __aiter__(self):
+        return self._receive()
+
+    async def _receive(self):
+        for message in self.messages:
+            yield json.dumps({'data': message})
+        while not self.close_after():
+            await asyncio.sleep(0.005)
+        raise ConnectionError('connection dropped')
+
+
+class _SnapshotBot:
+    """The first snapshot hangs until released; later ones answer at once."""
+
+    def __init__(self):
+        self.calls = 0
+        self.first_started = threading.Event()
+        self.release_first = threading.Event()
+
+    def _call(self, endpoint, **params):
+        self.calls += 1
+        if self.calls == 1:
+            self.first_started.set()
+            self.release_first.wait(5)
+            return {'lastUpdateId': 5, 'bids': [['99.0', '1']], 'asks': [['101.0', '1']]}
+        return {'lastUpdateId': 10, 'bids': [['100.0', '1']], 'asks': [['101.0', '1']]}
+
+
+def test_reconnect_cancels_the_sync_in_flight(monkeypatch):
+    bot = _SnapshotBot()
+    stream = DepthStream(bot, ['BTCUSDT'], ws_url='ws://test')
+    book = stream.books['BTCUSDT']
+    connections = iter([
+        _Socket([_event(6, 8, 5)], close_after=bot.first_started.is_set),
+        _Socket([_event(9, 11, 8, bids=[('100.5', '3')])], close_after=lambda: stream._stopping),
+    ])
+    monkeypatch.setattr(order_book.websockets, 'connect', lambda url: next(connections))
+    monkeypatch.setattr(order_book, 'RECONNECT_DELAY', 0.01)
+
+    async def scenario():
+        runner = asyncio.ensure_future(stream._run())
+        for _ in range(400):
+            await asyncio.sleep(0.005)
+            if book.synced and bot.calls == 2:
+                break
+        bot.release_first.set() # The stale snapshot arrives late: it must not be applied
+        await asyncio.sleep(0.1)
+        state = (bot.calls, book.synced, book.last_update_id, book.best_bid(), dict(stream._sync_tasks))
+        stream._stopping = True
+        await runner
+        return state
+
+    calls, synced, last_update_id, best_bid, sync_tasks = asyncio.run(scenario())
+    assert calls == 2
+    assert synced and last_update_id == 11
+    assert best_bid == (100.5, 3.0)
+    assert sync_tasks == {}
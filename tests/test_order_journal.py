@@ -0,0 +1,87 @@
+from order_journal import STATUS_MISSING, STATUS_NOT_SENT, STATUS_UNKNOWN, OrderJournal
+
+
+def _intent(journal, order_type='LIMIT', **fields):
+    params = {'symbol': 'BTCUSDT', 'side': 'BUY', 'type': order_type, 'quantity': '0.01'}
+    if order_type == 'LIMIT':
+        params.update(price='20000', timeInForce='GTC')
+    params.update(fields)
+    return params, journal.record_intent(params)
+
+
+def _place_directly(exchange, params):
+    """The send that reached the exchange before the "crash": its answer never got journaled."""
+    status, order = exchange.handle('POST', 'order', dict(params))
+    assert status == 200
+    return order
+
+
+def test_reconcile_resolves_every_crash_point(server, new_bot, tmp_path):
+    exchange = server.exchange
+    journal = OrderJournal(str(tmp_path / 'journal.db'))
+    resting_params, resting = _intent(journal)
+    _place_directly(exchange, resting_params)
+    filled_params, filled = _intent(journal, 'MARKET')
+    _place_directly(exchange, filled_params)
+    _, never_sent = _intent(journal)
+    _, acknowledged = _intent(journal)
+    journal.record_response(acknowledged, {'orderId': 999999, 'status': 'NEW'}) # No longer known to the exchange
+    journal.close()
+
+    # Restart: a new journal on the same file, reconciled against the exchange
+    journal = OrderJournal(str(tmp_path / 'journal.db'))
+    bot = new_bot(journal=journal)
+    summary = bot.reconcile_journal()
+
+    assert summary['checked'] == 4 and summary['failed'] == 0
+    assert journal.orders[resting]['status'] == 'NEW'
+    assert journal.orders[filled]['status'] == 'FILLED'
+    assert journal.orders[never_sent]['status'] == STATUS_NOT_SENT
+    assert journal.orders[acknowledged]['status'] == STATUS_MISSING
+    assert journal.unresolved() == [journal.orders[resting]]
+    journal.close()
+
+
+def test_resending_an_unknown_outcome_does_not_place_it_twice(server, new_bot, tmp_path):
+    journal = OrderJournal(str(tmp_path / 'journal.db'))
+    bot = new_bot(journal=journal)
+    params, cid = _intent(journal, 'MARKET')
+    _place_directly(server.exchange, params) # Filled, so the client ID is free again on the exchange
+    journal.record_error(cid, TimeoutError('read timed out'))
+    assert journal.orders[cid]['status'] == STATUS_UNKNOWN and journal.needs_lookup(cid)
+
+    before = len(server.exchange.orders)
+    order = bot.place_market_order('BTCUSDT', 'BUY', 0.01, client_order_id=cid)
+    assert order is not None and order['status'] == 'FILLED'
+    assert len(server.exchange.orders) == before
+    assert journal.orders[cid]['status'] == 'FILLED'
+    journal.close()
+
+
+def test_resending_a_not_sent_intent_places_it(server, new_bot, tmp_path):
+    journal = OrderJournal(str(tmp_path / 'journal.db'))
+    bot = new_bot(journal=journal)
+    _, cid = _intent(journal)
+    bot.reconcile_journal()
+    assert not journal.needs_lookup(cid)
+
+    before = len(server.exchange.orders)
+    order = bot.place_limit_order('BTCUSDT', 'BUY', 0.01, 20000, client_order_id=cid)
+    assert order is not None and order['clientOrderId'] == cid
+    assert len(server.exchange.orders) == before + 1
+    journal.close()
+
+
+def test_conditional_intent_is_reconciled_from_the_algo_endpoint(server, new_bot, tmp_path):
+    journal = OrderJournal(str(tmp_path / 'journal.db'))
+    params, cid = _intent(journal, 'STOP', price='19000', stopPrice='19100', timeInForce='GTC')
+    assert params['clientAlgoId'] == cid
+    algo_params = dict(params, algoType='CONDITIONAL', triggerPrice=params.pop('stopPrice'))
+    status, order = server.exchange.handle('POST', 'algoOrder', algo_params)
+    assert status == 200 and 'algoId' in order
+
+    bot = new_bot(journal=journal)
+    summary = bot.reconcile_journal()
+    assert summary['open'] == 1
+    assert journal.orders[cid]['status'] == 'NEW' and journal.orders[cid]['order_id'] == order['algoId']
+    journal.close()
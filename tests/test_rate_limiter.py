@@ -0,0 +1,128 @@
+import collections
+import json
+import threading
+import time
+
+from rate_limiter import FixedWindow, WeightScheduler, endpoint_orders, endpoint_weight
+
+
+class RecordingWindow(FixedWindow):
+    """Weight window that logs (window, weight) of every admitted call."""
+
+    def __init__(self, capacity, interval):
+        super().__init__(capacity, interval)
+        self.admitted = []
+
+    def reserve(self, amount):
+        wait = super().reserve(amount)
+        if not wait:
+            self.admitted.append((self.window, amount))
+        return wait
+
+
+class _Response:
+    def __init__(self, status_code, headers):
+        self.status_code = status_code
+        self.headers = headers
+
+
+def test_batches_count_every_order():
+    batch = [{'symbol': 'BTCUSDT', 'side': 'BUY', 'type': 'MARKET', 'quantity': '0.01'}] * 3
+    assert endpoint_orders('futures_place_batch_order', {'batchOrders': batch}) == 3
+    assert endpoint_orders('futures_place_batch_order', {'batchOrders': json.dumps(batch[:2])}) == 2
+    assert endpoint_orders('futures_create_order', {'symbol': 'BTCUSDT'}) == 1
+    assert endpoint_orders('futures_get_order', {'symbol': 'BTCUSDT'}) == 0
+
+    scheduler = WeightScheduler(order_limit=10, order_limit_10s=10)
+    scheduler.acquire('futures_place_batch_order', params={'batchOrders': batch})
+    scheduler.acquire('futures_create_order', params={'symbol': 'BTCUSDT'})
+    assert scheduler.order_window.used == scheduler.order_window_10s.used == 4
+
+
+def test_weights_follow_params():
+    assert endpoint_weight('futures_order_book', {'symbol': 'BTCUSDT', 'limit': 50}) == 2
+    assert endpoint_weight('futures_order_book', {'symbol': 'BTCUSDT', 'limit': 1000}) == 20
+    assert endpoint_weight('futures_get_open_orders', {}) == 40
+    assert endpoint_weight('futures_get_open_orders', {'symbol': 'BTCUSDT'}) == 1
+
+
+def test_weight_per_window_stays_within_the_limit():
+    limit, interval = 30, 0.2
+    window = RecordingWindow(limit, interval)
+    scheduler = WeightScheduler(order_limit=10**6, order_limit_10s=10**6, interval=interval, weight_window=window)
+    endpoints = ['futures_cancel_order', 'futures_create_order', 'futures_get_order', 'futures_account_balance']
+    deadline = time.monotonic() + 1.0
+
+    def worker(endpoint):
+        while time.monotonic() < deadline:
+            scheduler.acquire(endpoint)
+
+    threads = [threading.Thread(target=worker, args=(endpoints[n % 4],)) for n in range(12)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    per_window = collections.Counter()
+    for index, weight in window.admitted:
+        per_window[index] += weight
+    assert len(per_window) >= 4
+    assert max(per_window.values()) <= limit
+    # The budget is used, not just respected
+    assert sorted(per_window.values())[len(per_window) // 2] >= limit - 5
+
+
+def _admission_order(aging, cancels):
+    """
+    Queues one query and then `cancels` cancels while the scheduler is paused by a 429, and returns
+    the position at which the query (weight 5; cancels weigh 1) was admitted once the pause ends.
+    """
+    window = RecordingWindow(10**6, 60)
+    scheduler = WeightScheduler(aging=aging, weight_window=window)
+    scheduler.update_from_response(_Response(429, {'Retry-After': '0.3'}))
+    threads = []
+    for endpoint in ['futures_account_balance'] + ['futures_cancel_order'] * cancels:
+        thread = threading.Thread(target=scheduler.acquire, args=(endpoint,))
+        thread.start()
+        threads.append(thread)
+        while len(scheduler._queue) < len(threads): # Queue in a known order
+            time.sleep(0.001)
+    for thread in threads:
+        thread.join()
+    return [weight for _, weight in window.admitted].index(5)
+
+
+def test_cancels_go_first_under_strict_priority():
+    assert _admission_order(None, 20) == 20
+
+
+def test_aging_bounds_how_often_a_query_is_overtaken():
+    # Two priority levels behind: only the later arrivals numbered below 2 * aging go first
+    assert _admission_order(5, 20) == 9
+
+
+def _served_under_a_flood_of_cancels(aging):
+    scheduler = WeightScheduler(weight_limit=100, order_limit=10**6, order_limit_10s=10**6, interval=0.2, aging=aging)
+    served = collections.Counter()
+    deadline = time.monotonic() + 1.0
+
+    def worker(endpoint):
+        while time.monotonic() < deadline:
+            scheduler.acquire(endpoint)
+            served[endpoint] += 1
+
+    threads = [threading.Thread(target=worker, args=('futures_cancel_order',)) for _ in range(4)]
+    threads.append(threading.Thread(target=worker, args=('futures_get_order',)))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return served['futures_cancel_order'], served['futures_get_order']
+
+
+def test_queries_are_not_starved_by_a_flood_of_cancels():
+    cancels, queries = _served_under_a_flood_of_cancels(None)
+    assert queries <= 2 # Strict priority: the query only gets in when no cancel is queued
+    cancels, queries = _served_under_a_flood_of_cancels(5)
+    # About one query per 2 * aging arrivals; thread hand-offs make the closed loop a bit less even
+    assert queries >= cancels / 20
@@ -0,0 +1,126 @@
+import time
+
+from binance.exceptions import BinanceAPIException
+
+from mock_exchange import DISCONNECT, DROP_RESPONSE
+from retry import CLOSED, FATAL, OPEN, classify
+from trading_bot import DUPLICATE_CLIENT_ORDER_ID
+
+INTERNAL_ERROR = (503, {'code': -1001, 'msg': 'Internal error; unable to process your request. Please try again.'})
+
+
+class _Response:
+    """Stand-in for the requests.Response a BinanceAPIException is built from."""
+
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.text = ''
+        self.request = None
+
+
+def _limit_params(cid, price='20000'):
+    return {'symbol': 'BTCUSDT', 'side': 'BUY', 'type': 'LIMIT', 'quantity': '0.01', 'price': price,
+            'timeInForce': 'GTC', 'newClientOrderId': cid}
+
+
+def test_5xx_before_the_order_landed_is_looked_up_then_resent(server, new_bot):
+    bot = new_bot()
+    before = len(server.exchange.orders)
+    server.exchange.inject_fault(INTERNAL_ERROR, endpoint='order')
+    order = bot.place_limit_order('BTCUSDT', 'BUY', 0.01, 20000)
+    assert order is not None
+    assert len(server.exchange.orders) == before + 1
+    assert bot.retry_policy.stats()['retries'] == 1
+
+
+def test_lost_response_to_a_resting_order_is_not_resent(server, new_bot):
+    bot = new_bot()
+    before = len(server.exchange.orders)
+    server.exchange.inject_fault(DROP_RESPONSE, endpoint='order')
+    order = bot.place_limit_order('BTCUSDT', 'BUY', 0.01, 20000)
+    assert order is not None
+    assert len(server.exchange.orders) == before + 1
+
+
+def test_lost_response_to_a_filled_order_is_looked_up_not_resent(server, new_bot):
+    # Client IDs are only unique among open orders: resending a filled order would place it again
+    bot = new_bot()
+    before = len(server.exchange.orders)
+    server.exchange.inject_fault(DROP_RESPONSE, endpoint='order')
+    order = bot.place_market_order('BTCUSDT', 'BUY', 0.01)
+    assert order is not None and order['status'] == 'FILLED'
+    assert len(server.exchange.orders) == before + 1
+
+
+def test_lost_batch_response_resends_only_missing_orders(server, new_bot):
+    bot = new_bot()
+    before = len(server.exchange.orders)
+    server.exchange.inject_fault(DROP_RESPONSE, endpoint='batchOrders')
+    results = bot.place_batch_orders([{'type': 'LIMIT', 'symbol': 'BTCUSDT', 'side': 'BUY', 'quantity': 0.01, 'price': 20000 + i}
+                                      for i in range(3)])
+    assert [r['error'] for r in results] == [None] * 3
+    assert len(server.exchange.orders) == before + 3
+
+
+def test_duplicate_client_id_is_rejected_only_while_the_order_is_open(server):
+    exchange = server.exchange
+    status, first = exchange.handle('POST', 'order', _limit_params('dup-1'))
+    assert status == 200
+    status, answer = exchange.handle('POST', 'order', _limit_params('dup-1', price='20001'))
+    assert answer['code'] == DUPLICATE_CLIENT_ORDER_ID
+    exchange.handle('DELETE', 'order', {'symbol': 'BTCUSDT', 'orderId': str(first['orderId'])})
+    status, reused = exchange.handle('POST', 'order', _limit_params('dup-1'))
+    assert status == 200 and reused['orderId'] != first['orderId']
+
+
+def test_duplicate_client_id_returns_the_existing_order(server, new_bot):
+    bot = new_bot()
+    first = bot.place_limit_order('BTCUSDT', 'BUY', 0.01, 20000, client_order_id='dup-2')
+    again = bot.place_limit_order('BTCUSDT', 'BUY', 0.01, 20000, client_order_id='dup-2')
+    assert again is not None and again['orderId'] == first['orderId']
+    assert sum(o['clientOrderId'] == 'dup-2' for o in server.exchange.orders.values()) == 1
+
+
+def test_ip_ban_is_not_retried(server, new_bot):
+    bot = new_bot()
+    server.exchange.inject_fault((418, {'code': -1003, 'msg': 'Way too many requests; IP banned.'}), endpoint='order')
+    assert bot.place_limit_order('BTCUSDT', 'BUY', 0.01, 20000) is None
+    assert bot.retry_policy.stats()['retries'] == 0
+    assert classify(BinanceAPIException(_Response(418), 418, '{"code": -1003, "msg": "banned"}')) == FATAL
+
+
+def test_disconnect_and_timeout_are_retried(server, new_bot):
+    bot = new_bot()
+    server.exchange.inject_fault(DISCONNECT, endpoint='order')
+    server.exchange.inject_fault({'delay': 1.0}, endpoint='order') # Longer than the 0.5s request timeout
+    assert bot.place_market_order('BTCUSDT', 'BUY', 0.01) is not None
+    assert bot.retry_policy.stats()['retries'] >= 2
+
+
+def test_timestamp_error_resyncs_server_time(server, new_bot):
+    bot = new_bot()
+    server.exchange.clock_offset = 30.0 # Every signed request is outside recvWindow
+    assert bot.get_account_balance() is not None
+    assert bot.retry_policy.stats()['time_syncs'] == 1
+    assert bot.client.timestamp_offset > 25000
+
+
+def test_fatal_error_is_not_retried(server, new_bot):
+    bot = new_bot()
+    server.exchange.inject_fault((400, {'code': -2019, 'msg': 'Margin is insufficient.'}), endpoint='order')
+    assert bot.place_limit_order('BTCUSDT', 'BUY', 0.01, 20000) is None
+    assert bot.retry_policy.stats()['retries'] == 0
+
+
+def test_outage_opens_the_circuit_until_a_probe_succeeds(server, new_bot):
+    bot = new_bot()
+    order_id = bot.place_limit_order('BTCUSDT', 'BUY', 0.01, 20000)['orderId']
+    server.exchange.inject_fault(INTERNAL_ERROR, count=100)
+    assert [bot.get_order_status('BTCUSDT', order_id) for _ in range(10)] == [None] * 10
+    stats = bot.retry_policy.stats()
+    assert stats['circuit_state'] == OPEN and stats['short_circuited'] >= 8
+
+    server.exchange._faults.clear()
+    time.sleep(1.1) # reset_timeout of the new_bot breaker
+    assert bot.get_order_status('BTCUSDT', order_id) is not None
+    assert bot.retry_policy.breaker.state == CLOSED
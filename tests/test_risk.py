@@ -0,0 +1,71 @@
+import pytest
+
+from risk import MAX_FINISHED_ORDERS, RiskEngine, RiskRejected
+
+ACCOUNT = {'assets': [{'asset': 'USDT', 'walletBalance': '10000'}], 'positions': []}
+
+
+@pytest.fixture
+def engine():
+    engine = RiskEngine({'max_position': 1}, audit_path=None)
+    engine.seed(ACCOUNT, [])
+    yield engine
+    engine.close()
+
+
+def _filled(cid, side='BUY', quantity='0.01', price='30000'):
+    return {'orderId': 1, 'clientOrderId': cid, 'symbol': 'BTCUSDT', 'side': side, 'type': 'MARKET',
+            'status': 'FILLED', 'origQty': quantity, 'executedQty': quantity, 'avgPrice': price, 'price': '0'}
+
+
+def _trade_update(order):
+    return {'e': 'ORDER_TRADE_UPDATE', 'E': 1, 'o': {'i': order['orderId'], 's': order['symbol'], 'X': order['status'],
+                                                     'c': order['clientOrderId'], 'p': order['price'],
+                                                     'ap': order['avgPrice'], 'q': order['origQty'],
+                                                     'z': order['executedQty'], 'o': order['type'], 'S': order['side']}}
+
+
+def _position(engine):
+    return engine.symbols['BTCUSDT'].position
+
+
+def test_fill_seen_from_rest_and_stream_counts_once(engine):
+    params = {'symbol': 'BTCUSDT', 'side': 'BUY', 'type': 'MARKET', 'quantity': '0.01', 'newClientOrderId': 'a'}
+    engine.check(params, reference_price=30000)
+    order = _filled('a')
+    engine.on_order(order) # REST response
+    engine.apply_event(_trade_update(order)) # User-data stream
+    engine.on_order(dict(order)) # A later get_order_status
+    assert _position(engine) == pytest.approx(0.01)
+    assert engine.orders == {} and engine.symbols['BTCUSDT'].open_orders == 0
+
+    close = _filled('b', side='SELL', price='30100')
+    engine.apply_event(_trade_update(close)) # Stream first this time
+    engine.on_order(close)
+    assert _position(engine) == 0
+    assert engine.realized_pnl == pytest.approx(1.0)
+    assert engine.wallet_balance == pytest.approx(10001.0)
+
+
+def test_late_open_update_does_not_reopen_a_finished_order(engine):
+    params = {'symbol': 'BTCUSDT', 'side': 'BUY', 'type': 'LIMIT', 'quantity': '0.5', 'price': '30000',
+              'newClientOrderId': 'a'}
+    engine.check(params)
+    canceled = {'orderId': 1, 'clientOrderId': 'a', 'symbol': 'BTCUSDT', 'side': 'BUY', 'type': 'LIMIT',
+                'status': 'CANCELED', 'origQty': '0.5', 'executedQty': '0.2', 'avgPrice': '30000', 'price': '30000'}
+    engine.on_order(canceled)
+    engine.on_order(dict(canceled, status='NEW', executedQty='0')) # Out-of-order REST answer
+    state = engine.symbols['BTCUSDT']
+    assert state.open_orders == 0 and state.open_buy == 0
+    assert state.position == pytest.approx(0.2)
+    # The released exposure can be used again
+    engine.check(dict(params, quantity='0.8', newClientOrderId='b'))
+    with pytest.raises(RiskRejected):
+        engine.check(dict(params, quantity='0.1', newClientOrderId='c'))
+
+
+def test_finished_orders_are_bounded(engine):
+    for n in range(MAX_FINISHED_ORDERS + 5):
+        engine.on_order(_filled(f'o{n}', side='BUY' if n % 2 == 0 else 'SELL'))
+    assert len(engine.finished) == MAX_FINISHED_ORDERS
+    assert 'o0' not in engine.finished and f'o{MAX_FINISHED_ORDERS + 4}' in engine.finished
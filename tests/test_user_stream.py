@@ -0,0 +1,108 @@
+import asyncio
+import time
+
+import pytest
+
+import user_stream
+from mock_exchange import MockStreamServer
+from user_stream import AccountStateStore, UserDataStream
+
+
+def _trade_update(order_id, status, executed='0'):
+    return {'e': 'ORDER_TRADE_UPDATE', 'E': 1, 'o': {'i': order_id, 's': 'BTCUSDT', 'X': status, 'c': f'c{order_id}',
+                                                     'p': '20000', 'ap': '0', 'q': '0.01', 'z': executed,
+                                                     'o': 'LIMIT', 'S': 'BUY'}}
+
+
+def test_store_keeps_open_orders_and_a_bounded_window_of_finished_ones():
+    store = AccountStateStore(max_finished=3)
+    store.set_live(True)
+    for order_id in range(5):
+        store.apply_event(_trade_update(order_id, 'NEW'))
+    for order_id in range(4):
+        store.apply_event(_trade_update(order_id, 'FILLED', executed='0.01'))
+    assert list(store.orders) == ['4']
+    assert list(store.finished) == ['1', '2', '3']
+    assert store.get_order(3)['status'] == 'FILLED' and store.get_order(0) is None
+
+    version = store.version
+    assert store.wait_for_change(version, timeout=0.01) == version
+    store.apply_event(_trade_update(4, 'CANCELED'))
+    assert store.wait_for_change(version, timeout=0.01) != version
+    assert store.snapshot()['open_orders'] == []
+
+
+class _Bot:
+    def __init__(self, keepalive_failures=0):
+        self.risk = None
+        self.order_listeners = []
+        self.keepalive_failures = keepalive_failures
+        self.keepalives = 0
+
+    def _call(self, endpoint, **params):
+        assert endpoint == 'futures_stream_keepalive'
+        self.keepalives += 1
+        if self.keepalives <= self.keepalive_failures:
+            raise ConnectionError('keepalive failed')
+
+
+class _Socket:
+    def __init__(self):
+        self.closed = False
+
+    async def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def fast_keepalive(monkeypatch):
+    monkeypatch.setattr(user_stream, 'KEEPALIVE_INTERVAL', 0.02)
+    monkeypatch.setattr(user_stream, 'KEEPALIVE_RETRY_DELAY', 0.01)
+    monkeypatch.setattr(user_stream, 'LISTEN_KEY_TTL', 0.2)
+
+
+def _run_keepalive(bot, seconds):
+    stream, ws = UserDataStream(bot, ws_url='ws://test'), _Socket()
+
+    async def scenario():
+        task = asyncio.ensure_future(stream._keepalive(ws))
+        await asyncio.sleep(seconds)
+        done = task.done()
+        task.cancel()
+        return done
+    return asyncio.run(scenario()), ws
+
+
+def test_failed_keepalive_is_retried(fast_keepalive):
+    bot = _Bot(keepalive_failures=2)
+    done, ws = _run_keepalive(bot, 0.15)
+    assert not done and not ws.closed
+    assert bot.keepalives >= 4 # Two failures retried, then back on the normal interval
+
+
+def test_keepalive_closes_the_socket_before_the_key_expires(fast_keepalive):
+    bot = _Bot(keepalive_failures=10**6)
+    done, ws = _run_keepalive(bot, 0.4)
+    assert done and ws.closed # The reconnect path takes over with a new listen key
+
+
+def test_order_status_is_served_from_the_stream(server, new_bot):
+    ws = MockStreamServer(server.exchange).start()
+    try:
+        bot = new_bot()
+        failing = []
+        bot.order_listeners.append(lambda order: failing.append(1 / 0)) # Must not break the stream
+        order = bot.place_limit_order('BTCUSDT', 'BUY', 0.01, 20000)
+        bot.start_user_stream(ws.ws_url)
+        deadline = time.monotonic() + 5
+        while not bot.user_stream.store.live and time.monotonic() < deadline:
+            time.sleep(0.01)
+        bot.cancel_order('BTCUSDT', order['orderId'])
+        status = None
+        while (status is None or status['status'] != 'CANCELED') and time.monotonic() < deadline:
+            time.sleep(0.01)
+            status = bot.user_stream.store.get_order(order['orderId'])
+        assert status is not None and status['status'] == 'CANCELED'
+        bot.stop_user_stream()
+    finally:
+        ws.stop()
@@ -1,8 +1,20 @@
 import logging
+from logging_setup import configure_logging
 from binance.client import Client
 from binance.exceptions import BinanceAPIException, BinanceOrderException
 import os # For API keys from environment variables (recommended)
+import sys
+import threading
 import time
+from rate_limiter import WeightScheduler
+from exchange_info import SymbolFilterIndex, OrderValidationError
+from user_stream import UserDataStream, TESTNET_WS_URL, MAINNET_WS_URL
+from order_book import DepthStream
+from metrics import BotMetrics
+from order_journal import (OrderJournal, DEFAULT_JOURNAL_PATH, client_order_id, assign_client_order_id,
+                           new_client_order_id, is_unknown_outcome, normalize_order)
+from retry import RetryPolicy, classify, FATAL
+from risk import RiskEngine, RiskRejected, load_limits
 
 #--- Configuration
 
@@ -13,31 +25,98 @@ import time
 #Testnet URL
 TESTNET_BASE_URL = 'https://testnet.binancefuture.com'
 
+# Environment variables holding the Testnet API key and secret
+API_KEY_ENV = 'BINANCE_TEST_API_KEY'
+API_SECRET_ENV = 'BINANCE_TEST_API_SECRET'
+
+# Exchange limits for the batch endpoints
+BATCH_ORDER_SIZE = 5 # POST /fapi/v1/batchOrders
+BATCH_CANCEL_SIZE = 10 # DELETE /fapi/v1/batchOrders
+
+# Rejection code for a reused client order ID. Binance only checks IDs of *open* orders, so this
+# catches a resend of a resting order; a filled one is caught by the lookup before resending.
+DUPLICATE_CLIENT_ORDER_ID = -4116
+ORDER_NOT_FOUND = -2013
+
+# Seconds a successful exchange call vouches for connectivity before check_connectivity() pings again
+CONNECTIVITY_TTL = 30.0
+
 #--- Logging Setup
-logging.basicConfig(level=logging.INFO,
-                    format='%(asctime)s - %(levelname)s - %(message)s',
-                    handlers=[
-                        logging.FileHandler("trading_bot.log"), # Log to a file
-                        logging.StreamHandler() # Log to console
-                    ])
+# Importing this module configures nothing: entry points (the interactive CLI below, batch_cli.main,
+# bot_server.py, app.py) call configure_logging() themselves, so library users keep control of logging.
 
 logger = logging.getLogger(__name__)
 
+def build_order_params(order):
+    """
+    Turns an order spec into futures_create_order params.
+    :param order: Dict with 'type' (MARKET/LIMIT/STOP), 'symbol', 'side', 'quantity' and, where
+                  relevant, 'price' / 'stop_price'
+    """
+    order_type = order.get('type', 'MARKET').upper()
+    params = {'symbol': order['symbol'].upper(), 'side': order['side'].upper(), 'quantity': order['quantity']}
+    if order_type == 'MARKET':
+        params['type'] = 'MARKET'
+    elif order_type == 'LIMIT':
+        params.update({'type': 'LIMIT', 'price': order['price'], 'timeInForce': 'GTC'})
+    elif order_type in ('STOP', 'STOP_LIMIT'):
+        params.update({'type': 'STOP', 'price': order['price'], 'stopPrice': order['stop_price'], 'timeInForce': 'GTC'})
+    else:
+        raise ValueError(f"Unsupported order type: {order_type}")
+    return params
+
+def apply_base_url(client, base_url):
+    """Points a python-binance client's futures endpoints at base_url (e.g. a local mock exchange)."""
+    client.FUTURES_URL = client.FUTURES_TESTNET_URL = base_url.rstrip('/') + '/fapi'
+
 class BasicBot:
-    def __init__(self, api_key, api_secret, testnet=True):
+    def __init__(self, api_key, api_secret, testnet=True, base_url=None, scheduler=None, metrics=None, client=None, journal=None, retry_policy=None, risk=None, lazy=False):
+        """
+        :param lazy: Construct without network I/O. Connectivity is then proven by the first successful
+                     call, or checked in the background with connect(background=True).
+        """
         self.api_key = api_key
         self.api_secret = api_secret
+        self.testnet = testnet
+        self.user_stream = None # Started on demand by start_user_stream()
+        self.depth_stream = None # Started on demand by start_market_data()
+        # Every REST call is admitted through the scheduler so we stay inside the exchange's limits
+        self.scheduler = scheduler or WeightScheduler()
+        # Per-endpoint latency histograms, error counters and in-flight gauges (see metrics.py)
+        self.metrics = metrics or BotMetrics()
+        # Optional OrderJournal: intents are recorded before sending, under deterministic client order IDs
+        self.journal = journal
+        # Retries transient failures with backoff, resyncs the clock on -1021, trips a circuit breaker
+        self.retry_policy = retry_policy or RetryPolicy()
+        # Optional RiskEngine: every order is checked against position/exposure/margin limits before sending
+        self.risk = risk
+        # Callables receiving every order update the bot sees (user-data events, status and cancel responses)
+        self.order_listeners = []
+        # Last error message logged by each thread, so callers can report why a method returned None
+        self._errors = threading.local()
+        # Per-symbol LOT_SIZE / PRICE_FILTER / MIN_NOTIONAL index, loaded from disk or on first order
+        self.filters = SymbolFilterIndex(lambda: self._call('futures_exchange_info'))
+        # Set by the first successful exchange call; connection_error holds a failed background check
+        self.connected = threading.Event()
+        self.connection_error = None
+        self._last_success = None # time.monotonic() of the last successful call, for check_connectivity()
 
         try:
-            self.client = Client(api_key, api_secret, testnet=testnet)
-            if testnet:
-                self.client.FUTURES_URL = TESTNET_BASE_URL # Crucial for testnet futures
+            if client is not None:
+                # Pre-built client with the same futures_* methods (e.g. backtest.SimulatedExchange)
+                self.client = client
+            elif base_url:
+                # Custom endpoint (e.g. mock_exchange.py): skip the spot ping done by Client()
+                self.client = Client(api_key, api_secret, testnet=testnet, ping=False)
+                apply_base_url(self.client, base_url)
+            else:
+                # Lazy: skip the spot ping too, the futures endpoints are what we trade on
+                self.client = Client(api_key, api_secret, testnet=testnet, ping=not lazy)
+                if testnet:
+                    self.client.FUTURES_URL = TESTNET_BASE_URL # Crucial for testnet futures
 
-            # Test connectivity
-            self.client.futures_ping()
-            logger.info("Binance Futures Testnet connection successful.")
-            account_info = self.client.futures_account_balance()
-            logger.info(f"Account Balance: {account_info}")
+            if not lazy:
+                self.connect()
 
         except BinanceAPIException as e:
             logger.error(f"Binance API Exception on connection: {e}")
@@ -46,21 +125,354 @@ class BasicBot:
             logger.error(f"An unexpected error occurred during initialization: {e}")
             raise
 
+    def _call(self, endpoint, **params):
+        """
+        Calls a python-binance client method through the retry policy and the rate-limit scheduler.
+        :param endpoint: Client method name (e.g. 'futures_create_order')
+        :raises CircuitOpenError: if the exchange circuit breaker is open
+        """
+        return self.retry_policy.call(lambda: self._call_once(endpoint, params), endpoint=endpoint,
+                                      on_time_drift=self.sync_time)
+
+    def sync_time(self):
+        """
+        Measures the offset between the exchange clock and ours and applies it to request
+        timestamps (python-binance's timestamp_offset), which stops -1021 errors from clock drift.
+        :return: Offset in milliseconds
+        """
+        sent = time.time()
+        server_time = self._call_once('futures_time', {})['serverTime']
+        received = time.time()
+        self.client.timestamp_offset = server_time - (sent + received) / 2 * 1000
+        logger.info("Server time offset: %.0f ms", self.client.timestamp_offset)
+        return self.client.timestamp_offset
+
+    def connect(self, background=False):
+        """
+        Tests connectivity and logs the account balance; the constructor does this unless lazy=True.
+        :param background: Run on a daemon thread and return at once; a failure is logged and kept in
+                           connection_error
+        :return: The background thread, or the account balance
+        """
+        if background:
+            thread = threading.Thread(target=self._connect_in_background, name='bot-connect', daemon=True)
+            thread.start()
+            return thread
+        self._call('futures_ping')
+        logger.info("Binance Futures Testnet connection successful.")
+        account_info = self._call('futures_account_balance')
+        logger.info(f"Account Balance: {account_info}")
+        return account_info
+
+    def _connect_in_background(self):
+        try:
+            self.connect()
+        except Exception as e:
+            self.connection_error = str(e)
+            logger.error(f"Background connection check failed: {e}")
+
+    def wait_until_connected(self, timeout=None):
+        """:return: True once an exchange call has succeeded, False on timeout"""
+        return self.connected.wait(timeout)
+
+    def check_connectivity(self, max_age=CONNECTIVITY_TTL):
+        """
+        Cached connectivity check: any call that succeeded within max_age seconds counts, so only an
+        idle bot pays for a futures_ping.
+        :return: True if the exchange is reachable, False otherwise
+        """
+        if self._last_success is not None and time.monotonic() - self._last_success < max_age:
+            return True
+        try:
+            self._call('futures_ping')
+            return True
+        except Exception as e:
+            logger.warning(f"Connectivity check failed: {e}")
+            return False
+
+    def _call_once(self, endpoint, params):
+        self.scheduler.acquire(endpoint, params=params)
+        call = self.metrics.track(endpoint, self.client)
+        try:
+            with call:
+                call.result = getattr(self.client, endpoint)(**params)
+            self._last_success = time.monotonic()
+            if not self.connected.is_set():
+                self.connection_error = None
+                self.connected.set()
+            return call.result
+        finally:
+            # Resync with X-MBX-USED-WEIGHT-* headers (and back off on 429/418) from this call's own
+            # response; client.response may be another thread's, or stale if this call got none
+            self.scheduler.update_from_response(call.response)
+
+    def start_user_stream(self, ws_url=None):
+        """
+        Starts the user-data WebSocket listener; get_order_status then answers from its local
+        order store while the stream is connected.
+        :param ws_url: Optional WebSocket root (defaults to testnet/mainnet based on `testnet`)
+        """
+        if self.user_stream is None:
+            ws_url = ws_url or (TESTNET_WS_URL if self.testnet else MAINNET_WS_URL)
+            self.user_stream = UserDataStream(self, ws_url).start()
+        return self.user_stream
+
+    def stop_user_stream(self):
+        if self.user_stream:
+            self.user_stream.stop()
+            self.user_stream = None
+
+    def start_market_data(self, symbols, ws_url=None):
+        """
+        Starts local L2 order books for `symbols` from the diff-depth WebSocket stream.
+        :param symbols: List of trading symbols (e.g. ['BTCUSDT', 'ETHUSDT'])
+        :param ws_url: Optional WebSocket root (defaults to testnet/mainnet based on `testnet`)
+        """
+        if self.depth_stream is None:
+            ws_url = ws_url or (TESTNET_WS_URL if self.testnet else MAINNET_WS_URL)
+            self.depth_stream = DepthStream(self, symbols, ws_url).start()
+        return self.depth_stream
+
+    def stop_market_data(self):
+        if self.depth_stream:
+            self.depth_stream.stop()
+            self.depth_stream = None
+
+    def _book(self, symbol):
+        if self.depth_stream is None:
+            return None
+        book = self.depth_stream.books.get(symbol.upper())
+        return book if book and book.synced else None
+
+    def best_bid_ask(self, symbol):
+        """
+        :return: ((bid_price, bid_qty), (ask_price, ask_qty)) from the local book, or None if unavailable
+        """
+        book = self._book(symbol)
+        return (book.best_bid(), book.best_ask()) if book else None
+
+    def mid_price(self, symbol):
+        """:return: Mid price from the local book, or None if unavailable"""
+        book = self._book(symbol)
+        return book.mid_price() if book else None
+
+    def depth_at_price(self, symbol, side, price):
+        """
+        :param side: 'BUY'/'BID' or 'SELL'/'ASK'
+        :return: Resting quantity at price from the local book, or None if unavailable
+        """
+        book = self._book(symbol)
+        return book.depth_at(side, price) if book else None
+
+    def _prepare_order(self, params, client_order_id=None):
+        """
+        Validates and rounds order params against the cached symbol filters.
+        :return: True if the order may be sent, False if it was rejected locally
+        """
+        # MARKET orders have no price; the local book's mid (if running) prices the notional check
+        reference_price = self.mid_price(params['symbol'])
+        try:
+            self.filters.apply(params, reference_price=reference_price)
+        except OrderValidationError as e:
+            self._log_error(f"Order rejected locally (not sent): {e}")
+            return False
+        if client_order_id:
+            assign_client_order_id(params, client_order_id)
+        self._assign_client_id(params)
+        return self._check_risk(params, reference_price) is None
+
+    def _check_risk(self, params, reference_price):
+        """
+        Runs the pre-trade risk check for an order that already has its client order ID.
+        :return: Rejection message, or None if the order may be sent
+        """
+        if self.risk is None:
+            return None
+        try:
+            self.risk.check(params, reference_price=reference_price)
+            return None
+        except RiskRejected as e:
+            if self.journal:
+                self.journal.record_error(client_order_id(params), f"Risk: {e}", unknown=False)
+            self._log_error(f"Order rejected by risk check (not sent): {e}")
+            return str(e)
+
+    def _order_failed(self, params, error):
+        """Journals a failed send and frees its risk reservation unless the order may have landed."""
+        if self.journal:
+            self.journal.record_error(client_order_id(params), error)
+        if self.risk and not is_unknown_outcome(error):
+            self.risk.release(client_order_id(params))
+
+    def _order_update(self, order):
+        """Feeds an order response (status, cancel) to the journal, the risk engine and the order listeners."""
+        if self.journal:
+            self.journal.record_status(order)
+        if self.risk:
+            self.risk.on_order(order)
+        for listener in self.order_listeners:
+            listener(order)
+
+    def sync_risk(self):
+        """Seeds the risk engine's positions, balance and open orders from REST."""
+        self.risk.seed(self._call('futures_account'), self.fetch_open_orders())
+
+    def fetch_open_orders(self, symbol=None):
+        """
+        Open orders, regular and conditional: conditional types live on the algo endpoint and are
+        listed separately (openAlgoOrders). Errors are raised.
+        :param symbol: Optional symbol (default: all symbols)
+        :return: List of orders in the regular order shape (see order_journal.normalize_order)
+        """
+        params = {'symbol': symbol.upper()} if symbol else {}
+        orders = self._call('futures_get_open_orders', **params)
+        return orders + [normalize_order(order) for order in self._call('futures_get_open_orders', conditional=True, **params)]
+
+    def _assign_client_id(self, params, batch=False):
+        """Every order gets its client order ID before the first send, so a retry cannot place it twice."""
+        if self.journal:
+            self.journal.record_intent(params, batch=batch)
+        elif client_order_id(params) is None:
+            assign_client_order_id(params, new_client_order_id(), batch=batch)
+
+    @staticmethod
+    def _client_id_lookup(params):
+        """:return: futures_get_order params finding the order placed with `params` by its client ID"""
+        if 'clientAlgoId' in params:
+            return {'symbol': params['symbol'], 'clientAlgoId': params['clientAlgoId']}
+        return {'symbol': params['symbol'], 'origClientOrderId': params['newClientOrderId']}
+
+    def _find_duplicate(self, params):
+        """
+        Called on -4116 (ClientOrderId is duplicated): an earlier attempt of this order did reach
+        the exchange, so return that order instead of failing.
+        """
+        logger.warning("Order %s was already placed by an earlier attempt; using it.", client_order_id(params))
+        return self._call('futures_get_order', **self._client_id_lookup(params))
+
+    def _lookup_sent_order(self, params, error):
+        """
+        Asks the exchange whether an order with params' client ID exists (one attempt: the retry
+        policy repeats the lookup if it fails).
+        :param error: The failed send being resolved; re-raised if the lookup itself is rejected
+        :return: The order, or None if the exchange does not know it (-2013)
+        """
+        try:
+            return self._call_once('futures_get_order', self._client_id_lookup(params))
+        except BinanceAPIException as e:
+            if e.code == ORDER_NOT_FOUND:
+                return None
+            if classify(e) == FATAL:
+                logger.error("Lookup of order %s failed: %s", client_order_id(params), e)
+                raise error # Outcome still unknown: retried and looked up again, then reported as unknown
+            raise
+
+    def _resolve_send(self, params, error):
+        """
+        RetryPolicy resolve hook for order placement: after a failed send whose outcome is unknown
+        (timeout, dropped connection, 5xx), the order is resent only if the exchange never saw it.
+        :return: The order placed by the failed attempt, or None if it is safe to send again
+        """
+        if not is_unknown_outcome(error):
+            return None # Definite rejection (429, -1021, ...): nothing was placed
+        order = self._lookup_sent_order(params, error)
+        if order is not None:
+            logger.warning("Order %s was placed by an attempt whose response was lost; not resending.", client_order_id(params))
+        return order
+
+    def _resolve_batch(self, batch, error):
+        """
+        Resolve hook for batch placement: orders of the failed batch that reached the exchange are
+        kept and only the others are sent again.
+        :return: Positional responses like futures_place_batch_order's, or None to resend the whole batch
+        """
+        if not is_unknown_outcome(error):
+            return None
+        found = [self._lookup_sent_order(request, error) for request in batch]
+        if not any(found):
+            return None
+        missing = [request for request, order in zip(batch, found) if order is None]
+        logger.warning("Batch: %s of %s orders were placed by an attempt whose response was lost; resending %s.",
+                       len(batch) - len(missing), len(batch), len(missing))
+        resent = iter(self._call_once('futures_place_batch_order', {'batchOrders': missing}) if missing else [])
+        return [order if order is not None else next(resent) for order in found]
+
+    def _retry_lookup(self, params):
+        """:return: The order placed under params' client ID, or None if the exchange does not know it"""
+        try:
+            return self._call('futures_get_order', **self._client_id_lookup(params))
+        except BinanceAPIException as e:
+            if e.code == ORDER_NOT_FOUND:
+                return None
+            raise
+
+    def _send_order(self, endpoint, params, resolve):
+        """Like _call, but a retry after an unknown outcome first runs resolve(error) to see whether the order landed."""
+        return self.retry_policy.call(lambda: self._call_once(endpoint, params), endpoint=endpoint,
+                                      on_time_drift=self.sync_time, resolve=resolve)
+
+    def _create_order(self, params):
+        """Sends futures_create_order, journaling the exchange's answer (or the failure) when a journal is attached."""
+        if self.journal and self.journal.needs_lookup(client_order_id(params)):
+            # Resend of a journaled intent that may have landed: only send it if the exchange never saw it
+            order = self._retry_lookup(params)
+            if order is not None:
+                logger.warning("Order %s is already on the exchange; not resending.", client_order_id(params))
+                self._order_update(order)
+                return order
+        try:
+            order = self._send_order('futures_create_order', params, lambda error: self._resolve_send(params, error))
+        except BinanceAPIException as e:
+            if e.code != DUPLICATE_CLIENT_ORDER_ID:
+                self._order_failed(params, e)
+                raise
+            order = self._find_duplicate(params)
+        except Exception as e:
+            self._order_failed(params, e)
+            raise
+        if self.journal:
+            self.journal.record_response(client_order_id(params), order)
+        if self.risk:
+            self.risk.on_order(order)
+        return order
+
+    def reconcile_journal(self):
+        """
+        Crash recovery: resolves every journaled order whose outcome is unknown against the exchange.
+        :return: Reconciliation summary (see OrderJournal.reconcile), or None without a journal
+        """
+        if not self.journal:
+            return None
+        return self.journal.reconcile(self)
+
+    # %-style args: the message is only rendered by the handler (on the listener thread in queue mode)
     def _log_request(self, method_name, params):
-        logger.info(f"Request: {method_name} with params: {params}")
+        logger.info("Request: %s with params: %s", method_name, params,
+                    extra={'event': 'request', 'endpoint': method_name, 'params': params})
 
     def _log_response(self, response):
-        logger.info(f"Response: {response}")
+        logger.info("Response: %s", response, extra={'event': 'response', 'response': response})
 
     def _log_error(self, error_message):
+        self._errors.message = error_message
         logger.error(f'Error: {error_message}')
 
-    def place_market_order(self, symbol, side, quantity):
+    def last_error(self):
+        """
+        :return: The last error logged by the calling thread (why the last call returned None), or None
+        """
+        return getattr(self._errors, 'message', None)
+
+    def clear_error(self):
+        self._errors.message = None
+
+    def place_market_order(self, symbol, side, quantity, client_order_id=None):
         """
         Places a market order.
         :param symbol: Trading symbol (e.g., 'BTCUSDT')
         :param side: 'BUY' or 'SELL'
         :param quantity: Amount of the asset to buy/sell
+        :param client_order_id: Optional client order ID (default: assigned by the journal or generated)
         :return: Order response or None if error
         """
         params = {
@@ -69,11 +481,13 @@ class BasicBot:
             'type': 'MARKET',
             'quantity': quantity
         }
+        if not self._prepare_order(params, client_order_id):
+            return None
         self._log_request('futures_create_order (MARKET)', params)
         try:
-            order = self.client.futures_create_order(**params)
+            order = self._create_order(params)
             self._log_response(order)
-            logger.info(f"Market {side} order for {quantity} {symbol} placed successfully. Order ID: {order.get('orderId')}")
+            logger.info("Market %s order for %s %s placed successfully. Order ID: %s", side, quantity, symbol, order.get('orderId'))
             return order
         except BinanceAPIException as e:
             self._log_error(f"Binance API Exception placing market order: {e}")
@@ -85,13 +499,14 @@ class BasicBot:
             self._log_error(f"Unexpected error placing market order: {e}")
             return None
 
-    def place_limit_order(self, symbol, side, quantity, price):
+    def place_limit_order(self, symbol, side, quantity, price, client_order_id=None):
         """
         Places a limit order.
         :param symbol: Trading symbol (e.g., 'BTCUSDT')
         :param side: 'BUY' or 'SELL'
         :param quantity: Amount of the asset to buy/sell
         :param price: Price at which to place the order
+        :param client_order_id: Optional client order ID (default: assigned by the journal or generated)
         :return: Order response or None if error
         """
         params = {
@@ -102,11 +517,13 @@ class BasicBot:
             'price': price,
             'timeInForce': 'GTC' # Good Till Cancelled
         }
+        if not self._prepare_order(params, client_order_id):
+            return None
         self._log_request('futures_create_order (LIMIT)', params)
         try:
-            order = self.client.futures_create_order(**params)
+            order = self._create_order(params)
             self._log_response(order)
-            logger.info(f"Limit {side} order for {quantity} {symbol} at {price} placed successfully. Order ID: {order.get('orderId')}")
+            logger.info("Limit %s order for %s %s at %s placed successfully. Order ID: %s", side, quantity, symbol, price, order.get('orderId'))
             return order
         except BinanceAPIException as e:
             self._log_error(f"Binance API Exception placing limit order: {e}")
@@ -118,7 +535,7 @@ class BasicBot:
             self._log_error(f"Unexpected error placing limit order: {e}")
             return None
 
-    def place_stop_limit_order(self, symbol, side, quantity, price, stop_price):
+    def place_stop_limit_order(self, symbol, side, quantity, price, stop_price, client_order_id=None):
         """
         Places a stop-limit order.
         :param symbol: Trading symbol (e.g., 'BTCUSDT')
@@ -127,6 +544,7 @@ class BasicBot:
         :param price: The price at which the limit order will be placed once the stopPrice is
                       triggered.
         :param stop_price: The price at which the order becomes active.
+        :param client_order_id: Optional client order ID (default: assigned by the journal or generated)
         :return: Order response or None if error
         """
         params = {
@@ -140,13 +558,16 @@ class BasicBot:
             'timeInForce': 'GTC' # Or other if needed, GTC is common for stop orders
         }
 
+        if not self._prepare_order(params, client_order_id):
+            return None
         self._log_request('futures_create_order (STOP_LIMIT)', params) # Updated log message
 
         try:
-            order = self.client.futures_create_order(**params)
+            order = self._create_order(params)
             self._log_response(order)
             # Updated log message to reflect Stop-Limit order
-            logger.info(f"Stop-Limit {side} order for {quantity} {symbol} at limit {price} with stop price {stop_price} placed. Order ID: {order.get('orderId')}")
+            logger.info("Stop-Limit %s order for %s %s at limit %s with stop price %s placed. Order ID: %s",
+                        side, quantity, symbol, price, stop_price, normalize_order(order).get('orderId'))
             return order
         except BinanceAPIException as e:
             self._log_error(f"Binance API Exception placing stop-limit order: {e}")
@@ -159,19 +580,28 @@ class BasicBot:
             return None
 
 
-    def get_order_status(self, symbol, order_id):
+    def get_order_status(self, symbol, order_id, conditional=False):
         """
         Retrieves the status of a specific order.
         :param symbol: Trading symbol (e.g., 'BTCUSDT')
-        :param order_id: The order ID
+        :param order_id: The order ID (the algoId for a conditional order)
+        :param conditional: The order is a conditional (algo) order, e.g. from place_stop_limit_order
         :return: Order status or None if error
         """
-        params = {'symbol': symbol.upper(), 'orderId': order_id}
+        if self.user_stream and not conditional:
+            # Served from the user-data stream's store when it is live and knows the order
+            cached = self.user_stream.store.get_order(order_id)
+            if cached and cached['symbol'] == symbol.upper():
+                logger.info("Status for order ID %s (%s): %s (from user data stream)", order_id, symbol, cached.get('status'))
+                return cached
+
+        params = {'symbol': symbol.upper(), 'algoId' if conditional else 'orderId': order_id}
         self._log_request('futures_get_order', params)
         try:
-            order_status = self.client.futures_get_order(**params)
+            order_status = self._call('futures_get_order', **params)
             self._log_response(order_status)
-            logger.info(f"Status for order ID {order_id} ({symbol}): {order_status.get('status')}")
+            self._order_update(order_status)
+            logger.info("Status for order ID %s (%s): %s", order_id, symbol, normalize_order(order_status).get('status'))
             return order_status
         except BinanceAPIException as e:
             self._log_error(f"Binance API Exception fetching order status: {e}")
@@ -180,19 +610,21 @@ class BasicBot:
             self._log_error(f"Unexpected error fetching order status: {e}")
             return None
 
-    def cancel_order(self, symbol, order_id):
+    def cancel_order(self, symbol, order_id, conditional=False):
         """
         Cancels an open order.
         :param symbol: Trading symbol (e.g., 'BTCUSDT')
-        :param order_id: The order ID to cancel
+        :param order_id: The order ID to cancel (the algoId for a conditional order)
+        :param conditional: The order is a conditional (algo) order, e.g. from place_stop_limit_order
         :return: Cancellation response or None if error
         """
-        params = {'symbol': symbol.upper(), 'orderId': order_id}
+        params = {'symbol': symbol.upper(), 'algoId' if conditional else 'orderId': order_id}
         self._log_request('futures_cancel_order', params)
         try:
-            response = self.client.futures_cancel_order(**params)
+            response = self._call('futures_cancel_order', **params)
             self._log_response(response)
-            logger.info(f"Order ID {order_id} ({symbol}) cancelled successfully.")
+            self._order_update(response)
+            logger.info("Order ID %s (%s) cancelled successfully.", order_id, symbol)
             return response
         except BinanceAPIException as e:
             self._log_error(f"Binance API Exception cancelling order: {e}")
@@ -201,6 +633,183 @@ class BasicBot:
             self._log_error(f"Unexpected error cancelling order: {e}")
             return None
 
+    def place_batch_orders(self, orders):
+        """
+        Places several orders with /fapi/v1/batchOrders, 5 orders per request.
+        Each order is validated/rounded like the single-order methods; locally rejected orders
+        are reported without being sent.
+        :param orders: List of order specs (see build_order_params)
+        :return: One dict per input order, in input order:
+                 {'request': params, 'response': order response or None, 'error': message or None}
+        """
+        results = []
+        pending = [] # indexes into results still to be sent
+        for order in orders:
+            result = {'request': None, 'response': None, 'error': None}
+            results.append(result)
+            try:
+                params = build_order_params(order)
+                reference_price = self.mid_price(params['symbol'])
+                self.filters.apply(params, reference_price=reference_price)
+            except (OrderValidationError, ValueError, KeyError) as e:
+                result['error'] = f"Rejected locally: {e}"
+                self._log_error(f"Batch order rejected locally (not sent): {e}")
+                continue
+            self._assign_client_id(params, batch=True)
+            rejection = self._check_risk(params, reference_price)
+            if rejection:
+                result['error'] = f"Rejected by risk check: {rejection}"
+                continue
+            # The batch endpoint requires every value as a string
+            result['request'] = {k: str(v) for k, v in params.items()}
+            pending.append(len(results) - 1)
+
+        for start in range(0, len(pending), BATCH_ORDER_SIZE):
+            chunk = pending[start:start + BATCH_ORDER_SIZE]
+            batch = [dict(results[i]['request']) for i in chunk]
+            self._log_request('futures_place_batch_order', batch)
+            try:
+                responses = self._send_order('futures_place_batch_order', {'batchOrders': batch},
+                                             lambda error: self._resolve_batch(batch, error))
+                self._log_response(responses)
+            except (BinanceAPIException, BinanceOrderException) as e:
+                self._log_error(f"Binance API Exception placing batch orders: {e}")
+                self._batch_failed(batch, e)
+                responses = [{'code': getattr(e, 'code', None), 'msg': str(e)}] * len(chunk)
+            except Exception as e:
+                self._log_error(f"Unexpected error placing batch orders: {e}")
+                self._batch_failed(batch, e)
+                responses = [{'msg': str(e)}] * len(chunk)
+
+            # The response list is positional: an order dict or a {'code', 'msg'} error per order
+            for index, response in zip(chunk, responses):
+                if response.get('code') == DUPLICATE_CLIENT_ORDER_ID:
+                    # Still resting from an earlier send of this client ID
+                    try:
+                        response = self._find_duplicate(results[index]['request'])
+                    except Exception as e:
+                        response = {'code': getattr(e, 'code', None), 'msg': str(e)}
+                cid = client_order_id(results[index]['request'])
+                if 'orderId' in response:
+                    results[index]['response'] = response
+                    if self.journal:
+                        self.journal.record_response(cid, response)
+                    if self.risk:
+                        self.risk.on_order(response)
+                else:
+                    results[index]['error'] = f"{response.get('code')}: {response.get('msg')}"
+                    if 'code' in response:
+                        # A per-order error entry is a definite rejection of that order
+                        if self.journal:
+                            self.journal.record_error(cid, results[index]['error'], unknown=False)
+                        if self.risk:
+                            self.risk.release(cid)
+
+        failed = sum(1 for r in results if r['error'])
+        if failed:
+            self._log_error(f"Batch placement: {failed} of {len(results)} orders failed.")
+        logger.info("Batch placement: %s of %s orders placed.", len(results) - failed, len(results))
+        return results
+
+    def _batch_failed(self, batch, error):
+        for request in batch:
+            self._order_failed(request, error)
+
+    def cancel_batch_orders(self, symbol, order_ids):
+        """
+        Cancels several orders of one symbol with DELETE /fapi/v1/batchOrders, 10 per request.
+        :param symbol: Trading symbol (e.g., 'BTCUSDT')
+        :param order_ids: List of order IDs
+        :return: One dict per order ID, in input order:
+                 {'orderId': id, 'response': cancel response or None, 'error': message or None}
+        """
+        symbol = symbol.upper()
+        results = []
+        for start in range(0, len(order_ids), BATCH_CANCEL_SIZE):
+            chunk = [int(order_id) for order_id in order_ids[start:start + BATCH_CANCEL_SIZE]]
+            params = {'symbol': symbol, 'orderidlist': chunk}
+            self._log_request('futures_cancel_orders', params)
+            try:
+                responses = self._call('futures_cancel_orders', **params)
+                self._log_response(responses)
+            except BinanceAPIException as e:
+                self._log_error(f"Binance API Exception cancelling batch orders: {e}")
+                responses = [{'code': e.code, 'msg': e.message}] * len(chunk)
+            except Exception as e:
+                self._log_error(f"Unexpected error cancelling batch orders: {e}")
+                responses = [{'msg': str(e)}] * len(chunk)
+
+            for order_id, response in zip(chunk, responses):
+                if 'orderId' in response:
+                    results.append({'orderId': order_id, 'response': response, 'error': None})
+                    if self.risk:
+                        self.risk.on_order(response)
+                else:
+                    results.append({'orderId': order_id, 'response': None,
+                                    'error': f"{response.get('code')}: {response.get('msg')}"})
+
+        failed = sum(1 for r in results if r['error'])
+        if failed:
+            self._log_error(f"Batch cancel: {failed} of {len(results)} cancellations failed.")
+        logger.info("Batch cancel: %s of %s orders cancelled (%s).", len(results) - failed, len(results), symbol)
+        return results
+
+    def cancel_all_open_orders(self, symbol):
+        """
+        Cancels every open order on a symbol in a single request.
+        :param symbol: Trading symbol (e.g., 'BTCUSDT')
+        :return: Exchange response or None if error
+        """
+        params = {'symbol': symbol.upper()}
+        self._log_request('futures_cancel_all_open_orders', params)
+        try:
+            response = self._call('futures_cancel_all_open_orders', **params)
+            self._log_response(response)
+            logger.info("All open orders on %s cancelled.", symbol)
+            return response
+        except BinanceAPIException as e:
+            self._log_error(f"Binance API Exception cancelling all open orders: {e}")
+            return None
+        except Exception as e:
+            self._log_error(f"Unexpected error cancelling all open orders: {e}")
+            return None
+
+    def get_account_balance(self):
+        """
+        Retrieves the futures account balance.
+        :return: List of per-asset balances or None if error
+        """
+        self._log_request('futures_account_balance', {})
+        try:
+            balance = self._call('futures_account_balance')
+            self._log_response(balance)
+            return balance
+        except BinanceAPIException as e:
+            self._log_error(f"Binance API Exception fetching account balance: {e}")
+            return None
+        except Exception as e:
+            self._log_error(f"Unexpected error fetching account balance: {e}")
+            return None
+
+def build_bot(api_key, api_secret, base_url=None):
+    """
+    Builds the CLI bot: orders are journaled (BOT_JOURNAL_PATH) so a crash mid-order can be recovered
+    on the next start, and checked against BOT_RISK_LIMITS when that is set. The bot is lazy: its
+    first real request doubles as the connectivity check.
+    :param base_url: Optional futures endpoint (e.g. a local mock exchange) instead of the Testnet
+    :return: BasicBot with its journal reconciled and risk engine seeded
+    """
+    journal = OrderJournal(os.environ.get('BOT_JOURNAL_PATH', DEFAULT_JOURNAL_PATH))
+    # Pre-trade risk limits from a JSON file: {"account": {...}, "symbols": {"BTCUSDT": {...}}}
+    risk = RiskEngine(*load_limits(os.environ['BOT_RISK_LIMITS'])) if os.environ.get('BOT_RISK_LIMITS') else None
+    bot = BasicBot(api_key=api_key, api_secret=api_secret, testnet=True, base_url=base_url, journal=journal, risk=risk, lazy=True)
+    summary = bot.reconcile_journal()
+    if summary['checked']:
+        logger.info(f"Recovered {summary['checked']} unresolved orders from the journal: {summary}")
+    if risk:
+        bot.sync_risk()
+    return bot
+
 def get_user_input(prompt, type_converter=str, validation_func=None, error_message="Invalid input."):
     """Generic function to get and validate user input."""
     while True:
@@ -228,13 +837,21 @@ def display_menu():
     print("4. Check Order Status")
     print("5. Cancel Order")
     print("6. View Account Balance (Testnet)")
+    print("7. View Latency Metrics")
     print("0. Exit")
     print("---------------------------------")
 
+def show_top_of_book(bot, symbol):
+    """Prints best bid/ask from the local order book when market data is running for symbol."""
+    top = bot.best_bid_ask(symbol)
+    if top and top[0] and top[1]:
+        (bid, bid_qty), (ask, ask_qty) = top
+        print(f"Best bid: {bid} ({bid_qty}) | Best ask: {ask} ({ask_qty})")
+
 def main_cli(bot):
     while True:
         display_menu()
-        choice = get_user_input("Enter your choice: ", int, lambda x: 0 <= x <= 6)
+        choice = get_user_input("Enter your choice: ", int, lambda x: 0 <= x <= 7)
 
         if choice == 1: # Market Order
             symbol = get_user_input("Enter symbol (e.g., BTCUSDT): ", str.upper)
@@ -248,6 +865,7 @@ def main_cli(bot):
             symbol = get_user_input("Enter symbol (e.g., BTCUSDT): ", str.upper)
             side = get_user_input("Enter side (BUY/SELL): ", str.upper, lambda x: x in ['BUY', 'SELL'])
             quantity = get_user_input("Enter quantity: ", float, lambda x: x > 0)
+            show_top_of_book(bot, symbol)
             price = get_user_input("Enter limit price: ", float, lambda x: x > 0)
             order_details = bot.place_limit_order(symbol, side, quantity, price)
             if order_details:
@@ -257,6 +875,7 @@ def main_cli(bot):
             symbol = get_user_input("Enter symbol (e.g., BTCUSDT): ", str.upper)
             side = get_user_input("Enter side (BUY/SELL): ", str.upper, lambda x: x in ['BUY', 'SELL'])
             quantity = get_user_input("Enter quantity: ", float, lambda x: x > 0)
+            show_top_of_book(bot, symbol)
             stop_price = get_user_input("Enter stop price (trigger price): ", float, lambda x: x > 0) # Clarified prompt
             limit_price = get_user_input("Enter limit price (for when stop is triggered): ", float, lambda x: x > 0) # Added prompt for limit price
 
@@ -281,17 +900,24 @@ def main_cli(bot):
                 print(f"Order cancellation response: {response}")
 
         elif choice == 6: # View Account Balance
-            try:
-                balance = bot.client.futures_account_balance()
+            balance = bot.get_account_balance()
+            if balance is not None:
                 print("\n--- Testnet Account Balance ---")
                 for asset in balance:
                     if float(asset['balance']) > 0: # Show only assets with balance
                         print(f"Asset: {asset['asset']}, Balance: {asset['balance']}, Available: {asset['availableBalance']}")
                 print("-----------------------------")
-            except Exception as e:
-                logger.error(f"Could not fetch account balance: {e}")
+            else:
                 print("Error: Could not fetch account balance.")
 
+        elif choice == 7: # Latency Metrics
+            print("\n--- Exchange Call Latency ---")
+            print(bot.metrics.format_summary())
+            print(f"Retries: {bot.retry_policy.stats()}")
+            if bot.risk:
+                print(f"Risk: {bot.risk.stats()}")
+            print("-----------------------------")
+
         elif choice == 0: # Exit
             logger.info("Exiting bot.")
             break
@@ -302,6 +928,14 @@ def main_cli(bot):
         input("Press Enter to continue...") # Pause for user to read output
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        # Non-interactive mode: python trading_bot.py place|cancel|status|balance|batch ... (see batch_cli.py)
+        from batch_cli import main as script_main
+        sys.exit(script_main(sys.argv[1:]))
+
+    # Logs to trading_bot.log (rotated) and the console. Set BOT_LOG_MODE=queue to move formatting and
+    # I/O onto a background listener thread (see logging_setup.py).
+    configure_logging()
     logger.info("Starting Trading Bot Application...")
 
     #--- Method 1: Get API Keys from Environment Variables (Recommended & Secure) ---
@@ -312,8 +946,8 @@ if __name__ == "__main__":
     # set BINANCE_TEST_API_KEY="your_testnet_api_key"
     # set BINANCE_TEST_API_SECRET="your_testnet_api_secret"
 
-    api_key = os.environ.get('56cc474c3c74204fbdac7625299f3393153c719b559cc5c0afe4ea2ffd4bc9c4')
-    api_secret = os.environ.get('ed50634319d32a2aa24727a6f294db926b2772bde6f02fa60ae3f5e5b6d4979c')
+    api_key = os.environ.get(API_KEY_ENV)
+    api_secret = os.environ.get(API_SECRET_ENV)
 
     #--- Method 2: Input API Keys directly (Less Secure - for quick testing only)
     if not api_key or not api_secret:
@@ -327,7 +961,9 @@ if __name__ == "__main__":
         print("API Key and Secret Key are required. Exiting.")
     else:
         try:
-            bot_instance = BasicBot(api_key=api_key, api_secret=api_secret, testnet=True)
+            bot_instance = build_bot(api_key, api_secret)
+            # The menu comes up at once; the connection check and balance are logged while it is read
+            bot_instance.connect(background=True)
             main_cli(bot_instance)
         except Exception as e:
             logger.critical(f"Failed to initialize or run the bot: {e}")
@@ -0,0 +1,300 @@
+import asyncio
+import collections
+import json
+import logging
+import threading
+import time
+
+import websockets
+
+#--- User-data WebSocket stream
+# Keeps a local copy of orders, positions and balances up to date from ORDER_TRADE_UPDATE and
+# ACCOUNT_UPDATE events, so order status lookups become dictionary reads instead of REST calls.
+# Lifecycle: create listen key -> connect -> resync from REST -> apply events, with a keepalive
+# every 30 minutes and reconnect (plus a fresh REST resync to cover the gap) on any disconnect.
+# Open orders are kept until they finish; finished ones only in a bounded most-recent window, so a
+# long-running bot's memory does not grow with every order it has ever placed.
+
+logger = logging.getLogger(__name__)
+
+TESTNET_WS_URL = 'wss://fstream.binancefuture.com'
+MAINNET_WS_URL = 'wss://fstream.binance.com'
+
+KEEPALIVE_INTERVAL = 30 * 60
+KEEPALIVE_RETRY_DELAY = 60 # after a failed keepalive
+LISTEN_KEY_TTL = 60 * 60 # listen keys expire after 60 minutes without a keepalive
+RECONNECT_DELAY = 1.0
+MAX_RECONNECT_DELAY = 30.0
+MAX_FINISHED_ORDERS = 1000 # finished orders kept for status lookups
+
+OPEN_STATUSES = ('NEW', 'PARTIALLY_FILLED')
+
+
+def _order_from_event(o, event_time):
+    """Maps the abbreviated ORDER_TRADE_UPDATE fields onto the futures_get_order response shape."""
+    return {
+        'orderId': o['i'],
+        'symbol': o['s'],
+        'status': o['X'],
+        'clientOrderId': o.get('c'),
+        'price': o.get('p'),
+        'avgPrice': o.get('ap'),
+        'origQty': o.get('q'),
+        'executedQty': o.get('z'),
+        'timeInForce': o.get('f'),
+        'type': o.get('o'),
+        'side': o.get('S'),
+        'stopPrice': o.get('sp'),
+        'updateTime': o.get('T', event_time),
+    }
+
+
+class AccountStateStore:
+    """Thread-safe local view of orders, positions and balances. `version` changes with every update."""
+
+    def __init__(self, max_finished=MAX_FINISHED_ORDERS):
+        """:param max_finished: Finished (filled, canceled, expired...) orders kept, most recent first out last"""
+        self.orders = {} # str(orderId) -> open order dict (futures_get_order shape)
+        self.finished = collections.OrderedDict() # str(orderId) -> finished order dict, oldest first
+        self.max_finished = max_finished
+        self.positions = {} # (symbol, positionSide) -> position dict
+        self.balances = {} # asset -> balance dict
+        self.live = False # True while the stream is connected and resynced
+        self.last_event_time = None
+        self.version = 0
+        self._lock = threading.Condition()
+
+    def apply_event(self, event):
+        event_type = event.get('e')
+        with self._lock:
+            self.last_event_time = time.time()
+            if event_type == 'ORDER_TRADE_UPDATE':
+                self._store_order(_order_from_event(event['o'], event.get('E')))
+            elif event_type == 'ACCOUNT_UPDATE':
+                account = event.get('a', {})
+                for b in account.get('B', []):
+                    # Merged: the event has no availableBalance, the last resync's value is kept
+                    self.balances[b['a']] = dict(self.balances.get(b['a'], {}), asset=b['a'], balance=b['wb'], crossWalletBalance=b.get('cw'))
+                for p in account.get('P', []):
+                    self.positions[(p['s'], p.get('ps', 'BOTH'))] = {
+                        'symbol': p['s'],
+                        'positionAmt': p['pa'],
+                        'entryPrice': p['ep'],
+                        'unRealizedProfit': p.get('up'),
+                        'marginType': p.get('mt'),
+                        'positionSide': p.get('ps', 'BOTH'),
+                    }
+            else:
+                return
+            self._changed()
+
+    def _changed(self):
+        self.version += 1
+        self._lock.notify_all()
+
+    def _store_order(self, order):
+        order_id = str(order['orderId'])
+        if order['status'] in OPEN_STATUSES:
+            self.orders[order_id] = order
+            return
+        self.orders.pop(order_id, None)
+        self.finished[order_id] = order
+        self.finished.move_to_end(order_id)
+        while len(self.finished) > self.max_finished:
+            self.finished.popitem(last=False)
+
+    def resync(self, open_orders, account):
+        """Replaces the open-order, position and balance view with a REST snapshot."""
+        with self._lock:
+            # Orders we knew as open but the exchange no longer lists changed state while we were
+            # disconnected; drop them so lookups fall back to REST instead of serving stale data.
+            self.orders = {str(order['orderId']): order for order in open_orders}
+            self.balances = {a['asset']: {'asset': a['asset'], 'balance': a['walletBalance'],
+                                          'availableBalance': a.get('availableBalance')}
+                             for a in account.get('assets', [])}
+            self.positions = {(p['symbol'], p.get('positionSide', 'BOTH')): p
+                              for p in account.get('positions', []) if float(p.get('positionAmt', 0)) != 0}
+            self._changed()
+
+    def set_live(self, live):
+        with self._lock:
+            self.live = live
+            self._changed()
+
+    def snapshot(self):
+        """:return: {'balance', 'positions', 'open_orders', 'live', 'version'} copied under the lock"""
+        with self._lock:
+            return {
+                'balance': [dict(b) for b in self.balances.values() if float(b.get('balance') or 0) > 0],
+                'positions': [dict(p) for p in self.positions.values() if float(p.get('positionAmt', 0)) != 0],
+                'open_orders': [dict(order) for order in self.orders.values()],
+                'live': self.live,
+                'version': self.version,
+            }
+
+    def wait_for_change(self, version, timeout):
+        """Blocks until `version` is outdated or `timeout` elapses. :return: The current version"""
+        with self._lock:
+            self._lock.wait_for(lambda: self.version != version, timeout=timeout)
+            return self.version
+
+    def get_order(self, order_id):
+        """
+        :return: Cached order dict, or None if the stream is down or the order is unknown
+        """
+        with self._lock:
+            if not self.live:
+                return None
+            order = self.orders.get(str(order_id)) or self.finished.get(str(order_id))
+            return dict(order) if order else None
+
+
+class UserDataStream:
+    def __init__(self, bot, ws_url=TESTNET_WS_URL, store=None):
+        """
+        :param bot: BasicBot whose client/rate limiter are used for listen-key and resync REST calls
+        :param ws_url: WebSocket root (testnet, mainnet, or a local mock server)
+        """
+        self.bot = bot
+        self.ws_url = ws_url.rstrip('/')
+        self.store = store or AccountStateStore()
+        self._loop = None
+        self._thread = None
+        self._task = None
+        self._stopping = False
+        self._listen_key = None
+
+    def start(self):
+        """Runs the stream on a daemon thread with its own event loop."""
+        self._stopping = False
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_until_complete, args=(self._run(),),
+                                         name='user-data-stream', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopping = True
+        self.store.set_live(False)
+        if self._loop and self._task:
+            self._loop.call_soon_threadsafe(self._task.cancel)
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def _resync(self):
+        """Rebuilds the store from REST so events missed while disconnected are not lost."""
+        open_orders = self.bot.fetch_open_orders()
+        account = self.bot._call('futures_account')
+        self.store.resync(open_orders, account)
+        if self.bot.risk:
+            self.bot.risk.seed(account, open_orders)
+        logger.info(f"User data store resynced: {len(open_orders)} open orders")
+
+    def _notify(self, event):
+        """Passes an event to the risk engine and the order listeners; one failing does not stop the others or the stream."""
+        if self.bot.risk:
+            try:
+                self.bot.risk.apply_event(event)
+            except Exception as e:
+                logger.error(f"Risk engine failed to apply {event.get('e')} event: {e}")
+        if self.bot.order_listeners and event.get('e') == 'ORDER_TRADE_UPDATE':
+            order = _order_from_event(event['o'], event.get('E'))
+            for listener in self.bot.order_listeners:
+                try:
+                    listener(order)
+                except Exception as e:
+                    logger.error(f"Order listener {listener!r} failed on order {order['orderId']}: {e}")
+
+    async def _keepalive(self, ws):
+        """
+        Extends the listen key every KEEPALIVE_INTERVAL. A failed keepalive is retried sooner; once the key
+        may have expired the socket is closed, so the reconnect path creates a new one.
+        """
+        kept_alive = time.monotonic()
+        delay = KEEPALIVE_INTERVAL
+        while True:
+            await asyncio.sleep(delay)
+            try:
+                await asyncio.to_thread(self.bot._call, 'futures_stream_keepalive', listenKey=self._listen_key)
+            except Exception as e:
+                if time.monotonic() + KEEPALIVE_RETRY_DELAY - kept_alive >= LISTEN_KEY_TTL:
+                    logger.error(f"Listen key keepalive failed: {e}; the key may expire, reconnecting.")
+                    await ws.close()
+                    return
+                logger.error(f"Listen key keepalive failed: {e}; retrying in {KEEPALIVE_RETRY_DELAY}s")
+                delay = KEEPALIVE_RETRY_DELAY
+                continue
+            kept_alive = time.monotonic()
+            delay = KEEPALIVE_INTERVAL
+            logger.info("User data stream listen key kept alive.")
+
+    async def _run(self):
+        self._task = asyncio.current_task()
+        try:
+            await self._connect_forever()
+        except asyncio.CancelledError:
+            pass
+        logger.info("User data stream stopped.")
+
+    async def _connect_forever(self):
+        delay = RECONNECT_DELAY
+        while not self._stopping:
+            keepalive = None
+            try:
+                self._listen_key = await asyncio.to_thread(self.bot._call, 'futures_stream_get_listen_key')
+                async with websockets.connect(f"{self.ws_url}/ws/{self._listen_key}") as ws:
+                    # Resync only after the socket is open: anything after this point arrives as events
+                    await asyncio.to_thread(self._resync)
+                    self.store.set_live(True)
+                    logger.info("User data stream connected.")
+                    delay = RECONNECT_DELAY
+                    keepalive = asyncio.ensure_future(self._keepalive(ws))
+                    async for message in ws:
+                        event = json.loads(message)
+                        if event.get('e') == 'listenKeyExpired':
+                            logger.warning("User data stream listen key expired; reconnecting.")
+                            break
+                        self.store.apply_event(event)
+                        self._notify(event)
+            except Exception as e:
+                logger.error(f"User data stream error: {e}")
+            finally:
+                self.store.set_live(False)
+                if keepalive:
+                    keepalive.cancel()
+
+            if not self._stopping:
+                logger.info(f"Reconnecting user data stream in {delay:.0f}s")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, MAX_RECONNECT_DELAY)
+
+
+if __name__ == "__main__":
+    from mock_exchange import MockFuturesServer, MockStreamServer
+    from trading_bot import BasicBot
+
+    logging.getLogger().setLevel(logging.WARNING)
+    rest = MockFuturesServer(latency=0.05).start()
+    ws = MockStreamServer(rest.exchange).start()
+    bot = BasicBot('demo', 'demo', base_url=rest.base_url)
+    order = bot.place_limit_order('BTCUSDT', 'BUY', 0.01, 20000)
+
+    start = time.perf_counter()
+    bot.get_order_status('BTCUSDT', order['orderId'])
+    rest_time = time.perf_counter() - start
+
+    bot.start_user_stream(ws.ws_url)
+    while not bot.user_stream.store.live:
+        time.sleep(0.01)
+    bot.cancel_order('BTCUSDT', order['orderId'])
+    time.sleep(0.1) # let the ORDER_TRADE_UPDATE arrive
+
+    start = time.perf_counter()
+    status = bot.get_order_status('BTCUSDT', order['orderId'])
+    store_time = time.perf_counter() - start
+
+    print(f"REST lookup:  {rest_time * 1e6:10.1f} us")
+    print(f"Store lookup: {store_time * 1e6:10.1f} us (status {status['status']})")
+    bot.stop_user_stream()
+    ws.stop()
+    rest.stop()